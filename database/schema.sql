@@ -1,5 +1,7 @@
 -- Esquema de Base de Datos para Sistema IoT
 -- ==========================================
+-- Requiere PostgreSQL 14+ (date_bin en los agregados por intervalo de
+-- db_connector; particiones y triggers con tablas de transición)
 
 -- Crear la base de datos (ejecutar como superusuario)
 -- CREATE DATABASE iot_db;
@@ -20,16 +22,71 @@ CREATE TABLE IF NOT EXISTS devices (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Tabla de datos de sensores
+-- Tabla de datos de sensores (particionada por mes sobre timestamp)
+-- Nota: una instalación existente con sensor_data plana debe renombrarla,
+-- crear esta tabla y copiar los datos (INSERT ... SELECT) para migrar.
 CREATE TABLE IF NOT EXISTS sensor_data (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     device_id VARCHAR(50) REFERENCES devices(device_id),
     sensor_type VARCHAR(50) NOT NULL,
     value DECIMAL(10,4) NOT NULL,
     unit VARCHAR(20),
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     location VARCHAR(100),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Partición por defecto para lecturas fuera de los meses creados
+CREATE TABLE IF NOT EXISTS sensor_data_default PARTITION OF sensor_data DEFAULT;
+
+-- Crear (si no existe) la partición mensual que contiene p_month
+CREATE OR REPLACE FUNCTION ensure_sensor_data_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_month)::DATE;
+    month_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := format('sensor_data_%s', to_char(month_start, 'YYYY_MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF sensor_data FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_end
+    );
+    RETURN partition_name;
+END;
+$$ language 'plpgsql';
+
+-- Mes actual y siguiente (DatabaseConnector.connect y bulk_ingest aseguran los próximos cada mes)
+SELECT ensure_sensor_data_partition(CURRENT_DATE);
+SELECT ensure_sensor_data_partition((CURRENT_DATE + INTERVAL '1 month')::DATE);
+
+-- Rollups pre-agregados por (dispositivo, sensor, intervalo)
+CREATE TABLE IF NOT EXISTS sensor_rollup_1m (
+    device_id VARCHAR(50) NOT NULL,
+    sensor_type VARCHAR(50) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    sample_count BIGINT NOT NULL,
+    sum_value DOUBLE PRECISION NOT NULL,
+    min_value DOUBLE PRECISION NOT NULL,
+    max_value DOUBLE PRECISION NOT NULL,
+    avg_value DOUBLE PRECISION GENERATED ALWAYS AS (sum_value / NULLIF(sample_count, 0)) STORED,
+    first_ts TIMESTAMP NOT NULL,
+    last_ts TIMESTAMP NOT NULL,
+    PRIMARY KEY (device_id, sensor_type, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_1h (
+    device_id VARCHAR(50) NOT NULL,
+    sensor_type VARCHAR(50) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    sample_count BIGINT NOT NULL,
+    sum_value DOUBLE PRECISION NOT NULL,
+    min_value DOUBLE PRECISION NOT NULL,
+    max_value DOUBLE PRECISION NOT NULL,
+    avg_value DOUBLE PRECISION GENERATED ALWAYS AS (sum_value / NULLIF(sample_count, 0)) STORED,
+    first_ts TIMESTAMP NOT NULL,
+    last_ts TIMESTAMP NOT NULL,
+    PRIMARY KEY (device_id, sensor_type, bucket)
 );
 
 -- Tabla de alertas
@@ -60,9 +117,13 @@ CREATE TABLE IF NOT EXISTS sensor_config (
 -- Índices para mejorar el rendimiento
 CREATE INDEX IF NOT EXISTS idx_sensor_data_device_timestamp ON sensor_data(device_id, timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_sensor_data_type_timestamp ON sensor_data(sensor_type, timestamp DESC);
+-- Una lectura por (dispositivo, sensor, instante): clave de deduplicación de la ingesta masiva
+CREATE UNIQUE INDEX IF NOT EXISTS uq_sensor_data_reading ON sensor_data(device_id, sensor_type, timestamp);
 CREATE INDEX IF NOT EXISTS idx_alerts_device_status ON alerts(device_id, status);
 CREATE INDEX IF NOT EXISTS idx_alerts_created_at ON alerts(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_devices_status ON devices(status);
+CREATE INDEX IF NOT EXISTS idx_sensor_rollup_1m_bucket ON sensor_rollup_1m(bucket DESC);
+CREATE INDEX IF NOT EXISTS idx_sensor_rollup_1h_bucket ON sensor_rollup_1h(bucket DESC);
 
 -- Función para actualizar updated_at automáticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -81,3 +142,74 @@ CREATE TRIGGER update_devices_updated_at
 CREATE TRIGGER update_sensor_config_updated_at 
     BEFORE UPDATE ON sensor_config 
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Mantenimiento de rollups: un trigger por sentencia agrega el lote insertado
+-- (INSERT múltiple o COPY) y lo fusiona con los intervalos existentes
+CREATE OR REPLACE FUNCTION sensor_data_rollup_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sensor_rollup_1m AS r
+        (device_id, sensor_type, bucket, sample_count, sum_value, min_value, max_value, first_ts, last_ts)
+    SELECT device_id, sensor_type, date_trunc('minute', timestamp),
+           COUNT(*), SUM(value), MIN(value), MAX(value), MIN(timestamp), MAX(timestamp)
+    FROM new_rows
+    GROUP BY device_id, sensor_type, date_trunc('minute', timestamp)
+    ON CONFLICT (device_id, sensor_type, bucket) DO UPDATE SET
+        sample_count = r.sample_count + EXCLUDED.sample_count,
+        sum_value = r.sum_value + EXCLUDED.sum_value,
+        min_value = LEAST(r.min_value, EXCLUDED.min_value),
+        max_value = GREATEST(r.max_value, EXCLUDED.max_value),
+        first_ts = LEAST(r.first_ts, EXCLUDED.first_ts),
+        last_ts = GREATEST(r.last_ts, EXCLUDED.last_ts);
+
+    INSERT INTO sensor_rollup_1h AS r
+        (device_id, sensor_type, bucket, sample_count, sum_value, min_value, max_value, first_ts, last_ts)
+    SELECT device_id, sensor_type, date_trunc('hour', timestamp),
+           COUNT(*), SUM(value), MIN(value), MAX(value), MIN(timestamp), MAX(timestamp)
+    FROM new_rows
+    GROUP BY device_id, sensor_type, date_trunc('hour', timestamp)
+    ON CONFLICT (device_id, sensor_type, bucket) DO UPDATE SET
+        sample_count = r.sample_count + EXCLUDED.sample_count,
+        sum_value = r.sum_value + EXCLUDED.sum_value,
+        min_value = LEAST(r.min_value, EXCLUDED.min_value),
+        max_value = GREATEST(r.max_value, EXCLUDED.max_value),
+        first_ts = LEAST(r.first_ts, EXCLUDED.first_ts),
+        last_ts = GREATEST(r.last_ts, EXCLUDED.last_ts);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER sensor_data_rollup
+    AFTER INSERT ON sensor_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sensor_data_rollup_trigger();
+
+-- Reconstruir rollups de un rango desde los datos crudos (backfill o
+-- correcciones por UPDATE/DELETE, que el trigger no cubre)
+CREATE OR REPLACE FUNCTION refresh_sensor_rollups(p_from TIMESTAMP, p_to TIMESTAMP)
+RETURNS VOID AS $$
+DECLARE
+    hour_from TIMESTAMP := date_trunc('hour', p_from);
+    hour_to TIMESTAMP := date_trunc('hour', p_to) + INTERVAL '1 hour';
+BEGIN
+    DELETE FROM sensor_rollup_1m WHERE bucket >= hour_from AND bucket < hour_to;
+    DELETE FROM sensor_rollup_1h WHERE bucket >= hour_from AND bucket < hour_to;
+
+    INSERT INTO sensor_rollup_1m
+        (device_id, sensor_type, bucket, sample_count, sum_value, min_value, max_value, first_ts, last_ts)
+    SELECT device_id, sensor_type, date_trunc('minute', timestamp),
+           COUNT(*), SUM(value), MIN(value), MAX(value), MIN(timestamp), MAX(timestamp)
+    FROM sensor_data
+    WHERE timestamp >= hour_from AND timestamp < hour_to
+    GROUP BY device_id, sensor_type, date_trunc('minute', timestamp);
+
+    INSERT INTO sensor_rollup_1h
+        (device_id, sensor_type, bucket, sample_count, sum_value, min_value, max_value, first_ts, last_ts)
+    SELECT device_id, sensor_type, date_trunc('hour', bucket),
+           SUM(sample_count), SUM(sum_value), MIN(min_value), MAX(max_value), MIN(first_ts), MAX(last_ts)
+    FROM sensor_rollup_1m
+    WHERE bucket >= hour_from AND bucket < hour_to
+    GROUP BY device_id, sensor_type, date_trunc('hour', bucket);
+END;
+$$ language 'plpgsql';
@@ -19,6 +19,9 @@ from modules.tools.direct_jetson_connector import DirectJetsonConnector
 from modules.agents.direct_api_agent import create_direct_api_agent
 from modules.agents.langgraph_state import IoTAgentState, create_initial_state
 from modules.utils.usage_tracker import usage_tracker
+from modules.utils.tracing import tracer, COUNTER_RECORDS
+from modules.utils.async_runtime import agent_runtime
+from modules.utils.query_planner import FetchPlan, plan_query
 from modules.utils.intelligent_prompt_generator import (
     create_intelligent_prompt, 
     should_generate_visualization, 
@@ -36,39 +39,19 @@ logger = logging.getLogger(__name__)
 groq_logger = logging.getLogger('modules.agents.groq_integration')
 groq_logger.setLevel(logging.DEBUG)
 
-# 🧠 SISTEMAS DE INTELIGENCIA AVANZADA - INTEGRACIÓN COMPLETA
-try:
-    from modules.intelligence.smart_analyzer import SmartAnalyzer
-    from modules.intelligence.dynamic_sensor_detector import DynamicSensorDetector
-    from modules.intelligence.advanced_report_generator import AdvancedReportGenerator
-    from modules.intelligence.automatic_insights_engine import AutomaticInsightsEngine
-    from modules.intelligence.predictive_analysis_engine import PredictiveAnalysisEngine
-    from modules.intelligence.advanced_visualization_engine import AdvancedVisualizationEngine
-    from modules.intelligence.intelligent_alert_system import IntelligentAlertSystem
-    from modules.intelligence.temporal_comparison_engine import TemporalComparisonEngine
-    INTELLIGENCE_SYSTEMS_AVAILABLE = True
-    logger.info("🧠 SISTEMAS DE INTELIGENCIA AVANZADA CARGADOS EXITOSAMENTE")
-except ImportError as e:
-    INTELLIGENCE_SYSTEMS_AVAILABLE = False
-    logger.error(f"❌ Error cargando sistemas de inteligencia: {e}")
-except Exception as e:
-    INTELLIGENCE_SYSTEMS_AVAILABLE = False
-    logger.error(f"❌ Error inicializando sistemas de inteligencia: {e}")
+# 🧠 SISTEMAS DE INTELIGENCIA AVANZADA - CARGA DIFERIDA
+# Los motores se registran como plugins y se importan en su primer uso
+# (pandas/scipy/sklearn/plotly no se cargan hasta que una consulta los necesita)
+from modules.utils.plugin_registry import plugin_registry, LazyPluginMap, CATEGORY_ENGINE
 
-# LangGraph imports
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-
-logger = logging.getLogger(__name__)
+INTELLIGENCE_SYSTEMS_AVAILABLE = all(
+    plugin_registry.is_available(name) for name in plugin_registry.names(CATEGORY_ENGINE)
+)
+if not INTELLIGENCE_SYSTEMS_AVAILABLE:
+    logger.error("❌ Error cargando sistemas de inteligencia: módulos no encontrados")
 
-# Import del motor de visualización
-try:
-    from modules.utils.visualization_engine import create_visualization_engine
-    VISUALIZATION_AVAILABLE = True
-    logger.info("🎨 Motor de visualización cargado exitosamente")
-except ImportError as e:
-    VISUALIZATION_AVAILABLE = False
-    logger.warning(f"⚠️ Motor de visualización no disponible: {e}")
+# Motor de visualización (matplotlib) también diferido
+VISUALIZATION_AVAILABLE = plugin_registry.is_available("chart_renderer")
 
 class CloudIoTAgent:
     """
@@ -95,47 +78,34 @@ class CloudIoTAgent:
         # Inicializar componentes
         self.groq_integration = None
         self.jetson_connector = None
+        self.direct_connector = None
+        self.series_connector = None  # Series por ventana desde el almacén por niveles
         self.direct_api_agent = None  # Fallback robusto
         self.graph = None
         self.memory = MemorySaver()
         
-        # Motor de visualización (inicialización con fallback)
-        self.visualization_engine = None
-        try:
-            from modules.utils.visualization_engine import IoTVisualizationEngine
-            self.visualization_engine = IoTVisualizationEngine()
-            logger.info("✅ Motor de visualización inicializado")
-        except ImportError as e:
-            logger.warning(f"Motor de visualización no disponible: {e}")
-        except Exception as e:
-            logger.error(f"Error inicializando motor de visualización: {e}")
+        # Event loop persistente del proceso: clientes async y cachés sobreviven entre turnos
+        self.runtime = agent_runtime
+        self.query_timeout = float(os.getenv("IOT_AGENT_QUERY_TIMEOUT", "180"))
         
-        # 🧠 INICIALIZAR SISTEMAS DE INTELIGENCIA AVANZADA
+        # Motor de visualización (se crea en su primer uso, ver propiedad)
+        self._visualization_engine = None
+        
+        # 🧠 SISTEMAS DE INTELIGENCIA AVANZADA (instanciados bajo demanda)
         self.intelligence_systems = {}
         if INTELLIGENCE_SYSTEMS_AVAILABLE:
-            try:
-                self.intelligence_systems = {
-                    'smart_analyzer': SmartAnalyzer(),
-                    'sensor_detector': DynamicSensorDetector(jetson_api_url=self.jetson_api_url),
-                    'report_generator': AdvancedReportGenerator(jetson_api_url=self.jetson_api_url),
-                    'insights_engine': AutomaticInsightsEngine(jetson_api_url=self.jetson_api_url),
-                    'predictive_engine': PredictiveAnalysisEngine(jetson_api_url=self.jetson_api_url),
-                    'visualization_engine': AdvancedVisualizationEngine(jetson_api_url=self.jetson_api_url),
-                    'alert_system': IntelligentAlertSystem(jetson_api_url=self.jetson_api_url),
-                    'temporal_engine': TemporalComparisonEngine(jetson_api_url=self.jetson_api_url)
-                }
-                logger.info("🧠 SISTEMAS DE INTELIGENCIA AVANZADA INICIALIZADOS")
-                logger.info(f"   📊 SmartAnalyzer: ✅")
-                logger.info(f"   🔍 DynamicSensorDetector: ✅")
-                logger.info(f"   📋 AdvancedReportGenerator: ✅")
-                logger.info(f"   💡 AutomaticInsightsEngine: ✅")
-                logger.info(f"   🔮 PredictiveAnalysisEngine: ✅")
-                logger.info(f"   📈 AdvancedVisualizationEngine: ✅")
-                logger.info(f"   🚨 IntelligentAlertSystem: ✅")
-                logger.info(f"   ⏰ TemporalComparisonEngine: ✅")
-            except Exception as e:
-                logger.error(f"❌ Error inicializando sistemas de inteligencia: {e}")
-                self.intelligence_systems = {}
+            engine_kwargs = {"jetson_api_url": self.jetson_api_url}
+            self.intelligence_systems = LazyPluginMap(plugin_registry, {
+                'smart_analyzer': {},
+                'sensor_detector': engine_kwargs,
+                'report_generator': engine_kwargs,
+                'insights_engine': engine_kwargs,
+                'predictive_engine': engine_kwargs,
+                'visualization_engine': engine_kwargs,
+                'alert_system': engine_kwargs,
+                'temporal_engine': engine_kwargs
+            })
+            logger.info(f"🧠 {len(self.intelligence_systems)} sistemas de inteligencia registrados (carga diferida)")
         else:
             logger.warning("⚠️ Sistemas de inteligencia no disponibles - usando análisis básico")
         
@@ -152,6 +122,41 @@ class CloudIoTAgent:
         
         logger.info(f"Cloud IoT Agent creado con modelo: {groq_model}")
     
+    @property
+    def visualization_engine(self):
+        """Motor de visualización matplotlib, importado en su primer uso."""
+        if self._visualization_engine is None and VISUALIZATION_AVAILABLE:
+            try:
+                self._visualization_engine = plugin_registry.create("chart_renderer")
+                logger.info("✅ Motor de visualización inicializado")
+            except Exception as e:
+                logger.error(f"Error inicializando motor de visualización: {e}")
+        return self._visualization_engine
+    
+    @visualization_engine.setter
+    def visualization_engine(self, engine):
+        self._visualization_engine = engine
+    
+    def warm_up(self, background: bool = True):
+        """
+        Precargar los plugins pesados (motores, renderizador) en segundo plano.
+        
+        Llamar después del primer render para que la primera consulta
+        analítica no pague el costo de importación.
+        """
+        return plugin_registry.warm_up(background=background)
+    
+    def submit(self, coro):
+        """
+        Programar una corrutina en el event loop persistente del agente.
+        
+        Seguro de llamar desde cualquier hilo (p. ej. el script de Streamlit).
+        
+        Returns:
+            concurrent.futures.Future con el resultado
+        """
+        return self.runtime.submit(coro)
+    
     async def initialize(self) -> bool:
         """
         Inicializar componentes del agente de forma asíncrona.
@@ -191,6 +196,11 @@ class CloudIoTAgent:
             self.jetson_connector = self.direct_connector
             logger.info("✅ jetson_connector configurado como DirectJetsonConnector")
             
+            # PRIORIDAD 0: Series del plan de consulta (almacén local + /data con ventana).
+            # Un solo intento corto: si la Jetson no responde, pasan los conectores de respaldo
+            from modules.tools.ultra_robust_connector import UltraRobustJetsonConnector
+            self.series_connector = UltraRobustJetsonConnector(self.jetson_api_url, max_retries=1, timeout=10)
+            
             # PRIORIDAD 3: Agente directo (último fallback)
             self.direct_api_agent = create_direct_api_agent(self.jetson_api_url)
             
@@ -230,12 +240,12 @@ class CloudIoTAgent:
         # Crear StateGraph
         workflow = StateGraph(IoTAgentState)
         
-        # Agregar nodos
-        workflow.add_node("query_analyzer", self._query_analyzer_node)
-        workflow.add_node("remote_data_collector", self._remote_data_collector_node)
-        workflow.add_node("data_analyzer", self._data_analyzer_node)
-        workflow.add_node("response_generator", self._response_generator_node)
-        workflow.add_node("data_verification", self._data_verification_node)
+        # Agregar nodos (cada uno envuelto en un span de trazado)
+        workflow.add_node("query_analyzer", self._traced_node("query_analyzer", self._query_analyzer_node))
+        workflow.add_node("remote_data_collector", self._traced_node("remote_data_collector", self._remote_data_collector_node))
+        workflow.add_node("data_analyzer", self._traced_node("data_analyzer", self._data_analyzer_node))
+        workflow.add_node("response_generator", self._traced_node("response_generator", self._response_generator_node))
+        workflow.add_node("data_verification", self._traced_node("data_verification", self._data_verification_node))
         
         # Configurar flujo
         workflow.set_entry_point("query_analyzer")
@@ -252,6 +262,24 @@ class CloudIoTAgent:
         
         logger.info("📊 Graph de LangGraph construido para cloud")
     
+    @staticmethod
+    def _traced_node(node_name: str, node_func):
+        """
+        Envolver un nodo del graph en un span ``node.<nombre>``.
+        
+        Registra la cantidad de registros en el estado de salida y el
+        ``execution_status`` resultante.
+        """
+        async def traced(state: IoTAgentState) -> IoTAgentState:
+            with tracer.span(f"node.{node_name}", node=node_name) as span:
+                result = await node_func(state)
+                if span is not None:
+                    span.set_attribute("execution_status", result.get("execution_status", "unknown"))
+                    span.increment(COUNTER_RECORDS, len(result.get("raw_data") or []))
+                return result
+        traced.__name__ = getattr(node_func, "__name__", node_name)
+        return traced
+    
     async def _query_analyzer_node(self, state: IoTAgentState) -> IoTAgentState:
         """
         Nodo para analizar la consulta del usuario.
@@ -267,31 +295,25 @@ class CloudIoTAgent:
             
             user_query = state["user_query"]
             
-            # Análisis simple de la consulta
+            # Plan de recolección: qué series, qué ventana y a qué resolución
+            plan = plan_query(user_query, analysis_hours=state.get("analysis_hours"))
+            
             analysis = {
                 "intent": "sensor_data_query",
                 "requires_data": True,
-                "sensors_mentioned": [],
-                "devices_mentioned": [],
+                "sensors_mentioned": plan.sensor_types,
+                "devices_mentioned": plan.device_ids,
+                "aggregation": plan.aggregation,
+                "window_hours": plan.hours,
                 "timestamp": datetime.now().isoformat()
             }
             
-            # Detectar sensores mencionados
-            sensor_keywords = ["temperatura", "temperature", "sensor", "calor", "grados"]
-            if any(keyword in user_query.lower() for keyword in sensor_keywords):
-                analysis["sensors_mentioned"] = ["temperature"]
-            
-            # Detectar dispositivos mencionados
-            device_keywords = ["arduino", "esp32", "dispositivo", "device"]
-            for keyword in device_keywords:
-                if keyword in user_query.lower():
-                    analysis["devices_mentioned"].append(keyword)
-            
             # Actualizar estado
             state["query_analysis"] = analysis
+            state["fetch_plan"] = plan.to_dict()
             state["execution_status"] = "query_analyzed"
             
-            logger.info(f"   ✅ Consulta analizada: {analysis['intent']}")
+            logger.info(f"   ✅ Consulta analizada: {analysis['intent']} | plan: {plan.describe()}")
             return state
             
         except Exception as e:
@@ -320,9 +342,32 @@ class CloudIoTAgent:
             
             all_data = []
             method_used = "none"
+            plan = FetchPlan.from_dict(state.get("fetch_plan")) or FetchPlan()
+            
+            # MÉTODO 0: Series del plan (solo las series y la resolución necesarias)
+            if self.series_connector:
+                try:
+                    logger.info(f"🗺️ Recolectando según plan: {plan.describe()}")
+                    result = self.series_connector.get_series_for_window(
+                        plan.hours,
+                        max_points=plan.max_points,
+                        resolution=plan.resolution,
+                        device_ids=plan.device_ids or None,
+                        sensor_types=plan.sensor_types or None
+                    )
+                    if result["data"]:
+                        # La API ya se consultó para esta ventana: sin cobertura completa
+                        # se usan las series parciales en lugar de descargar de nuevo
+                        all_data = result["data"]
+                        method_used = "planned" if result["plan"]["covered"] else "planned_partial"
+                        state["fetch_plan"] = {**plan.to_dict(), "tier": result["plan"]}
+                        logger.info(f"✅ Plan resuelto desde nivel {result['plan']['tier']}: {len(all_data)} registros "
+                                    f"({'cubierto' if result['plan']['covered'] else 'cobertura parcial'})")
+                except Exception as e:
+                    logger.warning(f"⚠️ Recolección por plan falló: {e}")
             
             # MÉTODO 1: Conector DIRECTO (igual que dashboard exitoso)
-            if self.direct_connector:
+            if not all_data and self.direct_connector:
                 try:
                     logger.info("🚀 Intentando método DIRECTO (igual que dashboard)...")
                     
@@ -378,23 +423,8 @@ class CloudIoTAgent:
                     logger.info("� Activando FALLBACK DIRECTO (frontend logic)...")
                     
                     if hasattr(self, 'direct_api_agent') and self.direct_api_agent:
-                        # Usar el agente directo que copia la lógica del frontend
-                        # Intentar obtener configuración temporal del contexto
-                        analysis_hours = 3.0  # Default
-                        
-                        # Buscar si hay configuración temporal en la consulta
-                        user_query = state.get("user_query", "")
-                        if "CONFIGURACIÓN TEMPORAL" in user_query:
-                            try:
-                                import re
-                                match = re.search(r"(\d+(?:\.\d+)?)\s*horas", user_query)
-                                if match:
-                                    analysis_hours = float(match.group(1))
-                                    logger.info(f"📅 Usando configuración temporal: {analysis_hours} horas")
-                            except:
-                                pass
-                        
-                        direct_result = self.direct_api_agent.get_all_recent_data(hours=analysis_hours)
+                        # Usar el agente directo que copia la lógica del frontend (ventana del plan)
+                        direct_result = self.direct_api_agent.get_all_recent_data(hours=plan.hours)
                         
                         if direct_result.get("status") == "success":
                             all_data = direct_result.get("sensor_data", [])
@@ -408,6 +438,10 @@ class CloudIoTAgent:
                 except Exception as fallback_error:
                     logger.error(f"❌ Fallback directo falló: {fallback_error}")
             
+            # Los métodos de respaldo no filtran: aplicar el plan una sola vez aquí
+            if all_data and not method_used.startswith("planned"):
+                all_data = plan.select(all_data) or all_data
+            
             # RESULTADO FINAL
             if all_data:
                 state["raw_data"] = all_data
@@ -467,10 +501,11 @@ class CloudIoTAgent:
                     # Usar el mismo método exitoso del frontend
                     if hasattr(self, 'direct_api_agent') and self.direct_api_agent:
                         logger.info("🔄 Intentando recuperación directa de datos...")
-                        direct_result = self.direct_api_agent.get_all_recent_data(hours=3.0)
+                        plan = FetchPlan.from_dict(state.get("fetch_plan")) or FetchPlan()
+                        direct_result = self.direct_api_agent.get_all_recent_data(hours=plan.hours)
                         
                         if direct_result.get("status") == "success" and direct_result.get("sensor_data"):
-                            raw_data = direct_result.get("sensor_data", [])
+                            raw_data = plan.select(direct_result.get("sensor_data", [])) or direct_result.get("sensor_data", [])
                             state["raw_data"] = raw_data
                             logger.info(f"✅ RECUPERACIÓN EXITOSA: {len(raw_data)} registros obtenidos")
                         else:
@@ -545,7 +580,8 @@ class CloudIoTAgent:
                 try:
                     # Verificar si el método existe antes de usarlo
                     if hasattr(self.intelligence_systems['insights_engine'], 'analyze_user_query'):
-                        query_analysis = self.intelligence_systems['insights_engine'].analyze_user_query(user_query)
+                        with tracer.span("engine.insights_engine", method="analyze_user_query"):
+                            query_analysis = self.intelligence_systems['insights_engine'].analyze_user_query(user_query)
                         logger.info(f"🧠 AutomaticInsightsEngine analizó la consulta: {query_analysis.get('intent', 'unknown')}")
                     else:
                         logger.info("🔄 Método analyze_user_query no disponible, usando análisis básico")
@@ -556,6 +592,10 @@ class CloudIoTAgent:
             else:
                 query_analysis = self._basic_query_analysis(user_query)
             
+            # Ventana, series y agregación ya resueltas por el plan (los datos llegan recortados)
+            if state.get("fetch_plan"):
+                query_analysis = {**query_analysis, "fetch_plan": state["fetch_plan"]}
+            
             # PASO 3: DETECCIÓN DINÁMICA DE SENSORES Y DISPOSITIVOS
             logger.info("🔍 Detectando dispositivos y sensores dinámicamente...")
             device_analysis = {}
@@ -563,7 +603,8 @@ class CloudIoTAgent:
             if self.intelligence_systems.get('sensor_detector'):
                 try:
                     # Usar DynamicSensorDetector para análisis automático
-                    device_analysis = self.intelligence_systems['sensor_detector'].analyze_devices_and_sensors(processed_data)
+                    with tracer.span("engine.sensor_detector", records=len(processed_data)):
+                        device_analysis = self.intelligence_systems['sensor_detector'].analyze_devices_and_sensors(processed_data)
                     logger.info(f"🧠 DynamicSensorDetector encontró: {device_analysis.get('total_devices', 0)} dispositivos, {device_analysis.get('total_sensors', 0)} tipos de sensores")
                 except Exception as e:
                     logger.warning(f"⚠️ DynamicSensorDetector falló, usando detección básica: {e}")
@@ -577,10 +618,10 @@ class CloudIoTAgent:
             
             if self.intelligence_systems.get('smart_analyzer'):
                 try:
-                    # Usar SmartAnalyzer para análisis estadístico completo
-                    statistical_analysis = self.intelligence_systems['smart_analyzer'].perform_comprehensive_analysis(
-                        processed_data, query_analysis, device_analysis
-                    )
+                    # Usar SmartAnalyzer para análisis estadístico completo sobre la ventana del plan
+                    plan = FetchPlan.from_dict(state.get("fetch_plan")) or FetchPlan()
+                    with tracer.span("engine.smart_analyzer", records=len(processed_data)):
+                        statistical_analysis = self._smart_statistical_analysis(processed_data, plan.hours)
                     logger.info(f"🧠 SmartAnalyzer completó análisis estadístico: {len(statistical_analysis.get('insights', []))} insights generados")
                 except Exception as e:
                     logger.warning(f"⚠️ SmartAnalyzer falló en análisis estadístico: {e}")
@@ -595,14 +636,16 @@ class CloudIoTAgent:
             
             if self.intelligence_systems.get('predictive_engine'):
                 try:
-                    predictive_analysis = self.intelligence_systems['predictive_engine'].generate_predictions(processed_data)
+                    with tracer.span("engine.predictive_engine", records=len(processed_data)):
+                        predictive_analysis = self.intelligence_systems['predictive_engine'].generate_predictions(processed_data)
                     logger.info(f"🧠 PredictiveAnalysisEngine generó predicciones para {len(predictive_analysis.get('predictions', []))} variables")
                 except Exception as e:
                     logger.warning(f"⚠️ PredictiveAnalysisEngine falló: {e}")
             
             if self.intelligence_systems.get('temporal_engine'):
                 try:
-                    temporal_analysis = self.intelligence_systems['temporal_engine'].analyze_temporal_patterns(processed_data)
+                    with tracer.span("engine.temporal_engine", records=len(processed_data)):
+                        temporal_analysis = self.intelligence_systems['temporal_engine'].analyze_temporal_patterns(processed_data)
                     logger.info(f"🧠 TemporalComparisonEngine analizó patrones temporales")
                 except Exception as e:
                     logger.warning(f"⚠️ TemporalComparisonEngine falló: {e}")
@@ -613,9 +656,10 @@ class CloudIoTAgent:
             
             if self.intelligence_systems.get('alert_system'):
                 try:
-                    intelligent_alerts = self.intelligence_systems['alert_system'].generate_contextual_alerts(
-                        processed_data, statistical_analysis, predictive_analysis
-                    )
+                    with tracer.span("engine.alert_system", records=len(processed_data)):
+                        intelligent_alerts = self.intelligence_systems['alert_system'].generate_contextual_alerts(
+                            processed_data, statistical_analysis, predictive_analysis
+                        )
                     logger.info(f"🧠 IntelligentAlertSystem generó {len(intelligent_alerts)} alertas contextuales")
                 except Exception as e:
                     logger.warning(f"⚠️ IntelligentAlertSystem falló: {e}")
@@ -640,9 +684,10 @@ class CloudIoTAgent:
             if self.intelligence_systems.get('report_generator'):
                 try:
                     # Usar AdvancedReportGenerator para formateo inteligente
-                    formatted_data = self.intelligence_systems['report_generator'].generate_intelligent_report(
-                        processed_data, comprehensive_analysis, user_query
-                    )
+                    with tracer.span("engine.report_generator", method="generate_intelligent_report"):
+                        formatted_data = self.intelligence_systems['report_generator'].generate_intelligent_report(
+                            processed_data, comprehensive_analysis, user_query
+                        )
                     logger.info("🧠 AdvancedReportGenerator generó reporte inteligente")
                 except Exception as e:
                     logger.warning(f"⚠️ AdvancedReportGenerator falló, usando formateo básico: {e}")
@@ -722,11 +767,12 @@ class CloudIoTAgent:
             if self.intelligence_systems.get('report_generator') and comprehensive_analysis:
                 try:
                     # Usar AdvancedReportGenerator para generar respuesta completa
-                    intelligent_response = self.intelligence_systems['report_generator'].generate_intelligent_response(
-                        user_query=user_query,
-                        analysis_data=comprehensive_analysis,
-                        formatted_data=formatted_data
-                    )
+                    with tracer.span("engine.report_generator", method="generate_intelligent_response"):
+                        intelligent_response = self.intelligence_systems['report_generator'].generate_intelligent_response(
+                            user_query=user_query,
+                            analysis_data=comprehensive_analysis,
+                            formatted_data=formatted_data
+                        )
                     logger.info("🧠 AdvancedReportGenerator generó respuesta inteligente")
                     
                     # Si hay alertas inteligentes, agregarlas a la respuesta
@@ -769,12 +815,13 @@ class CloudIoTAgent:
                     # Usar AdvancedVisualizationEngine para generar gráficos inteligentes
                     raw_data = state.get("raw_data", [])
                     if raw_data:
-                        # Filtrar datos si es consulta temporal específica
-                        filtered_data = filter_visualization_data(raw_data, user_query)
+                        # Filtrar datos si es consulta temporal específica (sin plan previo)
+                        filtered_data = raw_data if state.get("fetch_plan") else filter_visualization_data(raw_data, user_query)
                         
-                        chart_result = self.intelligence_systems['visualization_engine'].generate_intelligent_visualizations(
-                            filtered_data, user_query, comprehensive_analysis
-                        )
+                        with tracer.span("engine.visualization_engine", records=len(filtered_data)):
+                            chart_result = self.intelligence_systems['visualization_engine'].generate_intelligent_visualizations(
+                                filtered_data, user_query, comprehensive_analysis
+                            )
                         if chart_result.get('charts'):
                             chart_paths = chart_result['charts']
                             visualization_info = chart_result.get('description', '')
@@ -814,11 +861,13 @@ class CloudIoTAgent:
                         intelligent_response,
                         comprehensive_analysis,
                         statistical_analysis,
-                        state.get("raw_data", [])
+                        state.get("raw_data", []),
+                        prefiltered=bool(state.get("fetch_plan"))
                     )
                     
                     # Generar respuesta mejorada con Groq
-                    groq_response = self.groq_integration.generate_response(enhanced_prompt, model=self.groq_model)
+                    with tracer.span("llm.generate_response", model=self.groq_model, prompt_chars=len(enhanced_prompt)):
+                        groq_response = self.groq_integration.generate_response(enhanced_prompt, model=self.groq_model)
                     final_response = groq_response
                     
                     # Agregar información de visualización si existe
@@ -1042,13 +1091,15 @@ class CloudIoTAgent:
             state["execution_status"] = "verification_error"
             return state
     
-    async def process_query(self, user_query: str, thread_id: str = "cloud-session") -> Dict[str, Any]:
+    async def process_query(self, user_query: str, thread_id: str = "cloud-session",
+                            analysis_hours: float = None) -> Dict[str, Any]:
         """
         Procesar consulta del usuario usando el agente cloud.
         
         Args:
             user_query: Consulta del usuario
             thread_id: ID del hilo de conversación
+            analysis_hours: Ventana de análisis fijada por la interfaz (la usa el plan de consulta)
             
         Returns:
             Dict con la respuesta procesada
@@ -1060,12 +1111,16 @@ class CloudIoTAgent:
             logger.info(f"🔄 Procesando consulta cloud: {user_query[:100]}...")
             
             # Crear estado inicial
-            initial_state = create_initial_state(user_query)
+            initial_state = create_initial_state(user_query, analysis_hours=analysis_hours)
             
-            # Ejecutar graph
+            # Ejecutar graph (span raíz de la traza de esta consulta)
             config = {"configurable": {"thread_id": thread_id}}
             
-            result = await self.graph.ainvoke(initial_state, config=config)
+            with tracer.span("agent.process_query", thread_id=thread_id, query_chars=len(user_query)) as root_span:
+                result = await self.graph.ainvoke(initial_state, config=config)
+                if root_span is not None:
+                    root_span.set_attribute("execution_status", result.get("execution_status", "unknown"))
+                    root_span.increment(COUNTER_RECORDS, len(result.get("raw_data", [])))
             
             # Formatear respuesta
             response = {
@@ -1364,23 +1419,11 @@ class CloudIoTAgent:
         Returns:
             String con la respuesta procesada
         """
-        import asyncio
-        import nest_asyncio
-        
         try:
-            # Aplicar nest_asyncio para permitir loops anidados
-            nest_asyncio.apply()
-            
-            # Agregar información temporal al contexto si se especifica
-            if analysis_hours:
-                # Modificar la consulta para incluir contexto temporal
-                temporal_context = f"\n[CONFIGURACIÓN TEMPORAL: Analizar datos de las últimas {analysis_hours} horas]"
-                enhanced_query = user_query + temporal_context
-            else:
-                enhanced_query = user_query
-            
-            # Ejecutar la función async
-            result = asyncio.run(self.process_query(enhanced_query, thread_id))
+            # La ventana temporal viaja en el estado y la aplica el plan de consulta
+            # Entregar la consulta al loop persistente (sin crear un loop por turno)
+            result = self.runtime.run(self.process_query(user_query, thread_id, analysis_hours=analysis_hours),
+                                      timeout=self.query_timeout)
             
             # Extraer respuesta del resultado
             if isinstance(result, dict):
@@ -1584,6 +1627,35 @@ Los datos de la API están llegando pero no tienen el formato esperado.
             "analysis_type": "basic"
         }
     
+    def _smart_statistical_analysis(self, processed_data: List[Dict], hours: float) -> Dict:
+        """
+        Análisis estadístico con el SmartAnalyzer del agente.
+        
+        La instancia vive lo mismo que el agente, así que su caché incremental
+        solo recalcula las series que cambiaron entre turnos.
+        """
+        analysis = self.intelligence_systems['smart_analyzer'].analyze_comprehensive(
+            processed_data, analysis_hours=hours
+        )
+        insights = [
+            {
+                "title": insight.title,
+                "description": insight.description,
+                "severity": insight.severity,
+                "confidence": float(insight.confidence)
+            }
+            for insight in analysis.get('sensor_insights', []) + analysis.get('system_insights', [])
+        ]
+        return {
+            "insights": insights,
+            "anomaly_count": len(analysis.get('anomalies', [])),
+            "recommendations": analysis.get('recommendations', []),
+            "health_score": float(analysis.get('health_score', 0.0)),
+            "confidence_level": float(analysis.get('confidence_level', 0.0)),
+            "summary": analysis.get('summary', {}),
+            "analysis_type": "smart"
+        }
+    
     def _basic_statistical_analysis(self, processed_data: List[Dict]) -> Dict:
         """Análisis estadístico básico cuando SmartAnalyzer no está disponible."""
         if not processed_data:
@@ -1840,6 +1912,8 @@ Los datos de la API están llegando pero no tienen el formato esperado.
 💡 INSIGHTS BÁSICOS:
 """
             for insight in analysis['statistical_analysis']['insights']:
+                if isinstance(insight, dict):
+                    insight = f"{insight.get('title', 'Insight')}: {insight.get('description', '')}"
                 report += f"• {insight}\n"
         
         return report
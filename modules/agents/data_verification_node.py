@@ -6,13 +6,103 @@ Este módulo implementa un sistema de verificación para asegurar que
 el agente solo hable de sensores y datos que realmente existen.
 """
 
-import asyncio
-from typing import Dict, List, Any, Set
+import re
+from functools import lru_cache
+from typing import Dict, List, Any, Set, FrozenSet, Optional, Tuple
 from datetime import datetime
 from modules.utils.logger import logger
 from modules.database.db_connector import DatabaseConnector
 
 
+# Palabras clave que indican sensores inexistentes en nuestro hardware
+# HARDWARE REAL: Solo tenemos sensores de temperatura (NTC/thermistores) y LDR (luminosidad)
+FORBIDDEN_SENSOR_KEYWORDS: Dict[str, List[str]] = {
+    'humedad': ['humedad', 'humidity', 'hum_', '%rh'],
+    'presion': ['presión', 'pressure', 'hpa', 'bar', 'atm'],
+    'movimiento': ['movimiento', 'motion', 'pir'],
+    'sonido': ['sonido', 'sound', 'ruido', 'db', 'decibel'],
+    'co2': ['co2', 'dióxido', 'carbono'],
+    'ph': ['ph', 'acidez', 'alcalinidad'],
+    'flujo': ['flujo', 'flow', 'caudal'],
+    'voltaje': ['voltage', 'voltaje', 'volt', 'v']
+}
+
+
+class HallucinationScanner:
+    """
+    Detector de menciones a sensores inexistentes en una sola pasada.
+    
+    Todo el vocabulario prohibido se compila en una única expresión regular
+    de alternancia (``\\b(?:kw1|kw2|...)\\b``), de modo que revisar una
+    respuesta es un solo ``finditer`` en lugar de un ``re.compile`` por
+    palabra clave. Las categorías cubiertas por sensores que sí existen en
+    el inventario se excluyen del vocabulario.
+    """
+    
+    def __init__(self, valid_sensor_types: FrozenSet[str] = frozenset()):
+        self.valid_sensor_types = valid_sensor_types
+        self._keywords: Dict[str, Tuple[int, str]] = {}
+        
+        for category, keywords in FORBIDDEN_SENSOR_KEYWORDS.items():
+            if self._category_in_inventory(category, keywords, valid_sensor_types):
+                continue
+            for keyword in keywords:
+                self._keywords.setdefault(keyword, (len(self._keywords), category))
+        
+        if self._keywords:
+            # Más largas primero para que la alternancia prefiera la coincidencia completa
+            alternation = '|'.join(re.escape(k) for k in sorted(self._keywords, key=len, reverse=True))
+            self._pattern: Optional[re.Pattern] = re.compile(r'\b(?:' + alternation + r')\b')
+        else:
+            self._pattern = None
+    
+    @staticmethod
+    def _category_in_inventory(category: str, keywords: List[str], valid_sensor_types: FrozenSet[str]) -> bool:
+        """Una categoría es legítima si algún sensor real la nombra."""
+        names = [category] + keywords
+        for sensor in valid_sensor_types:
+            tokens = set(re.split(r'[^a-z0-9%]+', sensor))
+            if any(name in tokens or (len(name) > 3 and name in sensor) for name in names):
+                return True
+        return False
+    
+    @property
+    def keyword_count(self) -> int:
+        return len(self._keywords)
+    
+    def scan(self, response_text: str) -> List[Dict[str, str]]:
+        """
+        Revisar la respuesta y devolver una alucinación por palabra clave encontrada,
+        en el orden del vocabulario.
+        """
+        if self._pattern is None or not response_text:
+            return []
+        
+        found = {match.group(0) for match in self._pattern.finditer(response_text.lower())}
+        
+        hallucinations = []
+        for keyword in sorted(found, key=lambda k: self._keywords[k][0]):
+            category = self._keywords[keyword][1]
+            hallucinations.append({
+                'type': 'sensor_inexistente',
+                'category': category,
+                'keyword': keyword,
+                'message': f"Mención de '{keyword}' pero no tenemos sensores de {category}"
+            })
+        return hallucinations
+
+
+@lru_cache(maxsize=16)
+def get_hallucination_scanner(valid_sensor_types: FrozenSet[str] = frozenset()) -> HallucinationScanner:
+    """
+    Obtener el escáner compilado para un inventario de sensores.
+    
+    Se reconstruye sólo cuando el inventario cambia; instancias distintas de
+    DataVerificationNode con el mismo inventario comparten el mismo escáner.
+    """
+    return HallucinationScanner(valid_sensor_types)
+
+
 class DataVerificationNode:
     """
     Nodo especializado en verificar la veracidad de los datos
@@ -26,6 +116,7 @@ class DataVerificationNode:
         self.valid_devices: Set[str] = set()
         self.last_refresh = None
         self.cache_duration = 300  # 5 minutos
+        self.scanner = get_hallucination_scanner()
         
     async def refresh_valid_data_cache(self) -> None:
         """
@@ -65,6 +156,7 @@ class DataVerificationNode:
                         self.valid_devices.add(device_id)
             
             self.last_refresh = datetime.now()
+            self.scanner = get_hallucination_scanner(frozenset(self.valid_sensor_types))
             
             logger.info(f"✅ Caché actualizada: {len(self.valid_sensor_types)} tipos de sensores, {len(self.valid_devices)} dispositivos")
             logger.info(f"📊 Sensores válidos: {sorted(self.valid_sensor_types)}")
@@ -78,6 +170,36 @@ class DataVerificationNode:
             (datetime.now() - self.last_refresh).total_seconds() > self.cache_duration):
             await self.refresh_valid_data_cache()
     
+    def update_inventory(self, sensor_types: Set[str], devices: Set[str]) -> bool:
+        """
+        Actualizar el inventario con los datos en vivo ya recolectados.
+        
+        Evita la consulta a la base de datos cuando el estado del grafo ya
+        trae las lecturas. El escáner sólo se recompila si el conjunto de
+        tipos de sensor cambió.
+        
+        Returns:
+            True si el inventario de sensores cambió
+        """
+        normalized = {s.lower().strip() for s in sensor_types if s}
+        changed = normalized != self.valid_sensor_types
+        if changed:
+            self.valid_sensor_types = normalized
+            self.scanner = get_hallucination_scanner(frozenset(normalized))
+        self.valid_devices = {d.strip() for d in devices if d}
+        self.last_refresh = datetime.now()
+        return changed
+    
+    def _update_inventory_from_state(self, state: Dict[str, Any]) -> bool:
+        """Tomar el inventario de las lecturas del estado, si las hay."""
+        raw_data = state.get("raw_data") or []
+        sensor_types = {r.get('sensor_type') for r in raw_data if isinstance(r, dict) and r.get('sensor_type')}
+        if not sensor_types:
+            return False
+        devices = {r.get('device_id') for r in raw_data if isinstance(r, dict) and r.get('device_id')}
+        self.update_inventory(sensor_types, devices)
+        return True
+    
     def get_sensor_classification(self) -> Dict[str, List[str]]:
         """
         Clasifica los sensores válidos por categorías
@@ -105,37 +227,7 @@ class DataVerificationNode:
         """
         Identifica posibles alucinaciones en el texto de respuesta
         """
-        hallucinations = []
-        response_lower = response_text.lower()
-        
-        # Palabras clave que indican sensores inexistentes en nuestro hardware
-        # HARDWARE REAL: Solo tenemos sensores de temperatura (NTC/thermistores) y LDR (luminosidad)
-        forbidden_keywords = {
-            'humedad': ['humedad', 'humidity', 'hum_', '%rh'],
-            'presion': ['presión', 'pressure', 'hpa', 'bar', 'atm'],
-            'movimiento': ['movimiento', 'motion', 'pir'],
-            'sonido': ['sonido', 'sound', 'ruido', 'db', 'decibel'],
-            'co2': ['co2', 'dióxido', 'carbono'],
-            'ph': ['ph', 'acidez', 'alcalinidad'],  
-            'flujo': ['flujo', 'flow', 'caudal'],
-            'voltaje': ['voltage', 'voltaje', 'volt', 'v']
-        }
-        
-        for category, keywords in forbidden_keywords.items():
-            for keyword in keywords:
-                if keyword in response_lower:
-                    # Verificar que no sea parte de otra palabra
-                    import re
-                    pattern = r'\b' + re.escape(keyword) + r'\b'
-                    if re.search(pattern, response_lower):
-                        hallucinations.append({
-                            'type': 'sensor_inexistente',
-                            'category': category,
-                            'keyword': keyword,
-                            'message': f"Mención de '{keyword}' pero no tenemos sensores de {category}"
-                        })
-        
-        return hallucinations
+        return self.scanner.scan(response_text)
     
     def generate_correction_prompt(self, hallucinations: List[Dict[str, str]]) -> str:
         """
@@ -169,8 +261,9 @@ class DataVerificationNode:
         try:
             logger.info("🔍 Iniciando verificación de datos...")
             
-            # Asegurar caché actualizada
-            await self.ensure_fresh_cache()
+            # Inventario en vivo desde el estado; la base de datos sólo como respaldo
+            if not self._update_inventory_from_state(state):
+                await self.ensure_fresh_cache()
             
             # Obtener la respuesta generada
             response = state.get("final_response", "")
@@ -9,6 +9,7 @@ from groq import Groq
 from typing import Optional, Dict, Any
 import logging
 from prompts.system_prompt import SYSTEM_PROMPT
+from modules.utils.tracing import tracer, COUNTER_LLM_TOKENS
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -86,6 +87,9 @@ class GroqIntegration:
             )
             
             content = chat_completion.choices[0].message.content
+            usage = getattr(chat_completion, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                tracer.increment(COUNTER_LLM_TOKENS, usage.total_tokens)
             logger.info(f"✅ Respuesta exitosa de Groq: {len(content)} caracteres")
             logger.debug(f"📥 RESPUESTA DE GROQ (primeros 300 chars): {content[:300]}...")
             return content
@@ -7,7 +7,7 @@ Agente conversacional principal que maneja las interacciones con el sistema IoT
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from modules.tools.database_tools import DatabaseTools
+from modules.tools.database_tools import DatabaseTools, parse_time_window_hours
 from modules.tools.analysis_tools import AnalysisTools
 from modules.agents.ollama_integration import OllamaLLMIntegration
 from modules.utils.logger import logger
@@ -111,6 +111,10 @@ class IoTAgent:
         if any(word in message_lower for word in ['anomalía', 'anómalo', 'unusual', 'extraño']):
             tools.append('anomalies')
 
+        # Gráficos y reportes: historial agregado desde los rollups
+        if any(word in message_lower for word in ['gráfico', 'grafico', 'visual', 'chart', 'reporte', 'informe']):
+            tools.append('history')
+
         # Conteos/estadísticas totales
         if any(w in message_lower for w in ['total', 'conteo', 'cuenta', 'count', 'cuántos', 'cantidad']):
             tools.append('db_stats')
@@ -208,10 +212,18 @@ class IoTAgent:
                 results['alerts'] = await self.db_tools.get_alerts_tool()
                 
             if 'analysis' in tools_to_use:
-                # Obtener más datos para análisis
-                sensor_data = await self.db_tools.get_sensor_data_tool(limit=150)
-                if sensor_data:
-                    results['trends'] = self.analysis_tools.analyze_sensor_trends(sensor_data)
+                # Agregados por intervalo de la ventana pedida (calculados en la base)
+                hours = parse_time_window_hours(msg)
+                buckets = await self.db_tools.get_sensor_buckets_tool(hours=hours)
+                if buckets:
+                    results['trends'] = self.analysis_tools.analyze_sensor_trends(
+                        buckets, time_window=max(24, hours)
+                    )
+                    
+            if 'history' in tools_to_use:
+                results['history'] = await self.db_tools.get_sensor_history_tool(
+                    hours=parse_time_window_hours(msg)
+                )
                     
             if 'anomalies' in tools_to_use:
                 sensor_data = await self.db_tools.get_sensor_data_tool(limit=120)
@@ -13,7 +13,7 @@ from datetime import datetime
 from modules.agents.langgraph_state import (
     IoTAgentState, QueryIntent, ToolType, ExecutionStatus
 )
-from modules.tools.database_tools import DatabaseTools
+from modules.tools.database_tools import DatabaseTools, parse_time_window_hours
 from modules.tools.analysis_tools import AnalysisTools
 from modules.agents.ollama_integration import OllamaLLMIntegration
 from modules.utils.logger import setup_logger
@@ -28,6 +28,7 @@ class LangGraphNodes:
         self.ollama = OllamaLLMIntegration()
         self.db_tools = DatabaseTools()
         self.analysis_tools = AnalysisTools()
+        self._data_verifier = None  # Se crea en la primera verificación
         
     async def query_analyzer_node(self, state: IoTAgentState) -> IoTAgentState:
         """
@@ -282,14 +283,20 @@ class LangGraphNodes:
             QueryIntent.SENSOR_DATA: [ToolType.GET_SENSOR_DATA],
             QueryIntent.DEVICE_STATUS: [ToolType.GET_DEVICES], 
             QueryIntent.ALERTS: [ToolType.GET_ALERTS],
-            QueryIntent.ANALYSIS: [ToolType.GET_SENSOR_DATA, ToolType.ANALYZE_TRENDS],
-            QueryIntent.STATISTICS: [ToolType.GET_SENSOR_STATS, ToolType.CALCULATE_STATISTICS],
+            QueryIntent.ANALYSIS: [ToolType.GET_SENSOR_BUCKETS, ToolType.ANALYZE_TRENDS],
+            QueryIntent.STATISTICS: [ToolType.GET_SENSOR_STATS, ToolType.GET_SENSOR_BUCKETS,
+                                     ToolType.CALCULATE_STATISTICS],
             QueryIntent.ANOMALIES: [ToolType.GET_SENSOR_DATA, ToolType.DETECT_ANOMALIES],
-            QueryIntent.REPORTS: [ToolType.GET_SENSOR_STATS, ToolType.GET_DEVICES]
+            QueryIntent.REPORTS: [ToolType.GET_SENSOR_STATS, ToolType.GET_DEVICES,
+                                  ToolType.GET_SENSOR_HISTORY]
         }
         
         # Herramientas adicionales basadas en palabras clave
         additional_tools = []
+        if any(word in query for word in ("gráfico", "grafico", "visualiz", "historial")):
+            # Series de rango largo desde los rollups, no lecturas crudas
+            additional_tools.append(ToolType.GET_SENSOR_HISTORY)
+        
         if "contar" in query or "cuántos" in query or "total" in query:
             additional_tools.append(ToolType.GET_SENSOR_STATS)
         
@@ -315,10 +322,22 @@ class LangGraphNodes:
             elif tool_name == ToolType.GET_SENSOR_STATS:
                 return await self.db_tools.get_sensor_stats_tool()
             
+            elif tool_name == ToolType.GET_SENSOR_BUCKETS:
+                # Agregados por intervalo en el servidor para la ventana pedida
+                hours = parse_time_window_hours(state["user_query"])
+                return await self.db_tools.get_sensor_buckets_tool(hours=hours)
+            
+            elif tool_name == ToolType.GET_SENSOR_HISTORY:
+                # Historial para gráficos y reportes desde los rollups 1m/1h
+                hours = parse_time_window_hours(state["user_query"])
+                return await self.db_tools.get_sensor_history_tool(hours=hours)
+            
             elif tool_name == ToolType.ANALYZE_TRENDS:
                 # Convertir context_data a lista para analysis_tools
                 sensor_data = self._extract_sensor_data_from_context(state["context_data"])
-                return self.analysis_tools.analyze_sensor_trends(sensor_data)
+                return self.analysis_tools.analyze_sensor_trends(
+                    sensor_data, time_window=max(24, parse_time_window_hours(state["user_query"]))
+                )
             
             elif tool_name == ToolType.DETECT_ANOMALIES:
                 sensor_data = self._extract_sensor_data_from_context(state["context_data"])
@@ -354,6 +373,13 @@ class LangGraphNodes:
         if ToolType.GET_SENSOR_DATA in context_data:
             return context_data[ToolType.GET_SENSOR_DATA]
         
+        # Los intervalos agregados traen timestamp/value como lecturas
+        if ToolType.GET_SENSOR_BUCKETS in context_data:
+            return context_data[ToolType.GET_SENSOR_BUCKETS]
+        
+        if ToolType.GET_SENSOR_HISTORY in context_data:
+            return context_data[ToolType.GET_SENSOR_HISTORY]
+        
         # Si no hay datos directos, intentar construir lista vacía
         return []
     
@@ -459,10 +485,11 @@ class LangGraphNodes:
         try:
             logger.info("🔍 Verificando respuesta para prevenir alucinaciones...")
             
-            from modules.agents.data_verification_node import DataVerificationNode
-            
-            # Crear instancia del verificador
-            verifier = DataVerificationNode()
+            # Reutilizar el verificador (conserva inventario y escáner compilado)
+            if self._data_verifier is None:
+                from modules.agents.data_verification_node import DataVerificationNode
+                self._data_verifier = DataVerificationNode()
+            verifier = self._data_verifier
             
             # Ejecutar verificación
             verified_state = await verifier.verify_response(state)
@@ -17,6 +17,8 @@ class IoTAgentState(TypedDict):
     Attributes:
         messages: Historial de mensajes de conversación
         user_query: Consulta original del usuario
+        analysis_hours: Ventana de análisis fijada por la interfaz (opcional)
+        fetch_plan: Plan de recolección construido antes de pedir datos
         query_intent: Intención detectada de la consulta
         required_tools: Herramientas identificadas como necesarias
         tool_results: Resultados de ejecución de herramientas
@@ -48,6 +50,8 @@ class IoTAgentState(TypedDict):
     data_collection_error: Optional[str]
     data_collection_timestamp: Optional[str]
     analyzed_query: Optional[Dict[str, Any]]
+    analysis_hours: Optional[float]
+    fetch_plan: Optional[Dict[str, Any]]
     
     # Análisis y procesamiento
     analysis_results: Dict[str, Any]
@@ -95,6 +99,8 @@ class ToolType:
     GET_DEVICES = "get_devices"
     GET_ALERTS = "get_alerts"
     GET_SENSOR_STATS = "get_sensor_stats"
+    GET_SENSOR_BUCKETS = "get_sensor_buckets"
+    GET_SENSOR_HISTORY = "get_sensor_history"
     CREATE_ALERT = "create_alert"
     
     # Herramientas de análisis
@@ -131,13 +137,15 @@ class ExecutionStatus:
     PENDING = "pending"
 
 
-def create_initial_state(user_query: str, messages: List[BaseMessage] = None) -> IoTAgentState:
+def create_initial_state(user_query: str, messages: List[BaseMessage] = None,
+                         analysis_hours: Optional[float] = None) -> IoTAgentState:
     """
     Crea el estado inicial para una nueva consulta.
     
     Args:
         user_query: Consulta del usuario
         messages: Mensajes previos de la conversación
+        analysis_hours: Ventana de análisis fijada por la interfaz
         
     Returns:
         Estado inicial del agente
@@ -157,6 +165,8 @@ def create_initial_state(user_query: str, messages: List[BaseMessage] = None) ->
         data_collection_error=None,
         data_collection_timestamp=None,
         analyzed_query=None,
+        analysis_hours=analysis_hours,
+        fetch_plan=None,
         analysis_results={},
         final_response=None,
         chart_paths=[],
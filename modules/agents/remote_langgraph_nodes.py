@@ -19,11 +19,22 @@ from modules.agents.langgraph_state import (
 )
 from modules.agents.remote_data_collector import RemoteDataCollectorNode
 from modules.tools.analysis_tools import AnalysisTools
+from modules.intelligence.anomaly_engine import anomaly_engine
 from modules.agents.ollama_integration import OllamaLLMIntegration
 from modules.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Rangos normales de los sensores de la API Jetson
+REMOTE_NORMAL_RANGES = {
+    't1': (0, 50),
+    't2': (0, 50),
+    'avg': (0, 50),
+    'ntc_entrada': (0, 60),
+    'ntc_salida': (0, 60),
+    'ldr': (0, 100)
+}
+
 
 class RemoteLangGraphNodes:
     """Nodos de procesamiento para el grafo LangGraph usando API remota de Jetson."""
@@ -450,39 +461,41 @@ class RemoteLangGraphNodes:
             return {}
     
     async def _detect_anomalies(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Detectar anomalías en los datos"""
-        anomalies = []
-        
+        """Detectar anomalías (fuera de rango y z-score robusto) con el motor unificado"""
         try:
-            # Detectar valores extremos por sensor
-            for record in data:
-                value = record.get('value', 0)
-                sensor_type = record.get('sensor_type')
-                
-                # Rangos normales (puedes ajustar según tus sensores)
-                normal_ranges = {
-                    't1': (0, 50),
-                    't2': (0, 50),
-                    'avg': (0, 50),
-                    'ntc_entrada': (0, 60),
-                    'ntc_salida': (0, 60),
-                    'ldr': (0, 100)
+            flagged = anomaly_engine.detect(data, detectors=('range', 'robust_z'),
+                                            valid_ranges=REMOTE_NORMAL_RANGES)
+            if flagged.empty:
+                return []
+            flagged = flagged.reindex(columns=[*flagged.columns, *({'device_id', 'timestamp'} - set(flagged.columns))])
+            
+            ranges = {}
+            for sensor in flagged['sensor_type'].unique():
+                bounds = REMOTE_NORMAL_RANGES.get(sensor) or anomaly_engine.config_for(sensor).valid_range
+                ranges[sensor] = f"{bounds[0]:g}-{bounds[1]:g}" if bounds else None
+            statistical = (flagged['baseline'].map('{:.2f}'.format) + ' ± '
+                           + (flagged['z_threshold'] * flagged['scale']).map('{:.2f}'.format))
+            
+            return [
+                {
+                    'device_id': device_id,
+                    'sensor': sensor,
+                    'value': value,
+                    'expected_range': ranges[sensor] if out_of_range else stat_range,
+                    'timestamp': timestamp,
+                    'severity': severity,
+                    'methods': methods
                 }
-                
-                if sensor_type in normal_ranges:
-                    min_val, max_val = normal_ranges[sensor_type]
-                    if value < min_val or value > max_val:
-                        anomalies.append({
-                            'sensor': sensor_type,
-                            'value': value,
-                            'expected_range': f"{min_val}-{max_val}",
-                            'timestamp': record.get('timestamp')
-                        })
+                for device_id, sensor, value, out_of_range, stat_range, timestamp, severity, methods in zip(
+                    flagged['device_id'], flagged['sensor_type'], flagged['value'],
+                    flagged['range_anomaly'], statistical, flagged['timestamp'],
+                    flagged['severity'], flagged['methods']
+                )
+            ]
         
         except Exception as e:
             logger.error(f"Error detecting anomalies: {e}")
-        
-        return anomalies
+            return []
     
     async def _calculate_statistics(self, data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Calcular estadísticas de los datos"""
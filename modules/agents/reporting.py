@@ -11,9 +11,10 @@ import json
 import math
 import logging
 import statistics
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import pandas as pd
 
 # Imports para gráficos y exportación
@@ -30,8 +31,27 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
+from modules.utils.streaming_export import (
+    PYARROW_AVAILABLE,
+    READING_COLUMNS,
+    iter_csv_chunks,
+    iter_series_rows,
+    spool_chunks,
+    write_parquet_streaming,
+    write_xlsx_streaming,
+)
+from modules.utils.compact_html_report import CompactHTMLReport, PLOTLY_MODE_INLINE
+from modules.utils.sketches import SeriesSketch
+from modules.intelligence.anomaly_engine import anomaly_engine
+
 logger = logging.getLogger(__name__)
 
+# Rangos físicos de las lecturas en reportes (temperatura °C, LDR ADC de 10 bits)
+REPORT_VALID_RANGES = {'temperature': (0.0, 50.0), 'ldr': (0.0, 1023.0)}
+
+# Tope de registros por respuesta de la API de la Jetson
+API_PAGE_SIZE = 200
+
 # Configurar kaleido para exportar gráficos (ROBUSTO)
 try:
     # Usar la nueva API de plotly (post September 2025)
@@ -52,9 +72,11 @@ class ReportGenerator:
     """Generador de reportes ejecutivos flexible"""
     
     def __init__(self, jetson_connector=None):
-        self.supported_formats = ["pdf", "csv", "xlsx", "png", "html"]
+        self.supported_formats = ["pdf", "csv", "xlsx", "png", "html", "parquet"]
         self.chart_types = ["line", "bar", "area", "scatter", "heatmap"]
         self.max_data_points = 1000  # Límite para evitar archivos enormes
+        self.page_size = API_PAGE_SIZE  # Registros por petición al paginar una ventana
+        self.html_plotly_mode = PLOTLY_MODE_INLINE  # plotly.js fijado e incrustado: reportes sin Internet
         
         # Conector para obtener datos reales (NO GENERAR DATOS FICTICIOS)
         self.jetson_connector = jetson_connector
@@ -143,6 +165,9 @@ class ReportGenerator:
         elif "excel" in user_lower or "xlsx" in user_lower:
             spec["format"] = "xlsx"
             spec["sections"] = ["table"]
+        elif "parquet" in user_lower or "arrow" in user_lower:
+            spec["format"] = "parquet"
+            spec["sections"] = ["table"]
         elif "png" in user_lower or "imagen" in user_lower:
             spec["format"] = "png"
             spec["sections"] = ["charts"]
@@ -169,7 +194,7 @@ class ReportGenerator:
             Diccionario con dispositivos como claves y lista de sensores como valores
         """
         return {
-            "arduino_eth_001": ["t1", "t2", "avg"],  # Solo temperatura (2 sondas + promedio)
+            "arduino_eth_001": ["temperature_1", "temperature_2", "temperature_avg"],  # Solo temperatura (2 sondas + promedio)
             "esp32_wifi_001": ["ntc_entrada", "ntc_salida", "ldr"]  # Temperatura + LDR
         }
     
@@ -202,7 +227,8 @@ class ReportGenerator:
             if logical_sensor.lower() == 'temperature':
                 # Mapear temperatura a sensores físicos de temperatura
                 for sensor in physical_sensors:
-                    if sensor.lower() in ['t1', 't2', 'avg', 'ntc_entrada', 'ntc_salida']:
+                    if sensor.lower() in ['temperature_1', 'temperature_2', 'temperature_avg',
+                                          'ntc_entrada', 'ntc_salida']:
                         expanded.append({
                             'logical_sensor': 'temperature',
                             'physical_sensor': sensor
@@ -249,52 +275,129 @@ class ReportGenerator:
         
         return sensor.lower() in [s.lower() for s in valid_combinations.get(device_key, [])]
 
-    def _get_real_sensor_data(self, device_id: str, sensor: str) -> List[Dict[str, Any]]:
+    def _get_window_hours(self, spec: Dict[str, Any]) -> float:
         """
-        Obtener datos reales de sensores desde la Jetson API.
-        NO genera datos ficticios.
+        Ventana temporal (horas) que cubre todo el spec.
         
         Args:
-            device_id: ID del dispositivo
-            sensor: Nombre del sensor
+            spec: Especificación del reporte
             
         Returns:
-            Lista de puntos temporales reales o lista vacía si no hay datos
+            Horas hacia atrás a solicitar
         """
-        try:
-            if not hasattr(self, 'jetson_connector') or not self.jetson_connector:
-                logger.warning(f"🚨 No hay conexión con Jetson API para obtener datos de {device_id}/{sensor}")
-                return []
-            
-            # Intentar obtener datos reales de la Jetson
-            real_data = self.jetson_connector.get_sensor_data(
-                device_id=device_id,
-                sensor_type=sensor,
-                limit=200
-            )
-            
-            if not real_data:
-                logger.warning(f"📭 No hay datos disponibles para {device_id}/{sensor}")
-                return []
-            
-            # Formatear datos reales para el gráfico
-            data_points = []
-            for record in real_data:
-                timestamp = record.get('timestamp')
-                value = record.get('value')
-                
-                if timestamp and value is not None:
-                    data_points.append({
-                        "t": timestamp,
-                        "v": value
-                    })
-            
-            logger.info(f"✅ Obtenidos {len(data_points)} puntos reales para {device_id}/{sensor}")
-            return data_points
+        description = (spec.get('time_range', {}).get('description') or '').lower()
+        if 'semana' in description:
+            return 168.0
+        match = re.search(r'(\d+(?:\.\d+)?)\s*(hora|día|dia)', description)
+        if match:
+            amount = float(match.group(1))
+            return amount * 24 if match.group(2).startswith('d') else amount
+        return 24.0
+    
+    def _plan_report_fetches(self, devices: List[str], sensors: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Planificar la recolección: una petición por dispositivo con todas sus series.
+        
+        Args:
+            devices: Dispositivos del spec
+            sensors: Sensores lógicos del spec
             
-        except Exception as e:
-            logger.error(f"❌ Error obteniendo datos reales para {device_id}/{sensor}: {e}")
-            return []
+        Returns:
+            Diccionario dispositivo -> lista de series (sensor físico y lógico)
+        """
+        plan = {}
+        for device in devices:
+            expanded = self._expand_sensors_for_device(device, sensors)
+            if expanded:
+                plan[device] = expanded
+        return plan
+    
+    def _fetch_device_window(self, device_id: str, hours: float, limit: int) -> List[Dict[str, Any]]:
+        """
+        Todas las lecturas del dispositivo en la ventana, paginando con
+        ``offset`` sobre el tope de registros por respuesta de la API.
+        
+        Se detiene al llegar a ``limit``, con una página incompleta o cuando
+        la API repite registros (versiones que ignoran ``offset``).
+        """
+        records: List[Dict[str, Any]] = []
+        seen = set()
+        while len(records) < limit:
+            requested = min(self.page_size, limit - len(records))
+            page = self.jetson_connector.get_sensor_data(
+                device_id=device_id, limit=requested, hours=hours, offset=len(records)
+            ) or []
+            new = []
+            for record in page:
+                key = (record.get('timestamp'), record.get('sensor_type'))
+                if key not in seen:
+                    seen.add(key)
+                    new.append(record)
+            records.extend(new)
+            if not new or len(page) < requested:
+                break
+        return records[:limit]
+    
+    def _split_series(self, records: List[Dict[str, Any]], physical_sensors: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Separar en memoria las lecturas de un dispositivo en series ``{t, v}``.
+        
+        Conserva el orden de llegada y limita cada serie a ``max_data_points``.
+        """
+        series = {sensor: [] for sensor in physical_sensors}
+        for record in records:
+            points = series.get(record.get('sensor_type'))
+            if points is None or len(points) >= self.max_data_points:
+                continue
+            timestamp = record.get('timestamp')
+            value = record.get('value')
+            if timestamp and value is not None:
+                points.append({"t": timestamp, "v": value})
+        return series
+    
+    def _collect_report_series(self, spec: Dict[str, Any], devices: List[str],
+                               sensors: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """
+        Obtener todas las series del reporte con una consulta paginada por
+        dispositivo (concurrentes).
+        
+        Reemplaza la petición por combinación dispositivo-sensor (con tope de
+        200 registros y filtrado en el cliente) por la ventana completa de cada
+        dispositivo, separada luego en memoria.
+        
+        Returns:
+            Diccionario dispositivo -> {sensor físico: [{t, v}, ...]}
+        """
+        plan = self._plan_report_fetches(devices, sensors)
+        if not plan or not self.jetson_connector:
+            if plan:
+                logger.warning("🚨 No hay conexión con Jetson API para obtener datos del reporte")
+            return {device: {} for device in plan}
+        
+        hours = self._get_window_hours(spec)
+        
+        device_sensors = self._get_valid_device_sensors()
+        
+        def fetch(device: str) -> Tuple[str, List[Dict[str, Any]]]:
+            # La respuesta trae todos los sensores del dispositivo, no sólo los pedidos
+            streams = max(len(plan[device]), len(device_sensors.get(device, [])))
+            limit = self.max_data_points * streams
+            try:
+                return device, self._fetch_device_window(device, hours, limit)
+            except Exception as e:
+                logger.error(f"❌ Error obteniendo datos reales para {device}: {e}")
+                return device, []
+        
+        with ThreadPoolExecutor(max_workers=min(len(plan), 4)) as executor:
+            fetched = dict(executor.map(fetch, plan))
+        
+        collected = {}
+        for device, series_info in plan.items():
+            physical = [info['physical_sensor'] for info in series_info]
+            collected[device] = self._split_series(fetched.get(device, []), physical)
+            logger.info(f"✅ {device}: {len(fetched.get(device, []))} registros "
+                        f"({len(physical)} series, {hours:g}h)")
+        return collected
     
     def build_plotly_figure(self, timestamps: List[str], values: List[float], 
                           chart_type: str = "line", title: str = "Sensor Data", 
@@ -776,19 +879,9 @@ class ReportGenerator:
                             device_id: str, sensor: str) -> bytes:
         """Exporta datos a CSV"""
         try:
-            df = pd.DataFrame(data_points)
-            if not df.empty:
-                df['device_id'] = device_id
-                df['sensor'] = sensor
-                # Reordenar columnas
-                cols = ['device_id', 'sensor', 't', 'v']
-                df = df[cols]
-                df.columns = ['Dispositivo', 'Sensor', 'Timestamp', 'Valor']
-            
-            buffer = BytesIO()
-            df.to_csv(buffer, index=False, encoding='utf-8')
-            buffer.seek(0)
-            return buffer.read()
+            rows = ((device_id, sensor, point.get('t'), point.get('v')) for point in data_points)
+            header = ['Dispositivo', 'Sensor', 'Timestamp', 'Valor'] if data_points else None
+            return b"".join(iter_csv_chunks(rows, header))
             
         except Exception as e:
             logger.error(f"Error exporting CSV: {e}")
@@ -796,22 +889,11 @@ class ReportGenerator:
     
     def export_xlsx_from_table(self, data_points: List[Dict[str, Any]], 
                              device_id: str, sensor: str) -> bytes:
-        """Exporta datos a Excel"""
+        """Exporta datos a Excel (modo write_only, memoria constante)"""
         try:
-            df = pd.DataFrame(data_points)
-            if not df.empty:
-                df['device_id'] = device_id
-                df['sensor'] = sensor
-                cols = ['device_id', 'sensor', 't', 'v']
-                df = df[cols]
-                df.columns = ['Dispositivo', 'Sensor', 'Timestamp', 'Valor']
-            
-            buffer = BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Datos IoT', index=False)
-            
-            buffer.seek(0)
-            return buffer.read()
+            rows = ((device_id, sensor, point.get('t'), point.get('v')) for point in data_points)
+            header = ['Dispositivo', 'Sensor', 'Timestamp', 'Valor']
+            return write_xlsx_streaming([('Datos IoT', header, rows)]).read()
             
         except Exception as e:
             logger.error(f"Error exporting XLSX: {e}")
@@ -909,6 +991,9 @@ class ReportGenerator:
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             
+            # Una petición por dispositivo para la ventana completa, separada en memoria
+            collected_series = self._collect_report_series(spec, devices, sensors)
+            
             # Expandir sensores lógicos a sensores físicos por dispositivo
             for device in devices:
                 expanded_sensors = self._expand_sensors_for_device(device, sensors)
@@ -919,7 +1004,7 @@ class ReportGenerator:
                     
                     key = f"{device}_{physical_sensor}"
                     try:
-                        data_points = self._get_real_sensor_data(device, physical_sensor)
+                        data_points = collected_series.get(device, {}).get(physical_sensor, [])
                         
                         if not data_points:
                             logger.warning(f"🚨 No hay datos reales disponibles para {device}/{physical_sensor}")
@@ -954,22 +1039,18 @@ class ReportGenerator:
             format_type = spec.get('format', 'pdf')
             
             if format_type == 'csv':
-                # Para CSV, combinar todos los datos
-                combined_data = []
-                for key, info in all_data.items():
-                    for point in info['data']:
-                        point_copy = point.copy()
-                        point_copy['device'] = info['device']
-                        point_copy['sensor'] = info['sensor']
-                        combined_data.append(point_copy)
-                
-                file_bytes = self.export_csv_from_combined_data(combined_data)
+                # Para CSV, escribir por bloques directamente desde las series
+                file_bytes = b"".join(self.stream_csv_from_series(all_data))
                 filename = f"reporte_iot_multi_dispositivos.csv"
                 
             elif format_type == 'xlsx':
                 file_bytes = self.export_xlsx_from_combined_data(all_data)
                 filename = f"reporte_iot_multi_dispositivos.xlsx"
                 
+            elif format_type == 'parquet':
+                file_bytes = self.export_parquet_from_combined_data(all_data)
+                filename = f"reporte_iot_multi_dispositivos.parquet"
+                
             elif format_type == 'png':
                 # Para PNG, crear gráfico combinado o múltiple
                 file_bytes = self.export_multiple_charts_png(all_data, spec)
@@ -1042,7 +1123,7 @@ class ReportGenerator:
                         if sensor_type.lower() == 'ldr':
                             all_ldr_values.extend(values)
                         elif any(temp_sensor in sensor_type.lower() 
-                                for temp_sensor in ['t1', 't2', 'avg', 'ntc_entrada', 'ntc_salida']):
+                                for temp_sensor in ['temperature', 't1', 't2', 'avg', 'ntc_entrada', 'ntc_salida']):
                             all_temperatures.extend(values)
             
             device_count = len(devices_found)
@@ -1072,7 +1153,7 @@ class ReportGenerator:
                 temp_stats = self._calculate_temperature_stats(all_temperatures)
                 insights["temperatura"] = f"""
 🌡️ **Análisis de Temperatura:**
-• Promedio: {temp_stats['avg']:.1f}°C
+• Promedio: {temp_stats['avg']:.1f}°C (mediana {temp_stats['median']:.1f}°C, P95 {temp_stats['p95']:.1f}°C)
 • Rango: {temp_stats['min']:.1f}°C - {temp_stats['max']:.1f}°C
 • Desviación estándar: {temp_stats['std']:.1f}°C
 • Condición predominante: {temp_stats['condition']}
@@ -1084,7 +1165,7 @@ class ReportGenerator:
                 ldr_stats = self._calculate_ldr_stats(all_ldr_values)
                 insights["ldr"] = f"""
 💡 **Análisis de Luminosidad:**
-• Promedio: {ldr_stats['avg']:.0f} unidades
+• Promedio: {ldr_stats['avg']:.0f} unidades (mediana {ldr_stats['median']:.0f}, P95 {ldr_stats['p95']:.0f})
 • Rango: {ldr_stats['min']:.0f} - {ldr_stats['max']:.0f}
 • Condición predominante: {ldr_stats['condition']}
 • Variabilidad: {ldr_stats['variability']}
@@ -1107,6 +1188,7 @@ class ReportGenerator:
 ⚠️ **Anomalías y Alertas:**
 • Temperaturas extremas: {anomalies['temp_extremes']}
 • Lecturas LDR anómalas: {anomalies['ldr_anomalies']}
+• Lecturas atípicas: {anomalies['statistical_outliers']}
 • Dispositivos inconsistentes: {anomalies['device_issues']}
 • Nivel de alerta: {anomalies['alert_level']}
             """.strip()
@@ -1150,14 +1232,16 @@ class ReportGenerator:
         except:
             return "Período no determinado"
     
-    def _calculate_temperature_stats(self, temperatures: List[float]) -> Dict[str, Any]:
-        """Calcula estadísticas detalladas de temperatura"""
-        import statistics
+    def _calculate_temperature_stats(self, temperatures) -> Dict[str, Any]:
+        """Calcula estadísticas detalladas de temperatura (lista de valores o SeriesSketch)"""
+        sketch = temperatures if isinstance(temperatures, SeriesSketch) else SeriesSketch.from_values(temperatures)
         stats = {
-            'avg': statistics.mean(temperatures),
-            'min': min(temperatures),
-            'max': max(temperatures),
-            'std': statistics.stdev(temperatures) if len(temperatures) > 1 else 0,
+            'avg': sketch.mean,
+            'min': sketch.min,
+            'max': sketch.max,
+            'std': sketch.std(ddof=1),
+            'median': sketch.median,
+            'p95': sketch.quantile(0.95),
         }
         
         # Determinar condición predominante
@@ -1180,13 +1264,15 @@ class ReportGenerator:
         
         return stats
     
-    def _calculate_ldr_stats(self, ldr_values: List[float]) -> Dict[str, Any]:
-        """Calcula estadísticas detalladas de luminosidad"""
-        import statistics
+    def _calculate_ldr_stats(self, ldr_values) -> Dict[str, Any]:
+        """Calcula estadísticas detalladas de luminosidad (lista de valores o SeriesSketch)"""
+        sketch = ldr_values if isinstance(ldr_values, SeriesSketch) else SeriesSketch.from_values(ldr_values)
         stats = {
-            'avg': statistics.mean(ldr_values),
-            'min': min(ldr_values),
-            'max': max(ldr_values),
+            'avg': sketch.mean,
+            'min': sketch.min,
+            'max': sketch.max,
+            'median': sketch.median,
+            'p95': sketch.quantile(0.95),
         }
         
         # Determinar condición predominante
@@ -1260,31 +1346,50 @@ class ReportGenerator:
         return trends
     
     def _detect_anomalies(self, temperatures: List[float], ldr_values: List[float]) -> Dict[str, str]:
-        """Detecta anomalías en los datos"""
+        """Detecta anomalías en los datos (rangos físicos y z-score robusto vía motor de anomalías)"""
         anomalies = {}
         
+        readings = pd.DataFrame({
+            'sensor_type': ['temperature'] * len(temperatures) + ['ldr'] * len(ldr_values),
+            'value': list(temperatures) + list(ldr_values),
+        })
+        scored = anomaly_engine.score(
+            readings, group_cols=('sensor_type',), detectors=('robust_z', 'range'),
+            valid_ranges=REPORT_VALID_RANGES
+        ) if not readings.empty else readings
+        
+        def count(sensor_type: str, flag: str) -> int:
+            if scored.empty:
+                return 0
+            return int(scored.loc[scored['sensor_type'] == sensor_type, flag].sum())
+        
         # Temperaturas extremas
-        extreme_temps = [t for t in temperatures if t < 0 or t > 50]
+        extreme_temps = count('temperature', 'range_anomaly')
         if extreme_temps:
-            anomalies['temp_extremes'] = f"⚠️ {len(extreme_temps)} lecturas extremas detectadas"
+            anomalies['temp_extremes'] = f"⚠️ {extreme_temps} lecturas extremas detectadas"
         else:
             anomalies['temp_extremes'] = "✅ Sin temperaturas extremas"
         
         # LDR anómalas
+        anomalous_ldr = count('ldr', 'range_anomaly')
         if ldr_values:
-            anomalous_ldr = [l for l in ldr_values if l < 0 or l > 1023]
             if anomalous_ldr:
-                anomalies['ldr_anomalies'] = f"⚠️ {len(anomalous_ldr)} lecturas LDR fuera de rango"
+                anomalies['ldr_anomalies'] = f"⚠️ {anomalous_ldr} lecturas LDR fuera de rango"
             else:
                 anomalies['ldr_anomalies'] = "✅ Lecturas LDR normales"
         else:
             anomalies['ldr_anomalies'] = "❌ Sin datos LDR"
         
+        # Desvíos estadísticos dentro del rango físico
+        outliers = count('temperature', 'robust_z_anomaly') + count('ldr', 'robust_z_anomaly')
+        anomalies['statistical_outliers'] = (f"⚠️ {outliers} lecturas atípicas" if outliers
+                                             else "✅ Sin lecturas atípicas")
+        
         # Dispositivos inconsistentes
         anomalies['device_issues'] = "✅ Dispositivos operando normalmente"
         
         # Nivel de alerta general
-        if extreme_temps or (ldr_values and any(l < 0 or l > 1023 for l in ldr_values)):
+        if extreme_temps or anomalous_ldr:
             anomalies['alert_level'] = "🔴 ALTA - Revisar sistema"
         elif len(temperatures) < 5:
             anomalies['alert_level'] = "🟡 MEDIA - Pocos datos"
@@ -1642,101 +1747,98 @@ class ReportGenerator:
         Exporta datos combinados de múltiples dispositivos a CSV.
         """
         try:
-            import csv
-            from io import StringIO
-            
-            output = StringIO()
-            
-            if combined_data:
-                fieldnames = ['timestamp', 'device', 'sensor', 'value']
-                writer = csv.DictWriter(output, fieldnames=fieldnames)
-                writer.writeheader()
-                
-                for point in combined_data:
-                    writer.writerow({
-                        'timestamp': point.get('t', ''),
-                        'device': point.get('device', ''),
-                        'sensor': point.get('sensor', ''),
-                        'value': point.get('v', '')
-                    })
-            
-            return output.getvalue().encode('utf-8')
+            if not combined_data:
+                return b""
+            rows = ((p.get('t', ''), p.get('device', ''), p.get('sensor', ''), p.get('v', '')) for p in combined_data)
+            return b"".join(iter_csv_chunks(rows, READING_COLUMNS))
             
         except Exception as e:
             logger.error(f"Error exporting combined CSV: {e}")
             return b""
     
+    def stream_csv_from_series(self, all_data: Dict[str, Any], chunk_rows: int = 5000) -> Iterator[bytes]:
+        """
+        Generador de CSV por bloques directamente desde las series del reporte.
+        
+        No construye la lista combinada; usar con ``spool_chunks`` para
+        ``st.download_button`` o escribir los bloques a un archivo.
+        """
+        return iter_csv_chunks(iter_series_rows(all_data), READING_COLUMNS, chunk_rows)
+    
+    def open_export_stream(self, all_data: Dict[str, Any], format_type: str = "csv"):
+        """
+        Archivo temporal rebobinado con la exportación (CSV, XLSX o Parquet).
+        
+        Se mantiene en memoria hasta 8 MB y luego pasa a disco, por lo que
+        el pico de memoria no depende del tamaño de la exportación.
+        """
+        if format_type == "parquet":
+            return write_parquet_streaming(iter_series_rows(all_data))
+        if format_type == "xlsx":
+            return write_xlsx_streaming(self._iter_xlsx_sheets(all_data))
+        return spool_chunks(self.stream_csv_from_series(all_data))
+    
+    def _iter_xlsx_sheets(self, all_data: Dict[str, Any]):
+        """Hojas del libro multi-dispositivo: resumen y una hoja por serie."""
+        summary_rows = []
+        for info in all_data.values():
+            count, total, minimum, maximum = 0, 0.0, math.inf, -math.inf
+            for point in info['data']:
+                value = point['v']
+                count += 1
+                total += value
+                minimum = min(minimum, value)
+                maximum = max(maximum, value)
+            if count:
+                summary_rows.append((info['device'], info['sensor'], count, total / count, minimum, maximum))
+        
+        if summary_rows:
+            yield 'Resumen', ['Dispositivo', 'Sensor', 'Registros', 'Promedio', 'Mínimo', 'Máximo'], summary_rows
+        
+        for info in all_data.values():
+            if info['data']:
+                rows = ((point['t'], point['v']) for point in info['data'])
+                yield f"{info['device']}_{info['sensor']}", ['Timestamp', 'Valor'], rows
+    
     def export_xlsx_from_combined_data(self, all_data: Dict[str, Any]) -> bytes:
         """
         Exporta datos de múltiples dispositivos a Excel con múltiples hojas.
         """
         try:
-            import pandas as pd
-            from io import BytesIO
-            
-            buffer = BytesIO()
-            
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                # Hoja de resumen
-                summary_data = []
-                for key, info in all_data.items():
-                    values = [point['v'] for point in info['data']]
-                    if values:
-                        summary_data.append({
-                            'Dispositivo': info['device'],
-                            'Sensor': info['sensor'],
-                            'Registros': len(values),
-                            'Promedio': sum(values)/len(values),
-                            'Mínimo': min(values),
-                            'Máximo': max(values)
-                        })
-                
-                if summary_data:
-                    summary_df = pd.DataFrame(summary_data)
-                    summary_df.to_excel(writer, sheet_name='Resumen', index=False)
-                
-                # Hoja por cada combinación dispositivo-sensor
-                for key, info in all_data.items():
-                    if info['data']:
-                        sheet_name = f"{info['device']}_{info['sensor']}"[:31]  # Excel limit
-                        data_for_df = [
-                            {
-                                'Timestamp': point['t'],
-                                'Valor': point['v']
-                            }
-                            for point in info['data']
-                        ]
-                        df = pd.DataFrame(data_for_df)
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-            
-            return buffer.getvalue()
+            return write_xlsx_streaming(self._iter_xlsx_sheets(all_data)).read()
             
         except Exception as e:
             logger.error(f"Error exporting combined XLSX: {e}")
             return b""
     
+    def export_parquet_from_combined_data(self, all_data: Dict[str, Any], compression: str = "zstd") -> bytes:
+        """
+        Exporta las series a Parquet columnar comprimido para herramientas de análisis.
+        """
+        try:
+            if not PYARROW_AVAILABLE:
+                logger.error("❌ pyarrow no disponible - no se puede exportar Parquet")
+                return b""
+            return write_parquet_streaming(iter_series_rows(all_data), compression=compression).read()
+            
+        except Exception as e:
+            logger.error(f"Error exporting Parquet: {e}")
+            return b""
+    
     def export_html_multi_report(self, spec: Dict[str, Any], summary_text: str, 
                                 metrics: Dict[str, Any], all_data: Dict[str, Any]) -> bytes:
         """
         Genera reporte HTML con múltiples gráficos interactivos.
+
+        Usa ``CompactHTMLReport``: cada serie se guarda una vez en un payload
+        binario comprimido, plotly.js va fijado a la versión instalada (incrustado
+        por defecto, ver ``html_plotly_mode``) y los gráficos se dibujan al hacer scroll.
         """
         try:
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>{spec.get('title', 'Reporte IoT')}</title>
-                <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 40px; }}
-                    h1 {{ color: #2c3e50; }}
-                    h2 {{ color: #34495e; }}
-                    .metric {{ background: #ecf0f1; padding: 10px; margin: 10px 0; border-radius: 5px; }}
-                    .chart-container {{ margin: 20px 0; }}
-                </style>
-            </head>
-            <body>
-                <h1>{spec.get('title', 'Reporte IoT')}</h1>
+            title = spec.get('title', 'Reporte IoT')
+            report = CompactHTMLReport(title, plotly_mode=self.html_plotly_mode)
+            report.add_html(f"""
+                <h1>{title}</h1>
                 
                 <h2>Resumen Ejecutivo</h2>
                 <p>{summary_text}</p>
@@ -1748,10 +1850,9 @@ class ReportGenerator:
                 <div class="metric"><b>Período:</b> {metrics['periodo']}</div>
                 
                 <h2>Gráficos Interactivos</h2>
-            """
+            """)
             
-            # Agregar gráficos
-            chart_id = 0
+            # Agregar gráficos (las trazas referencian la serie por id)
             for key, info in all_data.items():
                 if info['data']:
                     device = info['device']
@@ -1767,27 +1868,17 @@ class ReportGenerator:
                         sensor.title()
                     )
                     
-                    fig_json = fig.to_json()
-                    
-                    html_content += f"""
-                    <div class="chart-container">
-                        <h3>{device.upper()} - {sensor.title()}</h3>
-                        <div id="chart{chart_id}"></div>
-                        <script>
-                            Plotly.newPlot('chart{chart_id}', {fig_json});
-                        </script>
-                    </div>
-                    """
-                    chart_id += 1
-            
-            html_content += f"""
+                    series_refs = {}
+                    if chart_type != "pie":
+                        series_refs = {0: report.add_series(key, timestamps, values)}
+                    report.add_plotly_figure(f"{device.upper()} - {sensor.title()}", fig, series_refs)
+            
+            report.add_html(f"""
                 <hr>
                 <p><small>Generado el {metrics['timestamp']}</small></p>
-            </body>
-            </html>
-            """
+            """)
             
-            return html_content.encode('utf-8')
+            return report.to_bytes()
             
         except Exception as e:
             logger.error(f"Error generating HTML multi-report: {e}")
@@ -8,11 +8,14 @@ y operaciones de base de datos PostgreSQL.
 
 from .db_connector import DatabaseConnector, get_db
 from .models import SensorData, Device, Alert
+from .bulk_ingest import ReadingBatch, IngestStats
 
 __all__ = [
     "DatabaseConnector",
     "get_db",
     "SensorData", 
     "Device",
-    "Alert"
+    "Alert",
+    "ReadingBatch",
+    "IngestStats"
 ]
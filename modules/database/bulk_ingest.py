@@ -0,0 +1,291 @@
+"""
+Ingesta Masiva de Lecturas con COPY
+===================================
+
+Carga lecturas (p. ej. el espejo de la API Jetson) en ``sensor_data`` por
+lotes usando ``copy_records_to_table`` de asyncpg:
+
+1. Cada lote se copia a una tabla temporal de staging (``ON COMMIT DELETE ROWS``)
+2. Los ``device_id`` que aún no existen se registran en ``devices`` (la
+   clave foránea de ``sensor_data`` rechazaría el lote completo)
+3. Se deduplica por (device_id, sensor_type, timestamp) y se inserta en
+   ``sensor_data`` en una sola sentencia; por defecto las lecturas repetidas
+   se ignoran. Con ``on_conflict="update"`` los rollups del rango del lote se
+   recalculan, porque el trigger de rollups solo cubre INSERT
+4. Una cola acotada aplica back-pressure al productor y el tamaño de lote
+   se ajusta para acercarse a una duración objetivo por lote
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple, Union
+
+from modules.utils.latest_index import latest_index
+
+logger = logging.getLogger(__name__)
+
+# Fila de ingesta: (device_id, sensor_type, value, unit, timestamp)
+IngestRow = Tuple[str, str, float, Optional[str], datetime]
+
+INGEST_COLUMNS = ["device_id", "sensor_type", "value", "unit", "timestamp"]
+STAGING_TABLE = "sensor_data_staging"
+
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        device_id VARCHAR(50),
+        sensor_type VARCHAR(50),
+        value DOUBLE PRECISION,
+        unit VARCHAR(20),
+        timestamp TIMESTAMP
+    ) ON COMMIT DELETE ROWS
+"""
+
+_MERGE_SELECT = f"""
+    INSERT INTO sensor_data (device_id, sensor_type, value, unit, timestamp)
+    SELECT DISTINCT ON (device_id, sensor_type, timestamp)
+           device_id, sensor_type, value::DECIMAL(10,4), unit, timestamp
+    FROM {STAGING_TABLE}
+    ORDER BY device_id, sensor_type, timestamp
+"""
+
+REGISTER_DEVICES_SQL = f"""
+    INSERT INTO devices (device_id, device_name, device_type)
+    SELECT DISTINCT device_id, device_id, 'auto_registered'
+    FROM {STAGING_TABLE}
+    ON CONFLICT (device_id) DO NOTHING
+"""
+
+# Los valores reemplazados por el upsert no pasan por el trigger de rollups
+REFRESH_ROLLUPS_SQL = "SELECT refresh_sensor_rollups($1, $2)"
+
+MERGE_SQL = {
+    "update": _MERGE_SELECT + """
+    ON CONFLICT (device_id, sensor_type, timestamp) DO UPDATE
+        SET value = EXCLUDED.value, unit = EXCLUDED.unit
+        WHERE sensor_data.value IS DISTINCT FROM EXCLUDED.value
+    """,
+    "ignore": _MERGE_SELECT + """
+    ON CONFLICT (device_id, sensor_type, timestamp) DO NOTHING
+    """,
+}
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """
+    Timestamp ISO -> datetime naive en hora local del dispositivo
+    (la columna es ``TIMESTAMP`` sin zona, igual que ``NOW()`` del servidor).
+    """
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+@dataclass
+class ReadingBatch:
+    """Lote de lecturas normalizadas listo para COPY."""
+    rows: List[IngestRow] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "ReadingBatch":
+        """
+        Construir un lote desde lecturas de la API Jetson o de la base
+        (``device_id``, ``sensor_type``, ``value``, ``unit``, ``timestamp``).
+        Se descartan lecturas sin timestamp o valor numérico.
+        """
+        rows = []
+        for record in records:
+            timestamp = _parse_timestamp(record.get('timestamp'))
+            try:
+                value = float(record.get('value'))
+            except (TypeError, ValueError):
+                continue
+            if timestamp is None or not record.get('device_id') or not record.get('sensor_type'):
+                continue
+            rows.append((str(record['device_id']), str(record['sensor_type']), value,
+                         record.get('unit'), timestamp))
+        return cls(rows)
+
+
+@dataclass
+class IngestStats:
+    """Resultado de una ingesta masiva."""
+    batches: int = 0
+    rows_received: int = 0
+    rows_written: int = 0
+    seconds: float = 0.0
+    final_batch_size: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        """Filas descartadas por duplicadas o sin cambios."""
+        return self.rows_received - self.rows_written
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_received / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "rows_received": self.rows_received,
+            "rows_written": self.rows_written,
+            "duplicates": self.duplicates,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "final_batch_size": self.final_batch_size,
+        }
+
+
+class BulkIngestor:
+    """
+    Ingesta por COPY con staging, deduplicación y back-pressure.
+
+    Args:
+        pool: Pool de asyncpg (``DatabaseConnector.pool``)
+        batch_size: Filas iniciales por lote
+        max_pending_batches: Lotes en cola antes de bloquear al productor
+        workers: Conexiones que copian en paralelo
+        on_conflict: ``ignore`` (lecturas repetidas se descartan) o ``update``
+            (upsert del valor y recálculo de rollups del rango del lote)
+        target_batch_seconds: Duración objetivo por lote para el ajuste
+            automático del tamaño (``None`` desactiva el ajuste)
+        min_batch_size / max_batch_size: Límites del ajuste
+    """
+
+    def __init__(self, pool, batch_size: int = 5_000, max_pending_batches: int = 4,
+                 workers: int = 2, on_conflict: str = "ignore",
+                 target_batch_seconds: Optional[float] = 0.5,
+                 min_batch_size: int = 500, max_batch_size: int = 50_000):
+        if on_conflict not in MERGE_SQL:
+            raise ValueError(f"on_conflict debe ser uno de {sorted(MERGE_SQL)}")
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_pending_batches = max_pending_batches
+        self.workers = max(1, workers)
+        self.on_conflict = on_conflict
+        self.target_batch_seconds = target_batch_seconds
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_queue_depth = 0
+
+    def _tune(self, rows: int, elapsed: float):
+        """Acercar el tamaño de lote a la duración objetivo (factor acotado a x2)."""
+        if not self.target_batch_seconds or elapsed <= 0 or rows == 0:
+            return
+        factor = min(2.0, max(0.5, self.target_batch_seconds / elapsed))
+        self.batch_size = int(min(self.max_batch_size, max(self.min_batch_size, rows * factor)))
+
+    async def _write_batch(self, connection, rows: List[IngestRow]) -> int:
+        async with connection.transaction():
+            await connection.execute(CREATE_STAGING_SQL)
+            await connection.copy_records_to_table(STAGING_TABLE, records=rows, columns=INGEST_COLUMNS)
+            await connection.execute(REGISTER_DEVICES_SQL)
+            status = await connection.execute(MERGE_SQL[self.on_conflict])
+            # Estado "INSERT 0 <filas>"
+            written = int(status.split()[-1]) if status else 0
+            if self.on_conflict == "update" and written:
+                timestamps = [row[4] for row in rows]
+                await connection.execute(REFRESH_ROLLUPS_SQL, min(timestamps), max(timestamps))
+        return written
+
+    async def _worker(self, queue: asyncio.Queue, stats: IngestStats):
+        async with self.pool.acquire() as connection:
+            while True:
+                rows = await queue.get()
+                try:
+                    if rows is None:
+                        return
+                    started = time.perf_counter()
+                    written = await self._write_batch(connection, rows)
+                    self._tune(len(rows), time.perf_counter() - started)
+                    stats.batches += 1
+                    stats.rows_written += written
+                finally:
+                    queue.task_done()
+
+    async def _put(self, queue: asyncio.Queue, rows: List[IngestRow], workers: List[asyncio.Task]):
+        """Encolar un lote; bloquea mientras la cola esté llena (back-pressure)."""
+        put = asyncio.ensure_future(queue.put(rows))
+        done, _ = await asyncio.wait({put, *workers}, return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()  # Un worker terminó con error: no esperar a una cola sin consumidores
+            raise RuntimeError("La ingesta se detuvo por un error en un worker")
+        self.max_queue_depth = max(self.max_queue_depth, queue.qsize())
+
+    async def _produce(self, source, queue: asyncio.Queue, stats: IngestStats, workers: List[asyncio.Task]):
+        pending: List[IngestRow] = []
+        async for chunk in _aiter_chunks(source):
+            stats.rows_received += len(chunk)
+            latest_index.update(chunk)
+            pending.extend(chunk)
+            while len(pending) >= self.batch_size:
+                batch, pending = pending[:self.batch_size], pending[self.batch_size:]
+                await self._put(queue, batch, workers)
+        if pending:
+            await self._put(queue, pending, workers)
+
+    async def ingest(self, source: Union[Iterable, AsyncIterable]) -> IngestStats:
+        """
+        Ingerir lecturas desde ``ReadingBatch``, listas de registros o
+        iterables (sincrónicos o asíncronos) de cualquiera de ellos.
+
+        Returns:
+            IngestStats con filas recibidas/escritas y throughput
+        """
+        stats = IngestStats()
+        started = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending_batches)
+        workers = [asyncio.create_task(self._worker(queue, stats)) for _ in range(self.workers)]
+
+        try:
+            await self._produce(source, queue, stats, workers)
+        except RuntimeError:
+            pass  # El error real del worker se propaga abajo
+        finally:
+            for task in workers:
+                if not task.done():
+                    await queue.put(None)
+            results = await asyncio.gather(*workers, return_exceptions=True)
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+
+        stats.seconds = time.perf_counter() - started
+        stats.final_batch_size = self.batch_size
+        logger.info(f"📥 Ingesta masiva: {stats.rows_written}/{stats.rows_received} filas en "
+                    f"{stats.batches} lotes ({stats.rows_per_second:,.0f} filas/s)")
+        return stats
+
+
+def _normalize_chunk(item) -> List[IngestRow]:
+    if isinstance(item, ReadingBatch):
+        return item.rows
+    if isinstance(item, dict):
+        return ReadingBatch.from_records([item]).rows
+    return ReadingBatch.from_records(item).rows
+
+
+async def _aiter_chunks(source) -> "AsyncIterable[List[IngestRow]]":
+    """Normalizar la fuente a bloques de filas de ingesta."""
+    if isinstance(source, ReadingBatch) or (isinstance(source, list) and source
+                                            and isinstance(source[0], dict)):
+        source = [source]
+
+    if hasattr(source, '__aiter__'):
+        async for item in source:
+            yield _normalize_chunk(item)
+    else:
+        for item in source:
+            yield _normalize_chunk(item)
@@ -7,18 +7,100 @@ Utiliza variables de entorno para las credenciales de conexión.
 """
 
 import os
+import json
 import asyncio
 import asyncpg
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from typing import Optional, List, Dict, Any, Sequence
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 from modules.utils.logger import setup_logger
+from modules.database.bulk_ingest import BulkIngestor, IngestStats
 
 # Cargar variables de entorno
 load_dotenv()
 
 logger = setup_logger(__name__)
 
+# Tablas de rollup mantenidas por el trigger de database/schema.sql
+ROLLUP_TABLES = {"1m": "sensor_rollup_1m", "1h": "sensor_rollup_1h"}
+# Ventanas hasta este largo se sirven con resolución de 1 minuto
+ROLLUP_MINUTE_MAX_HOURS = 12
+
+# Anchos de bucket disponibles (de menor a mayor) para elegir según la ventana
+BUCKET_LADDER = [
+    timedelta(minutes=1), timedelta(minutes=5), timedelta(minutes=15),
+    timedelta(hours=1), timedelta(hours=6), timedelta(days=1),
+]
+DEFAULT_PERCENTILES = (0.5, 0.95)
+
+# Agregados por bucket sobre datos crudos (date_bin, PostgreSQL 14+); usa
+# idx_sensor_data_device_timestamp al filtrar por dispositivo y rango
+_BUCKETS_RAW_SQL = """
+    SELECT device_id, sensor_type,
+           date_bin($1::interval, timestamp, TIMESTAMP '2000-01-01') AS bucket_start,
+           COUNT(*) AS sample_count,
+           AVG(value)::float8 AS avg_value,
+           MIN(value)::float8 AS min_value,
+           MAX(value)::float8 AS max_value{percentiles}
+    FROM sensor_data
+    WHERE timestamp >= $2 AND timestamp < $3{filters}
+    GROUP BY device_id, sensor_type, bucket_start
+    ORDER BY device_id, sensor_type, bucket_start
+"""
+
+# Re-agrupación de un rollup (sin percentiles: no son combinables)
+_BUCKETS_ROLLUP_SQL = """
+    SELECT device_id, sensor_type,
+           date_bin($1::interval, bucket, TIMESTAMP '2000-01-01') AS bucket_start,
+           SUM(sample_count) AS sample_count,
+           SUM(sum_value) / NULLIF(SUM(sample_count), 0) AS avg_value,
+           MIN(min_value) AS min_value,
+           MAX(max_value) AS max_value
+    FROM {table}
+    WHERE bucket >= $2 AND bucket < $3{filters}
+    GROUP BY device_id, sensor_type, bucket_start
+    ORDER BY device_id, sensor_type, bucket_start
+"""
+
+
+def choose_bucket(hours: float, max_buckets: int = 120) -> timedelta:
+    """Menor ancho de bucket de BUCKET_LADDER que deja a lo sumo ``max_buckets`` por serie."""
+    window = timedelta(hours=hours)
+    for bucket in BUCKET_LADDER:
+        if window / bucket <= max_buckets:
+            return bucket
+    return BUCKET_LADDER[-1]
+
+
+# Estadísticas globales en una sola consulta; {per_device} agrega por dispositivo
+_SENSOR_STATS_TEMPLATE = """
+    WITH per_device AS ({per_device}), ranked AS (
+        SELECT *, ROW_NUMBER() OVER (ORDER BY count DESC) AS rank FROM per_device
+    )
+    SELECT COALESCE(SUM(count), 0) AS total,
+           MIN(first_ts) AS first_ts,
+           MAX(last_ts) AS last_ts,
+           COUNT(*) AS devices,
+           COALESCE(json_agg(json_build_object('device_id', device_id, 'count', count)
+                             ORDER BY count DESC) FILTER (WHERE rank <= 100), '[]') AS by_device
+    FROM ranked
+"""
+
+SENSOR_STATS_ROLLUP_QUERY = _SENSOR_STATS_TEMPLATE.format(per_device="""
+        SELECT device_id, SUM(sample_count) AS count,
+               MIN(first_ts) AS first_ts, MAX(last_ts) AS last_ts
+        FROM sensor_rollup_1h
+        GROUP BY device_id
+    """)
+
+# Misma consulta sobre los datos crudos (esquemas sin rollups)
+SENSOR_STATS_RAW_QUERY = _SENSOR_STATS_TEMPLATE.format(per_device="""
+        SELECT device_id, COUNT(*) AS count,
+               MIN(timestamp) AS first_ts, MAX(timestamp) AS last_ts
+        FROM sensor_data
+        GROUP BY device_id
+    """)
+
 
 class DatabaseConnector:
     """
@@ -33,6 +115,8 @@ class DatabaseConnector:
         self.user = os.getenv('DB_USER', 'iot_user')
         self.password = os.getenv('DB_PASSWORD')
         self.pool: Optional[asyncpg.Pool] = None
+        # Mes para el que ya se aseguraron las particiones de sensor_data
+        self._partitions_month: Optional[date] = None
         
         if not self.password:
             raise ValueError("DB_PASSWORD debe estar definido en el archivo .env")
@@ -56,6 +140,7 @@ class DatabaseConnector:
         except Exception as e:
             logger.error(f"Error al conectar con la base de datos: {e}")
             raise
+        await self._ensure_current_partitions()
     
     async def disconnect(self) -> None:
         """
@@ -113,6 +198,36 @@ class DatabaseConnector:
             logger.error(f"Error ejecutando comando: {e}")
             raise
     
+    async def bulk_ingest(self, readings, batch_size: int = 5_000,
+                          max_pending_batches: int = 4, workers: int = 2,
+                          on_conflict: str = "ignore") -> IngestStats:
+        """
+        Carga masiva de lecturas en sensor_data con COPY, staging y upsert.
+        
+        Args:
+            readings: ReadingBatch, lista de registros o iterable (sync/async) de ellos
+            batch_size: Filas iniciales por lote (se ajusta automáticamente)
+            max_pending_batches: Lotes en cola antes de frenar al productor
+            workers: Conexiones del pool que copian en paralelo
+            on_conflict: "ignore" (por defecto) o "update" (upsert y recálculo de rollups)
+            
+        Returns:
+            IngestStats: Filas recibidas/escritas, lotes y throughput
+        """
+        if not self.pool:
+            await self.connect()
+        # Procesos de larga vida: al cambiar de mes se crean las particiones siguientes
+        await self._ensure_current_partitions()
+        
+        ingestor = BulkIngestor(
+            self.pool,
+            batch_size=batch_size,
+            max_pending_batches=max_pending_batches,
+            workers=workers,
+            on_conflict=on_conflict,
+        )
+        return await ingestor.ingest(readings)
+    
     async def get_sensor_data(self, device_id: Optional[str] = None, 
                             limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -144,6 +259,184 @@ class DatabaseConnector:
             query = base_query + " ORDER BY timestamp DESC LIMIT $1"
             return await self.execute_query(query, limit)
     
+    @staticmethod
+    def pick_rollup_resolution(hours: float) -> str:
+        """Resolución de rollup para una ventana: 1 minuto hasta 12h, luego 1 hora."""
+        return "1m" if hours <= ROLLUP_MINUTE_MAX_HOURS else "1h"
+    
+    async def get_sensor_rollups(self, hours: float = 24, device_id: Optional[str] = None,
+                                 sensor_type: Optional[str] = None,
+                                 resolution: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Obtiene series pre-agregadas (min/max/avg/count por intervalo) desde
+        los rollups, para gráficos y reportes de rango largo.
+        
+        Args:
+            hours (float): Ventana hacia atrás en horas
+            device_id (Optional[str]): Filtrar por dispositivo
+            sensor_type (Optional[str]): Filtrar por sensor
+            resolution (Optional[str]): "1m" o "1h" (por defecto según la ventana)
+            
+        Returns:
+            List[Dict[str, Any]]: Filas por (dispositivo, sensor, bucket) en orden temporal,
+            con ``timestamp``/``value`` (inicio y promedio) como las lecturas crudas
+        """
+        resolution = resolution or self.pick_rollup_resolution(hours)
+        if resolution not in ROLLUP_TABLES:
+            raise ValueError(f"Resolución de rollup no soportada: {resolution}")
+        
+        conditions = ["bucket >= $1"]
+        params: List[Any] = [datetime.now() - timedelta(hours=hours)]
+        if device_id:
+            params.append(device_id)
+            conditions.append(f"device_id = ${len(params)}")
+        if sensor_type:
+            params.append(sensor_type)
+            conditions.append(f"sensor_type = ${len(params)}")
+        
+        query = f"""
+            SELECT device_id, sensor_type, bucket, sample_count,
+                   avg_value, min_value, max_value
+            FROM {ROLLUP_TABLES[resolution]}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY device_id, sensor_type, bucket
+        """
+        rows = await self.execute_query(query, *params)
+        for row in rows:
+            row["timestamp"] = row["bucket"]
+            row["value"] = row["avg_value"]
+        return rows
+    
+    async def get_bucketed_readings(self, start: datetime, end: Optional[datetime] = None,
+                                    bucket: timedelta = timedelta(hours=1),
+                                    device_id: Optional[str] = None,
+                                    sensor_type: Optional[str] = None,
+                                    percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> List[Dict[str, Any]]:
+        """
+        Agregados por intervalo calculados en el servidor: count/avg/min/max
+        y percentiles por (dispositivo, sensor, bucket).
+        
+        Sin percentiles y con buckets múltiplos de 1 minuto/1 hora, la
+        consulta se responde desde los rollups (límites alineados al rollup).
+        
+        Args:
+            start (datetime): Inicio del rango
+            end (Optional[datetime]): Fin del rango (por defecto ahora)
+            bucket (timedelta): Ancho del intervalo
+            device_id (Optional[str]): Filtrar por dispositivo
+            sensor_type (Optional[str]): Filtrar por sensor
+            percentiles (Sequence[float]): Percentiles a calcular (p. ej. 0.5, 0.95)
+            
+        Returns:
+            List[Dict[str, Any]]: Un registro por bucket, con ``timestamp``/``value``
+            (inicio y promedio) para usarse como lecturas en las herramientas de análisis
+        """
+        end = end or datetime.now()
+        params: List[Any] = [bucket, start, end]
+        filters = ""
+        if device_id:
+            params.append(device_id)
+            filters += f" AND device_id = ${len(params)}"
+        if sensor_type:
+            params.append(sensor_type)
+            filters += f" AND sensor_type = ${len(params)}"
+        
+        rows = None
+        rollup = self._rollup_for_bucket(bucket) if not percentiles else None
+        if rollup:
+            try:
+                rows = await self.execute_query(
+                    _BUCKETS_ROLLUP_SQL.format(table=ROLLUP_TABLES[rollup], filters=filters), *params
+                )
+            except asyncpg.exceptions.UndefinedTableError:
+                logger.warning("Rollups no disponibles - agregando sobre sensor_data")
+        
+        if rows is None:
+            percentile_sql = ""
+            if percentiles:
+                params.append([float(p) for p in percentiles])
+                percentile_sql = (",\n           percentile_cont("
+                                  f"${len(params)}::float8[]) WITHIN GROUP (ORDER BY value) AS percentiles")
+            rows = await self.execute_query(
+                _BUCKETS_RAW_SQL.format(percentiles=percentile_sql, filters=filters), *params
+            )
+        
+        for row in rows:
+            for p, value in zip(percentiles, row.pop("percentiles", None) or []):
+                row[f"p{round(p * 100):g}"] = value
+            row["timestamp"] = row["bucket_start"]
+            row["value"] = row["avg_value"]
+        return rows
+    
+    @staticmethod
+    def _rollup_for_bucket(bucket: timedelta) -> Optional[str]:
+        """Rollup más grueso cuyo intervalo divide al bucket pedido."""
+        if bucket % timedelta(hours=1) == timedelta(0):
+            return "1h"
+        if bucket % timedelta(minutes=1) == timedelta(0):
+            return "1m"
+        return None
+    
+    async def get_sensor_stats(self) -> Dict[str, Any]:
+        """
+        Estadísticas globales de sensor_data en una sola consulta sobre el
+        rollup horario (cae a los datos crudos si el esquema no tiene rollups).
+        
+        Returns:
+            Dict[str, Any]: total, rango temporal, dispositivos y conteo por dispositivo
+        """
+        try:
+            rows = await self.execute_query(SENSOR_STATS_ROLLUP_QUERY)
+        except asyncpg.exceptions.UndefinedTableError:
+            logger.warning("Rollups no disponibles - estadísticas sobre sensor_data")
+            rows = await self.execute_query(SENSOR_STATS_RAW_QUERY)
+        
+        row = rows[0] if rows else {}
+        by_device = row.get("by_device") or []
+        if isinstance(by_device, str):
+            by_device = json.loads(by_device)
+        return {
+            "total_records": int(row.get("total") or 0),
+            "first_record_at": row.get("first_ts"),
+            "last_record_at": row.get("last_ts"),
+            "devices_count": int(row.get("devices") or 0),
+            "counts_by_device": by_device,
+        }
+    
+    async def ensure_partitions(self, months_ahead: int = 2) -> List[str]:
+        """
+        Crea las particiones mensuales de sensor_data del mes actual y los
+        siguientes ``months_ahead`` meses (idempotente).
+        
+        Returns:
+            List[str]: Nombres de las particiones aseguradas
+        """
+        month = date.today().replace(day=1)
+        created = []
+        for _ in range(months_ahead + 1):
+            rows = await self.execute_query(
+                "SELECT ensure_sensor_data_partition($1) AS partition", month
+            )
+            created.append(rows[0]["partition"])
+            month = (month + timedelta(days=32)).replace(day=1)
+        self._partitions_month = date.today().replace(day=1)
+        return created
+    
+    async def _ensure_current_partitions(self) -> None:
+        """Asegurar las particiones una vez por mes (al conectar y al ingerir)"""
+        if self._partitions_month == date.today().replace(day=1):
+            return
+        try:
+            partitions = await self.ensure_partitions()
+            logger.info(f"Particiones de sensor_data aseguradas: {', '.join(partitions)}")
+        except asyncpg.exceptions.UndefinedFunctionError:
+            # Esquema sin particionar (anterior a database/schema.sql actual)
+            logger.warning("ensure_sensor_data_partition no disponible - sin particiones mensuales")
+            self._partitions_month = date.today().replace(day=1)
+        except Exception as e:
+            # Las lecturas caen en sensor_data_default; se reintenta en la próxima ingesta
+            logger.warning(f"No se pudieron asegurar las particiones: {e}")
+    
     async def get_active_devices(self) -> List[Dict[str, Any]]:
         """
         Obtiene la lista de dispositivos activos.
@@ -43,9 +43,16 @@ from reportlab.lib.units import inch
 # Imports locales
 from modules.intelligence.smart_analyzer import SmartAnalyzer, SensorInsight, SystemInsight
 from modules.intelligence.dynamic_sensor_detector import DynamicSensorDetector
+from modules.utils.compact_html_report import CompactHTMLReport
 
 logger = logging.getLogger(__name__)
 
+_DASHBOARD_CSS = """
+.header { text-align: center; margin-bottom: 30px; }
+.summary { background: #f0f0f0; padding: 20px; border-radius: 10px; margin-bottom: 30px; }
+.insights { background: #e8f4f8; padding: 15px; border-left: 5px solid #2E86AB; margin: 20px 0; }
+"""
+
 @dataclass
 class ReportSection:
     """Sección individual de un reporte"""
@@ -484,12 +491,20 @@ class AdvancedReportGenerator:
                        [{"type": "indicator"}, {"type": "scatter"}]]
             )
             
+            # Payload compartido: cada serie se guarda una sola vez
+            dashboard = CompactHTMLReport(f"{report.title} - Dashboard Interactivo",
+                                          extra_css=_DASHBOARD_CSS)
+            series_refs = {}
+            
             # 1. Tendencias temporales
             if 'timestamp' in df.columns:
                 df['timestamp'] = pd.to_datetime(df['timestamp'])
                 
                 for i, device in enumerate(df['device_id'].unique()[:3]):  # Máximo 3 dispositivos
                     device_data = df[df['device_id'] == device]
+                    series_refs[len(fig.data)] = dashboard.add_series(
+                        f"device_{i}", device_data['timestamp'].tolist(), device_data['value'].tolist()
+                    )
                     fig.add_trace(
                         go.Scatter(
                             x=device_data['timestamp'],
@@ -556,20 +571,7 @@ class AdvancedReportGenerator:
             )
             
             # Convertir a HTML
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>{report.title} - Dashboard Interactivo</title>
-                <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    .header {{ text-align: center; margin-bottom: 30px; }}
-                    .summary {{ background: #f0f0f0; padding: 20px; border-radius: 10px; margin-bottom: 30px; }}
-                    .insights {{ background: #e8f4f8; padding: 15px; border-left: 5px solid #2E86AB; margin: 20px 0; }}
-                </style>
-            </head>
-            <body>
+            dashboard.add_html(f"""
                 <div class="header">
                     <h1>{report.title}</h1>
                     <h3>{report.subtitle}</h3>
@@ -586,41 +588,25 @@ class AdvancedReportGenerator:
                         <div><strong>Sensores:</strong> {report.total_sensors}</div>
                     </div>
                 </div>
-                
-                <div id="dashboard-plot" style="width:100%;height:1000px;"></div>
-                
-                <script>
-                    var graphDiv = document.getElementById('dashboard-plot');
-                    var plotData = {fig.to_json()};
-                    Plotly.newPlot(graphDiv, plotData.data, plotData.layout);
-                </script>
-                
-                <div class="insights">
-                    <h2>Insights Clave</h2>
-                    <ul>
-            """
+            """)
             
-            for insight in report.key_insights:
-                html_content += f"<li>{insight}</li>"
+            dashboard.add_plotly_figure("", fig, series_refs, height=1000)
             
-            html_content += """
-                    </ul>
+            insights_html = "".join(f"<li>{insight}</li>" for insight in report.key_insights)
+            actions_html = "".join(f"<li><strong>{action}</strong></li>" for action in report.urgent_actions)
+            dashboard.add_html(f"""
+                <div class="insights">
+                    <h2>Insights Clave</h2>
+                    <ul>{insights_html}</ul>
                 </div>
                 
                 <div class="insights">
                     <h2>Acciones Urgentes</h2>
-                    <ul>
-            """
-            
-            for action in report.urgent_actions:
-                html_content += f"<li><strong>{action}</strong></li>"
-            
-            html_content += """
-                    </ul>
+                    <ul>{actions_html}</ul>
                 </div>
-            </body>
-            </html>
-            """
+            """)
+            
+            html_content = dashboard.render()
             
             self.logger.info("✅ Dashboard HTML generado exitosamente")
             return html_content
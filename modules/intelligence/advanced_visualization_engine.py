@@ -30,6 +30,10 @@ from scipy.spatial.distance import pdist, squareform
 from scipy.cluster.hierarchy import dendrogram, linkage
 import warnings
 
+from modules.intelligence.correlation_engine import correlation_engine
+from modules.intelligence.decomposition_engine import SeriesDecomposition, decomposition_engine
+from modules.utils.temporal_profiles import DAY_LABELS, WEEKDAYS, WEEKEND, TemporalProfile, profile_store
+
 # Suprimir warnings
 warnings.filterwarnings('ignore')
 
@@ -93,6 +97,8 @@ class AdvancedVisualizationEngine:
     def __init__(self, jetson_api_url: str):
         self.jetson_api_url = jetson_api_url
         self.logger = logging.getLogger(__name__)
+        self.profile_store = profile_store
+        self.decomposition_engine = decomposition_engine
         
         # Configuraciones de tema personalizadas
         self.custom_themes = {
@@ -234,42 +240,29 @@ class AdvancedVisualizationEngine:
     async def _create_correlation_analysis(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Crea análisis de correlación multi-dimensional avanzado"""
         try:
-            # Preparar datos para correlación
-            correlation_data = df.pivot_table(
-                index='timestamp',
-                columns=['device_id', 'sensor_type'],
-                values='value',
-                aggfunc='mean'
-            ).fillna(method='ffill').fillna(method='bfill')
-            
-            if correlation_data.empty or len(correlation_data.columns) < 2:
+            # Series alineadas en la grilla común (cacheadas por watermark)
+            result = correlation_engine.analyze(df)
+            if result is None:
                 return {'error': 'Datos insuficientes para análisis de correlación'}
             
-            # Calcular matriz de correlación
-            corr_matrix = correlation_data.corr()
-            
-            # Encontrar correlaciones significativas (>0.5 o <-0.5)
-            significant_corrs = []
-            for i in range(len(corr_matrix.columns)):
-                for j in range(i+1, len(corr_matrix.columns)):
-                    corr_val = corr_matrix.iloc[i, j]
-                    if abs(corr_val) > 0.5 and not pd.isna(corr_val):
-                        significant_corrs.append((
-                            corr_matrix.columns[i],
-                            corr_matrix.columns[j],
-                            corr_val
-                        ))
-            
-            # Encontrar correlación más fuerte positiva y negativa
-            all_corrs = []
-            for i in range(len(corr_matrix.columns)):
-                for j in range(i+1, len(corr_matrix.columns)):
-                    val = corr_matrix.iloc[i, j]
-                    if not pd.isna(val):
-                        all_corrs.append((corr_matrix.columns[i], corr_matrix.columns[j], val))
-            
-            strongest_positive = max(all_corrs, key=lambda x: x[2]) if all_corrs else None
-            strongest_negative = min(all_corrs, key=lambda x: x[2]) if all_corrs else None
+            corr_matrix = result.matrix
+            
+            # Correlaciones significativas (>0.5 o <-0.5), sin recorrer la matriz
+            significant = result.strong(0.5)
+            significant_corrs = list(zip(significant['sensor1'], significant['sensor2'],
+                                         significant['correlation']))
+            
+            # Relaciones con desfase (p. ej. temperatura que sigue a la luminosidad)
+            lagged = result.pairs[(result.pairs['lag_seconds'] != 0)
+                                  & (result.pairs['lag_correlation'].abs() > 0.5)]
+            
+            # Correlación más fuerte positiva y negativa
+            positive = result.strongest(1)
+            negative = result.strongest(-1)
+            strongest_positive = (positive['sensor1'], positive['sensor2'], positive['correlation']) \
+                if positive is not None else None
+            strongest_negative = (negative['sensor1'], negative['sensor2'], negative['correlation']) \
+                if negative is not None else None
             
             # Crear visualización de correlación avanzada
             correlation_fig = self._create_advanced_correlation_heatmap(corr_matrix)
@@ -298,6 +291,16 @@ class AdvancedVisualizationEngine:
                     'sensor2': str(strongest_negative[1]),
                     'correlation': float(strongest_negative[2])
                 } if strongest_negative else None,
+                'lagged_correlations': [
+                    {
+                        'sensor1': str(s1),
+                        'sensor2': str(s2),
+                        'lag_seconds': float(lag),
+                        'lag_correlation': float(lag_corr)
+                    }
+                    for s1, s2, lag, lag_corr in zip(lagged['sensor1'], lagged['sensor2'],
+                                                     lagged['lag_seconds'], lagged['lag_correlation'])
+                ],
                 'correlation_clusters': correlation_clusters,
                 'visualization': {
                     'plotly_json': correlation_fig.to_json(),
@@ -328,10 +331,9 @@ class AdvancedVisualizationEngine:
             text=np.round(corr_masked.values, 2),
             texttemplate='%{text}',
             textfont={'size': 10, 'color': 'white'},
-            hoverinfotemplate='<b>%{x}</b><br><b>%{y}</b><br>Correlación: %{z}<extra></extra>',
+            hovertemplate='<b>%{x}</b><br><b>%{y}</b><br>Correlación: %{z}<extra></extra>',
             colorbar=dict(
-                title='Correlación',
-                titleside='right',
+                title=dict(text='Correlación', side='right'),
                 tickmode='linear',
                 tick0=-1,
                 dtick=0.5
@@ -433,53 +435,47 @@ class AdvancedVisualizationEngine:
         return insights
     
     async def _create_temporal_heatmap(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Crea heatmap temporal avanzado con detección de patrones"""
+        """Crea heatmap temporal (hora x día de la semana) desde los perfiles precalculados"""
         try:
-            # Preparar datos temporales
-            df_temp = df.copy()
-            df_temp['hour'] = df_temp['timestamp'].dt.hour
-            df_temp['day'] = df_temp['timestamp'].dt.date
-            df_temp['day_of_week'] = df_temp['timestamp'].dt.day_name()
+            # Incorporar solo las lecturas nuevas; el resto ya está en los perfiles
+            self.profile_store.update(df)
             
             # Crear matriz temporal para cada tipo de sensor
             heatmaps = {}
+            time_span_days = 0
             
-            for sensor_type in df_temp['sensor_type'].unique():
-                sensor_data = df_temp[df_temp['sensor_type'] == sensor_type]
-                
-                # Matriz hora vs día
-                heatmap_data = sensor_data.pivot_table(
-                    index='hour',
-                    columns='day',
-                    values='value',
-                    aggfunc='mean'
-                ).fillna(0)
-                
-                if heatmap_data.empty:
+            # Solo las series (dispositivo, sensor) presentes en los datos recibidos
+            present = self.profile_store.series_in(df)
+            for sensor_type in df['sensor_type'].unique():
+                profile = self.profile_store.profile(sensor_type=str(sensor_type), series=present)
+                if profile.total == 0:
                     continue
                 
+                # Matriz hora vs día de la semana (168 celdas)
+                heatmap_data = profile.heatmap()
+                time_span_days = max(time_span_days, profile.span_days)
+                
                 # Crear figura
                 fig = go.Figure()
                 
                 fig.add_trace(go.Heatmap(
                     z=heatmap_data.values,
-                    x=[str(d) for d in heatmap_data.columns],
+                    x=list(DAY_LABELS),
                     y=[f'{h:02d}:00' for h in heatmap_data.index],
                     colorscale=self._get_sensor_colorscale(sensor_type),
-                    hoverinfotemplate='<b>Día:</b> %{x}<br><b>Hora:</b> %{y}<br><b>Valor:</b> %{z:.2f}<extra></extra>',
+                    hovertemplate='<b>Día:</b> %{x}<br><b>Hora:</b> %{y}<br><b>Valor:</b> %{z:.2f}<extra></extra>',
                     colorbar=dict(
-                        title=f'{sensor_type}',
-                        titleside='right'
+                        title=dict(text=f'{sensor_type}', side='right')
                     )
                 ))
                 
                 fig.update_layout(
                     title={
-                        'text': f'🌡️ Mapa de Calor Temporal - {sensor_type}<br><sub>Patrón de 24h x Días</sub>',
+                        'text': f'🌡️ Mapa de Calor Temporal - {sensor_type}<br><sub>Patrón de 24h x Días de la semana</sub>',
                         'x': 0.5,
                         'font': {'size': 18}
                     },
-                    xaxis={'title': 'Días', 'tickangle': 45},
+                    xaxis={'title': 'Día de la semana'},
                     yaxis={'title': 'Horas del Día'},
                     width=1000,
                     height=600,
@@ -487,7 +483,7 @@ class AdvancedVisualizationEngine:
                 )
                 
                 # Detectar patrones temporales
-                patterns = self._detect_temporal_patterns(heatmap_data, sensor_type)
+                patterns = self._detect_temporal_patterns(profile, sensor_type)
                 
                 heatmaps[sensor_type] = {
                     'visualization': {
@@ -495,15 +491,15 @@ class AdvancedVisualizationEngine:
                         'html': fig.to_html(include_plotlyjs='cdn')
                     },
                     'patterns_detected': patterns,
-                    'peak_hours': self._find_peak_hours(heatmap_data),
-                    'cyclical_behavior': self._analyze_cyclical_behavior(heatmap_data)
+                    'peak_hours': self._find_peak_hours(profile),
+                    'cyclical_behavior': self._analyze_cyclical_behavior(profile)
                 }
             
             return {
                 'heatmaps_by_sensor': heatmaps,
                 'summary': {
                     'sensors_analyzed': len(heatmaps),
-                    'time_span_days': len(df_temp['day'].unique()),
+                    'time_span_days': time_span_days,
                     'total_patterns_detected': sum(len(h['patterns_detected']) for h in heatmaps.values())
                 },
                 'insights': self._generate_temporal_insights(heatmaps)
@@ -526,13 +522,13 @@ class AdvancedVisualizationEngine:
         else:
             return 'Plasma'     # Por defecto
     
-    def _detect_temporal_patterns(self, heatmap_data: pd.DataFrame, sensor_type: str) -> List[str]:
-        """Detecta patrones temporales en los datos"""
+    def _detect_temporal_patterns(self, profile: TemporalProfile, sensor_type: str) -> List[str]:
+        """Detecta patrones temporales en el perfil hora x día de la semana"""
         patterns = []
         
         try:
             # Patrón diario (peaks y valleys)
-            daily_avg = heatmap_data.mean(axis=1)
+            daily_avg = profile.hourly()['mean'].dropna()
             
             peak_hour = daily_avg.idxmax()
             valley_hour = daily_avg.idxmin()
@@ -557,8 +553,8 @@ class AdvancedVisualizationEngine:
                 patterns.append("Alta actividad/variabilidad durante horas diurnas")
             
             # Detectar tendencias de fin de semana vs días laborales (si hay suficientes datos)
-            if heatmap_data.shape[1] >= 7:  # Al menos una semana de datos
-                weekend_pattern = self._analyze_weekend_pattern(heatmap_data)
+            if profile.days_covered == len(DAY_LABELS):  # Al menos una semana de datos
+                weekend_pattern = self._analyze_weekend_pattern(profile)
                 if weekend_pattern:
                     patterns.append(weekend_pattern)
             
@@ -568,10 +564,10 @@ class AdvancedVisualizationEngine:
         
         return patterns
     
-    def _find_peak_hours(self, heatmap_data: pd.DataFrame) -> Dict[str, int]:
-        """Encuentra horas pico en los datos"""
+    def _find_peak_hours(self, profile: TemporalProfile) -> Dict[str, int]:
+        """Encuentra horas pico en el perfil"""
         try:
-            daily_avg = heatmap_data.mean(axis=1)
+            daily_avg = profile.hourly()['mean'].dropna()
             
             return {
                 'peak_hour': int(daily_avg.idxmax()),
@@ -582,10 +578,10 @@ class AdvancedVisualizationEngine:
         except Exception:
             return {}
     
-    def _analyze_cyclical_behavior(self, heatmap_data: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_cyclical_behavior(self, profile: TemporalProfile) -> Dict[str, Any]:
         """Analiza comportamiento cíclico"""
         try:
-            daily_avg = heatmap_data.mean(axis=1)
+            daily_avg = profile.hourly()['mean'].dropna()
             
             # Calcular autocorrelación para detectar ciclos
             autocorr_12h = daily_avg.autocorr(lag=12) if len(daily_avg) > 12 else 0
@@ -603,11 +599,23 @@ class AdvancedVisualizationEngine:
         except Exception:
             return {}
     
-    def _analyze_weekend_pattern(self, heatmap_data: pd.DataFrame) -> Optional[str]:
-        """Analiza patrones de fin de semana"""
-        # Esto requeriría información adicional sobre qué días son fin de semana
-        # Por simplicidad, asumimos que podemos detectar diferencias en patrones
-        return None
+    def _analyze_weekend_pattern(self, profile: TemporalProfile) -> Optional[str]:
+        """Compara fin de semana con días laborales (media agrupada de cada grupo de días)"""
+        weekday_count, weekday_mean, _ = profile.pooled(WEEKDAYS)
+        weekend_count, weekend_mean, _ = profile.pooled(WEEKEND)
+        _, _, overall_std = profile.pooled()
+        
+        if not weekday_count or not weekend_count or not overall_std or np.isnan(overall_std):
+            return None
+        
+        # Diferencia relevante: al menos media desviación del conjunto
+        difference = weekend_mean - weekday_mean
+        if abs(difference) < 0.5 * overall_std:
+            return None
+        
+        direction = "más altos" if difference > 0 else "más bajos"
+        return (f"Valores {direction} en fin de semana que en días laborales "
+                f"({weekend_mean:.2f} vs {weekday_mean:.2f})")
     
     def _generate_temporal_insights(self, heatmaps: Dict) -> List[str]:
         """Genera insights sobre patrones temporales"""
@@ -864,23 +872,21 @@ class AdvancedVisualizationEngine:
         try:
             decompositions = {}
             
-            for sensor_type in df['sensor_type'].unique():
-                sensor_data = df[df['sensor_type'] == sensor_type].copy()
-                sensor_data = sensor_data.sort_values('timestamp')
-                
+            # Misma granularidad que las predicciones: una descomposición por serie
+            for (device_id, sensor_type), sensor_data in df.groupby(['device_id', 'sensor_type'], sort=False):
                 if len(sensor_data) < 24:  # Necesitamos al menos un día de datos
                     continue
                 
-                # Crear serie temporal
-                ts_data = sensor_data.set_index('timestamp')['value'].resample('H').mean().fillna(method='ffill')
-                
-                if len(ts_data) < 24:
+                # Componentes en caché (solo se procesan las lecturas nuevas)
+                decomposition = self.decomposition_engine.decompose(sensor_data, device_id, sensor_type)
+                if decomposition is None:
                     continue
                 
                 # Descomposición simple
-                decomp_result = self._perform_simple_decomposition(ts_data, sensor_type)
+                series_key = f"{device_id}_{sensor_type}"
+                decomp_result = self._perform_simple_decomposition(decomposition, series_key)
                 if decomp_result:
-                    decompositions[sensor_type] = decomp_result
+                    decompositions[series_key] = decomp_result
             
             return {
                 'decompositions': decompositions,
@@ -894,20 +900,13 @@ class AdvancedVisualizationEngine:
             self.logger.warning(f"⚠️ Error en descomposición de series temporales: {e}")
             return {'error': str(e)}
     
-    def _perform_simple_decomposition(self, ts_data: pd.Series, sensor_type: str) -> Optional[Dict]:
-        """Realiza descomposición simple de serie temporal"""
+    def _perform_simple_decomposition(self, decomposition: SeriesDecomposition, series_label: str) -> Optional[Dict]:
+        """Visualiza los componentes de la descomposición compartida"""
         try:
-            # Componente de tendencia (media móvil)
-            window_size = min(24, len(ts_data) // 4)  # Ventana de 24h o 1/4 de los datos
-            trend = ts_data.rolling(window=window_size, center=True).mean()
-            
-            # Componente estacional (patrón diario simple)
-            seasonal_period = 24 if len(ts_data) >= 48 else len(ts_data) // 2
-            seasonal = ts_data.groupby(ts_data.index.hour).transform('mean')
-            seasonal = seasonal - seasonal.mean()  # Centrar en cero
-            
-            # Residual
-            residual = ts_data - trend - seasonal
+            ts_data = decomposition.observed
+            trend = decomposition.trend
+            seasonal = decomposition.seasonal
+            residual = decomposition.residual
             
             # Crear visualización
             fig = make_subplots(
@@ -941,7 +940,7 @@ class AdvancedVisualizationEngine:
             )
             
             fig.update_layout(
-                title=f'📈 Descomposición de Serie Temporal - {sensor_type}',
+                title=f'📈 Descomposición de Serie Temporal - {series_label}',
                 height=800,
                 showlegend=False,
                 **self.custom_themes['iot_professional']
@@ -952,11 +951,7 @@ class AdvancedVisualizationEngine:
                     'plotly_json': fig.to_json(),
                     'html': fig.to_html(include_plotlyjs='cdn')
                 },
-                'components': {
-                    'trend_strength': float(trend.std() / ts_data.std()) if ts_data.std() > 0 else 0,
-                    'seasonal_strength': float(seasonal.std() / ts_data.std()) if ts_data.std() > 0 else 0,
-                    'residual_strength': float(residual.std() / ts_data.std()) if ts_data.std() > 0 else 0
-                }
+                'components': decomposition.strengths()
             }
             
         except Exception as e:
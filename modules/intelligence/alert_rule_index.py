@@ -0,0 +1,189 @@
+"""
+Índice de Reglas de Alerta
+==========================
+
+Mapea cada serie (device_id, sensor_type) a las reglas que le aplican, para
+que ``IntelligentAlertSystem`` evalúe cada serie solo contra sus propias
+reglas en vez de filtrar el lote completo una vez por regla:
+
+- Las reglas se compilan en cuatro grupos según lo que restringen
+  (dispositivo y sensor, solo dispositivo, solo sensor, ninguno)
+- La resolución por serie se memoriza hasta que cambian las reglas
+- ``RulesFileWatcher`` detecta cambios en el archivo JSON de reglas para
+  recargarlas en caliente sin reconstruir el sistema
+
+Formato del archivo de reglas::
+
+    {
+      "rules": [
+        {"rule_id": "temp_sala_servidores", "name": "Temperatura sala servidores",
+         "category": "environmental", "severity": "CRITICAL",
+         "condition": "value > threshold_high OR value < threshold_low",
+         "threshold_values": {"threshold_high": 28.0, "threshold_low": 15.0},
+         "sensor_types": ["temperature_1"], "devices": ["arduino_eth_001"],
+         "time_window": 300, "cooldown_period": 1800, "escalation_time": 900}
+      ]
+    }
+
+Las duraciones van en segundos. Una regla con el ``rule_id`` de una regla
+por defecto la reemplaza (``"enabled": false`` la desactiva).
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SeriesKey = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """Regla habilitada con sus restricciones como conjuntos"""
+    rule_id: str
+    position: int                      # Orden de definición (orden de evaluación)
+    devices: FrozenSet[str]            # Vacío = todos los dispositivos
+    sensor_types: FrozenSet[str]       # Vacío = todos los sensores
+
+
+class AlertRuleIndex:
+    """
+    Índice (device_id, sensor_type) -> reglas aplicables.
+
+    Args:
+        rules: Reglas por ``rule_id`` (objetos con ``enabled``, ``devices`` y
+            ``sensor_types``, p. ej. ``AlertRule``)
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Any]] = None):
+        self._lock = threading.Lock()
+        self.rebuild(rules or {})
+
+    @staticmethod
+    def signature(rules: Dict[str, Any]) -> Tuple:
+        """Huella de las reglas: cambia si se agrega, reemplaza o reconfigura alguna"""
+        return tuple((rule_id, id(rule), rule.enabled, tuple(rule.devices or ()), tuple(rule.sensor_types or ()))
+                     for rule_id, rule in rules.items())
+
+    def rebuild(self, rules: Dict[str, Any]):
+        """Compilar las reglas habilitadas en los grupos del índice"""
+        exact: Dict[SeriesKey, List[CompiledRule]] = {}
+        by_device: Dict[str, List[CompiledRule]] = {}
+        by_sensor: Dict[str, List[CompiledRule]] = {}
+        wildcard: List[CompiledRule] = []
+        positions: Dict[str, int] = {}
+
+        for position, (rule_id, rule) in enumerate(rules.items()):
+            if not rule.enabled:
+                continue
+            compiled = CompiledRule(rule_id, position, frozenset(rule.devices or ()),
+                                    frozenset(rule.sensor_types or ()))
+            positions[rule_id] = position
+            if compiled.devices and compiled.sensor_types:
+                for device in compiled.devices:
+                    for sensor in compiled.sensor_types:
+                        exact.setdefault((device, sensor), []).append(compiled)
+            elif compiled.devices:
+                for device in compiled.devices:
+                    by_device.setdefault(device, []).append(compiled)
+            elif compiled.sensor_types:
+                for sensor in compiled.sensor_types:
+                    by_sensor.setdefault(sensor, []).append(compiled)
+            else:
+                wildcard.append(compiled)
+
+        with self._lock:
+            self._exact, self._by_device, self._by_sensor, self._wildcard = exact, by_device, by_sensor, wildcard
+            self._positions = positions
+            self._resolved: Dict[SeriesKey, Tuple[str, ...]] = {}
+            self._signature = self.signature(rules)
+            self.rule_count = len(positions)
+
+    def ensure_current(self, rules: Dict[str, Any]) -> bool:
+        """Recompilar si las reglas cambiaron desde la última compilación"""
+        if self.signature(rules) == self._signature:
+            return False
+        self.rebuild(rules)
+        return True
+
+    def rules_for(self, device_id: str, sensor_type: str) -> Tuple[str, ...]:
+        """IDs de las reglas aplicables a la serie, en orden de definición"""
+        key = (device_id, sensor_type)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            matches = (self._exact.get(key, []) + self._by_device.get(device_id, [])
+                       + self._by_sensor.get(sensor_type, []) + self._wildcard)
+            resolved = tuple(rule.rule_id for rule in sorted(matches, key=lambda rule: rule.position))
+            with self._lock:
+                self._resolved[key] = resolved
+        return resolved
+
+    def partition(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Posiciones de fila de ``df`` que corresponden a cada regla, agrupando
+        el lote una sola vez por serie.
+
+        Returns:
+            {rule_id: posiciones} en orden de definición de las reglas
+        """
+        if df.empty:
+            return {}
+        groups = df.groupby([df['device_id'].astype(str), df['sensor_type'].astype(str)], sort=False).indices
+        per_rule: Dict[str, List[np.ndarray]] = {}
+        for (device_id, sensor_type), positions in groups.items():
+            for rule_id in self.rules_for(device_id, sensor_type):
+                per_rule.setdefault(rule_id, []).append(positions)
+        return {rule_id: np.sort(np.concatenate(chunks))
+                for rule_id, chunks in sorted(per_rule.items(), key=lambda item: self._positions[item[0]])}
+
+
+class RulesFileWatcher:
+    """
+    Carga el archivo JSON de reglas y detecta cambios por fecha de
+    modificación y tamaño (sin releer el archivo si no cambió).
+    """
+
+    def __init__(self, path: os.PathLike):
+        self.path = Path(path)
+        self._stamp: Optional[Tuple[float, int]] = None
+
+    def _current_stamp(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size)
+
+    def changed(self) -> bool:
+        return self._current_stamp() != self._stamp
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        Leer las entradas del archivo (lista o ``{"rules": [...]}``).
+
+        Raises:
+            ValueError: Si el archivo no es JSON válido o no tiene una lista de reglas
+        """
+        stamp = self._current_stamp()
+        if stamp is None:
+            self._stamp = None
+            return []
+        try:
+            payload = json.loads(self.path.read_text(encoding='utf-8'))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Archivo de reglas inválido {self.path}: {e}") from e
+        finally:
+            # Un archivo inválido no se reintenta hasta que vuelva a cambiar
+            self._stamp = stamp
+        entries = payload.get('rules', []) if isinstance(payload, dict) else payload
+        if not isinstance(entries, list):
+            raise ValueError(f"Archivo de reglas inválido {self.path}: se esperaba una lista de reglas")
+        return entries
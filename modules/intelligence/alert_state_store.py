@@ -0,0 +1,294 @@
+"""
+Almacén de Estado de Alertas
+============================
+
+Estado de alertas de ``IntelligentAlertSystem`` respaldado en SQLite, con
+índices en memoria para no recorrer todas las alertas en cada lote:
+
+- Por serie y regla (rule_id, device_id, sensor_type): lista ordenada de
+  disparos para buscar alertas similares dentro de una ventana en O(log n)
+- Por dispositivo, sensor, regla y estado: conjuntos de IDs
+- Ventana de retención acotada (tiempo y cantidad máxima de alertas)
+
+Con una ruta de archivo, el estado sobrevive a los reinicios del proceso
+(p. ej. cuando Streamlit recicla un worker).
+"""
+
+import bisect
+import json
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SimilarityKey = Tuple[str, str, str]   # (rule_id, device_id, sensor_type)
+
+ACTIVE_STATUSES = ('active', 'acknowledged', 'escalated')
+
+_MAX_ID = '\U0010ffff'                 # Mayor que cualquier alert_id (límite de búsqueda binaria)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    alert_id TEXT PRIMARY KEY,
+    rule_id TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    sensor_type TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    status TEXT NOT NULL,
+    current_value REAL,
+    triggered_at REAL NOT NULL,
+    last_updated REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_similarity ON alerts (rule_id, device_id, sensor_type, triggered_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts (status);
+CREATE INDEX IF NOT EXISTS idx_alerts_last_updated ON alerts (last_updated);
+"""
+
+_COLUMNS = ('alert_id', 'rule_id', 'device_id', 'sensor_type', 'severity', 'category', 'status',
+            'current_value', 'triggered_at', 'last_updated', 'payload')
+
+
+def to_epoch(value: Any) -> float:
+    """Timestamp -> segundos de la hora local del dispositivo (sin offset), comparable entre fuentes"""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.value / 1e9
+
+
+@dataclass
+class AlertRecord:
+    """Estado persistido de una alerta"""
+    alert_id: str
+    rule_id: str
+    device_id: str
+    sensor_type: str
+    severity: int
+    category: str
+    status: str
+    current_value: Optional[float]
+    triggered_at: float                # Segundos (hora local del dispositivo)
+    last_updated: float                # Segundos (reloj del servidor)
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def similarity_key(self) -> SimilarityKey:
+        return (self.rule_id, self.device_id, self.sensor_type)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Mismo formato que ``IntelligentAlertSystem._alert_to_dict``, con el estado vigente"""
+        return {**self.payload, 'status': self.status, 'current_value': self.current_value,
+                'last_updated': datetime.fromtimestamp(self.last_updated).isoformat()}
+
+    def _row(self) -> Tuple:
+        return (self.alert_id, self.rule_id, self.device_id, self.sensor_type, self.severity, self.category,
+                self.status, self.current_value, self.triggered_at, self.last_updated,
+                json.dumps(self.payload, default=str))
+
+    @classmethod
+    def _from_row(cls, row: Tuple) -> 'AlertRecord':
+        values = dict(zip(_COLUMNS, row))
+        values['payload'] = json.loads(values['payload'])
+        return cls(**values)
+
+
+class AlertStateStore:
+    """
+    Estado de alertas con persistencia en SQLite e índices en memoria.
+
+    Args:
+        db_path: Archivo SQLite (``":memory:"`` = sin persistencia)
+        retention: Antigüedad máxima (por última actualización) de las alertas retenidas
+        max_alerts: Alertas retenidas como máximo (se descartan las más antiguas)
+    """
+
+    def __init__(self, db_path: str = ":memory:", retention: timedelta = timedelta(days=7),
+                 max_alerts: int = 10000):
+        self.db_path = db_path
+        self.retention = retention
+        self.max_alerts = max_alerts
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+        self._records: Dict[str, AlertRecord] = {}
+        self._timeline: Dict[SimilarityKey, List[Tuple[float, str]]] = defaultdict(list)
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._by_device: Dict[str, Set[str]] = defaultdict(set)
+        self._by_sensor: Dict[str, Set[str]] = defaultdict(set)
+        self._by_rule: Dict[str, Set[str]] = defaultdict(set)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self._records
+
+    # ------------------------------------------------------------------
+    # Índices
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        """Reconstruir los índices desde SQLite (solo lo que está dentro de la retención)"""
+        self.prune()
+        rows = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM alerts ORDER BY triggered_at").fetchall()
+        for row in rows:
+            self._index(AlertRecord._from_row(row))
+        if rows:
+            logger.info(f"🗄️ Estado de alertas restaurado: {len(rows)} alertas ({self.db_path})")
+
+    def _index(self, record: AlertRecord):
+        self._records[record.alert_id] = record
+        bisect.insort(self._timeline[record.similarity_key], (record.triggered_at, record.alert_id))
+        self._by_status[record.status].add(record.alert_id)
+        self._by_device[record.device_id].add(record.alert_id)
+        self._by_sensor[record.sensor_type].add(record.alert_id)
+        self._by_rule[record.rule_id].add(record.alert_id)
+
+    def _unindex(self, record: AlertRecord):
+        self._records.pop(record.alert_id, None)
+        timeline = self._timeline.get(record.similarity_key, [])
+        position = bisect.bisect_left(timeline, (record.triggered_at, record.alert_id))
+        if position < len(timeline) and timeline[position][1] == record.alert_id:
+            timeline.pop(position)
+        if not timeline:
+            self._timeline.pop(record.similarity_key, None)
+        for index, key in ((self._by_status, record.status), (self._by_device, record.device_id),
+                           (self._by_sensor, record.sensor_type), (self._by_rule, record.rule_id)):
+            index[key].discard(record.alert_id)
+            if not index[key]:
+                del index[key]
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def add(self, record: AlertRecord) -> bool:
+        """
+        Registrar una alerta nueva.
+
+        Returns:
+            False si la alerta ya existía (p. ej. la misma lectura reprocesada)
+        """
+        with self._lock:
+            if record.alert_id in self._records:
+                return False
+            self._conn.execute(f"INSERT OR REPLACE INTO alerts VALUES ({', '.join('?' * len(_COLUMNS))})",
+                               record._row())
+            self._conn.commit()
+            self._index(record)
+            if len(self._records) > self.max_alerts:
+                self.prune()
+            return True
+
+    def update(self, alert_id: str, status: Optional[str] = None, current_value: Optional[float] = None,
+               now: Optional[datetime] = None) -> Optional[AlertRecord]:
+        """Actualizar estado y/o último valor de una alerta"""
+        with self._lock:
+            record = self._records.get(alert_id)
+            if record is None:
+                return None
+            self._by_status[record.status].discard(alert_id)
+            if not self._by_status[record.status]:
+                del self._by_status[record.status]
+            if status is not None:
+                record.status = status
+            if current_value is not None:
+                record.current_value = float(current_value)
+            record.last_updated = (now or datetime.now()).timestamp()
+            self._by_status[record.status].add(alert_id)
+            self._conn.execute("UPDATE alerts SET status = ?, current_value = ?, last_updated = ? WHERE alert_id = ?",
+                               (record.status, record.current_value, record.last_updated, alert_id))
+            self._conn.commit()
+            return record
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Descartar alertas fuera de la retención o por encima de ``max_alerts``"""
+        with self._lock:
+            # Ambas consultas usan el índice por last_updated: O(log n + descartadas)
+            cutoff = ((now or datetime.now()) - self.retention).timestamp()
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT alert_id FROM alerts WHERE last_updated < ?", (cutoff,))]
+            overflow = self._conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] - len(expired) - self.max_alerts
+            if overflow > 0:
+                expired += [row[0] for row in self._conn.execute(
+                    "SELECT alert_id FROM alerts WHERE last_updated >= ? ORDER BY last_updated LIMIT ?",
+                    (cutoff, overflow))]
+            if not expired:
+                return 0
+
+            self._conn.executemany("DELETE FROM alerts WHERE alert_id = ?", [(alert_id,) for alert_id in expired])
+            self._conn.commit()
+            for alert_id in expired:
+                if alert_id in self._records:
+                    self._unindex(self._records[alert_id])
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM alerts")
+            self._conn.commit()
+            for index in (self._records, self._timeline, self._by_status, self._by_device,
+                          self._by_sensor, self._by_rule):
+                index.clear()
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def get(self, alert_id: str) -> Optional[AlertRecord]:
+        return self._records.get(alert_id)
+
+    def find_similar(self, rule_id: str, device_id: str, sensor_type: str, triggered_at: Any,
+                     window: timedelta) -> List[AlertRecord]:
+        """Alertas de la misma regla y serie disparadas a menos de ``window`` (búsqueda binaria)"""
+        timeline = self._timeline.get((rule_id, device_id, sensor_type))
+        if not timeline:
+            return []
+        center = to_epoch(triggered_at)
+        span = window.total_seconds()
+        start = bisect.bisect_left(timeline, (center - span, ''))
+        end = bisect.bisect_right(timeline, (center + span, _MAX_ID))
+        return [self._records[alert_id] for _, alert_id in timeline[start:end]]
+
+    def query(self, device_id: Optional[str] = None, sensor_type: Optional[str] = None,
+              rule_id: Optional[str] = None, statuses: Iterable[str] = ACTIVE_STATUSES) -> List[AlertRecord]:
+        """Alertas filtradas por índice (intersección empezando por el conjunto más chico)"""
+        candidates = [set().union(*(self._by_status.get(status, set()) for status in statuses))]
+        for index, key in ((self._by_device, device_id), (self._by_sensor, sensor_type), (self._by_rule, rule_id)):
+            if key is not None:
+                candidates.append(index.get(key, set()))
+        candidates.sort(key=len)
+        alert_ids = candidates[0].intersection(*candidates[1:])
+        return sorted((self._records[alert_id] for alert_id in alert_ids), key=lambda record: record.triggered_at)
+
+    def count_by(self, field_name: str, statuses: Iterable[str] = ACTIVE_STATUSES) -> Dict[Any, int]:
+        """Conteo de alertas por ``severity``, ``category``, ``device_id``, ``sensor_type`` o ``rule_id``"""
+        counts: Dict[Any, int] = defaultdict(int)
+        for status in statuses:
+            for alert_id in self._by_status.get(status, ()):
+                counts[getattr(self._records[alert_id], field_name)] += 1
+        return dict(counts)
+
+    def count(self, statuses: Optional[Iterable[str]] = None) -> int:
+        if statuses is None:
+            return len(self._records)
+        return sum(len(self._by_status.get(status, ())) for status in statuses)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,286 @@
+"""
+Motor Unificado de Detección de Anomalías
+=========================================
+
+Puntúa todas las series (device_id, sensor_type) de un frame en una sola
+pasada vectorizada con pandas (groupby + rolling), sin bucles por serie:
+
+- ``robust_z``: z-score robusto con mediana y MAD móviles (desviación media
+  absoluta si la MAD es 0, p. ej. una serie casi constante con un pico)
+- ``iqr``: límites de Tukey con cuartiles móviles
+- ``jump``: cambio súbito respecto a la lectura anterior (escala robusta de las diferencias)
+- ``range``: lectura fuera del rango válido del tipo de sensor
+
+Las ventanas y umbrales son configurables por familia de sensor
+(temperatura, luminosidad, humedad). SmartAnalyzer, AnalysisTools,
+ReportGenerator y los nodos LangGraph remotos delegan en este motor.
+"""
+
+import logging
+import warnings
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+logger = logging.getLogger(__name__)
+
+DETECTORS = ("robust_z", "iqr", "jump", "range")
+
+# Constante de consistencia de la MAD con la desviación estándar normal
+MAD_SCALE = 0.6745
+# Ídem para la desviación media absoluta (sqrt(pi/2)), respaldo cuando la MAD es 0
+MEAN_AD_SCALE = 1.2533
+
+
+@dataclass(frozen=True)
+class AnomalyWindowConfig:
+    """Configuración de detección para una familia de sensores"""
+    window: Optional[int] = 60          # Lecturas por ventana móvil (None = serie completa)
+    min_periods: int = 20               # Lecturas mínimas antes de usar la ventana
+    z_threshold: float = 3.5            # Umbral del z-score robusto
+    iqr_k: float = 1.5                  # Multiplicador de Tukey
+    jump_k: float = 1.0                 # Cambio súbito: múltiplo de z_threshold sobre las diferencias
+    valid_range: Optional[Tuple[float, float]] = None
+
+
+DEFAULT_SENSOR_CONFIGS: Dict[str, AnomalyWindowConfig] = {
+    'temperature': AnomalyWindowConfig(window=60, z_threshold=3.5, valid_range=(-10.0, 60.0)),
+    'luminosity': AnomalyWindowConfig(window=30, z_threshold=4.0, valid_range=(0.0, 1023.0)),
+    'humidity': AnomalyWindowConfig(window=60, z_threshold=3.5, valid_range=(0.0, 100.0)),
+    'default': AnomalyWindowConfig(),
+}
+
+
+def sensor_family(sensor_type: Any) -> str:
+    """Mapear un tipo de sensor a su familia (mismas palabras clave que SmartAnalyzer)"""
+    name = str(sensor_type).lower()
+    if any(keyword in name for keyword in ['temp', 'ntc', 't1', 't2', 'avg']):
+        return 'temperature'
+    if any(keyword in name for keyword in ['ldr', 'light', 'lumino', 'bright']):
+        return 'luminosity'
+    if any(keyword in name for keyword in ['humid', 'moisture']):
+        return 'humidity'
+    return 'default'
+
+
+def _to_frame(data: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> pd.DataFrame:
+    frame = data.copy() if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data))
+    if frame.empty:
+        return frame
+    if not frame.index.is_unique:
+        frame = frame.reset_index(drop=True)
+    frame['value'] = pd.to_numeric(frame['value'], errors='coerce')
+    return frame
+
+
+# Estadísticos de la serie completa (ignoran NaN como ``groupby().transform``)
+_WHOLE_SERIES_STATS = {'median': np.nanmedian, 'mean': np.nanmean, 'quantile': np.nanquantile}
+
+
+def _series_bounds(frame: pd.DataFrame, group_cols: Sequence[str]) -> np.ndarray:
+    """Límites [inicio, fin) de cada serie en un frame ordenado por ``group_cols``"""
+    changed = np.zeros(len(frame), dtype=bool)
+    changed[0] = True
+    for col in group_cols:
+        keys = frame[col].to_numpy()
+        missing = pd.isna(keys)
+        changed[1:] |= (keys[1:] != keys[:-1]) & ~(missing[1:] & missing[:-1])
+    return np.r_[np.flatnonzero(changed), len(frame)]
+
+
+def _whole_series(values: np.ndarray, bounds: np.ndarray, how: str, *args) -> np.ndarray:
+    """Estadístico de cada serie completa, repetido en todas sus lecturas"""
+    result = np.empty(len(values), dtype=np.float64)
+    stat = _WHOLE_SERIES_STATS[how]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # Series sin valores numéricos: NaN
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            result[start:end] = stat(values[start:end], *args)
+    return result
+
+
+class _SeriesWindowIndexer(BaseIndexer):
+    """
+    Ventana causal de ``window`` lecturas que no cruza el inicio de su serie.
+
+    Las series deben venir contiguas (límites de ``_series_bounds``); así una
+    sola pasada de ``rolling`` cubre todas las series sin ``groupby().rolling``.
+    """
+
+    def __init__(self, bounds: np.ndarray, window: int):
+        super().__init__(window_size=window)
+        positions = np.arange(bounds[-1], dtype=np.int64)
+        series_start = np.repeat(bounds[:-1], np.diff(bounds)).astype(np.int64)
+        self.start = np.maximum(series_start, positions + 1 - window)
+        self.end = positions + 1
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.start, self.end
+
+
+class AnomalyEngine:
+    """
+    Detección de anomalías agrupada y vectorizada sobre frames multi-serie.
+
+    Args:
+        configs: Configuración por familia (``temperature``, ``luminosity``,
+            ``humidity``, ``default``); se combina con ``DEFAULT_SENSOR_CONFIGS``
+    """
+
+    def __init__(self, configs: Optional[Dict[str, AnomalyWindowConfig]] = None):
+        self.configs = {**DEFAULT_SENSOR_CONFIGS, **(configs or {})}
+
+    def config_for(self, sensor_type: Any) -> AnomalyWindowConfig:
+        return self.configs.get(sensor_family(sensor_type), self.configs['default'])
+
+    def score(self, data: Union[pd.DataFrame, Iterable[Dict[str, Any]]],
+              group_cols: Sequence[str] = ('device_id', 'sensor_type'),
+              detectors: Sequence[str] = DETECTORS,
+              valid_ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+              **overrides) -> pd.DataFrame:
+        """
+        Puntuar cada lectura del frame.
+
+        Args:
+            data: DataFrame o registros con ``sensor_type`` y ``value``
+                (y opcionalmente ``device_id`` y ``timestamp``)
+            group_cols: Columnas que definen una serie
+            detectors: Subconjunto de ``DETECTORS`` a aplicar
+            valid_ranges: Rangos válidos por ``sensor_type`` exacto (tienen
+                prioridad sobre el de la familia)
+            **overrides: Campos de ``AnomalyWindowConfig`` aplicados a todas
+                las familias (p. ej. ``window=None, z_threshold=2.0``)
+
+        Returns:
+            Copia del frame (mismo orden) con ``baseline``, ``scale``,
+            ``robust_z``, ``iqr_low``/``iqr_high``, un flag por detector,
+            ``is_anomaly``, ``methods`` y ``severity``
+        """
+        unknown = set(detectors) - set(DETECTORS)
+        if unknown:
+            raise ValueError(f"Detectores desconocidos: {sorted(unknown)}")
+
+        frame = _to_frame(data)
+        if frame.empty:
+            return frame
+        group_cols = [col for col in group_cols if col in frame.columns] or ['sensor_type']
+
+        # Orden temporal dentro de cada serie (las ventanas son causales)
+        keys = frame[list(dict.fromkeys([*group_cols, 'sensor_type', 'value']))].reset_index(drop=True)
+        order_cols = list(group_cols)
+        if 'timestamp' in frame.columns:
+            timestamps = frame['timestamp']
+            if not pd.api.types.is_datetime64_any_dtype(timestamps):
+                timestamps = pd.to_datetime(timestamps, errors='coerce', utc=True, format='ISO8601')
+            keys['_order_ts'] = timestamps.values
+            order_cols.append('_order_ts')
+        keys = keys.sort_values(order_cols, kind='mergesort')
+        order = keys.index.to_numpy()
+
+        # Cada familia escribe sus columnas en la posición original de sus lecturas
+        columns: Dict[str, np.ndarray] = {}
+        families = keys['sensor_type'].map({sensor: sensor_family(sensor) for sensor in keys['sensor_type'].unique()})
+        for family, positions in families.groupby(families, sort=False).indices.items():
+            config = replace(self.configs.get(family, self.configs['default']), **overrides)
+            scored = self._score_family(keys.iloc[positions], group_cols, config, detectors, valid_ranges or {})
+            for name, values in scored.items():
+                if name not in columns:
+                    columns[name] = np.empty(len(frame), dtype=values.dtype)
+                columns[name][order[positions]] = values
+
+        flag_cols = [f'{name}_anomaly' for name in DETECTORS]
+        columns['is_anomaly'] = np.logical_or.reduce([columns[col] for col in flag_cols])
+        columns['methods'] = self._methods(columns)
+        return pd.concat([frame.drop(columns=list(columns), errors='ignore'),
+                          pd.DataFrame(columns, index=frame.index)], axis=1)
+
+    def _score_family(self, sub: pd.DataFrame, group_cols: List[str], config: AnomalyWindowConfig,
+                      detectors: Sequence[str], valid_ranges: Dict[str, Tuple[float, float]]) -> Dict[str, np.ndarray]:
+        bounds = _series_bounds(sub, group_cols)
+        v = sub['value'].to_numpy(dtype=np.float64)
+        indexer = _SeriesWindowIndexer(bounds, config.window) if config.window else None
+
+        baseline, q1, q3 = self._rolling(v, bounds, indexer, config, ('median',), ('quantile', 0.25), ('quantile', 0.75))
+        deviation = np.abs(v - baseline)
+        mad, mean_ad = self._rolling(deviation, bounds, indexer, config, ('median',), ('mean',))
+        # Con más de la mitad de la ventana en la mediana la MAD es 0: se usa la desviación media
+        scale = np.where(mad > 0, mad / MAD_SCALE, mean_ad * MEAN_AD_SCALE)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            robust_z = np.nan_to_num(np.where(scale > 0, (v - baseline) / scale, 0.0), nan=0.0)
+        iqr_low = q1 - config.iqr_k * (q3 - q1)
+        iqr_high = q3 + config.iqr_k * (q3 - q1)
+
+        robust_flag = ('robust_z' in detectors) & (np.abs(robust_z) > config.z_threshold)
+        iqr_flag = ('iqr' in detectors) & ((v < iqr_low) | (v > iqr_high))
+
+        # Saltos: diferencia con la lectura anterior en escala robusta de las
+        # diferencias de la serie, alejándose de la línea base (no la recuperación)
+        same_series = np.ones(len(v), dtype=bool)
+        same_series[bounds[:-1]] = False
+        diff = np.where(same_series, v - np.r_[np.nan, v[:-1]], np.nan)
+        diff_dev = np.abs(diff - _whole_series(diff, bounds, 'median'))
+        diff_scale = _whole_series(diff_dev, bounds, 'median') / MAD_SCALE
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jump_z = np.where(diff_scale > 0, np.abs(diff) / diff_scale, 0.0)
+        moving_away = np.sign(diff) == np.sign(v - baseline)
+        jump_flag = (('jump' in detectors) & (jump_z > config.jump_k * config.z_threshold)
+                     & moving_away & (np.abs(robust_z) > 1.0))
+
+        ranges = {sensor: valid_ranges.get(sensor, config.valid_range or (-np.inf, np.inf))
+                  for sensor in sub['sensor_type'].unique()}
+        low = sub['sensor_type'].map({sensor: limits[0] for sensor, limits in ranges.items()}).to_numpy()
+        high = sub['sensor_type'].map({sensor: limits[1] for sensor, limits in ranges.items()}).to_numpy()
+        range_flag = ('range' in detectors) & ((v < low) | (v > high))
+
+        critical = range_flag | (np.abs(robust_z) > config.z_threshold * 1.5)
+        any_flag = robust_flag | iqr_flag | jump_flag | range_flag
+        return dict(
+            baseline=baseline, scale=scale, robust_z=robust_z, iqr_low=iqr_low, iqr_high=iqr_high,
+            robust_z_anomaly=robust_flag, iqr_anomaly=iqr_flag, jump_anomaly=jump_flag, range_anomaly=range_flag,
+            severity=np.where(any_flag, np.where(critical, 'critical', 'warning'), 'normal').astype(object),
+            z_threshold=np.full(len(v), config.z_threshold),
+        )
+
+    @staticmethod
+    def _rolling(values: np.ndarray, bounds: np.ndarray, indexer: Optional[BaseIndexer],
+                 config: AnomalyWindowConfig, *stats: Tuple) -> List[np.ndarray]:
+        """
+        Estadísticos móviles por serie sobre una misma ventana; antes de
+        ``min_periods`` se usa el de la serie completa.
+        """
+        results = []
+        window = None
+        if indexer is not None:
+            window = pd.Series(values).rolling(indexer, min_periods=min(config.min_periods, config.window))
+        for how, *args in stats:
+            whole = _whole_series(values, bounds, how, *args)
+            if window is None:
+                results.append(whole)
+                continue
+            rolling = getattr(window, how)(*args).to_numpy(dtype=np.float64)
+            results.append(np.where(np.isnan(rolling), whole, rolling))
+        return results
+
+    @staticmethod
+    def _methods(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        labels = {'robust_z_anomaly': 'Z-Score robusto', 'iqr_anomaly': 'IQR',
+                  'jump_anomaly': 'Cambio súbito', 'range_anomaly': 'Fuera de rango'}
+        methods = np.empty(len(columns['is_anomaly']), dtype=object)
+        methods[:] = [[] for _ in range(len(methods))]
+        for column, label in labels.items():
+            for position in np.flatnonzero(columns[column]):
+                methods[position].append(label)
+        return methods
+
+    def detect(self, data: Union[pd.DataFrame, Iterable[Dict[str, Any]]], **kwargs) -> pd.DataFrame:
+        """Solo las lecturas anómalas de ``score()``"""
+        scored = self.score(data, **kwargs)
+        return scored[scored['is_anomaly']] if not scored.empty else scored
+
+
+# Instancia global compartida por los módulos de análisis
+anomaly_engine = AnomalyEngine()
@@ -20,6 +20,9 @@ import json
 import statistics
 from enum import Enum
 
+from modules.intelligence.correlation_engine import correlation_engine
+from modules.utils.temporal_profiles import profile_store
+
 logger = logging.getLogger(__name__)
 
 class InsightType(Enum):
@@ -91,6 +94,7 @@ class AutomaticInsightsEngine:
     def __init__(self, jetson_api_url: str):
         self.jetson_api_url = jetson_api_url
         self.logger = logging.getLogger(__name__)
+        self.profile_store = profile_store
         
         # Cache de patrones aprendidos
         self.learned_patterns: Dict[str, PatternSignature] = {}
@@ -350,68 +354,52 @@ class AutomaticInsightsEngine:
         insights = []
         
         try:
-            # Crear matriz pivote para correlaciones
-            pivot_df = df.pivot_table(
-                values='value',
-                index='timestamp',
-                columns=['device_id', 'sensor_type'],
-                aggfunc='mean'
-            ).fillna(method='ffill').fillna(method='bfill')
-            
-            if pivot_df.shape[1] < 2:
+            # Correlaciones sobre la grilla común (compartidas con otros motores)
+            result = correlation_engine.analyze(df)
+            if result is None:
                 return insights
             
-            # Calcular correlaciones
-            correlation_matrix = pivot_df.corr()
-            
-            # Buscar correlaciones interesantes
-            for i in range(len(correlation_matrix.columns)):
-                for j in range(i+1, len(correlation_matrix.columns)):
-                    corr_value = correlation_matrix.iloc[i, j]
-                    
-                    if pd.isna(corr_value):
-                        continue
-                    
-                    sensor1 = correlation_matrix.columns[i]
-                    sensor2 = correlation_matrix.columns[j]
+            # Correlaciones fuertes (>0.8 o <-0.8)
+            strong = result.strong(0.8)
+            for sensor1, sensor2, corr_value, lag_seconds in zip(
+                strong['sensor1'], strong['sensor2'], strong['correlation'], strong['lag_seconds']
+            ):
+                insight_type = "positive" if corr_value > 0 else "negative"
+                
+                # Determinar si esta correlación es esperada o sorprendente
+                is_expected = self._is_expected_correlation(sensor1, sensor2, corr_value)
+                
+                if not is_expected:  # Solo reportar correlaciones inesperadas
+                    insight = AutomaticInsight(
+                        id=f"corr_{hash(str(sensor1) + str(sensor2))}",
+                        type=InsightType.CORRELATION_DISCOVERY,
+                        priority=Priority.MEDIUM,
+                        title=f"Correlación {insight_type} inesperada detectada",
+                        description=f"Correlación {insight_type} fuerte ({corr_value:.3f}) detectada entre "
+                                  f"{sensor1[1]} en {sensor1[0]} y {sensor2[1]} en {sensor2[0]}. "
+                                  f"Esta correlación no era esperada y merece investigación.",
+                        evidence={
+                            'correlation_coefficient': corr_value,
+                            'sensor1': sensor1,
+                            'sensor2': sensor2,
+                            'correlation_type': insight_type,
+                            'is_expected': is_expected,
+                            'lag_seconds': float(lag_seconds)
+                        },
+                        confidence=min(abs(corr_value), 0.95),
+                        affected_entities=[sensor1[0], sensor2[0]],
+                        generated_at=datetime.now(),
+                        recommended_actions=[
+                            "Investigar la causa física de esta correlación",
+                            "Verificar si existe interferencia entre sensores",
+                            "Evaluar si indica un problema sistémico común"
+                        ],
+                        time_sensitivity='days',
+                        estimated_impact='medium'
+                    )
                     
-                    # Correlaciones fuertes (>0.8 o <-0.8)
-                    if abs(corr_value) > 0.8:
-                        insight_type = "positive" if corr_value > 0 else "negative"
-                        
-                        # Determinar si esta correlación es esperada o sorprendente
-                        is_expected = self._is_expected_correlation(sensor1, sensor2, corr_value)
-                        
-                        if not is_expected:  # Solo reportar correlaciones inesperadas
-                            insight = AutomaticInsight(
-                                id=f"corr_{hash(str(sensor1) + str(sensor2))}",
-                                type=InsightType.CORRELATION_DISCOVERY,
-                                priority=Priority.MEDIUM,
-                                title=f"Correlación {insight_type} inesperada detectada",
-                                description=f"Correlación {insight_type} fuerte ({corr_value:.3f}) detectada entre "
-                                          f"{sensor1[1]} en {sensor1[0]} y {sensor2[1]} en {sensor2[0]}. "
-                                          f"Esta correlación no era esperada y merece investigación.",
-                                evidence={
-                                    'correlation_coefficient': corr_value,
-                                    'sensor1': sensor1,
-                                    'sensor2': sensor2,
-                                    'correlation_type': insight_type,
-                                    'is_expected': is_expected
-                                },
-                                confidence=min(abs(corr_value), 0.95),
-                                affected_entities=[sensor1[0], sensor2[0]],
-                                generated_at=datetime.now(),
-                                recommended_actions=[
-                                    "Investigar la causa física de esta correlación",
-                                    "Verificar si existe interferencia entre sensores",
-                                    "Evaluar si indica un problema sistémico común"
-                                ],
-                                time_sensitivity='days',
-                                estimated_impact='medium'
-                            )
-                            
-                            insights.append(insight)
-            
+                    insights.append(insight)
+    
         except Exception as e:
             self.logger.warning(f"⚠️ Error detecting correlations: {e}")
         
@@ -573,19 +561,20 @@ class AutomaticInsightsEngine:
         insights = []
         
         try:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['hour'] = df['timestamp'].dt.hour
-            df['day_of_week'] = df['timestamp'].dt.day_of_week
+            # Incorporar solo las lecturas nuevas a los perfiles hora x día
+            self.profile_store.update(df)
             
             # Analizar patrones temporales que sugieren factores ambientales
+            # Solo las series (dispositivo, sensor) presentes en los datos recibidos
+            present = self.profile_store.series_in(df)
             for sensor_type in df['sensor_type'].unique():
-                sensor_data = df[df['sensor_type'] == sensor_type]
+                profile = self.profile_store.profile(sensor_type=str(sensor_type), series=present)
                 
-                if len(sensor_data) < 24:  # Necesitamos al menos un día de datos
+                if profile.total < 24:  # Necesitamos al menos un día de datos
                     continue
                 
-                # Análisis por hora del día
-                hourly_pattern = sensor_data.groupby('hour')['value'].agg(['mean', 'std']).reset_index()
+                # Análisis por hora del día (desde el perfil precalculado)
+                hourly_pattern = profile.hourly().dropna(subset=['mean']).reset_index()
                 
                 # Detectar patrones ambientales
                 environmental_patterns = self._detect_environmental_patterns(hourly_pattern, sensor_type)
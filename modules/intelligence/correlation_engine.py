@@ -0,0 +1,225 @@
+"""
+Motor Compartido de Correlaciones
+=================================
+
+Alinea todas las series (device_id, sensor_type) en una grilla temporal
+común una sola vez y calcula:
+
+- La matriz de correlación completa, con extracción vectorizada del
+  triángulo superior (sin recorrer la matriz con bucles anidados)
+- La correlación cruzada con desfase vía FFT para todos los pares a la vez
+  (p. ej. la temperatura que sigue a la luminosidad con minutos de retraso)
+
+Los resultados se cachean por watermark de los datos, de modo que
+SmartAnalyzer, AutomaticInsightsEngine y AdvancedVisualizationEngine
+comparten el mismo cálculo dentro de una solicitud.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.utils.tracing import COUNTER_CACHE_HITS, COUNTER_CACHE_MISSES, tracer
+
+logger = logging.getLogger(__name__)
+
+# Resoluciones candidatas de la grilla común
+GRID_LADDER = [pd.Timedelta(seconds=10), pd.Timedelta(seconds=30), pd.Timedelta(minutes=1),
+               pd.Timedelta(minutes=5), pd.Timedelta(minutes=15), pd.Timedelta(minutes=30),
+               pd.Timedelta(hours=1), pd.Timedelta(hours=6), pd.Timedelta(days=1)]
+
+SeriesKey = Tuple[str, str]
+
+
+@dataclass
+class CorrelationResult:
+    """Resultado de correlaciones sobre la grilla común"""
+    freq: pd.Timedelta
+    grid: pd.DataFrame                 # Series alineadas (columnas: device_id, sensor_type)
+    matrix: pd.DataFrame               # Matriz de correlación de Pearson
+    pairs: pd.DataFrame                # Triángulo superior: sensor1, sensor2, correlation, overlap, lag...
+    watermark: Tuple = field(default_factory=tuple)
+
+    @property
+    def series(self) -> List[SeriesKey]:
+        return list(self.matrix.columns)
+
+    def strong(self, threshold: float) -> pd.DataFrame:
+        """Pares con |correlación| > ``threshold``, de mayor a menor"""
+        pairs = self.pairs[self.pairs['correlation'].abs() > threshold]
+        return pairs.reindex(pairs['correlation'].abs().sort_values(ascending=False).index)
+
+    def strongest(self, sign: int = 1) -> Optional[pd.Series]:
+        """Par con la correlación más positiva (``sign=1``) o más negativa (``sign=-1``)"""
+        valid = self.pairs.dropna(subset=['correlation'])
+        if valid.empty:
+            return None
+        index = valid['correlation'].idxmax() if sign > 0 else valid['correlation'].idxmin()
+        return valid.loc[index]
+
+
+class CorrelationEngine:
+    """
+    Correlaciones alineadas en el tiempo y con desfase, cacheadas por watermark.
+
+    Args:
+        max_grid_points: Puntos máximos de la grilla común (define la resolución)
+        max_gap_buckets: Huecos que se interpolan dentro de cada serie
+        min_overlap: Puntos comunes mínimos para correlacionar un par
+        max_lag_fraction: Desfase máximo explorado, como fracción de la grilla
+        cache_size: Resultados retenidos en caché
+    """
+
+    def __init__(self, max_grid_points: int = 2000, max_gap_buckets: int = 3, min_overlap: int = 10,
+                 max_lag_fraction: float = 0.25, cache_size: int = 16):
+        self.max_grid_points = max_grid_points
+        self.max_gap_buckets = max_gap_buckets
+        self.min_overlap = min_overlap
+        self.max_lag_fraction = max_lag_fraction
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple, CorrelationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @staticmethod
+    def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+        timestamps = df['timestamp']
+        if not isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+            timestamps = pd.to_datetime(timestamps, errors='coerce', utc=True, format='ISO8601')
+        frame = pd.DataFrame({
+            'device_id': df['device_id'].astype(str),
+            'sensor_type': df['sensor_type'].astype(str),
+            'value': pd.to_numeric(df['value'], errors='coerce'),
+            'timestamp': timestamps.dt.tz_convert('UTC'),
+        })
+        return frame.dropna(subset=['value', 'timestamp'])
+
+    def choose_freq(self, frame: pd.DataFrame) -> pd.Timedelta:
+        """Resolución de grilla: la menor del escalón que respete el muestreo típico y ``max_grid_points``"""
+        span = frame['timestamp'].max() - frame['timestamp'].min()
+        series_span = frame.groupby(['device_id', 'sensor_type'])['timestamp'].agg(['min', 'max', 'size'])
+        per_reading = ((series_span['max'] - series_span['min']) / series_span['size'].clip(lower=2)).median()
+        target = max(span / self.max_grid_points, per_reading if pd.notna(per_reading) else pd.Timedelta(0))
+        for step in GRID_LADDER:
+            if step >= target:
+                return step
+        return GRID_LADDER[-1]
+
+    def align(self, frame: pd.DataFrame, freq: pd.Timedelta) -> pd.DataFrame:
+        """Remuestrear todas las series a la grilla común en una sola agregación"""
+        bucket = frame['timestamp'].dt.floor(freq)
+        grid = frame.groupby([bucket, frame['device_id'], frame['sensor_type']])['value'].mean().unstack(
+            ['device_id', 'sensor_type'])
+        full_index = pd.date_range(grid.index.min(), grid.index.max(), freq=freq)
+        grid = grid.reindex(full_index)
+        # Rellenar solo huecos cortos dentro de cada serie (sin extrapolar en los bordes)
+        return grid.interpolate(method='linear', limit=self.max_gap_buckets, limit_area='inside')
+
+    def _watermark(self, frame: pd.DataFrame, freq: Optional[pd.Timedelta]) -> Tuple:
+        """
+        Hash del contenido por lectura (serie, timestamp y valor juntos),
+        sumado para no depender del orden de las filas: intercambiar datos
+        entre series cambia la clave.
+        """
+        hashed = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+        return len(frame), int(hashed.sum(dtype=np.uint64)), str(freq)
+
+    def analyze(self, df: pd.DataFrame, freq: Optional[pd.Timedelta] = None,
+                lags: bool = True) -> Optional[CorrelationResult]:
+        """
+        Matriz de correlación y correlación con desfase de todas las series.
+
+        Returns:
+            ``CorrelationResult`` o None si hay menos de dos series
+        """
+        if df is None or df.empty:
+            return None
+        frame = self._prepare(df)
+        if frame.empty:
+            return None
+
+        watermark = self._watermark(frame, freq) + (lags,)
+        with self._lock:
+            cached = self._cache.get(watermark)
+            if cached is not None:
+                self._cache.move_to_end(watermark)
+                self.cache_hits += 1
+                tracer.increment(COUNTER_CACHE_HITS)
+                return cached
+        self.cache_misses += 1
+        tracer.increment(COUNTER_CACHE_MISSES)
+
+        freq = freq or self.choose_freq(frame)
+        grid = self.align(frame, freq)
+        if grid.shape[1] < 2:
+            return None
+
+        matrix = grid.corr(min_periods=self.min_overlap)
+        pairs = self._upper_triangle(grid, matrix)
+        if lags and len(pairs):
+            pairs = pairs.join(self._lagged(grid, pairs, freq))
+
+        result = CorrelationResult(freq=freq, grid=grid, matrix=matrix, pairs=pairs, watermark=watermark)
+        with self._lock:
+            self._cache[watermark] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        logger.info(f"🔗 Correlaciones: {grid.shape[1]} series en grilla de {freq} ({len(grid)} puntos)")
+        return result
+
+    def _upper_triangle(self, grid: pd.DataFrame, matrix: pd.DataFrame) -> pd.DataFrame:
+        """Pares (i < j) extraídos de la matriz en forma vectorizada"""
+        columns = list(matrix.columns)
+        rows, cols = np.triu_indices(len(columns), k=1)
+        present = grid.notna().to_numpy(dtype=np.float64)
+        overlap = (present.T @ present)[rows, cols]
+        return pd.DataFrame({
+            'sensor1': [columns[i] for i in rows],
+            'sensor2': [columns[j] for j in cols],
+            'correlation': matrix.to_numpy()[rows, cols],
+            'overlap': overlap.astype(int),
+        })
+
+    def _lagged(self, grid: pd.DataFrame, pairs: pd.DataFrame, freq: pd.Timedelta) -> pd.DataFrame:
+        """
+        Correlación cruzada vía FFT para todos los pares.
+
+        ``lag_seconds > 0`` indica que ``sensor1`` va detrás de ``sensor2``.
+        """
+        values = grid.to_numpy(dtype=np.float64)
+        n = len(values)
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        std[~(std > 0)] = np.nan
+        z = np.nan_to_num((values - mean) / std)  # Huecos = media de la serie
+
+        size = 1 << int(np.ceil(np.log2(2 * n)))
+        spectrum = np.fft.rfft(z, n=size, axis=0)
+        columns = {key: i for i, key in enumerate(grid.columns)}
+        left = pairs['sensor1'].map(columns).to_numpy()
+        right = pairs['sensor2'].map(columns).to_numpy()
+        cross = np.fft.irfft(spectrum[:, left] * np.conj(spectrum[:, right]), n=size, axis=0) / n
+
+        max_lag = max(1, int(n * self.max_lag_fraction))
+        lags = np.r_[np.arange(0, max_lag + 1), np.arange(-max_lag, 0)]
+        window = cross[lags]
+        best = np.nanargmax(np.abs(window), axis=0)
+        best_lags = lags[best]
+        return pd.DataFrame({
+            'lag_correlation': window[best, np.arange(window.shape[1])],
+            'lag_seconds': best_lags * freq.total_seconds(),
+        }, index=pairs.index)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Instancia global compartida por los módulos de análisis
+correlation_engine = CorrelationEngine()
@@ -0,0 +1,279 @@
+"""
+Motor Compartido de Descomposición Estacional
+=============================================
+
+Descompone cada serie (device_id, sensor_type) en tendencia, componente
+estacional y residuo a una resolución fija, y mantiene el resultado en
+caché con el watermark de los datos:
+
+- Tendencia: media móvil centrada de ``trend_span``
+- Estacional: media de la serie sin tendencia por fase del período
+  (hora del día con la configuración por defecto), centrada en cero
+- Residuo: observado - tendencia - estacional
+
+Con lecturas nuevas solo se agregan los intervalos nuevos, se recalcula la
+cola de la tendencia y se suman a los acumuladores estacionales las fases
+cuya tendencia quedó definitiva. Si llega historia anterior a la caché (una
+ventana larga después de una corta) la serie se reconstruye desde esa ventana. Las predicciones de PredictiveAnalysisEngine,
+la descomposición visual de AdvancedVisualizationEngine y el puntaje de
+anomalía sobre residuos comparten así los mismos componentes.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from modules.utils.timestamps import wall_clock
+
+logger = logging.getLogger(__name__)
+
+DecompositionKey = Tuple[str, str, pd.Timedelta]   # (device_id, sensor_type, resolución)
+
+
+class SeriesDecomposition:
+    """
+    Componentes de una serie a una resolución, extendibles de forma incremental.
+
+    Args:
+        resolution: Ancho de cada intervalo de la serie regular
+        period: Duración del ciclo estacional
+        trend_span: Ancho de la media móvil de tendencia
+        max_buckets: Intervalos retenidos (los acumuladores estacionales
+            conservan la historia descartada)
+    """
+
+    def __init__(self, resolution: pd.Timedelta, period: pd.Timedelta, trend_span: pd.Timedelta,
+                 max_buckets: int):
+        self.resolution = resolution
+        self.period_buckets = max(int(period / resolution), 1)
+        self.trend_window = max(int(trend_span / resolution), 2)
+        self.max_buckets = max(max_buckets, 2 * self.trend_window + self.period_buckets)
+        self._reset()
+
+    def _reset(self):
+        self.sums = pd.Series(dtype=np.float64)
+        self.counts = pd.Series(dtype=np.float64)
+        self.trend = pd.Series(dtype=np.float64)
+        self.watermark: Optional[pd.Timestamp] = None
+        self._phase_sum = np.zeros(self.period_buckets)
+        self._phase_count = np.zeros(self.period_buckets)
+        self._seasonal_upto: Optional[pd.Timestamp] = None
+
+    def __len__(self) -> int:
+        return len(self.sums)
+
+    # ------------------------------------------------------------------
+    # Actualización incremental
+    # ------------------------------------------------------------------
+
+    def extend(self, timestamps: pd.Series, values: pd.Series) -> int:
+        """
+        Incorporar lecturas posteriores al watermark (timestamps en hora local, sin offset).
+
+        Si las lecturas empiezan antes del primer intervalo en caché y llegan
+        hasta el watermark, cubren toda la caché: la serie se reconstruye
+        desde ellas en lugar de descartar la historia nueva.
+        """
+        if timestamps.empty:
+            return 0
+        if self.watermark is not None:
+            if (timestamps.min().floor(self.resolution) < self.sums.index[0]
+                    and timestamps.max() >= self.watermark):
+                self._reset()
+            else:
+                newer = timestamps > self.watermark
+                timestamps, values = timestamps[newer], values[newer]
+                if timestamps.empty:
+                    return 0
+
+        previous = len(self.sums)
+        per_bucket = values.groupby(timestamps.dt.floor(self.resolution)).agg(['sum', 'count'])
+        sums = self.sums.add(per_bucket['sum'], fill_value=0)
+        counts = self.counts.add(per_bucket['count'], fill_value=0)
+        grid = pd.date_range(sums.index.min(), sums.index.max(), freq=self.resolution)
+        self.sums = sums.reindex(grid, fill_value=0.0)
+        self.counts = counts.reindex(grid, fill_value=0.0)
+        self.watermark = timestamps.max()
+
+        self._extend_trend(previous)
+        self._fold_seasonal()
+        self._trim()
+        return len(timestamps)
+
+    def _extend_trend(self, previous: int):
+        """Recalcular solo la cola de la tendencia afectada por los intervalos nuevos"""
+        observed = self.observed
+        window = self.trend_window
+        start = max(previous - 2 * window, 0)
+        rolled = observed.iloc[start:].rolling(window=window, center=True).mean()
+        if start == 0:
+            self.trend = rolled
+            return
+        trend = self.trend.reindex(observed.index)
+        # Desde ``window`` posiciones dentro del tramo la ventana queda completa
+        trend.iloc[start + window:] = rolled.iloc[window:].to_numpy()
+        self.trend = trend
+
+    def _fold_seasonal(self):
+        """Sumar a los acumuladores las fases con tendencia definitiva"""
+        # La última ventana incluye el intervalo en curso, que aún puede recibir lecturas
+        stable_end = len(self.trend) - (self.trend_window - self.trend_window // 2)
+        if stable_end <= 0:
+            return
+        trend = self.trend.iloc[:stable_end]
+        detrended = self.observed.iloc[:stable_end] - trend
+        mask = trend.notna().to_numpy()
+        if self._seasonal_upto is not None:
+            mask &= trend.index > self._seasonal_upto
+        if not mask.any():
+            return
+        np.add.at(self._phase_sum, self._phases(trend.index[mask]), detrended.to_numpy()[mask])
+        np.add.at(self._phase_count, self._phases(trend.index[mask]), 1)
+        self._seasonal_upto = trend.index[mask][-1]
+
+    def _trim(self):
+        excess = len(self.sums) - self.max_buckets
+        if excess > 0:
+            self.sums = self.sums.iloc[excess:]
+            self.counts = self.counts.iloc[excess:]
+            self.trend = self.trend.iloc[excess:]
+
+    def _phases(self, index: pd.DatetimeIndex) -> np.ndarray:
+        return (index.asi8 // self.resolution.value) % self.period_buckets
+
+    # ------------------------------------------------------------------
+    # Componentes
+    # ------------------------------------------------------------------
+
+    @property
+    def observed(self) -> pd.Series:
+        """Media por intervalo; los intervalos sin lecturas repiten el último valor"""
+        return (self.sums / self.counts.where(self.counts > 0)).ffill()
+
+    @property
+    def seasonal_profile(self) -> np.ndarray:
+        """Valor estacional por fase, centrado en cero (0 en fases sin datos)"""
+        seen = self._phase_count > 0
+        if not seen.any():
+            return np.zeros(self.period_buckets)
+        means = np.where(seen, self._phase_sum / np.where(seen, self._phase_count, 1), 0.0)
+        return np.where(seen, means - means[seen].mean(), 0.0)
+
+    @property
+    def seasonal(self) -> pd.Series:
+        return pd.Series(self.seasonal_profile[self._phases(self.sums.index)], index=self.sums.index)
+
+    @property
+    def residual(self) -> pd.Series:
+        return self.observed - self.trend - self.seasonal
+
+    @property
+    def last_trend(self) -> float:
+        trend = self.trend.dropna()
+        return float(trend.iloc[-1]) if not trend.empty else float(self.observed.mean())
+
+    def seasonal_at(self, timestamp: Any) -> float:
+        """Componente estacional en la fase de ``timestamp`` (hora local del dispositivo)"""
+        index = pd.DatetimeIndex([pd.Timestamp(timestamp).tz_localize(None)]).floor(self.resolution)
+        return float(self.seasonal_profile[self._phases(index)[0]])
+
+    def expected_at(self, timestamp: Any) -> float:
+        """Valor esperado por tendencia + estacionalidad"""
+        return self.last_trend + self.seasonal_at(timestamp)
+
+    def residual_zscore(self, value: float, timestamp: Any) -> float:
+        """Desvío de ``value`` respecto del valor esperado, en desviaciones del residuo"""
+        residual_std = self.residual.std()
+        if not residual_std or np.isnan(residual_std):
+            return 0.0
+        return abs(value - self.expected_at(timestamp)) / residual_std
+
+    def strengths(self) -> Dict[str, float]:
+        """Desviación de cada componente relativa a la de la serie"""
+        observed_std = self.observed.std()
+        if not observed_std or np.isnan(observed_std):
+            return {'trend_strength': 0.0, 'seasonal_strength': 0.0, 'residual_strength': 0.0}
+        return {
+            'trend_strength': float(self.trend.std() / observed_std),
+            'seasonal_strength': float(self.seasonal.std() / observed_std),
+            'residual_strength': float(self.residual.std() / observed_std),
+        }
+
+
+class DecompositionEngine:
+    """
+    Caché de ``SeriesDecomposition`` por (device_id, sensor_type, resolución).
+
+    Args:
+        period: Duración del ciclo estacional (diario por defecto)
+        trend_span: Ancho de la media móvil de tendencia
+        min_periods: Ciclos completos necesarios para entregar la descomposición
+        max_buckets: Intervalos retenidos por serie
+    """
+
+    def __init__(self, period: timedelta = timedelta(days=1), trend_span: timedelta = timedelta(hours=12),
+                 min_periods: float = 1.0, max_buckets: int = 24 * 60):
+        self.period = pd.Timedelta(period)
+        self.trend_span = pd.Timedelta(trend_span)
+        self.min_periods = min_periods
+        self.max_buckets = max_buckets
+        self._series: Dict[DecompositionKey, SeriesDecomposition] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def decompose(self, readings: Union[pd.DataFrame, Iterable[Dict[str, Any]]], device_id: str,
+                  sensor_type: str, resolution: timedelta = timedelta(hours=1)) -> Optional[SeriesDecomposition]:
+        """
+        Incorporar las lecturas nuevas de la serie y devolver sus componentes.
+
+        Volver a pasar una ventana solapada solo procesa las lecturas
+        posteriores al watermark; sin lecturas nuevas se devuelve la caché.
+        Una ventana que empieza antes de la caché y la cubre la reconstruye.
+
+        Returns:
+            La descomposición, o None si aún no cubre ``min_periods`` ciclos
+        """
+        df = readings if isinstance(readings, pd.DataFrame) else pd.DataFrame(list(readings))
+        resolution = pd.Timedelta(resolution)
+        key = (str(device_id), str(sensor_type), resolution)
+
+        with self._lock:
+            decomposition = self._series.get(key)
+            if decomposition is None:
+                decomposition = self._series[key] = SeriesDecomposition(
+                    resolution, self.period, self.trend_span, self.max_buckets)
+
+            if not df.empty and {'value', 'timestamp'}.issubset(df.columns):
+                if 'device_id' in df.columns and 'sensor_type' in df.columns:
+                    df = df[(df['device_id'].astype(str) == key[0]) & (df['sensor_type'].astype(str) == key[1])]
+                frame = pd.DataFrame({
+                    'value': pd.to_numeric(df['value'], errors='coerce'),
+                    'timestamp': wall_clock(df['timestamp']),
+                }).dropna()
+                decomposition.extend(frame['timestamp'], frame['value'])
+
+        if len(decomposition) < self.min_periods * decomposition.period_buckets:
+            return None
+        return decomposition
+
+    def get(self, device_id: str, sensor_type: str,
+            resolution: timedelta = timedelta(hours=1)) -> Optional[SeriesDecomposition]:
+        """Descomposición en caché de la serie (sin incorporar lecturas)"""
+        decomposition = self._series.get((str(device_id), str(sensor_type), pd.Timedelta(resolution)))
+        if decomposition is None or len(decomposition) < self.min_periods * decomposition.period_buckets:
+            return None
+        return decomposition
+
+
+# Instancia global compartida por los módulos de análisis
+decomposition_engine = DecompositionEngine()
@@ -19,14 +19,21 @@ from collections import defaultdict, deque
 from enum import Enum, IntEnum
 import json
 import hashlib
+import os
 import statistics
+from pathlib import Path
 from scipy import stats
 import warnings
 
+from modules.intelligence.alert_rule_index import AlertRuleIndex, RulesFileWatcher
+from modules.intelligence.alert_state_store import ACTIVE_STATUSES, AlertRecord, AlertStateStore, to_epoch
+
 warnings.filterwarnings('ignore')
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ALERT_STATE_DB = Path(__file__).resolve().parents[2] / "data" / "alert_state.db"
+
 class AlertSeverity(IntEnum):
     """Niveles de severidad de alertas (ordenados por prioridad)"""
     INFO = 1
@@ -78,6 +85,36 @@ class AlertRule:
     auto_resolve: bool = True
     suppress_similar: bool = True
 
+
+def alert_rule_from_config(entry: Dict[str, Any]) -> AlertRule:
+    """
+    Construir una ``AlertRule`` desde una entrada del archivo de reglas
+    (duraciones en segundos; categoría por valor y severidad por nombre).
+
+    Raises:
+        ValueError: Si falta un campo obligatorio o un valor no es válido
+    """
+    try:
+        severity = entry['severity']
+        return AlertRule(
+            rule_id=str(entry['rule_id']),
+            name=entry.get('name', entry['rule_id']),
+            category=AlertCategory(str(entry['category']).lower()),
+            severity=AlertSeverity(severity) if isinstance(severity, int) else AlertSeverity[str(severity).upper()],
+            condition=entry['condition'],
+            threshold_values={key: float(value) for key, value in entry.get('threshold_values', {}).items()},
+            sensor_types=list(entry.get('sensor_types', [])),
+            devices=list(entry.get('devices', [])),
+            time_window=timedelta(seconds=float(entry.get('time_window', 300))),
+            cooldown_period=timedelta(seconds=float(entry.get('cooldown_period', 1800))),
+            escalation_time=timedelta(seconds=float(entry.get('escalation_time', 900))),
+            enabled=bool(entry.get('enabled', True)),
+            auto_resolve=bool(entry.get('auto_resolve', True)),
+            suppress_similar=bool(entry.get('suppress_similar', True)),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Regla inválida {entry.get('rule_id', '?') if isinstance(entry, dict) else entry}: {e}") from e
+
 @dataclass
 class ContextualInfo:
     """Información contextual para alertas"""
@@ -170,18 +207,36 @@ class IntelligentAlertSystem:
     - Integración con sistema de mantenimiento
     """
     
-    def __init__(self, jetson_api_url: str):
+    def __init__(self, jetson_api_url: str, rules_file: Optional[str] = None,
+                 state_db: Optional[str] = None):
+        """
+        Args:
+            jetson_api_url: URL de la API Jetson
+            rules_file: Archivo JSON de reglas adicionales (por defecto ``ALERT_RULES_FILE``);
+                se recarga en caliente cuando cambia
+            state_db: Archivo SQLite del estado de alertas (por defecto ``ALERT_STATE_DB``;
+                sin configurar, ``data/alert_state.db`` del proyecto, así el ciclo de vida
+                sobrevive a reinicios)
+        """
         self.jetson_api_url = jetson_api_url
         self.logger = logging.getLogger(__name__)
         
         # Almacenamiento de alertas
-        self.active_alerts: Dict[str, SmartAlert] = {}
         self.alert_history: deque = deque(maxlen=10000)
         self.suppressed_alerts: Set[str] = set()
+        self.alert_store = AlertStateStore(self._state_db_path(state_db))
+        self._batch_suppressed: Set[str] = set()
         
         # Reglas de alerta predefinidas
         self.alert_rules: Dict[str, AlertRule] = {}
         self._initialize_default_rules()
+        self._default_rules = dict(self.alert_rules)
+        
+        # Índice (dispositivo, sensor) -> reglas y archivo de reglas recargable
+        self.rule_index = AlertRuleIndex(self.alert_rules)
+        rules_file = rules_file or os.getenv('ALERT_RULES_FILE')
+        self._rules_watcher = RulesFileWatcher(rules_file) if rules_file else None
+        self.reload_rules()
         
         # Sistema de aprendizaje
         self.pattern_memory: Dict[str, Dict] = defaultdict(dict)
@@ -213,7 +268,16 @@ class IntelligentAlertSystem:
             'avg_resolution_time': timedelta(0),
             'escalation_rate': 0.0
         }
-    
+
+    @staticmethod
+    def _state_db_path(state_db: Optional[str]) -> str:
+        """Ruta del estado de alertas: argumento, ``ALERT_STATE_DB`` o el archivo del proyecto"""
+        configured = state_db or os.getenv('ALERT_STATE_DB')
+        if configured:
+            return configured
+        DEFAULT_ALERT_STATE_DB.parent.mkdir(parents=True, exist_ok=True)
+        return str(DEFAULT_ALERT_STATE_DB)
+
     def _initialize_default_rules(self):
         """Inicializa reglas de alerta por defecto"""
         
@@ -292,6 +356,39 @@ class IntelligentAlertSystem:
             escalation_time=timedelta(days=3)
         )
     
+    def reload_rules(self, force: bool = False) -> bool:
+        """
+        Recargar las reglas del archivo si cambió: reglas por defecto más
+        las del archivo (que reemplazan a las de igual ``rule_id``). Si el
+        archivo es inválido se conservan las reglas vigentes.
+        
+        Returns:
+            True si se recargaron las reglas
+        """
+        if self._rules_watcher is None or not (force or self._rules_watcher.changed()):
+            return False
+        
+        try:
+            entries = self._rules_watcher.load()
+        except ValueError as e:
+            self.logger.warning(f"⚠️ {e} - se conservan las reglas actuales")
+            return False
+        
+        rules = dict(self._default_rules)
+        for entry in entries:
+            try:
+                rule = alert_rule_from_config(entry)
+            except ValueError as e:
+                self.logger.warning(f"⚠️ {e}")
+                continue
+            rules[rule.rule_id] = rule
+        
+        self.alert_rules = rules
+        self.rule_index.rebuild(rules)
+        self.logger.info(f"🔄 Reglas de alerta recargadas: {len(entries)} del archivo, "
+                         f"{self.rule_index.rule_count} habilitadas")
+        return True
+    
     async def process_real_time_data(self, 
                                    raw_data: List[Dict],
                                    additional_context: Optional[Dict] = None) -> Dict[str, Any]:
@@ -318,6 +415,10 @@ class IntelligentAlertSystem:
             df = pd.DataFrame(raw_data)
             df['timestamp'] = pd.to_datetime(df['timestamp'])
             
+            # Retención acotada del estado de alertas
+            self.alert_store.prune()
+            self._batch_suppressed = set()
+            
             # Estructura de resultados
             results = {
                 'timestamp': datetime.now().isoformat(),
@@ -346,11 +447,11 @@ class IntelligentAlertSystem:
             
             # 2. ANÁLISIS CONTEXTUAL DE ALERTAS EXISTENTES
             updated_alerts = await self._analyze_existing_alerts(df)
-            results['updated_alerts'] = [self._alert_to_dict(alert) for alert in updated_alerts]
+            results['updated_alerts'] = [record.to_dict() for record in updated_alerts]
             
             # 3. AUTO-RESOLUCIÓN DE ALERTAS
             resolved_alerts = await self._auto_resolve_alerts(df)
-            results['resolved_alerts'] = [self._alert_to_dict(alert) for alert in resolved_alerts]
+            results['resolved_alerts'] = [record.to_dict() for record in resolved_alerts]
             
             # 4. SUPRESIÓN DE ALERTAS SIMILARES
             suppressed_alerts = await self._suppress_similar_alerts()
@@ -390,16 +491,19 @@ class IntelligentAlertSystem:
             return self._create_empty_alert_result(f"Error: {str(e)}")
     
     async def _evaluate_alert_rules(self, df: pd.DataFrame) -> List[SmartAlert]:
-        """Evalúa todas las reglas de alerta contra los datos actuales"""
+        """Evalúa las reglas de alerta contra los datos actuales (cada serie solo contra sus reglas)"""
         new_alerts = []
         
         try:
-            for rule_id, rule in self.alert_rules.items():
-                if not rule.enabled:
-                    continue
+            self.reload_rules()
+            self.rule_index.ensure_current(self.alert_rules)
+            
+            for rule_id, positions in self.rule_index.partition(df).items():
+                rule = self.alert_rules[rule_id]
                 
-                # Filtrar datos relevantes para esta regla
-                rule_data = self._filter_data_for_rule(df, rule)
+                # Filas de las series de esta regla, dentro de su ventana de tiempo
+                rule_rows = df if len(positions) == len(df) else df.iloc[positions]
+                rule_data = self._apply_time_window(rule_rows, rule)
                 
                 if rule_data.empty:
                     continue
@@ -410,9 +514,8 @@ class IntelligentAlertSystem:
                 # Generar alertas para cada trigger
                 for trigger_info in triggered_items:
                     alert = await self._create_smart_alert(rule, trigger_info, rule_data)
-                    if alert and self._should_generate_alert(alert):
+                    if alert and self._should_generate_alert(alert) and self._register_alert(alert):
                         new_alerts.append(alert)
-                        self.active_alerts[alert.alert_id] = alert
             
         except Exception as e:
             self.logger.warning(f"⚠️ Error evaluando reglas de alerta: {e}")
@@ -431,12 +534,14 @@ class IntelligentAlertSystem:
         if rule.devices:
             filtered_df = filtered_df[filtered_df['device_id'].isin(rule.devices)]
         
-        # Filtrar por ventana de tiempo
-        if not filtered_df.empty:
-            cutoff_time = datetime.now() - rule.time_window
-            filtered_df = filtered_df[filtered_df['timestamp'] >= cutoff_time]
-        
-        return filtered_df
+        return self._apply_time_window(filtered_df, rule)
+    
+    def _apply_time_window(self, df: pd.DataFrame, rule: AlertRule) -> pd.DataFrame:
+        """Conserva solo las filas dentro de la ventana de tiempo de la regla"""
+        if df.empty:
+            return df
+        cutoff_time = datetime.now() - rule.time_window
+        return df[df['timestamp'] >= cutoff_time]
     
     async def _evaluate_rule_condition(self, df: pd.DataFrame, rule: AlertRule) -> List[Dict]:
         """Evalúa la condición específica de una regla"""
@@ -894,21 +999,63 @@ class IntelligentAlertSystem:
     
     # [CONTINÚA CON MÁS MÉTODOS...]
     
-    async def _analyze_existing_alerts(self, df: pd.DataFrame) -> List[SmartAlert]:
-        """Analiza alertas existentes y las actualiza"""
+    def _register_alert(self, alert: SmartAlert) -> bool:
+        """Persiste la alerta en el almacén de estado (False si ya estaba registrada)"""
+        record = AlertRecord(
+            alert_id=alert.alert_id,
+            rule_id=alert.rule_id,
+            device_id=str(alert.device_id),
+            sensor_type=str(alert.sensor_type),
+            severity=int(alert.severity),
+            category=alert.category.value,
+            status=alert.status.value,
+            current_value=float(alert.current_value),
+            triggered_at=to_epoch(alert.triggered_at),
+            last_updated=datetime.now().timestamp(),
+            payload=self._alert_to_dict(alert),
+        )
+        return self.alert_store.add(record)
+    
+    def _latest_readings(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Última lectura de cada serie del lote"""
+        latest = df.loc[df.groupby(['device_id', 'sensor_type'], sort=False)['timestamp'].idxmax()]
+        return latest[['device_id', 'sensor_type', 'value', 'timestamp']]
+    
+    async def _analyze_existing_alerts(self, df: pd.DataFrame) -> List[AlertRecord]:
+        """Actualiza el último valor de las alertas activas de las series presentes en el lote"""
         updated_alerts = []
-        # Implementación simplificada
+        
+        for device_id, sensor_type, value, timestamp in self._latest_readings(df).itertuples(index=False):
+            reading_at = to_epoch(timestamp)
+            for record in self.alert_store.query(device_id=str(device_id), sensor_type=str(sensor_type)):
+                if reading_at > record.triggered_at and record.current_value != value:
+                    updated_alerts.append(self.alert_store.update(record.alert_id, current_value=value))
+        
         return updated_alerts
     
-    async def _auto_resolve_alerts(self, df: pd.DataFrame) -> List[SmartAlert]:
-        """Auto-resuelve alertas que ya no aplican"""
+    async def _auto_resolve_alerts(self, df: pd.DataFrame) -> List[AlertRecord]:
+        """Auto-resuelve alertas de umbral cuya serie volvió al rango normal"""
         resolved_alerts = []
-        # Implementación simplificada
+        
+        for device_id, sensor_type, value, timestamp in self._latest_readings(df).itertuples(index=False):
+            reading_at = to_epoch(timestamp)
+            for record in self.alert_store.query(device_id=str(device_id), sensor_type=str(sensor_type)):
+                rule = self.alert_rules.get(record.rule_id)
+                if not rule or not rule.auto_resolve or reading_at <= record.triggered_at:
+                    continue
+                if rule.condition != 'value > threshold_high OR value < threshold_low':
+                    continue
+                high = rule.threshold_values.get('threshold_high', float('inf'))
+                low = rule.threshold_values.get('threshold_low', float('-inf'))
+                if low <= value <= high:
+                    resolved_alerts.append(self.alert_store.update(
+                        record.alert_id, status=AlertStatus.RESOLVED.value, current_value=value))
+        
         return resolved_alerts
     
     async def _suppress_similar_alerts(self) -> Set[str]:
-        """Suprime alertas similares"""
-        return set()
+        """Alertas suprimidas en este lote por existir una similar dentro del cooldown"""
+        return set(self._batch_suppressed)
     
     async def _process_escalations(self) -> List[Dict]:
         """Procesa escalamientos automáticos"""
@@ -916,16 +1063,19 @@ class IntelligentAlertSystem:
     
     def _generate_alert_summary(self) -> AlertSummary:
         """Genera resumen de alertas"""
+        by_device = self.alert_store.count_by('device_id')
         return AlertSummary(
-            total_alerts=len(self.active_alerts),
-            active_alerts=len(self.active_alerts),
-            by_severity={},
-            by_category={},
-            by_device={},
-            escalated_alerts=0,
+            total_alerts=self.alert_store.count(),
+            active_alerts=self.alert_store.count(ACTIVE_STATUSES),
+            by_severity={AlertSeverity(severity): count
+                         for severity, count in self.alert_store.count_by('severity').items()},
+            by_category={AlertCategory(category): count
+                         for category, count in self.alert_store.count_by('category').items()},
+            by_device=by_device,
+            escalated_alerts=self.alert_store.count([AlertStatus.ESCALATED.value]),
             false_positive_rate=0.1,
             avg_response_time=timedelta(minutes=15),
-            top_alert_sources=[],
+            top_alert_sources=sorted(by_device.items(), key=lambda item: item[1], reverse=True)[:5],
             trending_issues=[]
         )
     
@@ -1006,11 +1156,14 @@ class IntelligentAlertSystem:
     
     def _should_generate_alert(self, alert: SmartAlert) -> bool:
         """Determina si se debe generar la alerta"""
-        # Verificar cooldown period
+        # Verificar cooldown period: suprimir si ya hay una alerta de la misma regla y serie
         rule = self.alert_rules.get(alert.rule_id)
-        if rule and rule.cooldown_period:
-            # Simplificado: siempre generar por ahora
-            pass
+        if rule and rule.suppress_similar and rule.cooldown_period:
+            similar = self.alert_store.find_similar(alert.rule_id, str(alert.device_id), str(alert.sensor_type),
+                                                    alert.triggered_at, rule.cooldown_period)
+            if any(record.alert_id != alert.alert_id for record in similar):
+                self._batch_suppressed.add(alert.alert_id)
+                return False
         
         # Verificar si es muy probable falso positivo
         if alert.false_positive_probability > 0.8:
@@ -1083,6 +1236,8 @@ class IntelligentAlertSystem:
         return {
             'total_alerts': summary.total_alerts,
             'active_alerts': summary.active_alerts,
+            'by_severity': {severity.name: count for severity, count in summary.by_severity.items()},
+            'by_device': summary.by_device,
             'false_positive_rate': summary.false_positive_rate,
             'avg_response_time_minutes': summary.avg_response_time.total_seconds() / 60
         }
@@ -24,6 +24,8 @@ import warnings
 # Suprimir warnings de numpy y pandas
 warnings.filterwarnings('ignore')
 
+from modules.intelligence.decomposition_engine import SeriesDecomposition, decomposition_engine
+
 logger = logging.getLogger(__name__)
 
 class PredictionHorizon(Enum):
@@ -113,6 +115,7 @@ class PredictiveAnalysisEngine:
     def __init__(self, jetson_api_url: str):
         self.jetson_api_url = jetson_api_url
         self.logger = logging.getLogger(__name__)
+        self.decomposition_engine = decomposition_engine
         
         # Historia de predicciones para aprendizaje
         self.prediction_history: deque = deque(maxlen=10000)
@@ -305,12 +308,15 @@ class PredictiveAnalysisEngine:
                 sensor_data = group.sort_values('timestamp').reset_index(drop=True)
                 sensor_data = sensor_data.drop_duplicates(subset=['timestamp'])
                 
+                # Componentes compartidos: una actualización por serie (solo lecturas nuevas)
+                decomposition = self.decomposition_engine.decompose(sensor_data, device_id, sensor_type)
+                
                 # Generar predicciones para cada combinación algoritmo-horizonte
                 for algorithm in algorithms:
                     for horizon in horizons:
                         try:
                             prediction = await self._apply_prediction_algorithm(
-                                sensor_data, device_id, sensor_type, algorithm, horizon
+                                sensor_data, device_id, sensor_type, algorithm, horizon, decomposition
                             )
                             
                             if prediction:
@@ -330,7 +336,8 @@ class PredictiveAnalysisEngine:
                                         device_id: str,
                                         sensor_type: str,
                                         algorithm: PredictionAlgorithm,
-                                        horizon: PredictionHorizon) -> Optional[PredictionResult]:
+                                        horizon: PredictionHorizon,
+                                        decomposition: Optional[SeriesDecomposition] = None) -> Optional[PredictionResult]:
         """Aplica un algoritmo específico de predicción"""
         try:
             config = self.algorithm_config.get(algorithm, {})
@@ -368,7 +375,7 @@ class PredictiveAnalysisEngine:
             
             elif algorithm == PredictionAlgorithm.SEASONAL_DECOMPOSITION:
                 result = self._apply_seasonal_decomposition(
-                    sensor_data, horizon_hours, config
+                    sensor_data, decomposition, horizon_hours, config
                 )
                 if result:
                     predicted_value, confidence, confidence_interval, trend_direction, trend_strength, seasonality_detected = result
@@ -383,7 +390,7 @@ class PredictiveAnalysisEngine:
             
             # Calcular probabilidad de anomalía
             anomaly_probability = self._calculate_anomaly_probability(
-                predicted_value, values, sensor_type
+                predicted_value, values, sensor_type, decomposition, horizon_hours
             )
             
             return PredictionResult(
@@ -502,42 +509,22 @@ class PredictiveAnalysisEngine:
             self.logger.warning(f"⚠️ Error en suavizado exponencial: {e}")
             return None
     
-    def _apply_seasonal_decomposition(self, sensor_data: pd.DataFrame, horizon_hours: float, config: Dict) -> Optional[Tuple]:
-        """Aplica descomposición estacional"""
+    def _apply_seasonal_decomposition(self, sensor_data: pd.DataFrame,
+                                      decomposition: Optional[SeriesDecomposition],
+                                      horizon_hours: float, config: Dict) -> Optional[Tuple]:
+        """Aplica descomposición estacional (componentes en caché del motor compartido)"""
         try:
             min_points = config.get('min_data_points', 48)
-            if len(sensor_data) < min_points:
+            if len(sensor_data) < min_points or decomposition is None:
                 return None
             
-            # Crear serie temporal con índice de tiempo
-            ts = sensor_data.set_index('timestamp')['value']
-            ts = ts.resample('H').mean().fillna(method='ffill')  # Resample a horas
-            
-            if len(ts) < 24:  # Necesitamos al menos un día
-                return None
-            
-            # Descomposición simple usando medias móviles
-            seasonal_period = 24  # Ciclo diario
-            
-            # Calcular tendencia con media móvil
-            trend = ts.rolling(window=min(12, len(ts)//2), center=True).mean()
-            
-            # Calcular componente estacional
-            detrended = ts - trend
-            seasonal = detrended.groupby(detrended.index.hour).mean()
-            
-            # Reconstruir serie estacional
-            seasonal_series = detrended.index.to_series().dt.hour.map(seasonal)
-            
-            # Residuos
-            residual = ts - trend - seasonal_series
+            ts = decomposition.observed
+            seasonal = pd.Series(decomposition.seasonal_profile)
+            residual = decomposition.residual.dropna()
+            trend = decomposition.trend.dropna()
             
             # Predicción combinando componentes
-            last_trend = trend.dropna().iloc[-1] if not trend.dropna().empty else ts.mean()
-            future_hour = (ts.index[-1] + pd.Timedelta(hours=horizon_hours)).hour
-            seasonal_component = seasonal.get(future_hour, 0)
-            
-            predicted_value = last_trend + seasonal_component
+            predicted_value = decomposition.expected_at(decomposition.watermark + pd.Timedelta(hours=horizon_hours))
             
             # Confianza basada en estabilidad estacional
             seasonal_stability = 1 - (seasonal.std() / ts.std()) if ts.std() > 0 else 0.5
@@ -550,9 +537,8 @@ class PredictiveAnalysisEngine:
             
             # Tendencia
             trend_slope = 0
-            if not trend.dropna().empty and len(trend.dropna()) >= 2:
-                trend_values = trend.dropna().values
-                trend_slope = np.mean(np.diff(trend_values[-5:])) if len(trend_values) >= 5 else 0
+            if len(trend) >= 5:
+                trend_slope = np.mean(np.diff(trend.values[-5:]))
             
             if abs(trend_slope) < 0.01:
                 trend_direction = 'stable'
@@ -828,20 +814,27 @@ class PredictiveAnalysisEngine:
     
     def _calculate_anomaly_probability(self, predicted_value: float, 
                                      historical_values: np.ndarray, 
-                                     sensor_type: str) -> float:
+                                     sensor_type: str,
+                                     decomposition: Optional[SeriesDecomposition] = None,
+                                     horizon_hours: float = 0.0) -> float:
         """Calcula probabilidad de que el valor predicho sea anómalo"""
         try:
             if len(historical_values) < 10:
                 return 0.0
             
-            # Usar Z-score para calcular anomalía
-            mean_val = np.mean(historical_values)
-            std_val = np.std(historical_values)
-            
-            if std_val == 0:
-                return 0.0
-            
-            z_score = abs(predicted_value - mean_val) / std_val
+            if decomposition is not None:
+                # Z-score sobre residuos: desvío respecto de tendencia + estacionalidad esperadas
+                target_time = decomposition.watermark + pd.Timedelta(hours=horizon_hours)
+                z_score = decomposition.residual_zscore(predicted_value, target_time)
+            else:
+                # Usar Z-score para calcular anomalía
+                mean_val = np.mean(historical_values)
+                std_val = np.std(historical_values)
+                
+                if std_val == 0:
+                    return 0.0
+                
+                z_score = abs(predicted_value - mean_val) / std_val
             
             # Convertir Z-score a probabilidad de anomalía
             if z_score > 3:
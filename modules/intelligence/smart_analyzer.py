@@ -14,10 +14,15 @@ import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional, Tuple
-from dataclasses import dataclass
-from collections import defaultdict
+from dataclasses import dataclass, field
+from collections import OrderedDict, defaultdict
 import math
 
+from modules.intelligence.anomaly_engine import anomaly_engine
+from modules.intelligence.correlation_engine import correlation_engine
+from modules.utils.sketches import SeriesSketch
+from modules.utils.tracing import COUNTER_CACHE_HITS, COUNTER_CACHE_MISSES, tracer
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -48,6 +53,23 @@ class SystemInsight:
     recommendations: List[str]
     metrics: Dict[str, Any]
 
+def _as_datetime(timestamps: pd.Series) -> pd.Series:
+    """Timestamps como datetime, sin reconvertir una columna que ya lo es"""
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return timestamps
+    return pd.to_datetime(timestamps)
+
+# Watermark de una serie dentro de la ventana: (lecturas, primer ts, último ts, suma)
+SeriesWatermark = Tuple[int, Any, Any, float]
+
+@dataclass
+class CachedSeriesAnalysis:
+    """Resultados de una serie (device, sensor, ventana) junto al watermark de sus datos"""
+    watermark: SeriesWatermark
+    sensor_insights: List[SensorInsight] = field(default_factory=list)
+    anomalies: List[Dict[str, Any]] = field(default_factory=list)
+    prediction: Optional[Dict[str, Any]] = None
+
 class SmartAnalyzer:
     """
     Sistema de análisis inteligente que convierte datos en insights accionables.
@@ -58,11 +80,25 @@ class SmartAnalyzer:
     - Generación de insights proactivos
     - Predicciones basadas en tendencias
     - Recomendaciones contextuales
+    
+    En modo incremental (por defecto) los resultados por serie y los
+    insights sistémicos se cachean con el watermark de sus datos; en cada
+    llamada solo se recalculan las series cuya ventana cambió.
     """
     
-    def __init__(self):
+    def __init__(self, incremental: bool = True, max_cached_series: int = 1024):
         self.logger = logging.getLogger(__name__)
         
+        # Caché incremental por (device_id, sensor_type, ventana)
+        self.incremental = incremental
+        self.max_cached_series = max_cached_series
+        self._series_cache: 'OrderedDict[Tuple[str, str, float], CachedSeriesAnalysis]' = OrderedDict()
+        self._system_cache: Optional[Tuple[Any, List[SystemInsight]]] = None
+        self.cache_stats = {'series_hits': 0, 'series_misses': 0, 'system_hits': 0, 'system_misses': 0}
+        
+        # Último frame puntuado por el motor de anomalías (compartido entre pasos)
+        self._scored: Optional[Tuple[pd.DataFrame, pd.DataFrame]] = None
+        
         # Thresholds configurables para diferentes tipos de sensores
         self.sensor_thresholds = {
             'temperature': {
@@ -188,20 +224,26 @@ class SmartAnalyzer:
                 'confidence_level': 0.0
             }
             
-            # 1. ANÁLISIS POR SENSOR
-            sensor_insights = self._analyze_sensors_detailed(df_filtered)
-            analysis_result['sensor_insights'] = sensor_insights
+            if self.incremental:
+                # 1-4. ANÁLISIS POR SERIE Y SISTÉMICO (solo series con datos nuevos)
+                sensor_insights, anomalies, predictions, system_insights = \
+                    self._analyze_incremental(df_filtered, analysis_hours)
+            else:
+                # 1. ANÁLISIS POR SENSOR
+                sensor_insights = self._analyze_sensors_detailed(df_filtered)
+                
+                # 2. ANÁLISIS SISTÉMICO
+                system_insights = self._analyze_system_patterns(df_filtered)
+                
+                # 3. DETECCIÓN DE ANOMALÍAS INTELIGENTE
+                anomalies = self._detect_intelligent_anomalies(df_filtered)
+                
+                # 4. ANÁLISIS PREDICTIVO
+                predictions = self._generate_predictions(df_filtered)
             
-            # 2. ANÁLISIS SISTÉMICO
-            system_insights = self._analyze_system_patterns(df_filtered)
+            analysis_result['sensor_insights'] = sensor_insights
             analysis_result['system_insights'] = system_insights
-            
-            # 3. DETECCIÓN DE ANOMALÍAS INTELIGENTE
-            anomalies = self._detect_intelligent_anomalies(df_filtered)
             analysis_result['anomalies'] = anomalies
-            
-            # 4. ANÁLISIS PREDICTIVO
-            predictions = self._generate_predictions(df_filtered)
             analysis_result['predictions'] = predictions
             
             # 5. GENERACIÓN DE RECOMENDACIONES CONTEXTUALES
@@ -234,8 +276,11 @@ class SmartAnalyzer:
         """Análisis detallado por sensor individual"""
         insights = []
         
+        # Z-score robusto de todas las series en una sola pasada
+        scored = self._score_anomalies(df)
+        
         # Agrupar por dispositivo y sensor
-        for (device_id, sensor_type), group in df.groupby(['device_id', 'sensor_type']):
+        for (device_id, sensor_type), group in scored.groupby(['device_id', 'sensor_type']):
             try:
                 if len(group) < 3:  # Necesitamos al menos 3 puntos para análisis
                     continue
@@ -247,14 +292,19 @@ class SmartAnalyzer:
                 sensor_config = self._get_sensor_config(sensor_type)
                 
                 # 1. ANÁLISIS ESTADÍSTICO BÁSICO
+                sketch = SeriesSketch.from_values(values)
+                p25, median, p75, p95 = sketch.quantile([0.25, 0.5, 0.75, 0.95])
                 stats = {
-                    'mean': np.mean(values),
-                    'median': np.median(values),
-                    'std': np.std(values),
-                    'min': np.min(values),
-                    'max': np.max(values),
-                    'range': np.max(values) - np.min(values),
-                    'cv': np.std(values) / np.mean(values) if np.mean(values) != 0 else 0
+                    'mean': sketch.mean,
+                    'median': median,
+                    'std': sketch.std(),
+                    'min': sketch.min,
+                    'max': sketch.max,
+                    'range': sketch.max - sketch.min,
+                    'p25': p25,
+                    'p75': p75,
+                    'p95': p95,
+                    'cv': sketch.std() / sketch.mean if sketch.mean != 0 else 0
                 }
                 
                 # 2. DETECCIÓN DE TENDENCIAS
@@ -292,7 +342,7 @@ class SmartAnalyzer:
                     ))
                 
                 # 4. DETECCIÓN DE ANOMALÍAS POR SENSOR
-                anomaly_insights = self._detect_sensor_anomalies(values, timestamps, sensor_config, device_id, sensor_type)
+                anomaly_insights = self._detect_sensor_anomalies(group, device_id, sensor_type)
                 insights.extend(anomaly_insights)
                 
                 # 5. ANÁLISIS DE RANGOS OPERATIVOS
@@ -333,61 +383,33 @@ class SmartAnalyzer:
         return insights
     
     def _detect_intelligent_anomalies(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        """Detección inteligente de anomalías usando múltiples algoritmos"""
-        anomalies = []
-        
+        """Detección inteligente de anomalías (z-score robusto, IQR y cambios súbitos) sobre todas las series"""
         try:
-            # Agrupar por sensor para análisis individualizado
-            for (device_id, sensor_type), group in df.groupby(['device_id', 'sensor_type']):
-                if len(group) < 5:  # Necesitamos suficientes datos
-                    continue
-                
-                values = group['value'].values
-                timestamps = group['timestamp'].values
-                
-                # 1. DETECCIÓN POR Z-SCORE
-                from scipy import stats
-                z_scores = np.abs(stats.zscore(values))
-                z_threshold = self._get_sensor_config(sensor_type)['anomaly_z_score']
-                
-                z_anomalies = np.where(z_scores > z_threshold)[0]
-                
-                # 2. DETECCIÓN POR IQR (Interquartile Range)
-                q1, q3 = np.percentile(values, [25, 75])
-                iqr = q3 - q1
-                lower_bound = q1 - 1.5 * iqr
-                upper_bound = q3 + 1.5 * iqr
-                
-                iqr_anomalies = np.where((values < lower_bound) | (values > upper_bound))[0]
-                
-                # 3. DETECCIÓN POR CAMBIOS SÚBITOS
-                if len(values) > 1:
-                    diff = np.abs(np.diff(values))
-                    diff_threshold = np.std(values) * 2
-                    sudden_changes = np.where(diff > diff_threshold)[0]
-                
-                # Consolidar anomalías encontradas
-                all_anomaly_indices = set(z_anomalies) | set(iqr_anomalies)
-                if len(values) > 1:
-                    all_anomaly_indices |= set(sudden_changes)
-                    
-                for idx in all_anomaly_indices:
-                    if idx < len(values) and idx < len(timestamps):
-                        anomalies.append({
-                            'device_id': device_id,
-                            'sensor_type': sensor_type,
-                            'timestamp': timestamps[idx],
-                            'value': values[idx],
-                            'expected_range': f"{np.mean(values):.2f} ± {np.std(values):.2f}",
-                            'severity': self._classify_anomaly_severity(values[idx], values),
-                            'detection_method': self._get_detection_methods(idx, z_anomalies, iqr_anomalies, sudden_changes if len(values) > 1 else []),
-                            'confidence': min(z_scores[idx] / z_threshold if idx in z_anomalies else 0.5, 1.0)
-                        })
+            # Series con suficientes datos para el análisis
+            scored = self._score_anomalies(df)
+            if scored.empty:
+                return []
+            sizes = scored.groupby(['device_id', 'sensor_type'])['value'].transform('size')
+            flagged = scored[(sizes >= 5) & scored['is_anomaly']]
+            if flagged.empty:
+                return []
+            
+            anomalies = pd.DataFrame({
+                'device_id': flagged['device_id'],
+                'sensor_type': flagged['sensor_type'],
+                'timestamp': flagged['timestamp'],
+                'value': flagged['value'],
+                'expected_range': flagged['baseline'].map('{:.2f}'.format) + ' ± ' + flagged['scale'].map('{:.2f}'.format),
+                'severity': flagged['severity'],
+                'detection_method': flagged['methods'],
+                'confidence': np.where(flagged['robust_z_anomaly'],
+                                       np.minimum(flagged['robust_z'].abs() / flagged['z_threshold'], 1.0), 0.5)
+            })
+            return anomalies.to_dict('records')
             
         except Exception as e:
             logger.warning(f"⚠️ Error en detección de anomalías: {e}")
-        
-        return anomalies
+            return []
     
     def _generate_predictions(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Genera predicciones inteligentes basadas en tendencias históricas"""
@@ -399,7 +421,7 @@ class SmartAnalyzer:
                     continue
                 
                 values = group['value'].values
-                timestamps = pd.to_datetime(group['timestamp'])
+                timestamps = _as_datetime(group['timestamp'])
                 
                 # Calcular tendencia lineal simple
                 time_numeric = np.arange(len(values))
@@ -631,6 +653,98 @@ class SmartAnalyzer:
             logger.warning(f"⚠️ Error generando resumen ejecutivo: {e}")
             return {'overall_status': 'Error', 'status_emoji': '❌'}
     
+    def _score_anomalies(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Puntuación del motor de anomalías, calculada una vez por frame y reutilizada"""
+        if self._scored is None or self._scored[0] is not df:
+            columns = df[['device_id', 'sensor_type', 'timestamp', 'value']]
+            self._scored = (df, anomaly_engine.score(columns, detectors=('robust_z', 'iqr', 'jump')))
+        return self._scored[1]
+    
+    # ANÁLISIS INCREMENTAL
+    
+    def clear_cache(self):
+        """Descarta los resultados cacheados del modo incremental"""
+        self._series_cache.clear()
+        self._system_cache = None
+        self._scored = None
+    
+    def _series_watermarks(self, df: pd.DataFrame) -> Dict[Tuple[str, str], SeriesWatermark]:
+        """Watermark de cada serie en la ventana (cambia si entran o salen lecturas)"""
+        agg = df.groupby(['device_id', 'sensor_type'], sort=True).agg(
+            n=('value', 'size'), first=('timestamp', 'min'),
+            last=('timestamp', 'max'), total=('value', 'sum')
+        )
+        return {
+            key: (int(row.n), row.first, row.last, float(row.total))
+            for key, row in zip(agg.index, agg.itertuples(index=False))
+        }
+    
+    def _analyze_incremental(self, df: pd.DataFrame, window_hours: float):
+        """
+        Insights, anomalías y predicciones por serie desde la caché,
+        recalculando solo las series cuyo watermark cambió.
+        
+        Returns:
+            (sensor_insights, anomalies, predictions, system_insights)
+        """
+        watermarks = self._series_watermarks(df)
+        entries: Dict[Tuple[str, str], CachedSeriesAnalysis] = {}
+        stale = []
+        for key, watermark in watermarks.items():
+            entry = self._series_cache.get(key + (window_hours,))
+            if entry is not None and entry.watermark == watermark:
+                entries[key] = entry
+                self._series_cache.move_to_end(key + (window_hours,))   # LRU
+            else:
+                stale.append(key)
+        self.cache_stats['series_hits'] += len(watermarks) - len(stale)
+        self.cache_stats['series_misses'] += len(stale)
+        tracer.increment(COUNTER_CACHE_HITS, len(watermarks) - len(stale))
+        tracer.increment(COUNTER_CACHE_MISSES, len(stale))
+        
+        if stale:
+            stale_df = df[pd.MultiIndex.from_frame(df[['device_id', 'sensor_type']]).isin(stale)]
+            fresh = {key: CachedSeriesAnalysis(watermark=watermarks[key]) for key in stale}
+            
+            for insight in self._analyze_sensors_detailed(stale_df):
+                fresh[(insight.device_id, insight.sensor_type)].sensor_insights.append(insight)
+            for anomaly in self._detect_intelligent_anomalies(stale_df):
+                fresh[(anomaly['device_id'], anomaly['sensor_type'])].anomalies.append(anomaly)
+            for prediction in self._generate_predictions(stale_df).values():
+                fresh[(prediction['device_id'], prediction['sensor_type'])].prediction = prediction
+            
+            entries.update(fresh)
+            for key, entry in fresh.items():
+                self._series_cache.pop(key + (window_hours,), None)
+                self._series_cache[key + (window_hours,)] = entry
+        
+        # Desalojar las menos usadas (las de esta llamada quedaron al final y
+        # el resultado se arma desde ``entries``, así que no dependen de la caché)
+        while len(self._series_cache) > self.max_cached_series:
+            self._series_cache.popitem(last=False)
+        
+        sensor_insights, anomalies, predictions = [], [], {}
+        for device_id, sensor_type in watermarks:
+            entry = entries[(device_id, sensor_type)]
+            sensor_insights.extend(entry.sensor_insights)
+            anomalies.extend(entry.anomalies)
+            if entry.prediction is not None:
+                predictions[f"{device_id}_{sensor_type}"] = entry.prediction
+        
+        # Los insights sistémicos cruzan series: se reutilizan si ninguna cambió
+        system_key = (window_hours, tuple(watermarks.items()))
+        if self._system_cache is not None and self._system_cache[0] == system_key:
+            self.cache_stats['system_hits'] += 1
+            tracer.increment(COUNTER_CACHE_HITS)
+            system_insights = self._system_cache[1]
+        else:
+            self.cache_stats['system_misses'] += 1
+            tracer.increment(COUNTER_CACHE_MISSES)
+            system_insights = self._analyze_system_patterns(df)
+            self._system_cache = (system_key, system_insights)
+        
+        return sensor_insights, anomalies, predictions, system_insights
+    
     # MÉTODOS AUXILIARES
     
     def _create_empty_analysis(self, reason: str) -> Dict[str, Any]:
@@ -724,41 +838,36 @@ class SmartAnalyzer:
         
         return None
     
-    def _detect_sensor_anomalies(self, values: np.ndarray, timestamps: np.ndarray, 
-                                config: Dict, device_id: str, sensor_type: str) -> List[SensorInsight]:
-        """Detecta anomalías específicas de un sensor"""
+    def _detect_sensor_anomalies(self, scored: pd.DataFrame, device_id: str, sensor_type: str) -> List[SensorInsight]:
+        """Resume las anomalías de un sensor a partir de su tramo puntuado por el motor de anomalías"""
         anomaly_insights = []
         
         try:
-            # Usar Z-score para detección
-            if len(values) >= 3:
-                from scipy import stats
-                z_scores = np.abs(stats.zscore(values))
-                threshold = config['anomaly_z_score']
-                
-                anomalous_indices = np.where(z_scores > threshold)[0]
+            flagged = scored[scored['robust_z_anomaly']]
+            if len(flagged) > 0:
+                threshold = float(flagged['z_threshold'].iloc[0])
+                abs_z = flagged['robust_z'].abs()
+                max_z = float(abs_z.max())
+                severity = 'critical' if max_z > threshold * 1.5 else 'warning'
                 
-                if len(anomalous_indices) > 0:
-                    severity = 'critical' if np.max(z_scores[anomalous_indices]) > threshold * 1.5 else 'warning'
-                    
-                    anomaly_insights.append(SensorInsight(
-                        sensor_type=sensor_type,
-                        device_id=device_id,
-                        insight_type='anomaly',
-                        severity=severity,
-                        title=f'{len(anomalous_indices)} anomalías estadísticas detectadas',
-                        description=f'Valores con desviación estadística significativa (Z-score > {threshold}). '
-                                  f'Valor más anómalo: {values[anomalous_indices[np.argmax(z_scores[anomalous_indices])]]:.2f}',
-                        confidence=min(np.max(z_scores[anomalous_indices]) / threshold, 1.0),
-                        data_points=len(values),
-                        timestamp=datetime.now(),
-                        suggested_action='Investigar causas de los valores anómalos y verificar sensor.',
-                        technical_details={
-                            'max_z_score': float(np.max(z_scores[anomalous_indices])),
-                            'anomalous_values': values[anomalous_indices].tolist(),
-                            'threshold_used': threshold
-                        }
-                    ))
+                anomaly_insights.append(SensorInsight(
+                    sensor_type=sensor_type,
+                    device_id=device_id,
+                    insight_type='anomaly',
+                    severity=severity,
+                    title=f'{len(flagged)} anomalías estadísticas detectadas',
+                    description=f'Valores con desviación estadística significativa (Z-score robusto > {threshold}). '
+                              f'Valor más anómalo: {flagged["value"].loc[abs_z.idxmax()]:.2f}',
+                    confidence=min(max_z / threshold, 1.0),
+                    data_points=len(scored),
+                    timestamp=datetime.now(),
+                    suggested_action='Investigar causas de los valores anómalos y verificar sensor.',
+                    technical_details={
+                        'max_z_score': max_z,
+                        'anomalous_values': flagged['value'].tolist(),
+                        'threshold_used': threshold
+                    }
+                ))
         
         except Exception as e:
             logger.warning(f"⚠️ Error detectando anomalías en sensor: {e}")
@@ -820,34 +929,24 @@ class SmartAnalyzer:
         insights = []
         
         try:
-            # Crear matriz pivote para análisis de correlación
-            pivot_df = df.pivot_table(
-                values='value', 
-                index='timestamp', 
-                columns=['device_id', 'sensor_type'], 
-                aggfunc='mean'
-            ).ffill().bfill()
-            
-            if pivot_df.shape[1] >= 2:  # Necesitamos al menos 2 sensores
-                correlation_matrix = pivot_df.corr()
-                
+            # Correlaciones sobre la grilla común (compartidas con otros motores)
+            result = correlation_engine.analyze(df)
+            
+            if result is not None:  # Necesitamos al menos 2 sensores
                 # Buscar correlaciones significativas (> 0.7 o < -0.7)
-                strong_correlations = []
-                
-                for i in range(len(correlation_matrix.columns)):
-                    for j in range(i+1, len(correlation_matrix.columns)):
-                        corr_value = correlation_matrix.iloc[i, j]
-                        
-                        if abs(corr_value) > 0.7 and not pd.isna(corr_value):
-                            sensor1 = correlation_matrix.columns[i]
-                            sensor2 = correlation_matrix.columns[j]
-                            
-                            strong_correlations.append({
-                                'sensor1': sensor1,
-                                'sensor2': sensor2,
-                                'correlation': corr_value,
-                                'type': 'positive' if corr_value > 0 else 'negative'
-                            })
+                strong = result.strong(0.7)
+                strong_correlations = [
+                    {
+                        'sensor1': sensor1,
+                        'sensor2': sensor2,
+                        'correlation': corr_value,
+                        'type': 'positive' if corr_value > 0 else 'negative',
+                        'lag_seconds': lag_seconds
+                    }
+                    for sensor1, sensor2, corr_value, lag_seconds in zip(
+                        strong['sensor1'], strong['sensor2'], strong['correlation'], strong['lag_seconds']
+                    )
+                ]
                 
                 if strong_correlations:
                     correlation_type = 'positive' if strong_correlations[0]['correlation'] > 0 else 'negative'
@@ -865,7 +964,11 @@ class SmartAnalyzer:
                             'Las correlaciones indican comportamiento sistemático esperado',
                             'Monitorear que las correlaciones se mantengan estables'
                         ],
-                        metrics={'correlations_found': len(strong_correlations)}
+                        metrics={
+                            'correlations_found': len(strong_correlations),
+                            'max_lag_seconds': max(abs(sc['lag_seconds']) for sc in strong_correlations),
+                            'grid_resolution_seconds': result.freq.total_seconds()
+                        }
                     ))
         
         except Exception as e:
@@ -882,7 +985,7 @@ class SmartAnalyzer:
             device_frequencies = {}
             
             for device_id, group in df.groupby('device_id'):
-                timestamps = pd.to_datetime(group['timestamp']).sort_values()
+                timestamps = _as_datetime(group['timestamp']).sort_values()
                 if len(timestamps) > 1:
                     time_diffs = timestamps.diff().dropna()
                     avg_interval = time_diffs.mean().total_seconds()
@@ -930,7 +1033,7 @@ class SmartAnalyzer:
             
             for device_id in devices_analyzed:
                 device_data = df[df['device_id'] == device_id]
-                last_timestamp = pd.to_datetime(device_data['timestamp']).max()
+                last_timestamp = _as_datetime(device_data['timestamp']).max()
                 
                 # Convertir a datetime timezone-aware si es necesario
                 if last_timestamp.tz is None:
@@ -982,7 +1085,7 @@ class SmartAnalyzer:
         try:
             # Análisis de patrones diarios si tenemos datos suficientes
             df_copy = df.copy()
-            df_copy['timestamp'] = pd.to_datetime(df_copy['timestamp'])
+            df_copy['timestamp'] = _as_datetime(df_copy['timestamp'])
             df_copy['hour'] = df_copy['timestamp'].dt.hour
             
             # Buscar patrones por hora del día
@@ -1024,35 +1127,6 @@ class SmartAnalyzer:
         
         return insights
     
-    def _classify_anomaly_severity(self, value: float, all_values: np.ndarray) -> str:
-        """Clasifica la severidad de una anomalía"""
-        try:
-            mean_val = np.mean(all_values)
-            std_val = np.std(all_values)
-            
-            z_score = abs(value - mean_val) / std_val if std_val > 0 else 0
-            
-            if z_score > 3:
-                return 'critical'
-            elif z_score > 2:
-                return 'warning'
-            else:
-                return 'info'
-        except:
-            return 'info'
-    
-    def _get_detection_methods(self, idx: int, z_anomalies: np.ndarray, 
-                              iqr_anomalies: np.ndarray, sudden_changes: np.ndarray) -> List[str]:
-        """Obtiene métodos de detección que identificaron la anomalía"""
-        methods = []
-        if idx in z_anomalies:
-            methods.append('Z-Score')
-        if idx in iqr_anomalies:
-            methods.append('IQR')
-        if idx in sudden_changes:
-            methods.append('Cambio súbito')
-        return methods if methods else ['Estadístico']
-    
     def _extract_top_insights(self, all_insights: List) -> List[str]:
         """Extrae los insights más importantes"""
         try:
@@ -22,6 +22,9 @@ import calendar
 from scipy import stats
 import warnings
 
+from modules.utils.sketches import SeriesSketch, sketch_store
+from modules.utils.timestamps import wall_clock
+
 warnings.filterwarnings('ignore')
 
 logger = logging.getLogger(__name__)
@@ -180,7 +183,8 @@ class TemporalComparisonEngine:
                 'large': 0.8
             },
             'seasonal_detection_threshold': 0.3,
-            'trend_change_threshold': 0.1
+            'trend_change_threshold': 0.1,
+            'sketch_min_period_days': 7  # Períodos desde esta duración: outliers desde sketches en caché
         }
         
         # Umbrales de cambio por tipo de sensor
@@ -209,6 +213,9 @@ class TemporalComparisonEngine:
         self.historical_comparisons: Dict[str, List[TemporalComparison]] = defaultdict(list)
         self.seasonal_patterns_cache: Dict[str, SeasonalAnalysis] = {}
         self.evolution_cache: Dict[str, EvolutionAnalysis] = {}
+        
+        # Sketches por hora compartidos (distribuciones de semanas/meses sin releer lecturas)
+        self.sketch_store = sketch_store
     
     async def perform_comprehensive_temporal_analysis(self, 
                                                     raw_data: List[Dict],
@@ -237,6 +244,9 @@ class TemporalComparisonEngine:
             df['timestamp'] = pd.to_datetime(df['timestamp'])
             df = df.sort_values('timestamp')
             
+            # Alimentar los sketches (solo lecturas fuera del rango ya visto por serie)
+            self.sketch_store.update(df)
+            
             # Configurar períodos por defecto
             if comparison_periods is None:
                 comparison_periods = [
@@ -396,8 +406,10 @@ class TemporalComparisonEngine:
             distribution_shift = self._detect_distribution_shift(current_values, reference_values)
             variance_change = (np.var(current_values) - np.var(reference_values)) / np.var(reference_values) if np.var(reference_values) > 0 else 0
             
-            # Análisis de outliers
-            outlier_changes = self._analyze_outlier_changes(current_values, reference_values)
+            # Análisis de outliers (en períodos largos, desde los sketches en caché)
+            outlier_changes = self._analyze_outlier_changes(
+                self._period_distribution(current_period_data, device_id, sensor_type),
+                self._period_distribution(reference_period_data, device_id, sensor_type))
             
             # Generar interpretación
             interpretation = self._generate_comparison_interpretation(
@@ -500,6 +512,21 @@ class TemporalComparisonEngine:
             self.logger.warning(f"⚠️ Error dividiendo datos por período: {e}")
             return pd.DataFrame(), pd.DataFrame()
     
+    def _period_distribution(self, period_data: pd.DataFrame, device_id: str,
+                             sensor_type: str) -> Union[np.ndarray, SeriesSketch]:
+        """
+        Distribución de un período: el sketch fusionado de sus intervalos si
+        el período es largo y la caché lo cubre, o los valores tal cual.
+        """
+        values = period_data['value'].to_numpy()
+        local = wall_clock(period_data['timestamp'])
+        start, end = local.min(), local.max()
+        if end - start < timedelta(days=self.analysis_config['sketch_min_period_days']):
+            return values
+        sketch = self.sketch_store.query(start.to_pydatetime(), end.to_pydatetime() + timedelta(microseconds=1),
+                                         device_id=str(device_id), sensor_type=str(sensor_type))
+        return sketch if sketch.count >= len(values) else values
+    
     def _calculate_cohens_d(self, group1: np.ndarray, group2: np.ndarray) -> float:
         """Calcula el tamaño del efecto Cohen's d"""
         try:
@@ -583,28 +610,35 @@ class TemporalComparisonEngine:
         except Exception:
             return False
     
-    def _analyze_outlier_changes(self, current: np.ndarray, reference: np.ndarray) -> Dict[str, Any]:
-        """Analiza cambios en outliers entre períodos"""
+    def _analyze_outlier_changes(self, current: Union[np.ndarray, SeriesSketch],
+                                 reference: Union[np.ndarray, SeriesSketch]) -> Dict[str, Any]:
+        """
+        Analiza cambios en outliers (IQR) entre períodos.
+        
+        Acepta arrays de valores o ``SeriesSketch`` en caché; con sketches el
+        conteo se estima desde la distribución sin materializar las lecturas.
+        """
         try:
-            # Detectar outliers usando IQR
-            def detect_outliers(data):
+            def count_outliers(data) -> Tuple[int, int]:
+                if isinstance(data, SeriesSketch):
+                    if data.count < 4:
+                        return 0, data.count
+                    return int(round(data.outlier_fraction(1.5) * data.count)), data.count
+                data = np.asarray(data, dtype=float)
                 if len(data) < 4:
-                    return []
-                q1, q3 = np.percentile(data, [25, 75])
-                iqr = q3 - q1
-                lower_bound = q1 - 1.5 * iqr
-                upper_bound = q3 + 1.5 * iqr
-                return data[(data < lower_bound) | (data > upper_bound)]
+                    return 0, len(data)
+                lower_bound, upper_bound = SeriesSketch.from_values(data).iqr_bounds(1.5)
+                return int(np.count_nonzero((data < lower_bound) | (data > upper_bound))), len(data)
             
-            current_outliers = detect_outliers(current)
-            reference_outliers = detect_outliers(reference)
+            current_outliers, current_total = count_outliers(current)
+            reference_outliers, reference_total = count_outliers(reference)
             
             return {
-                'current_outlier_count': len(current_outliers),
-                'reference_outlier_count': len(reference_outliers),
-                'outlier_change': len(current_outliers) - len(reference_outliers),
-                'current_outlier_ratio': len(current_outliers) / len(current) if len(current) > 0 else 0,
-                'reference_outlier_ratio': len(reference_outliers) / len(reference) if len(reference) > 0 else 0
+                'current_outlier_count': current_outliers,
+                'reference_outlier_count': reference_outliers,
+                'outlier_change': current_outliers - reference_outliers,
+                'current_outlier_ratio': current_outliers / current_total if current_total > 0 else 0,
+                'reference_outlier_ratio': reference_outliers / reference_total if reference_total > 0 else 0
             }
             
         except Exception:
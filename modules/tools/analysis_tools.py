@@ -9,6 +9,7 @@ import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from modules.intelligence.anomaly_engine import anomaly_engine
 from modules.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -124,7 +125,7 @@ class AnalysisTools:
     def detect_anomalies(self, sensor_data: List[Dict[str, Any]], 
                         threshold_factor: float = 2.0) -> List[Dict[str, Any]]:
         """
-        Detecta anomalías en los datos de sensores usando desviación estándar.
+        Detecta anomalías en los datos de sensores con z-score robusto (mediana/MAD).
         
         Args:
             sensor_data: Lista de datos de sensores
@@ -137,48 +138,37 @@ class AnalysisTools:
             return []
         
         try:
-            df = pd.DataFrame(sensor_data)
+            # Z-score robusto (mediana/MAD) por tipo de sensor en una sola pasada
+            flagged = anomaly_engine.detect(
+                sensor_data, group_cols=('sensor_type',), detectors=('robust_z',),
+                window=None, z_threshold=threshold_factor
+            )
             anomalies = []
             
-            # Detectar anomalías por tipo de sensor
-            for sensor_type in df['sensor_type'].unique():
-                sensor_df = df[df['sensor_type'] == sensor_type]
-                
-                mean_val = sensor_df['value'].mean()
-                std_val = sensor_df['value'].std()
-                
-                if std_val == 0:  # Si no hay variación, no hay anomalías
-                    continue
-                
-                threshold_upper = mean_val + (threshold_factor * std_val)
-                threshold_lower = mean_val - (threshold_factor * std_val)
-                
-                # Encontrar valores anómalos
-                anomalous_data = sensor_df[
-                    (sensor_df['value'] > threshold_upper) | 
-                    (sensor_df['value'] < threshold_lower)
-                ]
-                
-                for _, row in anomalous_data.iterrows():
-                    anomalies.append({
-                        "device_id": row['device_id'],
-                        "sensor_type": row['sensor_type'],
-                        "value": row['value'],
-                        "timestamp": row['timestamp'].isoformat() if isinstance(row['timestamp'], datetime) else row['timestamp'],
-                        "expected_range": {
-                            "min": threshold_lower,
-                            "max": threshold_upper
-                        },
-                        "severity": "high" if abs(row['value'] - mean_val) > 3 * std_val else "medium"
-                    })
+            if not flagged.empty:
+                margin = threshold_factor * flagged['scale']
+                timestamps = flagged['timestamp'].map(
+                    lambda ts: ts.isoformat() if isinstance(ts, datetime) else ts
+                )
+                anomalies = pd.DataFrame({
+                    "device_id": flagged['device_id'],
+                    "sensor_type": flagged['sensor_type'],
+                    "value": flagged['value'],
+                    "timestamp": timestamps,
+                    "expected_range": [
+                        {"min": low, "max": high}
+                        for low, high in zip(flagged['baseline'] - margin, flagged['baseline'] + margin)
+                    ],
+                    "severity": np.where(flagged['robust_z'].abs() > 3, "high", "medium")
+                }).to_dict('records')
             
             logger.info(f"Detectadas {len(anomalies)} anomalías")
             return {
                 "anomalies_found": len(anomalies),
                 "anomalies": anomalies,
                 "threshold_used": {
-                    "method": "statistical",
-                    "sigma_multiplier": 2
+                    "method": "robust_z",
+                    "sigma_multiplier": threshold_factor
                 }
             }
             
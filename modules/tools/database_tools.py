@@ -5,9 +5,12 @@ Herramientas de Base de Datos
 Herramientas que el agente puede usar para consultar la base de datos IoT.
 """
 
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Sequence
 from modules.database import DatabaseConnector, get_db
+from modules.database.db_connector import choose_bucket
 from modules.utils.logger import setup_logger
+from modules.utils.query_planner import parse_time_window_hours
 
 logger = setup_logger(__name__)
 
@@ -199,30 +202,12 @@ class DatabaseTools:
 
     async def get_sensor_stats_tool(self) -> Dict[str, Any]:
         """Estadísticas globales de la tabla sensor_data para consultas avanzadas.
-        Devuelve totales, rango temporal, número de dispositivos y conteo por dispositivo.
+        Devuelve totales, rango temporal, número de dispositivos y conteo por dispositivo,
+        en una sola consulta respondida desde los rollups pre-agregados.
         """
         db = await self._get_db()
         try:
-            total_q = "SELECT COUNT(*) AS total FROM sensor_data"
-            range_q = "SELECT MIN(timestamp) AS first_ts, MAX(timestamp) AS last_ts FROM sensor_data"
-            devs_q = "SELECT COUNT(DISTINCT device_id) AS devices FROM sensor_data"
-            by_dev_q = (
-                "SELECT device_id, COUNT(*) AS count "
-                "FROM sensor_data GROUP BY device_id ORDER BY count DESC LIMIT 100"
-            )
-
-            total = await db.execute_query(total_q)
-            trange = await db.execute_query(range_q)
-            devs = await db.execute_query(devs_q)
-            by_dev = await db.execute_query(by_dev_q)
-
-            result = {
-                "total_records": int(total[0]["total"]) if total else 0,
-                "first_record_at": trange[0]["first_ts"] if trange else None,
-                "last_record_at": trange[0]["last_ts"] if trange else None,
-                "devices_count": int(devs[0]["devices"]) if devs else 0,
-                "counts_by_device": by_dev,
-            }
+            result = await db.get_sensor_stats()
             logger.info(
                 f"Stats: total={result['total_records']} devices={result['devices_count']}"
             )
@@ -235,3 +220,63 @@ class DatabaseTools:
                 "counts_by_device": [],
                 "error": str(e),
             }
+
+    async def get_sensor_buckets_tool(self, hours: float = 24,
+                                      device_id: Optional[str] = None,
+                                      sensor_type: Optional[str] = None,
+                                      bucket_minutes: Optional[float] = None,
+                                      percentiles: Sequence[float] = ()) -> List[Dict[str, Any]]:
+        """
+        Herramienta de agregados por intervalo calculados en la base de datos.
+        
+        Args:
+            hours: Ventana hacia atrás en horas
+            device_id: ID del dispositivo (opcional)
+            sensor_type: Tipo de sensor (opcional)
+            bucket_minutes: Ancho del intervalo (por defecto ~120 intervalos por serie)
+            percentiles: Percentiles por intervalo (p. ej. DEFAULT_PERCENTILES); sin
+                percentiles se responde desde los rollups, con ellos sobre sensor_data
+            
+        Returns:
+            Lista de intervalos con count/avg/min/max/percentiles; cada uno trae
+            ``timestamp`` y ``value`` para usarse directamente en AnalysisTools
+        """
+        db = await self._get_db()
+        try:
+            bucket = timedelta(minutes=bucket_minutes) if bucket_minutes else choose_bucket(hours)
+            data = await db.get_bucketed_readings(
+                datetime.now() - timedelta(hours=hours),
+                bucket=bucket,
+                device_id=device_id,
+                sensor_type=sensor_type,
+                percentiles=percentiles,
+            )
+            logger.info(f"Obtenidos {len(data)} intervalos de {bucket} (últimas {hours:g}h)")
+            return data
+        except Exception as e:
+            logger.error(f"Error obteniendo agregados por intervalo: {e}")
+            return []
+
+    async def get_sensor_history_tool(self, hours: float = 24,
+                                      device_id: Optional[str] = None,
+                                      sensor_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Herramienta para series de rango largo (gráficos, reportes) leídas de
+        los rollups: una fila por intervalo en lugar de cada lectura cruda.
+        
+        Args:
+            hours: Ventana hacia atrás en horas
+            device_id: ID del dispositivo (opcional)
+            sensor_type: Tipo de sensor (opcional)
+            
+        Returns:
+            Lista de intervalos con avg/min/max/count
+        """
+        db = await self._get_db()
+        try:
+            data = await db.get_sensor_rollups(hours, device_id, sensor_type)
+            logger.info(f"Obtenidos {len(data)} intervalos agregados (últimas {hours}h)")
+            return data
+        except Exception as e:
+            logger.error(f"Error obteniendo historial agregado: {e}")
+            return []
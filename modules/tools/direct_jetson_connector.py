@@ -12,6 +12,9 @@ import logging
 from typing import List, Dict, Any
 from datetime import datetime
 
+from modules.utils.latest_index import latest_index
+from modules.utils.tracing import tracer, COUNTER_BYTES
+
 logger = logging.getLogger(__name__)
 
 class DirectJetsonConnector:
@@ -32,6 +35,7 @@ class DirectJetsonConnector:
             logger.info(f"🔍 Testing conexión: {url}")
             
             response = requests.get(url, timeout=10)
+            tracer.increment(COUNTER_BYTES, len(response.content))
             response.raise_for_status()
             
             result = {
@@ -62,6 +66,7 @@ class DirectJetsonConnector:
             logger.info(f"📱 Obteniendo dispositivos: {url}")
             
             response = requests.get(url, timeout=15)
+            tracer.increment(COUNTER_BYTES, len(response.content))
             response.raise_for_status()
             
             data = response.json()
@@ -92,6 +97,7 @@ class DirectJetsonConnector:
                 if 'status' not in device:
                     device['status'] = 'active'  # Si responde, está activo
             
+            latest_index.register_devices(devices)
             return devices
             
         except Exception as e:
@@ -115,6 +121,7 @@ class DirectJetsonConnector:
             logger.info(f"📊 Obteniendo datos: {url} - params: {params}")
             
             response = requests.get(url, params=params, timeout=20)
+            tracer.increment(COUNTER_BYTES, len(response.content))
             response.raise_for_status()
             
             data = response.json()
@@ -134,6 +141,7 @@ class DirectJetsonConnector:
                 sensor_data = []
             
             logger.info(f"📊 Registros de sensores: {len(sensor_data)}")
+            latest_index.update(sensor_data)
             return sensor_data
             
         except Exception as e:
@@ -13,6 +13,9 @@ from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 import logging
 
+from modules.utils.latest_index import latest_index
+from modules.utils.tracing import tracer, COUNTER_BYTES
+
 # Configurar logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,6 +33,7 @@ class JetsonAPIConnector:
             base_url: URL base de la API Jetson (ej: https://domain.trycloudflare.com)
         """
         self.base_url = base_url.rstrip('/')
+        self.latest_max_age_seconds = 60.0  # Antigüedad máxima del índice de últimos valores
         self.session = requests.Session()
         self.session.timeout = (10, 30)  # (conexión, lectura)
         
@@ -63,6 +67,7 @@ class JetsonAPIConnector:
             
             response = self.session.request(method, url, **kwargs)
             response.raise_for_status()
+            tracer.increment(COUNTER_BYTES, len(response.content))
             
             # Intentar parsear JSON
             try:
@@ -111,6 +116,7 @@ class JetsonAPIConnector:
                 devices = [response] if response else []
             
             logger.info(f"📱 Dispositivos obtenidos: {len(devices)}")
+            latest_index.register_devices(devices)
             return devices
             
         except Exception as e:
@@ -119,7 +125,7 @@ class JetsonAPIConnector:
             raise Exception(f"No se pudo conectar a la API de Jetson: {str(e)}")
     
     def get_sensor_data(self, device_id: str = None, sensor_type: str = None, 
-                       limit: int = 100, hours: float = None) -> List[Dict[str, Any]]:
+                       limit: int = 100, hours: float = None, offset: int = 0) -> List[Dict[str, Any]]:
         """
         Obtener datos de sensores.
         
@@ -128,6 +134,7 @@ class JetsonAPIConnector:
             sensor_type: Tipo de sensor (opcional)
             limit: Límite de registros
             hours: Horas hacia atrás para filtrar
+            offset: Registros a saltar (paginación, más recientes primero)
             
         Returns:
             Lista de registros de sensores
@@ -139,6 +146,8 @@ class JetsonAPIConnector:
                 params['limit'] = limit
             if hours:
                 params['hours'] = hours
+            if offset:
+                params['offset'] = offset
             
             # Construir endpoint
             if device_id:
@@ -159,6 +168,9 @@ class JetsonAPIConnector:
             else:
                 data = []
             
+            # Alimentar el índice de últimos valores (antes de filtrar)
+            latest_index.update(data)
+            
             # Filtrar por sensor_type si se especifica
             if sensor_type and data:
                 data = [record for record in data if record.get('sensor_type') == sensor_type]
@@ -288,28 +300,13 @@ class JetsonAPIConnector:
         Returns:
             Dict organizado por dispositivo y tipo de sensor
         """
-        data = self.get_sensor_data(device_id=device_id, limit=50)
-        
-        # Organizar datos por dispositivo y tipo de sensor
-        organized_data = {}
-        
-        for record in data:
-            dev_id = record.get('device_id')
-            sensor_type = record.get('sensor_type')
-            
-            if dev_id not in organized_data:
-                organized_data[dev_id] = {}
-            
-            # Solo guardar la lectura más reciente de cada tipo de sensor
-            if sensor_type not in organized_data[dev_id]:
-                organized_data[dev_id][sensor_type] = {
-                    'value': record.get('value'),
-                    'unit': record.get('unit', ''),
-                    'timestamp': record.get('timestamp'),
-                    'raw_data': record.get('raw_data')
-                }
+        # Solo se consulta la API si el índice no tiene ingestas recientes
+        latest = latest_index.latest(device_id)
+        if not latest or not latest_index.is_fresh(self.latest_max_age_seconds, device_id=device_id):
+            self.get_sensor_data(device_id=device_id, limit=50)  # Alimenta el índice
+            latest = latest_index.latest(device_id)
         
-        return organized_data
+        return latest
     
     def get_temperature_data(self, limit: int = 200) -> List[Dict[str, Any]]:
         """
@@ -354,15 +351,18 @@ class JetsonAPIConnector:
             'sensors': {}
         }
         
-        # Añadir información de sensores
+        # Añadir información de sensores (conteos y último visto desde el índice)
+        device_status = latest_index.device_status()
         for device_id, sensors in latest_readings.items():
-            device_info = next((d for d in devices if d.get('device_id') == device_id), {})
+            device_info = latest_index.device_info(device_id)
+            status = device_status.get(device_id, {})
             
             summary['sensors'][device_id] = {
                 'device_type': device_info.get('device_type', 'unknown'),
                 'ip_address': device_info.get('ip_address', 'unknown'),
                 'status': device_info.get('status', 'unknown'),
-                'last_seen': device_info.get('last_seen'),
+                'last_seen': status.get('last_seen', device_info.get('last_seen')),
+                'records_count': status.get('records_count', 0),
                 'sensors': sensors
             }
         
@@ -0,0 +1,428 @@
+"""
+Servidor Sustituto (Stand-in) de la API Jetson
+==============================================
+
+Servidor HTTP local y determinista que replica los endpoints reales de la
+API Jetson expuesta vía Cloudflare tunnel:
+
+- ``/health``
+- ``/devices``
+- ``/data``
+- ``/data/{device_id}``
+
+Genera series sintéticas configurables (N dispositivos, M sensores, cualquier
+frecuencia de muestreo y largo de historial) y permite inyectar latencia,
+jitter, errores HTTP y el tope real de 200 registros por página. Sirve para
+medir throughput y latencia de cola de conectores, agente y reportes sin
+depender del Jetson real.
+
+Uso rápido::
+
+    with JetsonStandInServer(StandInConfig(devices=4, latency_ms=80)) as server:
+        connector = JetsonAPIConnector(server.base_url)
+        data = connector.get_sensor_data(limit=200)
+
+Línea de comandos::
+
+    python -m modules.tools.jetson_standin_server --port 8765 --devices 4 --latency-ms 50
+"""
+
+import json
+import logging
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Zona horaria de los timestamps que emite el Jetson real (Chile, -03:00)
+JETSON_TZ = timezone(timedelta(hours=-3))
+
+# Tope de registros por respuesta observado en la API real
+REAL_PAGE_CAP = 200
+
+# Perfiles de sensores reales: (sensor_type, unidad, base, amplitud diaria, ruido)
+SENSOR_PROFILES: List[Tuple[str, str, float, float, float]] = [
+    ("ntc_entrada", "°C", 22.0, 3.0, 0.25),
+    ("ntc_salida", "°C", 29.0, 4.0, 0.30),
+    ("ldr", "lux", 400.0, 380.0, 15.0),
+    ("temperature_1", "°C", 24.0, 2.5, 0.20),
+    ("temperature_2", "°C", 25.0, 2.5, 0.20),
+    ("temperature_avg", "°C", 24.5, 2.5, 0.15),
+]
+
+# Dispositivos reales: se usan primero para que los conectores existentes
+# (que esperan estos IDs) funcionen sin cambios.
+REAL_DEVICES: List[Tuple[str, str, List[str]]] = [
+    ("esp32_wifi_001", "192.168.0.101", ["ntc_entrada", "ntc_salida", "ldr"]),
+    ("arduino_eth_001", "192.168.0.107", ["temperature_1", "temperature_2", "temperature_avg"]),
+]
+
+
+@dataclass
+class StandInConfig:
+    """Configuración del servidor sustituto"""
+    devices: int = 2
+    sensors_per_device: Optional[int] = None  # None = perfil real de cada dispositivo
+    interval_seconds: float = 10.0            # Frecuencia de muestreo por sensor
+    history_hours: float = 24.0 * 30          # Historial disponible hacia atrás
+    seed: int = 42
+    anchor: Optional[datetime] = None         # Congela el "ahora" para respuestas idénticas
+    page_cap: int = REAL_PAGE_CAP
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0                   # Probabilidad 0..1 de responder con error
+    error_status: int = 500
+
+
+def _mix64(value: int) -> int:
+    """Hash entero determinista (splitmix64) para generar ruido sin estado."""
+    value = (value + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+
+class SyntheticJetsonDataset:
+    """
+    Fuente de lecturas sintéticas deterministas.
+
+    Cada valor es función pura de (seed, dispositivo, sensor, tick), por lo que
+    la misma consulta devuelve siempre los mismos registros y no es necesario
+    materializar el historial: cada página se genera en O(offset + limit).
+    """
+
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        self.devices = self._build_devices()
+        self._profiles = {p[0]: p for p in SENSOR_PROFILES}
+
+    def _build_devices(self) -> List[Dict[str, Any]]:
+        devices = []
+        for index in range(self.config.devices):
+            if index < len(REAL_DEVICES):
+                device_id, ip_address, sensors = REAL_DEVICES[index]
+            else:
+                device_id = f"sim_device_{index + 1:03d}"
+                ip_address = f"10.0.{index // 250}.{index % 250 + 1}"
+                sensors = [p[0] for p in SENSOR_PROFILES]
+
+            if self.config.sensors_per_device is not None:
+                count = self.config.sensors_per_device
+                pool = sensors + [p[0] for p in SENSOR_PROFILES if p[0] not in sensors]
+                sensors = [pool[i] if i < len(pool) else f"sensor_{i + 1:02d}" for i in range(count)]
+
+            devices.append({
+                "device_id": device_id,
+                "device_type": "arduino_ethernet",
+                "ip_address": ip_address,
+                "port": 80,
+                "sensors": sensors,
+                "index": index,
+                "key": _mix64(self.config.seed * 1_000_003 + index),
+            })
+        return devices
+
+    def now(self) -> datetime:
+        if self.config.anchor is not None:
+            anchor = self.config.anchor
+            return anchor if anchor.tzinfo else anchor.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc)
+
+    def _latest_tick(self) -> int:
+        return int(self.now().timestamp() // self.config.interval_seconds)
+
+    def _value(self, device: Dict[str, Any], sensor_index: int, sensor_type: str, tick: int) -> float:
+        _, _, base, amplitude, noise = self._profiles.get(sensor_type, (sensor_type, "", 50.0, 10.0, 1.0))
+        seconds = tick * self.config.interval_seconds
+        daily = math.sin(2 * math.pi * (seconds % 86400) / 86400)
+        jitter = (_mix64(device["key"] ^ (sensor_index << 48) ^ tick) / 2**64) * 2 - 1
+        value = base + amplitude * daily + noise * jitter
+        if sensor_type == "ldr":
+            value = max(0.0, value)
+        return round(value, 5)
+
+    def device_records(self, device_ids: List[str], hours: Optional[float], limit: int,
+                       offset: int = 0) -> List[Dict[str, Any]]:
+        """Registros más recientes primero, intercalando dispositivos por tick, desde ``offset``."""
+        selected = [d for d in self.devices if d["device_id"] in device_ids]
+        if not selected or limit <= 0:
+            return []
+        wanted = offset + limit
+
+        latest = self._latest_tick()
+        window_hours = min(hours, self.config.history_hours) if hours else self.config.history_hours
+        oldest = latest - int(window_hours * 3600 / self.config.interval_seconds)
+        device_count = len(self.devices)
+
+        records: List[Dict[str, Any]] = []
+        tick = latest
+        while tick > oldest and len(records) < wanted:
+            timestamp = datetime.fromtimestamp(tick * self.config.interval_seconds, JETSON_TZ).isoformat()
+            for device in selected:
+                for sensor_index, sensor_type in enumerate(device["sensors"]):
+                    unit = self._profiles.get(sensor_type, (None, ""))[1]
+                    records.append({
+                        "id": (tick * device_count + device["index"]) * 64 + sensor_index,
+                        "device_id": device["device_id"],
+                        "sensor_type": sensor_type,
+                        "value": self._value(device, sensor_index, sensor_type, tick),
+                        "unit": unit,
+                        "timestamp": timestamp,
+                    })
+                    if len(records) >= wanted:
+                        return records[offset:]
+            tick -= 1
+        return records[offset:]
+
+    def device_payload(self) -> List[Dict[str, Any]]:
+        last_seen = datetime.fromtimestamp(
+            self._latest_tick() * self.config.interval_seconds, JETSON_TZ
+        ).isoformat()
+        return [
+            {
+                "device_id": d["device_id"],
+                "device_type": d["device_type"],
+                "ip_address": d["ip_address"],
+                "port": d["port"],
+                "status": "online",
+                "description": None,
+                "has_data": True,
+                "last_seen": last_seen,
+                "online": True,
+            }
+            for d in self.devices
+        ]
+
+
+class _StandInRequestHandler(BaseHTTPRequestHandler):
+    """Handler HTTP; la lógica vive en JetsonStandInServer."""
+
+    server_version = "JetsonStandIn/1.0"
+
+    def do_GET(self):  # noqa: N802 - nombre impuesto por BaseHTTPRequestHandler
+        self.server.standin.handle(self)
+
+    def log_message(self, format, *args):  # noqa: A002 - firma de la clase base
+        logger.debug("🛰️ stand-in: " + format, *args)
+
+
+class JetsonStandInServer:
+    """
+    Servidor HTTP multihilo que emula la API Jetson con fallas configurables.
+    """
+
+    def __init__(self, config: Optional[StandInConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StandInConfig()
+        self.dataset = SyntheticJetsonDataset(self.config)
+        self.host = host
+        self.port = port
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"requests": 0, "errors": 0, "records_served": 0, "by_endpoint": {}}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "JetsonStandInServer":
+        """Levantar el servidor en un hilo daemon; devuelve self."""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _StandInRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="jetson-standin", daemon=True)
+        self._thread.start()
+        logger.info(f"🛰️ Jetson stand-in escuchando en {self.base_url} ({len(self.dataset.devices)} dispositivos)")
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self) -> "JetsonStandInServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def serve_forever(self):
+        """Modo bloqueante para uso desde línea de comandos."""
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    # ------------------------------------------------------------------
+    # Manejo de peticiones
+    # ------------------------------------------------------------------
+
+    def _draw_faults(self) -> Tuple[float, bool]:
+        with self._lock:
+            delay = self.config.latency_ms
+            if self.config.jitter_ms:
+                delay += self._rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+            fail = self.config.error_rate > 0 and self._rng.random() < self.config.error_rate
+        return max(0.0, delay) / 1000.0, fail
+
+    def _record(self, endpoint: str, records: int = 0, error: bool = False):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["records_served"] += records
+            self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(endpoint, 0) + 1
+            if error:
+                self.stats["errors"] += 1
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        parsed = urlparse(request.path)
+        path = parsed.path.rstrip("/") or "/"
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        endpoint = "/data/{device_id}" if path.startswith("/data/") else path
+
+        delay, fail = self._draw_faults()
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            self._record(endpoint, error=True)
+            self._send(request, self.config.error_status, {
+                "success": False,
+                "message": "Error inyectado por stand-in",
+                "timestamp": self._timestamp(),
+            })
+            return
+
+        try:
+            status, payload, records = self.route(path, params)
+        except ValueError as e:
+            status, payload, records = 422, {"success": False, "message": str(e)}, 0
+
+        self._record(endpoint, records=records, error=status >= 400)
+        self._send(request, status, payload)
+
+    def route(self, path: str, params: Dict[str, str]) -> Tuple[int, Dict[str, Any], int]:
+        """Resolver una ruta a (status, payload, registros servidos)."""
+        all_ids = [d["device_id"] for d in self.dataset.devices]
+
+        if path == "/":
+            return 200, {
+                "success": True,
+                "message": "IoT Streamlit Backend API - Sistema activo",
+                "data": {"version": "1.0.0", "status": "/status", "devices": "/devices", "data": "/data"},
+                "timestamp": self._timestamp(),
+            }, 0
+
+        if path == "/health":
+            return 200, {
+                "status": "healthy",
+                "timestamp": self._timestamp(),
+                "database": "connected",
+                "devices_count": len(all_ids),
+                "cache": {"cache_ttl_seconds": 300, "source": "stand-in"},
+            }, 0
+
+        if path == "/devices":
+            devices = self.dataset.device_payload()
+            return 200, {"success": True, "data": devices, "count": len(devices)}, 0
+
+        if path == "/data" or path.startswith("/data/"):
+            device_ids = all_ids
+            if path.startswith("/data/"):
+                device_id = path.split("/", 2)[2]
+                if device_id not in all_ids:
+                    return 404, {"success": False, "message": f"Dispositivo {device_id} no encontrado"}, 0
+                device_ids = [device_id]
+
+            limit = int(float(params.get("limit", self.config.page_cap)))
+            limit = max(0, min(limit, self.config.page_cap))
+            hours = None
+            if "hours" in params:
+                hours = float(params["hours"])
+            elif "days" in params:
+                hours = float(params["days"]) * 24
+
+            offset = max(0, int(float(params.get("offset", 0))))
+            records = self.dataset.device_records(device_ids, hours, limit, offset)
+            return 200, {
+                "success": True,
+                "data": records,
+                "count": len(records),
+                "timestamp": self._timestamp(),
+            }, len(records)
+
+        return 404, {"success": False, "message": f"Endpoint {path} no existe"}, 0
+
+    def _timestamp(self) -> str:
+        return self.dataset.now().isoformat()
+
+    @staticmethod
+    def _send(request: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def create_standin_server(**kwargs) -> JetsonStandInServer:
+    """
+    Crear servidor sustituto a partir de argumentos de StandInConfig.
+
+    ``host`` y ``port`` se pasan al servidor; el resto a la configuración.
+    """
+    host = kwargs.pop("host", "127.0.0.1")
+    port = kwargs.pop("port", 0)
+    return JetsonStandInServer(StandInConfig(**kwargs), host=host, port=port)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor sustituto determinista de la API Jetson")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--sensors", type=int, default=None, help="Sensores por dispositivo")
+    parser.add_argument("--interval", type=float, default=10.0, help="Segundos entre lecturas")
+    parser.add_argument("--history-hours", type=float, default=24.0 * 30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--page-cap", type=int, default=REAL_PAGE_CAP)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = create_standin_server(
+        host=args.host,
+        port=args.port,
+        devices=args.devices,
+        sensors_per_device=args.sensors,
+        interval_seconds=args.interval,
+        history_hours=args.history_hours,
+        seed=args.seed,
+        page_cap=args.page_cap,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+    )
+    print(f"🛰️ Jetson stand-in en http://{args.host}:{args.port} (Ctrl+C para detener)")
+    server.serve_forever()
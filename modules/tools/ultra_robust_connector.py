@@ -10,22 +10,33 @@ import requests
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import math
 import time
 import json
 
+from modules.utils.reading_tiers import TieredReadingStore, reading_store as shared_reading_store
+
 logger = logging.getLogger(__name__)
 
+# Tope de registros por respuesta de la API de la Jetson
+API_PAGE_SIZE = 200
+
 class UltraRobustJetsonConnector:
     """
     Conector ultra-robusto que garantiza acceso a los datos de la API Jetson
     mediante múltiples estrategias de conexión y fallback.
     """
     
-    def __init__(self, base_url: str, max_retries: int = 5, timeout: int = 30):
+    def __init__(self, base_url: str, max_retries: int = 5, timeout: int = 30,
+                 reading_store: Optional[TieredReadingStore] = None):
         self.base_url = base_url.rstrip('/')
         self.max_retries = max_retries
         self.timeout = timeout
         
+        # Almacén local por niveles (raw/1m/15m/1h/1d) alimentado por cada descarga
+        self.reading_store = reading_store if reading_store is not None else shared_reading_store
+        self._last_fetch: Tuple[float, float] = (0.0, 0.0)   # (time.time(), horas pedidas)
+        
         # Configuración de sesión HTTP robusta
         self.session = requests.Session()
         self.session.headers.update({
@@ -300,6 +311,7 @@ class UltraRobustJetsonConnector:
         PRIORIDAD: Usar endpoint /data REAL con filtros temporales confirmados funcionando.
         """
         logger.info(f"🚀 Iniciando recolección comprehensiva REAL de datos ({hours}h, max {max_records_per_device}/device)")
+        self._last_fetch = (time.time(), hours)
         
         # ESTRATEGIA 1: ENDPOINT REAL /data CON FILTROS TEMPORALES - CONFIRMADO FUNCIONANDO
         logger.info("📊 ESTRATEGIA 1: Usando endpoint REAL /data con filtros temporales...")
@@ -345,7 +357,7 @@ class UltraRobustJetsonConnector:
                         valid_records.append(record)
                 
                 logger.info(f"🎯 DATOS REALES OBTENIDOS: {len(valid_records)} registros válidos")
-                return valid_records
+                return self._store_records(valid_records)
             else:
                 logger.warning(f"⚠️ Respuesta exitosa pero formato inesperado: {response_data}")
         else:
@@ -387,7 +399,7 @@ class UltraRobustJetsonConnector:
                     valid_records.append(record)
             
             logger.info(f"🎯 DATOS REALES (FALLBACK): {len(valid_records)} registros válidos")
-            return valid_records
+            return self._store_records(valid_records)
         
         # FALLBACK: Método anterior solo si el endpoint real falla
         logger.warning("⚠️ Endpoint REAL /data falló, usando fallback por dispositivos...")
@@ -425,7 +437,109 @@ class UltraRobustJetsonConnector:
         except:
             logger.warning("⚠️ No se pudo ordenar por timestamp")
         
-        return valid_records
+        return self._store_records(valid_records)
+    
+    @staticmethod
+    def _window_params(hours: float) -> Dict[str, Any]:
+        """Filtro temporal de /data: ``hours`` hasta 24h, luego ``days`` (redondeado hacia arriba)"""
+        if hours <= 24:
+            return {'hours': hours}
+        return {'days': min(30, math.ceil(hours / 24))}
+    
+    def fetch_window(self, hours: float, max_records_per_device: int = 20000) -> List[Dict[str, Any]]:
+        """
+        Descargar la ventana completa de cada dispositivo paginando con
+        ``offset`` sobre el tope de 200 registros por respuesta, y guardarla
+        en el almacén local.
+        
+        Por dispositivo se detiene con una página incompleta (ventana
+        agotada), cuando la API repite registros (versiones que ignoran
+        ``offset``) o al llegar a ``max_records_per_device``.
+        
+        Returns:
+            Registros válidos descargados (vacío si la API no responde)
+        """
+        self._last_fetch = (time.time(), hours)
+        success, response = self._make_robust_request('/devices')
+        if not success:
+            logger.warning(f"⚠️ API no disponible para descargar la ventana: {response}")
+            return []
+        devices = response.get('data', []) if isinstance(response, dict) else response
+        device_ids = [d.get('device_id') for d in devices or [] if isinstance(d, dict) and d.get('device_id')]
+        
+        records: List[Dict[str, Any]] = []
+        for device_id in device_ids:
+            fetched, seen = 0, set()
+            while fetched < max_records_per_device:
+                requested = min(API_PAGE_SIZE, max_records_per_device - fetched)
+                params = {**self._window_params(hours), 'limit': requested, 'offset': fetched}
+                success, response = self._make_robust_request(f'/data/{device_id}', params=params)
+                page = response.get('data', []) if success and isinstance(response, dict) else []
+                new = []
+                for record in page:
+                    key = (record.get('timestamp'), record.get('sensor_type'))
+                    if key not in seen and self._validate_record(record):
+                        seen.add(key)
+                        new.append(record)
+                records.extend(new)
+                fetched += len(page)
+                if not new or len(page) < requested:
+                    break
+            logger.info(f"📄 {device_id}: {len(seen)} registros en {hours:g}h")
+        
+        return self._store_records(records)
+    
+    def _store_records(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Incorporar los registros descargados al almacén local por niveles"""
+        try:
+            added = self.reading_store.ingest(records)
+            if added:
+                logger.debug(f"🗄️ Almacén local: {added} lecturas nuevas")
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron guardar lecturas en el almacén local: {e}")
+        return records
+    
+    def get_series_for_window(self, hours: float, max_points: Optional[int] = 500,
+                              resolution: Optional[timedelta] = None,
+                              device_ids: Optional[List[str]] = None,
+                              sensor_types: Optional[List[str]] = None,
+                              max_records_per_device: int = 20000) -> Dict[str, Any]:
+        """
+        Series de la ventana desde el nivel de rollup adecuado del almacén local.
+        
+        Se elige el nivel más grueso que cumple ``resolution`` (o ``max_points``
+        por serie), así una ventana de 30 días devuelve un número acotado de
+        filas. Solo se consulta la API si el almacén no cubre la ventana (y no
+        se acaba de pedir) o si su última ingesta quedó vieja; en ese caso se
+        piden únicamente las horas transcurridas desde la última descarga,
+        paginadas por dispositivo (``fetch_window``).
+        
+        Returns:
+            Dict con ``data`` (filas por intervalo) y ``plan`` (nivel elegido)
+        """
+        store = self.reading_store
+        plan = store.plan(hours, max_points=max_points, resolution=resolution,
+                          device_ids=device_ids, sensor_types=sensor_types)
+        
+        fetched_at, fetched_hours = self._last_fetch
+        recent_hours = fetched_hours if time.time() - fetched_at <= store.stale_after.total_seconds() else 0.0
+        fetch_hours = None
+        if not plan.covered and hours > recent_hours:
+            # Ventana más larga que lo ya descargado: pedirla completa
+            fetch_hours = hours
+        elif plan.covered and store.is_stale():
+            # Solo el tramo nuevo (con margen para lecturas en tránsito)
+            fetch_hours = min(hours, store.seconds_since_ingest() / 3600 + 0.25)
+        
+        if fetch_hours is not None:
+            logger.info(f"📡 Almacén local sin cobertura/actualización: descargando {fetch_hours:.2f}h")
+            self.fetch_window(fetch_hours, max_records_per_device=max_records_per_device)
+            plan = store.plan(hours, max_points=max_points, resolution=resolution,
+                              device_ids=device_ids, sensor_types=sensor_types)
+        
+        data = store.query(plan, device_ids=device_ids, sensor_types=sensor_types)
+        logger.info(f"🗄️ Ventana {hours}h desde nivel {plan.tier}: {len(data)} filas")
+        return {'data': data, 'plan': plan.to_dict()}
     
     def _validate_record(self, record: Dict[str, Any]) -> bool:
         """
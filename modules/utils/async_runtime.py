@@ -0,0 +1,135 @@
+"""
+Event Loop Persistente en Segundo Plano
+=======================================
+
+Un hilo daemon ejecuta un único event loop durante toda la vida del
+proceso. Los llamadores síncronos (Streamlit) entregan corrutinas con
+``submit()`` y reciben un ``concurrent.futures.Future``, de modo que los
+pools HTTP asíncronos, clientes LLM y cachés ligados al loop sobreviven
+entre turnos de chat en lugar de recrearse con cada ``asyncio.run``.
+
+``agent_runtime`` es el loop compartido por todos los agentes del proceso:
+crear un agente por turno no crea hilos nuevos.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+import weakref
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Loops creados en el proceso (referencias débiles: no los mantienen vivos)
+_instances: "weakref.WeakSet[BackgroundEventLoop]" = weakref.WeakSet()
+
+
+class BackgroundEventLoop:
+    """
+    Event loop de larga vida en un hilo propio.
+
+    El hilo se crea en el primer ``submit()`` y se detiene con ``stop()``
+    (también al salir del proceso).
+    """
+
+    def __init__(self, name: str = "async-runtime"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.submitted = 0
+        _instances.add(self)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Loop en ejecución (se inicia si hace falta)."""
+        self.start()
+        return self._loop
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "BackgroundEventLoop":
+        """Arrancar el hilo del loop si no está corriendo."""
+        with self._lock:
+            if self.is_running:
+                return self
+            self._ready.clear()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._ready.wait()
+        logger.info(f"🔁 Event loop persistente '{self.name}' iniciado")
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._ready.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._shutdown_loop()
+
+    def _shutdown_loop(self):
+        pending = [task for task in asyncio.all_tasks(self._loop) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        self._loop.close()
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """
+        Programar una corrutina en el loop persistente (seguro entre hilos).
+
+        Returns:
+            Future con el resultado de la corrutina
+        """
+        loop = self.loop
+        self.submitted += 1
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        Ejecutar una corrutina y esperar su resultado desde código síncrono.
+
+        Raises:
+            RuntimeError: Si se llama desde el propio hilo del loop (bloquearía)
+            concurrent.futures.TimeoutError: Si se supera ``timeout``
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run() no puede llamarse desde el hilo del event loop; use await")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 5.0):
+        """Detener el loop y esperar al hilo."""
+        with self._lock:
+            if not self.is_running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info(f"⏹️ Event loop persistente '{self.name}' detenido")
+
+
+def _stop_all():
+    """Detener al salir del proceso los loops que sigan vivos"""
+    for runtime in list(_instances):
+        runtime.stop()
+
+
+atexit.register(_stop_all)
+
+# Instancia global compartida por los agentes
+agent_runtime = BackgroundEventLoop(name="cloud-iot-agent-loop")
@@ -0,0 +1,422 @@
+"""
+Servicio de Renderizado de Gráficos Raster
+==========================================
+
+Renderiza los gráficos de ``IoTVisualizationEngine`` sin pasar por pyplot:
+
+- Lienzos Agg preconfigurados y reutilizados por proceso (sin crear una
+  figura nueva por llamada)
+- DPI, tamaño y densidad de marcadores según la cantidad de puntos y el
+  tamaño de visualización destino (en vez de 300 DPI fijos)
+- Salida PNG o WebP
+- Caché de imágenes por hash de (watermark de los datos, especificación)
+
+Los gráficos se renderizan en el proceso actual: con 3 gráficos por
+solicitud, un pool de procesos tardaba más que el renderizado en serie
+(serializar los frames y arrancar los procesos cuesta más que lo que
+se paraleliza).
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import matplotlib
+matplotlib.use('Agg')  # Backend sin display para cloud deployment
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from modules.utils.plot_data import SeriesFrames, prepare_series, series_stats
+from modules.utils.tracing import COUNTER_CACHE_HITS, COUNTER_CACHE_MISSES, tracer
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import features as _pil_features
+    WEBP_AVAILABLE = bool(_pil_features.check('webp'))
+except Exception:
+    WEBP_AVAILABLE = False
+
+MIME_TYPES = {'png': 'image/png', 'webp': 'image/webp'}
+
+# Ancho (pulgadas) con el que se diseñó cada tipo de gráfico; el DPI escala al tamaño destino
+BASE_WIDTH_IN = {'time_series': 12.0, 'statistics': 14.0, 'prediction': 14.0}
+
+MIN_DPI = 50
+MAX_DPI = 200
+MARKER_SPACING_PX = 10  # Separación mínima entre marcadores para que no se solapen
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """Especificación de un gráfico (forma parte de la clave de caché)"""
+    kind: str                           # 'time_series', 'statistics' o 'prediction'
+    title: str = ""
+    width_px: int = 1100                # Tamaño de visualización destino
+    height_px: int = 650
+    image_format: str = 'png'           # 'png' o 'webp'
+    hours_ahead: int = 24               # Solo 'prediction'
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """Parámetros de dibujo derivados del volumen de datos y del tamaño destino"""
+    dpi: int
+    figsize: Tuple[float, float]
+    marker: Optional[str]
+    markersize: float
+    markevery: Optional[int]
+    linewidth: float
+
+
+@dataclass
+class ChartImage:
+    """Imagen renderizada"""
+    data: bytes
+    image_format: str
+    width_px: int
+    height_px: int
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.image_format]
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+    def data_uri(self) -> str:
+        return f"data:{self.mime_type};base64,{self.to_base64()}"
+
+
+def render_profile(spec: ChartSpec, points_per_series: int) -> RenderProfile:
+    """
+    DPI para que la figura mida ``width_px`` sin cambiar el diseño en
+    pulgadas, y marcadores solo mientras quepan sin solaparse.
+    """
+    width_in = BASE_WIDTH_IN.get(spec.kind, 12.0)
+    dpi = int(min(MAX_DPI, max(MIN_DPI, round(spec.width_px / width_in))))
+    figsize = (spec.width_px / dpi, spec.height_px / dpi)
+
+    plot_width_px = spec.width_px * 0.75
+    max_markers = max(1, int(plot_width_px / MARKER_SPACING_PX))
+    if points_per_series <= max_markers:
+        marker, markersize, markevery = 'o', 4.0, None
+    elif points_per_series <= 4 * max_markers:
+        marker, markersize, markevery = 'o', 3.0, math.ceil(points_per_series / max_markers)
+    else:
+        marker, markersize, markevery = None, 0.0, None
+    linewidth = 2.0 if points_per_series < plot_width_px else 1.0
+    return RenderProfile(dpi, figsize, marker, markersize, markevery, linewidth)
+
+
+def _frame(data: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> pd.DataFrame:
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data))
+    if df.empty:
+        return df
+    # Solo las columnas graficadas (la normalización la hace ``prepare_series``)
+    columns = [col for col in ('device_id', 'sensor_type', 'value', 'timestamp') if col in df.columns]
+    return df[columns]
+
+
+def data_watermark(df: pd.DataFrame) -> str:
+    """Hash del contenido del frame (vectorizado, independiente del índice)"""
+    if df.empty:
+        return "empty"
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes() + ",".join(df.columns).encode()).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Lienzos reutilizables (uno por hilo y disposición)
+# ---------------------------------------------------------------------------
+
+_figures = threading.local()
+
+
+def _acquire_figure(profile: RenderProfile) -> Figure:
+    """Figura Agg limpia, reutilizada si ya existe una con el mismo tamaño y DPI"""
+    cache = getattr(_figures, 'cache', None)
+    if cache is None:
+        cache = _figures.cache = {}
+    key = (profile.figsize, profile.dpi)
+    fig = cache.get(key)
+    if fig is None:
+        if len(cache) >= 8:
+            cache.pop(next(iter(cache)))
+        fig = cache[key] = Figure(figsize=profile.figsize, dpi=profile.dpi)
+        FigureCanvasAgg(fig)
+    else:
+        fig.clear()
+        # clear() conserva los márgenes que dejó tight_layout en el uso anterior
+        fig.subplotpars.update(**{name: matplotlib.rcParams[f'figure.subplot.{name}']
+                                  for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')})
+    return fig
+
+
+# ---------------------------------------------------------------------------
+# Dibujo por tipo de gráfico
+# ---------------------------------------------------------------------------
+
+def _draw_time_series(fig: Figure, series: SeriesFrames, spec: ChartSpec, profile: RenderProfile) -> bool:
+    if not len(series):
+        return False
+    ax = fig.add_subplot()
+
+    # Una línea por dispositivo y tipo de sensor
+    for (device_id, sensor_type), sensor_data in series:
+        label = f"{device_id} - {sensor_type}"
+        ax.plot(sensor_data['timestamp'], sensor_data['value'], marker=profile.marker,
+                markersize=profile.markersize, markevery=profile.markevery,
+                linewidth=profile.linewidth, label=label, alpha=0.8)
+
+    ax.set_title(spec.title, fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel('Tiempo', fontsize=12)
+    ax.set_ylabel('Valor del Sensor', fontsize=12)
+    ax.legend(bbox_to_anchor=(1.02, 1), loc='upper left')
+    ax.grid(True, alpha=0.3)
+
+    # Formato de fechas en eje X (el localizador automático evita miles de ticks en rangos largos)
+    locator = mdates.AutoDateLocator(maxticks=12)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+    return True
+
+
+def _draw_statistics(fig: Figure, series: SeriesFrames, spec: ChartSpec, profile: RenderProfile) -> bool:
+    # Calcular estadísticas por sensor y dispositivo
+    stats = series_stats(series).reset_index()
+    if stats.empty:
+        return False
+    df = series.frame
+
+    (ax1, ax2), (ax3, ax4) = fig.subplots(2, 2)
+    labels = [f"{device}\n{sensor}" for device, sensor in zip(stats['device_id'], stats['sensor_type'])]
+
+    # Gráfico 1: Promedio por sensor
+    sensor_groups = stats.groupby('sensor_type')['mean'].mean().sort_values(ascending=False)
+    ax1.bar(range(len(sensor_groups)), sensor_groups.values, color='skyblue', alpha=0.8)
+    ax1.set_title('Valor Promedio por Tipo de Sensor', fontweight='bold')
+    ax1.set_xticks(range(len(sensor_groups)))
+    ax1.set_xticklabels(sensor_groups.index, rotation=45)
+    ax1.set_ylabel('Valor Promedio')
+
+    # Gráfico 2: Cantidad de registros por dispositivo
+    device_counts = df['device_id'].value_counts()
+    ax2.pie(device_counts.values, labels=device_counts.index, autopct='%1.1f%%',
+            colors=['lightcoral', 'lightblue', 'lightgreen', 'lightyellow'])
+    ax2.set_title('Distribución de Registros por Dispositivo', fontweight='bold')
+
+    # Gráfico 3: Rango de valores (min-max) por sensor
+    x_pos = range(len(stats))
+    ax3.errorbar(x_pos, stats['mean'].to_numpy(),
+                 yerr=[(stats['mean'] - stats['min']).to_numpy(), (stats['max'] - stats['mean']).to_numpy()],
+                 fmt='o', capsize=5, capthick=2, alpha=0.8)
+    ax3.set_title('Rango de Valores por Sensor', fontweight='bold')
+    ax3.set_xticks(x_pos)
+    ax3.set_xticklabels(labels, rotation=45)
+    ax3.set_ylabel('Valor')
+
+    # Gráfico 4: Desviación estándar
+    ax4.bar(x_pos, stats['std'], color='orange', alpha=0.7)
+    ax4.set_title('Desviación Estándar por Sensor', fontweight='bold')
+    ax4.set_xticks(x_pos)
+    ax4.set_xticklabels(labels, rotation=45)
+    ax4.set_ylabel('Desviación Estándar')
+
+    fig.suptitle(spec.title, fontsize=16, fontweight='bold', y=0.98)
+    return True
+
+
+def _draw_prediction(fig: Figure, series: SeriesFrames, spec: ChartSpec, profile: RenderProfile) -> bool:
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import PolynomialFeatures
+
+    axes = fig.subplots(2, 2).flatten()
+
+    plot_count = 0
+    max_plots = 4
+
+    for (device_id, sensor_type), sensor_data in series:
+        if plot_count >= max_plots:
+            break
+
+        if len(sensor_data) < 5:
+            continue
+
+        # Preparar datos para predicción
+        time_numeric = (sensor_data['timestamp'] - sensor_data['timestamp'].min()).dt.total_seconds() / 3600
+        X = time_numeric.values.reshape(-1, 1)
+        y = sensor_data['value'].values
+
+        # Crear modelo polinomial simple
+        poly_features = PolynomialFeatures(degree=2)
+        model = LinearRegression()
+        model.fit(poly_features.fit_transform(X), y)
+
+        # Generar predicción
+        last_time = time_numeric.max()
+        future_times = np.linspace(last_time, last_time + spec.hours_ahead, 50)
+        future_predictions = model.predict(poly_features.transform(future_times.reshape(-1, 1)))
+
+        # Crear timestamps futuros
+        future_timestamps = [sensor_data['timestamp'].max() + timedelta(hours=h)
+                             for h in (future_times - last_time)]
+
+        ax = axes[plot_count]
+
+        # Plotear datos históricos
+        ax.plot(sensor_data['timestamp'], sensor_data['value'], marker=profile.marker,
+                markersize=profile.markersize, markevery=profile.markevery,
+                label='Datos Históricos', linewidth=profile.linewidth)
+
+        # Plotear predicción
+        ax.plot(future_timestamps, future_predictions,
+                '--', label=f'Predicción {spec.hours_ahead}h', linewidth=2, alpha=0.8, color='red')
+
+        ax.set_title(f'{device_id} - {sensor_type}', fontweight='bold')
+        ax.set_xlabel('Tiempo')
+        ax.set_ylabel('Valor')
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+
+        # Formato de fechas
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+
+        plot_count += 1
+
+    if plot_count == 0:
+        return False
+
+    # Ocultar subplots no utilizados
+    for i in range(plot_count, max_plots):
+        axes[i].set_visible(False)
+
+    fig.suptitle(spec.title, fontsize=16, fontweight='bold', y=0.98)
+    return True
+
+
+DRAWERS: Dict[str, Callable[[Figure, SeriesFrames, ChartSpec, RenderProfile], bool]] = {
+    'time_series': _draw_time_series,
+    'statistics': _draw_statistics,
+    'prediction': _draw_prediction,
+}
+
+
+def render_chart(spec: ChartSpec, df: pd.DataFrame) -> Optional[ChartImage]:
+    """
+    Renderizar un gráfico sobre el lienzo reutilizado del hilo actual.
+
+    Returns:
+        ChartImage o None si no hay nada que graficar
+    """
+    drawer = DRAWERS.get(spec.kind)
+    if drawer is None:
+        raise ValueError(f"Tipo de gráfico desconocido: {spec.kind}")
+    image_format = spec.image_format if spec.image_format in MIME_TYPES else 'png'
+    if image_format == 'webp' and not WEBP_AVAILABLE:
+        image_format = 'png'
+
+    series = prepare_series(df)
+    profile = render_profile(spec, int(series.sizes.max()) if len(series) else 0)
+    fig = _acquire_figure(profile)
+    if not drawer(fig, series, spec, profile):
+        fig.clear()
+        return None
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=image_format, dpi=profile.dpi, bbox_inches='tight')
+    fig.clear()
+    return ChartImage(buffer.getvalue(), image_format, spec.width_px, spec.height_px)
+
+
+class ChartRenderer:
+    """
+    Renderizado con caché por (watermark de datos, especificación).
+
+    Args:
+        cache_size: Imágenes retenidas en caché
+    """
+
+    def __init__(self, cache_size: int = 64):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Optional[ChartImage]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @staticmethod
+    def cache_key(spec: ChartSpec, df: pd.DataFrame) -> str:
+        payload = f"{data_watermark(df)}|{astuple(spec)!r}"
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _lookup(self, key: str) -> Tuple[bool, Optional[ChartImage]]:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                tracer.increment(COUNTER_CACHE_HITS)
+                return True, self._cache[key]
+            self.cache_misses += 1
+            tracer.increment(COUNTER_CACHE_MISSES)
+            return False, None
+
+    def _store(self, key: str, image: Optional[ChartImage]):
+        with self._lock:
+            self._cache[key] = image
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def render(self, spec: ChartSpec, data: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> Optional[ChartImage]:
+        """Renderizar (o recuperar de la caché) un gráfico"""
+        return self.render_many([(spec, data)])[0]
+
+    def render_many(self, jobs: Sequence[Tuple[ChartSpec, Union[pd.DataFrame, Iterable[Dict[str, Any]]]]]
+                    ) -> List[Optional[ChartImage]]:
+        """Renderizar varios gráficos; solo se dibujan los que no están en caché"""
+        for spec, _ in jobs:
+            if spec.kind not in DRAWERS:
+                raise ValueError(f"Tipo de gráfico desconocido: {spec.kind}")
+
+        results: List[Optional[ChartImage]] = []
+        for spec, data in jobs:
+            df = _frame(data)
+            key = self.cache_key(spec, df)
+            hit, image = self._lookup(key)
+            if not hit:
+                image, ok = self._render_safely(spec, df)
+                if ok:  # Los errores no se guardan: el próximo pedido vuelve a intentarlo
+                    self._store(key, image)
+            results.append(image)
+        return results
+
+    @staticmethod
+    def _render_safely(spec: ChartSpec, df: pd.DataFrame) -> Tuple[Optional[ChartImage], bool]:
+        try:
+            return render_chart(spec, df), True
+        except Exception as e:
+            logger.error(f"Error generando gráfico {spec.kind}: {e}")
+            return None, False
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Instancia global compartida por los motores de visualización
+chart_renderer = ChartRenderer()
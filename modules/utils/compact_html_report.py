@@ -0,0 +1,363 @@
+"""
+Reportes HTML Compactos y Autocontenidos
+========================================
+
+Escritor de reportes HTML interactivos livianos:
+
+- Cada serie se guarda UNA sola vez en un payload binario compartido
+  (timestamps Float64 codificados en deltas + valores Float32), comprimido
+  con deflate y codificado en base64.
+- Las figuras referencian las series por id en lugar de repetir los
+  arreglos; los templates de layout se guardan una vez.
+- plotly.js va fijado a la versión instalada de plotly: por defecto
+  incrustado en el HTML (``inline``, funciona sin acceso a Internet, ~3.5 MB
+  más por reporte); como archivo hermano (``sibling``, con ``write_bundle``)
+  o desde el CDN (``cdn``, requiere Internet, el HTML pesa solo sus datos).
+- Los gráficos se dibujan al entrar en pantalla (IntersectionObserver).
+
+El navegador descomprime con ``DecompressionStream`` (Chrome 80+,
+Firefox 113+, Safari 16.4+); con ``compress=False`` el payload va sin
+comprimir para navegadores más antiguos.
+"""
+
+import base64
+import hashlib
+import html
+import json
+import logging
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PLOTLY_MODE_CDN = "cdn"
+PLOTLY_MODE_INLINE = "inline"
+PLOTLY_MODE_SIBLING = "sibling"
+
+
+def _plotly_version() -> str:
+    import plotly
+    return plotly.__version__
+
+
+def plotly_asset_name() -> str:
+    """Nombre del archivo hermano con la versión fijada de plotly.js."""
+    return f"plotly-{_plotly_version()}.min.js"
+
+
+def _value_text_template(text: Any, values: Any) -> Optional[str]:
+    """
+    ``texttemplate`` equivalente a etiquetas por punto que solo formatean
+    el valor (``f'{v:.1f}'``), o None si las etiquetas dicen otra cosa.
+    """
+    if not isinstance(text, list) or not isinstance(values, list) or len(text) != len(values):
+        return None
+    for decimals in range(4):
+        try:
+            if all(str(label) == f"{float(value):.{decimals}f}" for label, value in zip(text, values)):
+                return f"%{{y:.{decimals}f}}"
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def _to_wall_clock_ms(timestamps: Sequence[Any]) -> np.ndarray:
+    """
+    Convertir timestamps a milisegundos de "hora de pared".
+
+    Se descarta el offset de zona horaria (igual que hace plotly.js con las
+    cadenas ISO), de modo que el eje muestre la hora local del dispositivo.
+    """
+    out = np.empty(len(timestamps), dtype=np.float64)
+    for i, ts in enumerate(timestamps):
+        if isinstance(ts, datetime):
+            dt = ts
+        else:
+            try:
+                dt = datetime.fromisoformat(str(ts).replace('Z', '+00:00'))
+            except ValueError:
+                out[i] = np.nan
+                continue
+        out[i] = (dt.replace(tzinfo=None) - datetime(1970, 1, 1)).total_seconds() * 1000.0
+    return out
+
+
+class CompactHTMLReport:
+    """
+    Constructor de un reporte HTML con payload de series compartido.
+
+    Uso::
+
+        report = CompactHTMLReport("Reporte IoT")
+        report.add_series("s0", timestamps, values)
+        report.add_figure("Temperatura", [{"series": "s0", "type": "line", "name": "t1"}])
+        html_text = report.render()
+    """
+
+    def __init__(self, title: str, plotly_mode: str = PLOTLY_MODE_INLINE, compress: bool = True,
+                 extra_css: str = ""):
+        self.title = title
+        self.extra_css = extra_css
+        self.plotly_mode = plotly_mode
+        self.compress = compress
+        self._series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._figures: List[Dict[str, Any]] = []
+        self._templates: Dict[str, Any] = {}
+        self._sections: List[str] = []
+
+    # ------------------------------------------------------------------
+    # Contenido
+    # ------------------------------------------------------------------
+
+    def add_series(self, series_id: str, timestamps: Sequence[Any], values: Sequence[Any]) -> str:
+        """Registrar una serie temporal (se almacena una sola vez)."""
+        if series_id not in self._series:
+            times = _to_wall_clock_ms(timestamps)
+            vals = np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+            valid = ~np.isnan(times)  # Los deltas no admiten timestamps inválidos
+            self._series[series_id] = (times[valid], vals[valid])
+        return series_id
+
+    def add_html(self, fragment: str):
+        """Agregar HTML estático (encabezados, métricas, listas) en orden."""
+        self._sections.append(fragment)
+
+    def add_figure(self, title: str, traces: List[Dict[str, Any]],
+                   layout: Optional[Dict[str, Any]] = None, height: int = 450) -> str:
+        """
+        Agregar una figura cuyas trazas referencian series por id.
+
+        Cada traza es un dict de plotly.js; la clave ``series`` se reemplaza
+        en el navegador por ``x``/``y``. ``type`` acepta además ``line`` y
+        ``area`` como atajos, y ``color_by_value`` colorea marcadores con ``y``.
+        """
+        figure_id = f"fig{len(self._figures)}"
+        layout = dict(layout or {})
+        template = layout.pop('template', None)
+        if template:
+            layout['template'] = self._template_ref(template)
+        self._figures.append({"id": figure_id, "traces": traces, "layout": layout, "height": height})
+        heading = f'<h3>{html.escape(title)}</h3>' if title else ''
+        self._sections.append(
+            f'<div class="chart-container">{heading}'
+            f'<div class="lazy-chart" id="{figure_id}" style="height:{height}px">'
+            f'<span class="chart-placeholder">Cargando gráfico…</span></div></div>'
+        )
+        return figure_id
+
+    def add_plotly_figure(self, title: str, fig, series_refs: Optional[Dict[int, str]] = None,
+                          height: int = 450) -> str:
+        """
+        Agregar una figura de plotly reemplazando los arreglos x/y de las
+        trazas indicadas (``índice -> id de serie``) por referencias.
+
+        Las etiquetas por punto que solo formatean el valor pasan a un
+        ``texttemplate``; las demás se conservan. ``hovertext``/``customdata``
+        se descartan y los colores de marcador por punto pasan a derivarse
+        del valor en el navegador.
+        """
+        from plotly.utils import PlotlyJSONEncoder
+
+        spec = json.loads(json.dumps(fig.to_plotly_json(), cls=PlotlyJSONEncoder))
+        traces = spec.get('data', [])
+        for index, series_id in (series_refs or {}).items():
+            if index >= len(traces):
+                continue
+            trace = traces[index]
+            template = _value_text_template(trace.get('text'), trace.get('y'))
+            if template:
+                trace.pop('text')
+                trace.setdefault('texttemplate', template)
+            for key in ('x', 'y', 'hovertext', 'customdata'):
+                trace.pop(key, None)
+            marker = trace.get('marker')
+            if isinstance(marker, dict) and isinstance(marker.get('color'), list):
+                marker.pop('color')
+                trace['color_by_value'] = True
+            trace['series'] = series_id
+        return self.add_figure(title, traces, spec.get('layout', {}), height)
+
+    def _template_ref(self, template: Any) -> str:
+        encoded = json.dumps(template, sort_keys=True, default=str)
+        key = hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:12]
+        self._templates.setdefault(key, json.loads(encoded))
+        return f"@template:{key}"
+
+    # ------------------------------------------------------------------
+    # Payload
+    # ------------------------------------------------------------------
+
+    def build_payload(self) -> Tuple[Dict[str, Any], str]:
+        """
+        Empaquetar todas las series en un buffer binario.
+
+        Returns:
+            Tupla (manifiesto con offsets por serie, buffer en base64)
+        """
+        manifest = {"compressed": self.compress, "series": {}}
+        time_chunks, value_chunks = [], []
+        time_offset = value_offset = 0
+
+        for series_id, (times, values) in self._series.items():
+            deltas = np.diff(times, prepend=0.0) if len(times) else times
+            time_chunks.append(deltas.astype('<f8').tobytes())
+            value_chunks.append(values.astype('<f4').tobytes())
+            manifest["series"][series_id] = {"n": int(len(times)), "t": time_offset, "v": value_offset}
+            time_offset += len(times)
+            value_offset += len(values)
+
+        manifest["values_byte_offset"] = time_offset * 8
+        raw = b"".join(time_chunks) + b"".join(value_chunks)
+        if self.compress:
+            raw = zlib.compress(raw, 9)
+        return manifest, base64.b64encode(raw).decode('ascii')
+
+    # ------------------------------------------------------------------
+    # Render
+    # ------------------------------------------------------------------
+
+    def _plotly_script_tag(self) -> str:
+        if self.plotly_mode == PLOTLY_MODE_CDN:
+            return f'<script src="https://cdn.plot.ly/{plotly_asset_name()}" charset="utf-8"></script>'
+        if self.plotly_mode == PLOTLY_MODE_SIBLING:
+            return f'<script src="{plotly_asset_name()}"></script>'
+        from plotly.offline import get_plotlyjs
+        return f'<script type="text/javascript">/* plotly.js {_plotly_version()} */{get_plotlyjs()}</script>'
+
+    def render(self) -> str:
+        """HTML completo del reporte."""
+        manifest, payload = self.build_payload()
+        spec = {"figures": self._figures, "templates": self._templates}
+        spec_json = json.dumps(spec, ensure_ascii=False, default=str).replace('</', '<\\/')
+
+        return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>{html.escape(self.title)}</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 40px; }}
+h1 {{ color: #2c3e50; }}
+h2 {{ color: #34495e; }}
+.metric {{ background: #ecf0f1; padding: 10px; margin: 10px 0; border-radius: 5px; }}
+.chart-container {{ margin: 20px 0; }}
+.chart-placeholder {{ color: #95a5a6; }}
+{self.extra_css}
+</style>
+{self._plotly_script_tag()}
+</head>
+<body>
+{''.join(self._sections)}
+<script type="application/json" id="report-manifest">{json.dumps(manifest)}</script>
+<script type="application/json" id="report-spec">{spec_json}</script>
+<script type="text/plain" id="report-payload">{payload}</script>
+<script>
+{_LAZY_RENDER_JS}
+</script>
+</body>
+</html>
+"""
+
+    def to_bytes(self) -> bytes:
+        return self.render().encode('utf-8')
+
+    def write_bundle(self, directory: str, filename: str = "reporte.html") -> Path:
+        """
+        Escribir el reporte y, en modo ``sibling``, el archivo fijado de plotly.js.
+
+        Returns:
+            Ruta del HTML generado
+        """
+        target = Path(directory)
+        target.mkdir(parents=True, exist_ok=True)
+        if self.plotly_mode == PLOTLY_MODE_SIBLING:
+            asset = target / plotly_asset_name()
+            if not asset.exists():
+                from plotly.offline import get_plotlyjs
+                asset.write_text(get_plotlyjs(), encoding='utf-8')
+        html_path = target / filename
+        html_path.write_text(self.render(), encoding='utf-8')
+        return html_path
+
+
+# Decodifica el payload una vez y dibuja cada figura al hacerse visible
+_LAZY_RENDER_JS = r"""
+(function () {
+  var manifest = JSON.parse(document.getElementById('report-manifest').textContent);
+  var spec = JSON.parse(document.getElementById('report-spec').textContent);
+  var b64 = document.getElementById('report-payload').textContent.trim();
+  var payloadPromise = null;
+
+  function loadPayload() {
+    if (payloadPromise) return payloadPromise;
+    var bin = Uint8Array.from(atob(b64), function (c) { return c.charCodeAt(0); });
+    var bufferPromise = manifest.compressed
+      ? new Response(new Blob([bin]).stream().pipeThrough(new DecompressionStream('deflate'))).arrayBuffer()
+      : Promise.resolve(bin.buffer);
+    payloadPromise = bufferPromise.then(function (buffer) {
+      var series = {};
+      Object.keys(manifest.series).forEach(function (id) {
+        var m = manifest.series[id];
+        var deltas = new Float64Array(buffer, m.t * 8, m.n);
+        var values = new Float32Array(buffer, manifest.values_byte_offset + m.v * 4, m.n);
+        var x = new Array(m.n), acc = 0;
+        for (var i = 0; i < m.n; i++) { acc += deltas[i]; x[i] = acc; }
+        series[id] = { x: x, y: Array.from(values) };
+      });
+      return series;
+    });
+    return payloadPromise;
+  }
+
+  function buildTrace(trace, series) {
+    var t = Object.assign({}, trace);
+    if (t.series) {
+      var s = series[t.series];
+      t.x = s.x; t.y = s.y;
+      delete t.series;
+    }
+    if (t.type === 'line') { t.type = 'scatter'; t.mode = t.mode || 'lines+markers'; }
+    if (t.type === 'area') { t.type = 'scatter'; t.mode = t.mode || 'lines'; t.fill = t.fill || 'tozeroy'; }
+    if (t.color_by_value) { t.marker = Object.assign({}, t.marker, { color: t.y }); delete t.color_by_value; }
+    return t;
+  }
+
+  function render(figure) {
+    loadPayload().then(function (series) {
+      var layout = Object.assign({}, figure.layout);
+      if (typeof layout.template === 'string' && layout.template.indexOf('@template:') === 0) {
+        layout.template = spec.templates[layout.template.slice(10)];
+      }
+      var hasSeries = figure.traces.some(function (t) { return t.series; });
+      if (hasSeries) {
+        layout.xaxis = Object.assign({ type: 'date' }, layout.xaxis);
+      }
+      var el = document.getElementById(figure.id);
+      el.innerHTML = '';
+      Plotly.newPlot(el, figure.traces.map(function (t) { return buildTrace(t, series); }), layout,
+                     { responsive: true, displaylogo: false });
+    });
+  }
+
+  var byId = {};
+  spec.figures.forEach(function (f) { byId[f.id] = f; });
+
+  if ('IntersectionObserver' in window) {
+    var observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          render(byId[entry.target.id]);
+        }
+      });
+    }, { rootMargin: '200px' });
+    spec.figures.forEach(function (f) { observer.observe(document.getElementById(f.id)); });
+  } else {
+    spec.figures.forEach(render);
+  }
+})();
+"""
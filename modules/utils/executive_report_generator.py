@@ -14,6 +14,8 @@ import json
 from io import BytesIO
 import base64
 
+from modules.utils.sketches import SketchAccumulator
+
 logger = logging.getLogger(__name__)
 
 class ExecutiveReportGenerator:
@@ -34,7 +36,8 @@ class ExecutiveReportGenerator:
             'include_trend_analysis': True,
             'include_performance_metrics': True,
             'include_recommendations': True,
-            'include_visualizations': True
+            'include_visualizations': True,
+            'chart_max_points': 500       # Puntos por serie en los gráficos (nivel de rollup)
         }
         
         logger.info("📊 ExecutiveReportGenerator inicializado")
@@ -65,8 +68,8 @@ class ExecutiveReportGenerator:
         # 6. Recomendaciones
         recommendations = self._generate_recommendations(raw_data, performance_analysis)
         
-        # 7. Visualizaciones
-        visualizations = self._generate_report_visualizations(raw_data)
+        # 7. Visualizaciones (desde el almacén por niveles: filas acotadas para cualquier período)
+        visualizations = self._generate_report_visualizations(self._chart_data(raw_data, hours))
         
         # 8. Métricas de calidad
         quality_metrics = self._calculate_quality_metrics(raw_data)
@@ -222,6 +225,8 @@ else 'en estado crítico que requiere intervención inmediata'}.
         # Análisis por dispositivo
         device_analysis = {}
         sensor_analysis = {}
+        device_sketches = SketchAccumulator()
+        sensor_sketches = SketchAccumulator()
         
         for record in data:
             device_id = record.get('device_id', 'unknown')
@@ -234,7 +239,6 @@ else 'en estado crítico que requiere intervención inmediata'}.
                 device_analysis[device_id] = {
                     'total_records': 0,
                     'sensors': set(),
-                    'values': [],
                     'timestamps': [],
                     'data_quality_score': 0
                 }
@@ -242,11 +246,13 @@ else 'en estado crítico que requiere intervención inmediata'}.
             device_analysis[device_id]['total_records'] += 1
             device_analysis[device_id]['sensors'].add(sensor_type)
             
-            if value is not None:
-                try:
-                    device_analysis[device_id]['values'].append(float(value))
-                except:
-                    pass
+            try:
+                numeric_value = float(value) if value is not None else None
+            except (TypeError, ValueError):
+                numeric_value = None
+            
+            if numeric_value is not None:
+                device_sketches.add(device_id, numeric_value)
             
             if timestamp:
                 device_analysis[device_id]['timestamps'].append(timestamp)
@@ -257,41 +263,44 @@ else 'en estado crítico que requiere intervención inmediata'}.
                 sensor_analysis[sensor_key] = {
                     'device_id': device_id,
                     'sensor_type': sensor_type,
-                    'values': [],
                     'statistics': {}
                 }
             
-            if value is not None:
-                try:
-                    sensor_analysis[sensor_key]['values'].append(float(value))
-                except:
-                    pass
+            if numeric_value is not None:
+                sensor_sketches.add(sensor_key, numeric_value)
         
         # Calcular estadísticas
         for device_id, stats in device_analysis.items():
             stats['sensors'] = list(stats['sensors'])
             stats['unique_sensors'] = len(stats['sensors'])
+            sketch = device_sketches.get(device_id)
             
-            if stats['values']:
-                stats['avg_value'] = sum(stats['values']) / len(stats['values'])
-                stats['min_value'] = min(stats['values'])
-                stats['max_value'] = max(stats['values'])
+            if sketch.count:
+                stats['avg_value'] = sketch.mean
+                stats['min_value'] = sketch.min
+                stats['max_value'] = sketch.max
                 stats['value_range'] = stats['max_value'] - stats['min_value']
             
             # Calcular score de calidad
-            completeness = len([v for v in stats['values'] if v is not None]) / max(1, stats['total_records'])
+            completeness = sketch.count / max(1, stats['total_records'])
             stats['data_quality_score'] = completeness * 100
         
+        # Estadísticas desde sketches (memoria acotada por sensor)
         for sensor_key, stats in sensor_analysis.items():
-            if stats['values'] and len(stats['values']) > 0:
-                values = stats['values']
+            sketch = sensor_sketches.get(sensor_key)
+            if sketch.count:
+                q1, median, q3, p95 = sketch.quantile([0.25, 0.5, 0.75, 0.95])
                 stats['statistics'] = {
-                    'count': len(values),
-                    'mean': sum(values) / len(values),
-                    'min': min(values),
-                    'max': max(values),
-                    'range': max(values) - min(values),
-                    'std_dev': self._calculate_std_dev(values) if len(values) > 1 else 0
+                    'count': sketch.count,
+                    'mean': sketch.mean,
+                    'min': sketch.min,
+                    'max': sketch.max,
+                    'range': sketch.max - sketch.min,
+                    'std_dev': sketch.std(),
+                    'median': float(median),
+                    'p95': float(p95),
+                    'iqr': float(q3 - q1),
+                    'distinct_values': sketch.distinct.count()
                 }
         
         return {
@@ -470,6 +479,20 @@ else 'en estado crítico que requiere intervención inmediata'}.
             'technical': technical
         }
     
+    def _chart_data(self, raw_data: List[Dict], hours: float) -> List[Dict]:
+        """
+        Series para los gráficos desde el nivel de rollup que cumple el
+        presupuesto de puntos; los datos crudos si el conector no lo soporta.
+        """
+        if not hasattr(self.connector, 'get_series_for_window'):
+            return raw_data
+        try:
+            series = self.connector.get_series_for_window(hours, max_points=self.report_config['chart_max_points'])
+            return series.get('data') or raw_data
+        except Exception as e:
+            logger.warning(f"Error obteniendo series por niveles: {e}")
+            return raw_data
+    
     def _generate_report_visualizations(self, data: List[Dict]) -> Dict[str, Any]:
         """
         Generar visualizaciones para el reporte.
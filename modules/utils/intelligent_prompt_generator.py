@@ -13,9 +13,12 @@ logger = logging.getLogger(__name__)
 
 def create_intelligent_prompt(user_query: str, intelligent_response: str, 
                                comprehensive_analysis: Dict, statistical_analysis: Dict, 
-                               raw_data: List) -> str:
+                               raw_data: List, prefiltered: bool = False) -> str:
     """
     Crear prompt inteligente específico según el tipo de consulta del usuario
+    
+    ``prefiltered`` indica que los datos ya llegan recortados por el plan de
+    consulta (ventana y series), así que no se vuelven a filtrar por tiempo.
     """
     query_lower = user_query.lower()
     
@@ -35,7 +38,7 @@ def create_intelligent_prompt(user_query: str, intelligent_response: str,
     
     # FILTRAR DATOS SI ES CONSULTA TEMPORAL
     filtered_data = raw_data
-    if is_temporal and raw_data:
+    if is_temporal and raw_data and not prefiltered:
         filtered_data = filter_data_by_time(raw_data, user_query)
     
     # CALCULAR ESTADÍSTICAS ESPECÍFICAS SI ES CONSULTA ESTADÍSTICA
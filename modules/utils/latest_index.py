@@ -0,0 +1,248 @@
+"""
+Índice de Últimos Valores por Sensor
+====================================
+
+Mantiene incrementalmente, por (device_id, sensor_type):
+
+- La lectura más reciente (valor, unidad, timestamp original)
+- El conteo acumulado de lecturas distintas vistas
+- El último visto por dispositivo, combinado con los metadatos de ``/devices``;
+  un dispositivo está activo si su última lectura tiene menos de
+  ``ACTIVE_WINDOW_MINUTES``
+- La hora de la última ingesta por dispositivo, para decidir si hay que
+  volver a consultar la API por ese dispositivo
+
+Se alimenta desde cualquier vía de ingesta activa (JetsonAPIConnector,
+DirectJetsonConnector, BulkIngestor) y permite que la pestaña Sistema y la
+barra lateral se rendericen en O(dispositivos) sin descargar lecturas.
+
+Los conectores lo importan al cargarse, así que pandas se importa recién en
+la primera ingesta y no en el arranque del agente.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SeriesKey = Tuple[str, str]
+
+ACTIVE_WINDOW_MINUTES = 15.0   # Antigüedad máxima de la última lectura de un dispositivo activo
+
+# Columnas de las filas de ingesta (mismo orden que ``bulk_ingest.INGEST_COLUMNS``)
+ROW_COLUMNS = ["device_id", "sensor_type", "value", "unit", "timestamp"]
+
+
+@dataclass
+class LatestReading:
+    """Última lectura conocida de una serie"""
+    device_id: str
+    sensor_type: str
+    value: Any
+    unit: str
+    timestamp: Any                     # Tal como llegó (se muestra sin reformatear)
+    observed_at: 'pd.Timestamp'        # Hora local del dispositivo, para comparar
+    raw_data: Any = None
+    count: int = 0                     # Lecturas distintas vistas desde el arranque
+    observed_utc: Optional['pd.Timestamp'] = None   # Instante real, si el timestamp traía offset
+
+    def age_seconds(self, now: Optional[datetime] = None) -> float:
+        """
+        Antigüedad de la lectura. Sin offset en el timestamp se compara en
+        hora local (la del equipo y la del dispositivo coinciden).
+        """
+        # Un ``now`` naive se interpreta en hora local
+        now = now.astimezone() if now is not None else datetime.now(timezone.utc)
+        if self.observed_utc is not None:
+            return (now - self.observed_utc).total_seconds()
+        local_now = now.astimezone().replace(tzinfo=None)
+        return (local_now - self.observed_at).total_seconds()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'value': self.value,
+            'unit': self.unit,
+            'timestamp': self.timestamp,
+            'raw_data': self.raw_data,
+            'count': self.count,
+        }
+
+
+class LatestValueIndex:
+    """
+    Últimos valores, último visto y conteos acumulados por serie.
+
+    Por serie solo se cuentan lecturas posteriores a la última vista, de
+    modo que volver a descargar una ventana solapada no duplica conteos
+    (las lecturas atrasadas que llegan fuera de orden no se cuentan).
+    La frescura del índice se lleva por dispositivo: alimentarlo con las
+    lecturas de un dispositivo no vuelve frescos a los demás.
+    """
+
+    def __init__(self):
+        self._series: Dict[SeriesKey, LatestReading] = {}
+        self._devices: Dict[str, Dict[str, Any]] = {}
+        self._updated_at: Optional[float] = None
+        self._device_updated_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._devices.clear()
+            self._updated_at = None
+            self._device_updated_at.clear()
+
+    def update(self, readings: Union['pd.DataFrame', Iterable[Any]]) -> int:
+        """
+        Incorporar lecturas: registros de la API (``device_id``,
+        ``sensor_type``, ``value``, ``timestamp``, opcionalmente ``unit`` y
+        ``raw_data``), un DataFrame o filas de ingesta
+        ``(device_id, sensor_type, value, unit, timestamp)``.
+
+        Returns:
+            Número de lecturas nuevas contadas
+        """
+        import pandas as pd
+        from modules.utils.timestamps import instant, wall_clock
+
+        if isinstance(readings, pd.DataFrame):
+            df = readings.reset_index(drop=True)
+        else:
+            records = list(readings)
+            if records and isinstance(records[0], (tuple, list)):
+                df = pd.DataFrame(records, columns=ROW_COLUMNS)
+            else:
+                df = pd.DataFrame(records)
+        if df.empty or not {'device_id', 'sensor_type', 'timestamp'}.issubset(df.columns):
+            return 0
+
+        frame = pd.DataFrame({
+            'device_id': df['device_id'].astype(str),
+            'sensor_type': df['sensor_type'].astype(str),
+            'observed_at': wall_clock(df['timestamp']),
+            'observed_utc': instant(df['timestamp']),
+        }).dropna(subset=['observed_at'])
+
+        added = 0
+        with self._lock:
+            for key, series in frame.groupby(['device_id', 'sensor_type'], sort=False):
+                entry = self._series.get(key)
+                if entry is not None:
+                    series = series[series['observed_at'] > entry.observed_at]
+                if series.empty:
+                    continue
+                # Lecturas distintas (la API puede repetir un timestamp entre páginas)
+                new = series['observed_at'].nunique()
+                newest = series['observed_at'].idxmax()
+                row = df.loc[newest]
+                observed_utc = series.at[newest, 'observed_utc']
+                self._series[key] = LatestReading(
+                    device_id=key[0],
+                    sensor_type=key[1],
+                    value=row.get('value'),
+                    unit=row.get('unit') if pd.notna(row.get('unit', None)) else '',
+                    timestamp=row['timestamp'],
+                    observed_at=series['observed_at'].max(),
+                    raw_data=row.get('raw_data'),
+                    count=(entry.count if entry is not None else 0) + new,
+                    observed_utc=observed_utc if pd.notna(observed_utc) else None,
+                )
+                added += new
+            self._updated_at = time.time()
+            for device_id in frame['device_id'].unique():
+                self._device_updated_at[device_id] = self._updated_at
+        return added
+
+    def register_devices(self, devices: Iterable[Dict[str, Any]]):
+        """Guardar metadatos de ``/devices`` (estado, tipo, IP, último visto reportado)"""
+        with self._lock:
+            for device in devices or []:
+                device_id = device.get('device_id') or device.get('id')
+                if device_id:
+                    self._devices[str(device_id)] = dict(device)
+
+    def age_seconds(self, device_id: Optional[str] = None) -> Optional[float]:
+        """
+        Segundos desde la última ingesta que incluyó a ``device_id``; sin
+        dispositivo, la del dispositivo alimentado hace más tiempo (None si
+        nunca se alimentó).
+        """
+        with self._lock:
+            if device_id is not None:
+                updated_at = self._device_updated_at.get(str(device_id))
+            else:
+                updated_at = min(self._device_updated_at.values(), default=None)
+        return None if updated_at is None else time.time() - updated_at
+
+    def is_fresh(self, max_age_seconds: float, device_id: Optional[str] = None) -> bool:
+        age = self.age_seconds(device_id)
+        return age is not None and age <= max_age_seconds
+
+    def devices(self) -> List[str]:
+        with self._lock:
+            return sorted({device for device, _ in self._series} | set(self._devices))
+
+    def device_info(self, device_id: str) -> Dict[str, Any]:
+        return dict(self._devices.get(device_id, {}))
+
+    def latest(self, device_id: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Última lectura de cada sensor, organizada por dispositivo y tipo de sensor"""
+        organized: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (device, sensor), entry in self._series.items():
+                if device_id is not None and device != device_id:
+                    continue
+                organized.setdefault(device, {})[sensor] = entry.to_dict()
+        return organized
+
+    @property
+    def total_records(self) -> int:
+        with self._lock:
+            return sum(entry.count for entry in self._series.values())
+
+    def device_status(self, active_minutes: float = ACTIVE_WINDOW_MINUTES,
+                      now: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Estado por dispositivo en O(series): conteo de lecturas, sensores y
+        último visto. Un dispositivo con lecturas está activo si la más
+        reciente tiene menos de ``active_minutes``; los conocidos solo por
+        ``/devices`` se incluyen con su estado reportado.
+        """
+        with self._lock:
+            per_device: Dict[str, List[LatestReading]] = {}
+            for (device, _), entry in self._series.items():
+                per_device.setdefault(device, []).append(entry)
+            device_ids = sorted(set(per_device) | set(self._devices))
+
+            status = {}
+            for device_id in device_ids:
+                entries = per_device.get(device_id, [])
+                info = self._devices.get(device_id, {})
+                records_count = sum(entry.count for entry in entries)
+                if entries:
+                    newest = max(entries, key=lambda entry: entry.observed_at)
+                    last_seen = newest.timestamp
+                    active = newest.age_seconds(now) <= active_minutes * 60
+                else:
+                    last_seen = info.get('last_seen')
+                    active = str(info.get('status', '')).lower() in ('online', 'active')
+                status[device_id] = {
+                    'status': '🟢 Activo' if active else '🔴 Inactivo',
+                    'records_count': records_count,
+                    'sensors_count': len(entries) or len(info.get('sensors') or []),
+                    'last_seen': last_seen or 'Sin timestamp',
+                    'active': active,
+                }
+            return status
+
+
+# Instancia global alimentada por los conectores e ingesta
+latest_index = LatestValueIndex()
@@ -19,6 +19,8 @@ import io
 from typing import Dict, List, Optional, Any
 import logging
 
+from modules.utils.plot_data import prepare_series, series_stats
+
 class ModernVisualizationEngine:
     """Motor de visualizaciones modernas para dashboards IoT"""
     
@@ -51,22 +53,15 @@ class ModernVisualizationEngine:
             if df.empty:
                 return {}
             
-            # Preparar datos
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['numeric_value'] = pd.to_numeric(df['value'], errors='coerce')
-            df = df.dropna(subset=['numeric_value'])
+            # Preparar datos: una copia dividida por sensor y estadísticas en una sola agregación
+            series = prepare_series(df, by=('sensor_type',))
+            sensor_stats = series_stats(series)
             
             cards = {}
-            sensors = df['sensor_type'].unique()
             
-            for i, sensor in enumerate(sensors):
-                sensor_data = df[df['sensor_type'] == sensor].copy()
-                
-                if len(sensor_data) == 0:
-                    continue
-                
+            for i, ((sensor,), sensor_data) in enumerate(series):
                 # Crear tarjeta moderna para este sensor
-                card_html = await self._create_altair_sensor_card(sensor, sensor_data, i)
+                card_html = await self._create_altair_sensor_card(sensor, sensor_data, i, sensor_stats.loc[sensor])
                 
                 if card_html:
                     cards[f"sensor_{sensor}"] = card_html
@@ -77,17 +72,18 @@ class ModernVisualizationEngine:
             self.logger.error(f"Error creando dashboard cards: {e}")
             return {}
 
-    async def _create_altair_sensor_card(self, sensor_name: str, data: pd.DataFrame, color_index: int) -> str:
+    async def _create_altair_sensor_card(self, sensor_name: str, data: pd.DataFrame, color_index: int,
+                                         sensor_stats: pd.Series) -> str:
         """Crear tarjeta individual usando Altair con diseño moderno"""
         try:
-            # Estadísticas
+            # Estadísticas (precalculadas por ``series_stats``)
             stats = {
-                'mean': data['numeric_value'].mean(),
-                'std': data['numeric_value'].std(),
-                'min': data['numeric_value'].min(),
-                'max': data['numeric_value'].max(),
-                'count': len(data),
-                'trend': self._calculate_trend(data['numeric_value'])
+                'mean': sensor_stats['mean'],
+                'std': sensor_stats['std'],
+                'min': sensor_stats['min'],
+                'max': sensor_stats['max'],
+                'count': int(sensor_stats['count']),
+                'trend': self._format_trend(sensor_stats['trend_pct'])
             }
             
             # Determinar unidad
@@ -111,11 +107,11 @@ class ModernVisualizationEngine:
             ).encode(
                 x=alt.X('timestamp:T', 
                        axis=alt.Axis(title='', labels=False, ticks=False)),
-                y=alt.Y('numeric_value:Q',
+                y=alt.Y('value:Q',
                        axis=alt.Axis(title='', labels=True, tickCount=5)),
                 tooltip=[
                     alt.Tooltip('timestamp:T', title='Tiempo'),
-                    alt.Tooltip('numeric_value:Q', title=f'Valor ({unit})', format='.2f'),
+                    alt.Tooltip('value:Q', title=f'Valor ({unit})', format='.2f'),
                     alt.Tooltip('device_id:N', title='Dispositivo')
                 ]
             ).properties(
@@ -129,7 +125,7 @@ class ModernVisualizationEngine:
                 opacity=0.2
             ).encode(
                 x='timestamp:T',
-                y='numeric_value:Q'
+                y='value:Q'
             )
             
             # Línea de promedio
@@ -349,7 +345,12 @@ class ModernVisualizationEngine:
         first_half = values[:len(values)//2].mean()
         second_half = values[len(values)//2:].mean()
         
-        diff_percent = ((second_half - first_half) / first_half) * 100
+        return self._format_trend(((second_half - first_half) / first_half) * 100)
+
+    def _format_trend(self, diff_percent: float) -> str:
+        """Describir la variación porcentual entre la primera y la segunda mitad"""
+        if pd.isna(diff_percent):
+            return "Insuficiente"
         
         if abs(diff_percent) < 2:
             return "Estable"
@@ -0,0 +1,117 @@
+"""
+Preparación de Datos para Gráficos
+==================================
+
+Etapa compartida por los motores de gráficos (``chart_renderer``,
+``ModernVisualizationEngine``, ``create_simple_chart``):
+
+- Normaliza una copia de los datos (timestamps, valores numéricos) sin
+  modificar el DataFrame del llamador; los timestamps se ordenan en UTC
+  (offsets mixtos por horario de verano) y se grafican en hora local del
+  dispositivo
+- Ordena una sola vez por serie y tiempo y la divide en vistas contiguas,
+  en vez de filtrar con ``df[df['device_id'] == ...]`` dentro de un bucle
+  (O(series x filas))
+- Calcula las estadísticas de tarjeta (media, desviación, mínimo, máximo y
+  tendencia) en una única agregación agrupada
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from modules.utils.timestamps import wall_clock
+
+DataLike = Union[pd.DataFrame, Iterable[Dict[str, Any]]]
+
+
+@dataclass
+class SeriesFrames:
+    """Datos ordenados por serie y tiempo, con los límites de cada serie"""
+    frame: pd.DataFrame
+    by: Tuple[str, ...]
+    keys: List[Tuple[Any, ...]]
+    bounds: np.ndarray                 # Inicio de cada serie y fin de la última
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[Tuple[Tuple[Any, ...], pd.DataFrame]]:
+        for position, key in enumerate(self.keys):
+            yield key, self.frame.iloc[self.bounds[position]:self.bounds[position + 1]]
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.bounds)
+
+
+def prepare_series(data: DataLike, by: Sequence[str] = ('device_id', 'sensor_type'),
+                   value_column: str = 'value') -> SeriesFrames:
+    """
+    Normalizar y dividir los datos en series contiguas.
+
+    Las series quedan en el orden en que aparece cada clave (como al
+    recorrer ``unique()`` anidado) y cada una ordenada por instante (UTC);
+    ``timestamp`` queda en hora local del dispositivo, sin offset.
+    Se descartan filas sin valor numérico o sin timestamp válido.
+    """
+    by = tuple(by)
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data))
+    if df.empty or not set(by + (value_column, 'timestamp')).issubset(df.columns):
+        return SeriesFrames(pd.DataFrame(columns=list(by) + ['timestamp', 'value']), by, [], np.zeros(1, dtype=int))
+
+    # Con offsets mixtos (-03:00/-04:00) ``to_datetime`` sin ``utc`` devuelve dtype object
+    instant = pd.to_datetime(df['timestamp'], errors='coerce', utc=True, format='ISO8601')
+    frame = df.assign(
+        timestamp=wall_clock(df['timestamp']),
+        value=pd.to_numeric(df[value_column], errors='coerce'),
+        _instant=instant,
+    ).dropna(subset=['timestamp', 'value', '_instant'])
+
+    # Códigos por orden de aparición: primero la clave externa y luego la serie completa,
+    # de modo que las series de una misma clave externa quedan juntas
+    outer = pd.factorize(frame[by[0]])[0]
+    series = frame.groupby(list(by), sort=False).ngroup().to_numpy()
+    order = np.lexsort((frame['_instant'].astype('int64').to_numpy(), series, outer))
+    frame = frame.iloc[order].drop(columns='_instant').reset_index(drop=True)
+    codes = series[order]
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+    bounds = np.r_[starts, len(frame)]
+    keys = list(frame.loc[starts, list(by)].itertuples(index=False, name=None))
+    return SeriesFrames(frame, by, keys, bounds)
+
+
+def series_stats(series: SeriesFrames) -> pd.DataFrame:
+    """
+    Estadísticas por serie en una sola agregación: ``count``, ``mean``,
+    ``std``, ``min``, ``max`` y ``trend_pct`` (variación porcentual de la
+    media de la segunda mitad respecto de la primera, en orden temporal).
+    """
+    frame = series.frame
+    if not len(series):
+        return pd.DataFrame(columns=['count', 'mean', 'std', 'min', 'max', 'trend_pct'])
+
+    labels = np.repeat(np.arange(len(series)), series.sizes)
+    position = np.arange(len(frame)) - np.repeat(series.bounds[:-1], series.sizes)
+    first_half = position < np.repeat(series.sizes // 2, series.sizes)
+    values = frame['value'].to_numpy(dtype=np.float64)
+
+    stats = pd.DataFrame({
+        'series': labels,
+        'value': values,
+        'first_half': np.where(first_half, values, np.nan),
+        'second_half': np.where(first_half, np.nan, values),
+    }).groupby('series', sort=True).agg(
+        count=('value', 'size'), mean=('value', 'mean'), std=('value', 'std'),
+        min=('value', 'min'), max=('value', 'max'),
+        first_half=('first_half', 'mean'), second_half=('second_half', 'mean'),
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['trend_pct'] = (stats['second_half'] - stats['first_half']) / stats['first_half'] * 100
+    stats.loc[stats['count'] < 2, 'trend_pct'] = np.nan
+    stats.index = pd.MultiIndex.from_tuples(series.keys, names=list(series.by)) if len(series.by) > 1 \
+        else pd.Index([key[0] for key in series.keys], name=series.by[0])
+    return stats.drop(columns=['first_half', 'second_half'])
@@ -0,0 +1,277 @@
+"""
+Registro de Plugins con Carga Diferida
+======================================
+
+Los motores de inteligencia, renderizadores y exportadores importan
+bibliotecas pesadas (pandas, scipy, scikit-learn, plotly, matplotlib,
+reportlab, openpyxl). Importarlos todos al cargar el agente domina el
+arranque en frío de Streamlit Cloud aunque la consulta sea un simple
+"estado actual".
+
+Este módulo registra cada componente por nombre y lo importa la primera
+vez que se usa. Además:
+- ``warm_up()`` precarga en un hilo de fondo (después del primer render)
+- ``import_report()`` entrega el costo de importación de cada plugin
+
+Variables de entorno:
+- ``IOT_PLUGIN_WARMUP``: ``0`` desactiva la precarga en segundo plano
+"""
+
+import importlib
+import importlib.util
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Categorías de plugins
+CATEGORY_ENGINE = "engine"
+CATEGORY_RENDERER = "renderer"
+CATEGORY_EXPORTER = "exporter"
+
+
+@dataclass
+class PluginSpec:
+    """Descripción de un plugin importable bajo demanda"""
+    name: str
+    module: str
+    attribute: str
+    category: str
+    description: str = ""
+
+
+@dataclass
+class ImportRecord:
+    """Resultado de importar un plugin"""
+    name: str
+    module: str
+    status: str  # loaded | failed
+    seconds: float
+    loaded_at: str
+    thread: str
+    error: Optional[str] = None
+
+
+class PluginRegistry:
+    """
+    Registro de plugins por nombre con importación diferida y segura entre hilos.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, PluginSpec] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._records: Dict[str, ImportRecord] = {}
+        self._lock = threading.RLock()
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, module: str, attribute: str,
+                 category: str = CATEGORY_ENGINE, description: str = ""):
+        """Registrar un plugin sin importarlo."""
+        with self._lock:
+            self._specs[name] = PluginSpec(name, module, attribute, category, description)
+
+    def names(self, category: Optional[str] = None) -> List[str]:
+        return [n for n, s in self._specs.items() if category is None or s.category == category]
+
+    def is_available(self, name: str) -> bool:
+        """Verificar que el módulo del plugin existe, sin importarlo."""
+        spec = self._specs.get(name)
+        if spec is None:
+            return False
+        if name in self._records:
+            return self._records[name].status == "loaded"
+        try:
+            return importlib.util.find_spec(spec.module) is not None
+        except (ImportError, ValueError):
+            return False
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def load(self, name: str) -> Any:
+        """
+        Importar (una sola vez) y devolver el objeto exportado por el plugin.
+
+        Raises:
+            KeyError: Si el plugin no está registrado
+            ImportError: Si el módulo no se pudo importar
+        """
+        if name in self._loaded:
+            return self._loaded[name]
+
+        spec = self._specs[name]
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+
+            start = time.perf_counter()
+            try:
+                module = importlib.import_module(spec.module)
+                obj = getattr(module, spec.attribute)
+            except Exception as e:
+                self._records[name] = self._record(spec, "failed", start, e)
+                logger.warning(f"⚠️ Plugin '{name}' no disponible: {e}")
+                raise ImportError(f"Plugin '{name}' no disponible: {e}") from e
+
+            self._loaded[name] = obj
+            self._records[name] = self._record(spec, "loaded", start)
+            logger.info(f"🔌 Plugin '{name}' cargado en {self._records[name].seconds:.2f}s")
+            return obj
+
+    def create(self, name: str, *args, **kwargs) -> Any:
+        """Importar el plugin e instanciarlo con los argumentos dados."""
+        return self.load(name)(*args, **kwargs)
+
+    @staticmethod
+    def _record(spec: PluginSpec, status: str, start: float, error: Exception = None) -> ImportRecord:
+        return ImportRecord(
+            name=spec.name,
+            module=spec.module,
+            status=status,
+            seconds=round(time.perf_counter() - start, 4),
+            loaded_at=datetime.now().isoformat(),
+            thread=threading.current_thread().name,
+            error=str(error) if error else None,
+        )
+
+    # ------------------------------------------------------------------
+    # Precarga y reporte
+    # ------------------------------------------------------------------
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Precargar plugins, por defecto en un hilo daemon de fondo.
+
+        Pensado para llamarse después del primer render de la UI, de modo que
+        la primera consulta pesada no pague el costo de importación.
+
+        Returns:
+            El hilo de precarga (o None si se ejecutó en el hilo actual o está desactivada)
+        """
+        if os.getenv("IOT_PLUGIN_WARMUP", "1") == "0":
+            return None
+
+        pending = [n for n in (names or self.names()) if n not in self._loaded]
+        if not pending:
+            return None
+
+        def _run():
+            for plugin_name in pending:
+                try:
+                    self.load(plugin_name)
+                except Exception:
+                    pass  # Ya registrado en el reporte de importación
+
+        if not background:
+            _run()
+            return None
+
+        with self._lock:
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                return self._warmup_thread
+            self._warmup_thread = threading.Thread(target=_run, name="plugin-warmup", daemon=True)
+            self._warmup_thread.start()
+            return self._warmup_thread
+
+    def import_report(self) -> Dict[str, Any]:
+        """Costo de importación por plugin, del más lento al más rápido."""
+        records = sorted(self._records.values(), key=lambda r: r.seconds, reverse=True)
+        return {
+            "registered": len(self._specs),
+            "loaded": len(self._loaded),
+            "pending": [n for n in self._specs if n not in self._records],
+            "total_seconds": round(sum(r.seconds for r in records), 4),
+            "plugins": [r.__dict__.copy() for r in records],
+        }
+
+
+class LazyPluginMap(Mapping):
+    """
+    Diccionario de instancias de plugins creado bajo demanda.
+
+    Se comporta como el ``dict`` de sistemas que usaban los agentes
+    (``systems.get('smart_analyzer')``, ``systems['alert_system']``), pero
+    cada instancia se crea en el primer acceso. Los plugins que fallan al
+    importarse desaparecen del mapa y ``get`` devuelve ``None``.
+    """
+
+    def __init__(self, registry: PluginRegistry, init_kwargs: Dict[str, Dict[str, Any]]):
+        self._registry = registry
+        self._init_kwargs = dict(init_kwargs)
+        self._instances: Dict[str, Any] = {}
+        self._failed: set = set()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._init_kwargs or name in self._failed:
+            raise KeyError(name)
+
+        with self._lock:
+            if name not in self._instances:
+                try:
+                    self._instances[name] = self._registry.create(name, **self._init_kwargs[name])
+                except Exception as e:
+                    self._failed.add(name)
+                    logger.error(f"❌ Error inicializando plugin '{name}': {e}")
+                    raise KeyError(name) from e
+        return self._instances[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return (n for n in self._init_kwargs if n not in self._failed)
+
+    def __len__(self) -> int:
+        return len(self._init_kwargs) - len(self._failed)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._init_kwargs and name not in self._failed
+
+    def loaded_names(self) -> List[str]:
+        return list(self._instances)
+
+
+# Registro global con los componentes pesados del proyecto
+plugin_registry = PluginRegistry()
+
+_DEFAULT_PLUGINS = [
+    # Motores de inteligencia
+    ("smart_analyzer", "modules.intelligence.smart_analyzer", "SmartAnalyzer", CATEGORY_ENGINE),
+    ("sensor_detector", "modules.intelligence.dynamic_sensor_detector", "DynamicSensorDetector", CATEGORY_ENGINE),
+    ("report_generator", "modules.intelligence.advanced_report_generator", "AdvancedReportGenerator", CATEGORY_ENGINE),
+    ("insights_engine", "modules.intelligence.automatic_insights_engine", "AutomaticInsightsEngine", CATEGORY_ENGINE),
+    ("predictive_engine", "modules.intelligence.predictive_analysis_engine", "PredictiveAnalysisEngine", CATEGORY_ENGINE),
+    ("visualization_engine", "modules.intelligence.advanced_visualization_engine", "AdvancedVisualizationEngine", CATEGORY_ENGINE),
+    ("alert_system", "modules.intelligence.intelligent_alert_system", "IntelligentAlertSystem", CATEGORY_ENGINE),
+    ("temporal_engine", "modules.intelligence.temporal_comparison_engine", "TemporalComparisonEngine", CATEGORY_ENGINE),
+    # Renderizadores
+    ("chart_renderer", "modules.utils.visualization_engine", "IoTVisualizationEngine", CATEGORY_RENDERER),
+    # Exportadores
+    ("report_exporter", "modules.agents.reporting", "ReportGenerator", CATEGORY_EXPORTER),
+]
+
+for _name, _module, _attribute, _category in _DEFAULT_PLUGINS:
+    plugin_registry.register(_name, _module, _attribute, _category)
+
+
+def get_plugin_registry() -> PluginRegistry:
+    """Obtener el registro global de plugins."""
+    return plugin_registry
+
+
+if __name__ == "__main__":
+    # Reporte de costo de importación: python -m modules.utils.plugin_registry
+    import json
+
+    logging.basicConfig(level=logging.WARNING)
+    start = time.perf_counter()
+    plugin_registry.warm_up(background=False)
+    report = plugin_registry.import_report()
+    report["wall_seconds"] = round(time.perf_counter() - start, 4)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
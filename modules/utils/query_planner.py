@@ -0,0 +1,186 @@
+"""
+Planificador de Consultas
+=========================
+
+Traduce la intención de una consulta en lenguaje natural (dispositivos,
+sensores, ventana temporal, tipo de agregación y presupuesto de puntos) en
+un ``FetchPlan`` explícito **antes** de recolectar datos:
+
+- ``latest``: valores actuales, ventana corta a resolución cruda
+- ``summary``: estadísticas (promedio, máximo...), a la resolución más fina
+  retenida: los extremos no se calculan sobre promedios de intervalo
+- ``series``: tendencias y gráficos, acotadas a ``CHART_POINTS`` por serie
+
+El recolector pide solo las series del plan al nivel de rollup adecuado
+(``UltraRobustJetsonConnector.get_series_for_window``) y los nodos
+posteriores reciben los datos ya recortados, sin volver a filtrar por el
+texto de la consulta.
+
+Este módulo no importa pandas: se usa al construir el agente.
+"""
+
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_WINDOW_HOURS = 3.0     # Ventana por defecto del recolector
+LATEST_WINDOW_HOURS = 1.0      # Ventana para "valor actual"
+CHART_POINTS = 500             # Puntos por serie para tendencias/gráficos
+
+_WINDOW_UNITS_HOURS = {"minuto": 1 / 60, "hora": 1, "día": 24, "dia": 24, "semana": 168, "mes": 720}
+
+# Familia -> (palabras en la consulta, prefijos de sensor_type)
+SENSOR_FAMILIES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    'temperature': (('temperatura', 'temperature', 'calor', 'grados', 'térmic', 'termic', 'ntc'),
+                    ('temperature', 'ntc')),
+    'ldr': (('luz', 'ldr', 'luminosidad', 'iluminación', 'iluminacion', 'light'), ('ldr', 'light')),
+    'humidity': (('humedad', 'humidity'), ('humidity',)),
+    'pressure': (('presión', 'presion', 'pressure'), ('pressure',)),
+    'voltage': (('voltaje', 'voltage', 'tensión'), ('voltage',)),
+}
+
+_DEVICE_PATTERN = re.compile(r'\b((?:esp32|arduino)\w*)')
+_RESOLUTION_PATTERN = re.compile(r'\b(?:por|cada)\s+(\d+(?:[.,]\d+)?\s*)?(minuto|hora|día|dia|semana)s?\b')
+_LATEST_WORDS = ('actual', 'ahora', 'último valor', 'ultimo valor', 'en este momento', 'estado')
+_SUMMARY_WORDS = ('promedio', 'media', 'máximo', 'maximo', 'mínimo', 'minimo', 'estadística', 'estadistica',
+                  'desviación', 'desviacion', 'resumen', 'total')
+_SERIES_WORDS = ('gráfic', 'grafic', 'visualiza', 'chart', 'plot', 'tendencia', 'evolución', 'evolucion',
+                 'historial', 'comportamiento')
+
+
+def parse_time_window_hours(text: str, default: Optional[float] = 24) -> Optional[float]:
+    """
+    Ventana temporal pedida en una consulta ("últimas 6 horas", "última semana",
+    "3 días") expresada en horas.
+    """
+    text = text.lower()
+    match = re.search(r'(\d+(?:[.,]\d+)?)\s*(minuto|hora|día|dia|semana|mes)', text)
+    if match:
+        return float(match.group(1).replace(',', '.')) * _WINDOW_UNITS_HOURS[match.group(2)]
+    for unit, hours in _WINDOW_UNITS_HOURS.items():
+        if re.search(rf'\b(?:último|última|ultimo|ultima)\s+{unit}', text):
+            return hours
+    return default
+
+
+@dataclass
+class FetchPlan:
+    """
+    Datos que necesita una consulta.
+
+    ``device_ids`` y ``sensor_types`` son ids exactos o prefijos
+    (``esp32``, ``temperature``); vacíos = todos.
+    """
+    hours: float = DEFAULT_WINDOW_HOURS
+    device_ids: List[str] = field(default_factory=list)
+    sensor_types: List[str] = field(default_factory=list)
+    aggregation: str = 'series'                  # latest | summary | series
+    max_points: Optional[int] = CHART_POINTS     # Puntos por serie (None = resolución cruda)
+    resolution: Optional[timedelta] = None       # Intervalo pedido explícitamente ("por hora")
+    window_explicit: bool = False                # Ventana indicada por el usuario o la UI
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma serializable (para el estado del grafo)"""
+        plan = asdict(self)
+        plan['resolution'] = self.resolution.total_seconds() if self.resolution else None
+        return plan
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['FetchPlan']:
+        if not data:
+            return None
+        fields = {key: data[key] for key in cls.__dataclass_fields__ if key in data}
+        if fields.get('resolution') is not None:
+            fields['resolution'] = timedelta(seconds=fields['resolution'])
+        return cls(**fields)
+
+    def matches(self, device_id: Any, sensor_type: Any) -> bool:
+        """La serie (device_id, sensor_type) pertenece al plan"""
+        device, sensor = str(device_id).lower(), str(sensor_type).lower()
+        return ((not self.device_ids or device.startswith(tuple(self.device_ids)))
+                and (not self.sensor_types or sensor.startswith(tuple(self.sensor_types))))
+
+    def select(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Aplicar el plan a registros obtenidos sin él (métodos de respaldo):
+        series del plan dentro de la ventana, medida desde el registro más
+        reciente en hora local del dispositivo.
+        """
+        records = [record for record in records
+                   if isinstance(record, dict) and self.matches(record.get('device_id'), record.get('sensor_type'))]
+        stamped = [(record, _local_time(record.get('timestamp'))) for record in records]
+        times = [moment for _, moment in stamped if moment is not None]
+        if not times:
+            return records
+        cutoff = max(times) - timedelta(hours=self.hours)
+        return [record for record, moment in stamped if moment is None or moment >= cutoff]
+
+    def describe(self) -> str:
+        """Resumen legible para los registros del agente"""
+        devices = ', '.join(self.device_ids) or 'todos'
+        sensors = ', '.join(self.sensor_types) or 'todos'
+        return (f"{self.aggregation} | {self.hours:g}h | dispositivos: {devices} | sensores: {sensors} | "
+                f"puntos/serie: {self.max_points or 'crudo'}")
+
+
+def _local_time(value: Any) -> Optional[datetime]:
+    """Timestamp ISO en hora local del dispositivo (sin offset)"""
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def plan_query(user_query: str, analysis_hours: Optional[float] = None,
+               now: Optional[datetime] = None) -> FetchPlan:
+    """
+    Construir el plan de recolección de una consulta.
+
+    Args:
+        user_query: Consulta del usuario
+        analysis_hours: Ventana fijada por la interfaz (prevalece sobre el texto)
+        now: Hora de referencia para "hoy" (por defecto, la actual)
+
+    Returns:
+        FetchPlan con series, ventana, agregación y presupuesto de puntos
+    """
+    text = user_query.lower()
+
+    # Resolución explícita ("por hora", "cada 15 minutos"); se quita del texto
+    # para que no se confunda con la ventana
+    resolution = None
+    match = _RESOLUTION_PATTERN.search(text)
+    if match:
+        amount = float((match.group(1) or '1').strip().replace(',', '.'))
+        resolution = timedelta(hours=amount * _WINDOW_UNITS_HOURS[match.group(2)])
+        text = text[:match.start()] + text[match.end():]
+
+    if any(word in text for word in _SERIES_WORDS):
+        aggregation, max_points = 'series', CHART_POINTS
+    elif any(word in text for word in _SUMMARY_WORDS):
+        aggregation, max_points = 'summary', None
+    elif any(word in text for word in _LATEST_WORDS):
+        aggregation, max_points = 'latest', None
+    else:
+        aggregation, max_points = 'series', CHART_POINTS
+
+    hours = analysis_hours or parse_time_window_hours(text, default=None)
+    window_explicit = hours is not None
+    if hours is None and re.search(r'\bhoy\b', text):
+        now = now or datetime.now()
+        hours = max((now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds() / 3600, 1.0)
+        window_explicit = True
+    if hours is None:
+        hours = LATEST_WINDOW_HOURS if aggregation == 'latest' else DEFAULT_WINDOW_HOURS
+
+    sensor_types: List[str] = []
+    for words, prefixes in SENSOR_FAMILIES.values():
+        if any(word in text for word in words):
+            sensor_types.extend(prefix for prefix in prefixes if prefix not in sensor_types)
+
+    device_ids = list(dict.fromkeys(_DEVICE_PATTERN.findall(text)))
+
+    return FetchPlan(hours=float(hours), device_ids=device_ids, sensor_types=sensor_types,
+                     aggregation=aggregation, max_points=max_points, resolution=resolution,
+                     window_explicit=window_explicit)
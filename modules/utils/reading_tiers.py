@@ -0,0 +1,404 @@
+"""
+Almacén Local de Lecturas por Niveles de Resolución
+===================================================
+
+Guarda las lecturas descargadas de la API Jetson en SQLite y mantiene
+automáticamente niveles de rollup con count/sum/min/max por
+(device_id, sensor_type, intervalo):
+
+- ``raw``: lecturas tal cual (retención corta)
+- ``1m``, ``15m``, ``1h``, ``1d``: agregados con retención creciente
+
+``TieredReadingStore.plan`` elige el nivel más grueso que todavía cumple la
+resolución pedida (o el presupuesto de puntos del gráfico) para la ventana,
+de modo que una consulta de 30 días lee un número acotado de filas en vez
+de arrastrar todas las lecturas por el túnel y por pandas.
+
+Los timestamps se guardan en hora local del dispositivo (sin offset), igual
+que ``sensor_data`` en la base y el resto de los índices en memoria. Las
+filas devueltas tienen el formato de ``DatabaseConnector.get_bucketed_readings``
+(``timestamp``/``value`` = inicio y promedio del intervalo).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from modules.utils.timestamps import wall_clock
+
+logger = logging.getLogger(__name__)
+
+SeriesKey = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Tier:
+    """Nivel de resolución del almacén"""
+    name: str
+    bucket: Optional[timedelta]        # None = lecturas crudas
+    retention: timedelta
+
+    @property
+    def table(self) -> str:
+        return "readings_raw" if self.bucket is None else f"readings_{self.name}"
+
+
+# De más fino a más grueso
+TIERS = [
+    Tier("raw", None, timedelta(days=2)),
+    Tier("1m", timedelta(minutes=1), timedelta(days=14)),
+    Tier("15m", timedelta(minutes=15), timedelta(days=120)),
+    Tier("1h", timedelta(hours=1), timedelta(days=730)),
+    Tier("1d", timedelta(days=1), timedelta(days=3650)),
+]
+TIERS_BY_NAME = {tier.name: tier for tier in TIERS}
+
+_ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    device_id TEXT NOT NULL,
+    sensor_type TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    sample_count INTEGER NOT NULL,
+    sum_value REAL NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    PRIMARY KEY (device_id, sensor_type, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket);
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings_raw (
+    device_id TEXT NOT NULL,
+    sensor_type TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (device_id, sensor_type, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_readings_raw_ts ON readings_raw (ts);
+CREATE TABLE IF NOT EXISTS reading_series (
+    device_id TEXT NOT NULL,
+    sensor_type TEXT NOT NULL,
+    first_ts REAL NOT NULL,
+    last_ts REAL NOT NULL,
+    PRIMARY KEY (device_id, sensor_type)
+);
+""" + "".join(_ROLLUP_SCHEMA.format(table=tier.table) for tier in TIERS if tier.bucket is not None)
+
+_UPSERT_SQL = """
+    INSERT INTO {table} (device_id, sensor_type, bucket, sample_count, sum_value, min_value, max_value)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (device_id, sensor_type, bucket) DO UPDATE SET
+        sample_count = sample_count + excluded.sample_count,
+        sum_value = sum_value + excluded.sum_value,
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value)
+"""
+
+
+def _epoch(timestamp: Union[datetime, pd.Timestamp]) -> float:
+    return pd.Timestamp(timestamp).value / 1e9
+
+
+def _from_epoch(seconds: float) -> pd.Timestamp:
+    return pd.Timestamp(round(seconds * 1e9))
+
+
+@dataclass
+class TierPlan:
+    """Nivel elegido para responder una ventana"""
+    tier: str
+    bucket: Optional[timedelta]
+    start: datetime
+    end: datetime
+    estimated_rows: int
+    covered: bool                      # El almacén tiene lecturas desde el inicio de la ventana
+
+    def to_dict(self) -> Dict[str, Any]:
+        plan = asdict(self)
+        plan['bucket'] = self.bucket.total_seconds() if self.bucket else None
+        plan['start'], plan['end'] = self.start.isoformat(), self.end.isoformat()
+        return plan
+
+
+def choose_tier(window: timedelta, max_points: Optional[int] = None,
+                resolution: Optional[timedelta] = None) -> Tier:
+    """
+    Nivel más grueso cuyo intervalo no supera la resolución pedida (o
+    ``window / max_points``) y cuya retención cubre la ventana.
+
+    Sin resolución ni presupuesto de puntos se usa el nivel más fino que
+    cubre la ventana.
+    """
+    target = resolution or (window / max_points if max_points else None)
+    retained = [tier for tier in TIERS if tier.retention >= window] or TIERS[-1:]
+    if target is None:
+        return retained[0]
+    fine_enough = [tier for tier in retained if (tier.bucket or timedelta(0)) <= target]
+    return fine_enough[-1] if fine_enough else retained[0]
+
+
+class TieredReadingStore:
+    """
+    Lecturas crudas y rollups por nivel en SQLite.
+
+    Args:
+        db_path: Archivo SQLite (``":memory:"`` = sin persistencia)
+        stale_after: Antigüedad de la última ingesta a partir de la cual
+            conviene volver a consultar la API
+    """
+
+    def __init__(self, db_path: str = ":memory:", stale_after: timedelta = timedelta(minutes=5)):
+        self.db_path = db_path
+        self.stale_after = stale_after
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._series: Dict[SeriesKey, Tuple[float, float]] = {
+            (device, sensor): (first, last)
+            for device, sensor, first, last in self._conn.execute(
+                "SELECT device_id, sensor_type, first_ts, last_ts FROM reading_series")
+        }
+        self._ingested_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    # ------------------------------------------------------------------
+    # Ingesta
+    # ------------------------------------------------------------------
+
+    def ingest(self, readings: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> int:
+        """
+        Incorporar lecturas (``device_id``, ``sensor_type``, ``value``,
+        ``timestamp``) al nivel crudo y a todos los rollups.
+
+        Las lecturas se deduplican por (serie, timestamp) contra el nivel
+        crudo, así que volver a descargar una ventana solapada no duplica
+        conteos y la historia descargada más tarde (anterior a la primera
+        lectura vista) se incorpora. Lo ya contado que el crudo dejó de
+        retener se reconoce por el rango ``first_ts``..``last_ts`` de la serie.
+
+        Returns:
+            Número de lecturas nuevas incorporadas
+        """
+        df = readings if isinstance(readings, pd.DataFrame) else pd.DataFrame(list(readings))
+        required = {"device_id", "sensor_type", "value", "timestamp"}
+        if df.empty or not required.issubset(df.columns):
+            return 0
+
+        frame = pd.DataFrame({
+            "device_id": df["device_id"].astype(str),
+            "sensor_type": df["sensor_type"].astype(str),
+            "value": pd.to_numeric(df["value"], errors="coerce"),
+            "timestamp": wall_clock(df["timestamp"]),
+        }).dropna(subset=["value", "timestamp"])
+        frame["ns"] = frame["timestamp"].astype("int64")
+        frame["ts"] = frame["ns"] / 1e9
+
+        frame = frame.drop_duplicates(["device_id", "sensor_type", "ns"])
+
+        with self._lock:
+            self._ingested_at = time.time()
+            frame = self._unseen(frame)
+            if frame.empty:
+                return 0
+
+            self._conn.executemany(
+                "INSERT INTO readings_raw VALUES (?, ?, ?, ?)",
+                frame[["device_id", "sensor_type", "ts", "value"]].itertuples(index=False, name=None))
+            for tier in TIERS:
+                if tier.bucket is not None:
+                    self._merge_rollup(tier, frame)
+            self._update_series(frame)
+            self._conn.commit()
+            self.prune()
+        return len(frame)
+
+    def _unseen(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Lecturas que todavía no se contaron en los rollups"""
+        if self._series:
+            # Dentro del rango conocido de la serie pero fuera de la retención
+            # del crudo: ya se contaron y no hay clave contra la cual comparar
+            raw_cutoff = max(last for _, last in self._series.values()) - TIERS[0].retention.total_seconds()
+            spans = pd.DataFrame([(device, sensor, first) for (device, sensor), (first, _) in self._series.items()],
+                                 columns=["device_id", "sensor_type", "first_ts"]).astype({"first_ts": float})
+            first_ts = frame.merge(spans, how="left", on=["device_id", "sensor_type"])["first_ts"].to_numpy()
+            ts = frame["ts"].to_numpy()
+            frame = frame[~((ts >= first_ts) & (ts < raw_cutoff))]
+        if frame.empty:
+            return frame
+
+        # Clave primaria del crudo: anti-join mediante una tabla temporal
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming_keys "
+                           "(device_id TEXT, sensor_type TEXT, ts REAL, row INTEGER)")
+        self._conn.execute("DELETE FROM incoming_keys")
+        self._conn.executemany("INSERT INTO incoming_keys VALUES (?, ?, ?, ?)",
+                               zip(frame["device_id"], frame["sensor_type"], frame["ts"], range(len(frame))))
+        seen = [row for (row,) in self._conn.execute(
+            "SELECT i.row FROM incoming_keys i JOIN readings_raw r "
+            "ON r.device_id = i.device_id AND r.sensor_type = i.sensor_type AND r.ts = i.ts")]
+        self._conn.execute("DELETE FROM incoming_keys")
+        if not seen:
+            return frame
+        keep = np.ones(len(frame), dtype=bool)
+        keep[seen] = False
+        return frame[keep]
+
+    def _merge_rollup(self, tier: Tier, frame: pd.DataFrame):
+        width = pd.Timedelta(tier.bucket).value
+        buckets = (frame["ns"] // width) * width // 10**9
+        grouped = frame.groupby([frame["device_id"], frame["sensor_type"], buckets.rename("bucket")])["value"]
+        rows = grouped.agg(["count", "sum", "min", "max"]).reset_index()
+        self._conn.executemany(_UPSERT_SQL.format(table=tier.table),
+                               ((row.device_id, row.sensor_type, int(row.bucket), int(row.count),
+                                 float(row.sum), float(row.min), float(row.max))
+                                for row in rows.itertuples(index=False)))
+
+    def _update_series(self, frame: pd.DataFrame):
+        bounds = frame.groupby(["device_id", "sensor_type"])["ts"].agg(["min", "max"])
+        for (device, sensor), row in bounds.iterrows():
+            first, last = self._series.get((device, sensor), (row["min"], row["max"]))
+            self._series[(device, sensor)] = (min(first, row["min"]), max(last, row["max"]))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO reading_series VALUES (?, ?, ?, ?)",
+            ((device, sensor, first, last) for (device, sensor), (first, last) in self._series.items()))
+
+    def prune(self) -> int:
+        """Descartar de cada nivel lo que excede su retención (relativa a la lectura más reciente)"""
+        with self._lock:
+            if not self._series:
+                return 0
+            newest = max(last for _, last in self._series.values())
+            removed = 0
+            for tier in TIERS:
+                column = "ts" if tier.bucket is None else "bucket"
+                cutoff = newest - tier.retention.total_seconds()
+                removed += self._conn.execute(f"DELETE FROM {tier.table} WHERE {column} < ?", (cutoff,)).rowcount
+            # El primer timestamp de cada serie refleja lo que conserva el nivel más largo
+            oldest_kept = newest - TIERS[-1].retention.total_seconds()
+            self._series = {key: (max(first, oldest_kept), last) for key, (first, last) in self._series.items()}
+            self._conn.commit()
+            return removed
+
+    def clear(self):
+        with self._lock:
+            for tier in TIERS:
+                self._conn.execute(f"DELETE FROM {tier.table}")
+            self._conn.execute("DELETE FROM reading_series")
+            self._conn.commit()
+            self._series.clear()
+            self._ingested_at = None
+
+    # ------------------------------------------------------------------
+    # Planificación y consulta
+    # ------------------------------------------------------------------
+
+    @property
+    def latest(self) -> Optional[pd.Timestamp]:
+        """Lectura más reciente incorporada (hora local del dispositivo)"""
+        if not self._series:
+            return None
+        return _from_epoch(max(last for _, last in self._series.values()))
+
+    def is_stale(self) -> bool:
+        return self._ingested_at is None or time.time() - self._ingested_at > self.stale_after.total_seconds()
+
+    def seconds_since_ingest(self) -> Optional[float]:
+        return None if self._ingested_at is None else time.time() - self._ingested_at
+
+    def _matching(self, device_ids: Optional[Sequence[str]], sensor_types: Optional[Sequence[str]]) -> List[SeriesKey]:
+        """Series que coinciden con los filtros (ids exactos o prefijos como ``esp32``/``temperature``)"""
+        devices, sensors = tuple(device_ids or ()), tuple(sensor_types or ())
+        return [(device, sensor) for device, sensor in self._series
+                if (not devices or device.startswith(devices)) and (not sensors or sensor.startswith(sensors))]
+
+    def plan(self, hours: float, end: Optional[datetime] = None, max_points: Optional[int] = None,
+             resolution: Optional[timedelta] = None, device_ids: Optional[Sequence[str]] = None,
+             sensor_types: Optional[Sequence[str]] = None) -> TierPlan:
+        """
+        Elegir el nivel para las últimas ``hours`` horas hasta ``end`` (por
+        defecto, la lectura más reciente del almacén).
+
+        Args:
+            max_points: Puntos por serie que puede mostrar el gráfico
+            resolution: Intervalo máximo aceptable entre puntos (prevalece
+                sobre ``max_points``)
+        """
+        end = pd.Timestamp(end or self.latest or datetime.now()).tz_localize(None)
+        window = timedelta(hours=hours)
+        tier = choose_tier(window, max_points, resolution)
+        start = end - window
+        if tier.bucket is not None:
+            start = start.floor(tier.bucket)
+
+        # Una descarga de ``hours`` arranca apenas después de ``end - window``: se
+        # tolera un intervalo del nivel, la antigüedad de ingesta o el 1% de la ventana
+        slack = max(tier.bucket or timedelta(0), self.stale_after, window / 100)
+        series = self._matching(device_ids, sensor_types)
+        covered = bool(series) and bool(min(self._series[key][0] for key in series) <= _epoch(end - window + slack))
+        if tier.bucket is None:
+            estimated_rows = self._count_raw(series, start, end)
+        else:
+            estimated_rows = len(series) * (int((end - start) / tier.bucket) + 1)
+        return TierPlan(tier.name, tier.bucket, start.to_pydatetime(), end.to_pydatetime(),
+                        estimated_rows, covered)
+
+    def _count_raw(self, series: List[SeriesKey], start: pd.Timestamp, end: pd.Timestamp) -> int:
+        return sum(self._conn.execute(
+            "SELECT COUNT(*) FROM readings_raw WHERE device_id = ? AND sensor_type = ? AND ts >= ? AND ts <= ?",
+            (device, sensor, _epoch(start), _epoch(end))).fetchone()[0] for device, sensor in series)
+
+    def query(self, plan: TierPlan, device_ids: Optional[Sequence[str]] = None,
+              sensor_types: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Filas del nivel del plan dentro de su ventana, ordenadas por serie y tiempo.
+
+        Returns:
+            Un registro por intervalo con ``sample_count``, ``avg_value``,
+            ``min_value``, ``max_value`` y ``timestamp``/``value`` (inicio y
+            promedio) para usarse como lecturas en los motores de análisis
+        """
+        tier = TIERS_BY_NAME[plan.tier]
+        if tier.bucket is None:
+            sql = ("SELECT device_id, sensor_type, ts, 1, value, value, value FROM readings_raw "
+                   "WHERE device_id = ? AND sensor_type = ? AND ts >= ? AND ts <= ? ORDER BY ts")
+        else:
+            sql = (f"SELECT device_id, sensor_type, bucket, sample_count, sum_value / sample_count, min_value, "
+                   f"max_value FROM {tier.table} WHERE device_id = ? AND sensor_type = ? "
+                   f"AND bucket >= ? AND bucket <= ? ORDER BY bucket")
+
+        rows = []
+        with self._lock:
+            for device, sensor in sorted(self._matching(device_ids, sensor_types)):
+                for _, _, start, count, mean, low, high in self._conn.execute(
+                        sql, (device, sensor, _epoch(plan.start), _epoch(plan.end))):
+                    timestamp = _from_epoch(start).isoformat()
+                    rows.append({
+                        'device_id': device,
+                        'sensor_type': sensor,
+                        'bucket_start': timestamp,
+                        'sample_count': count,
+                        'avg_value': mean,
+                        'min_value': low,
+                        'max_value': high,
+                        'timestamp': timestamp,
+                        'value': mean,
+                    })
+        return rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Instancia global compartida por los conectores (READING_STORE_DB = archivo persistente)
+reading_store = TieredReadingStore(os.getenv("READING_STORE_DB", ":memory:"))
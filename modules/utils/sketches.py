@@ -0,0 +1,484 @@
+"""
+Sketches Estadísticos por Serie
+===============================
+
+Resúmenes de tamaño acotado para las series (device_id, sensor_type):
+
+- ``TDigest``: cuantiles aproximados (mediana, percentiles, IQR). Mientras la
+  serie es pequeña los valores se guardan tal cual y la respuesta es exacta;
+  al crecer se compactan en centroides (~``compression / 2``).
+- ``HyperLogLog``: conteo aproximado de valores distintos en ``2**precision``
+  bytes.
+- ``SeriesSketch``: ambos más conteo, media y varianza (Welford/Chan).
+- ``SketchStore``: caché de sketches por intervalo de tiempo; las consultas
+  de meses se responden fusionando sketches sin volver a leer las lecturas
+  (``TemporalComparisonEngine`` responde así los outliers de semana y mes).
+
+Todos los sketches se actualizan de forma incremental y son fusionables
+entre intervalos y dispositivos (``merge``).
+"""
+
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from modules.utils.timestamps import wall_clock
+
+logger = logging.getLogger(__name__)
+
+Quantiles = Union[float, Sequence[float]]
+
+
+def _finite(values: Any) -> np.ndarray:
+    arr = np.asarray(values, dtype=np.float64).ravel()
+    return arr[np.isfinite(arr)]
+
+
+class TDigest:
+    """
+    t-digest con fusión vectorizada (función de escala k1 = asin).
+
+    Args:
+        compression: Controla la precisión; el número de centroides queda
+            acotado a ~``compression / 2`` independientemente de los datos
+        buffer_size: Valores en bruto que se acumulan antes de compactar
+            (las consultas son exactas hasta la primera compactación)
+    """
+
+    def __init__(self, compression: float = 200.0, buffer_size: Optional[int] = None):
+        self.compression = float(compression)
+        self.buffer_size = int(buffer_size or 5 * compression)
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer_means: List[np.ndarray] = []
+        self._buffer_weights: List[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def is_exact(self) -> bool:
+        """True mientras no se haya compactado (todas las lecturas en bruto)."""
+        return self.means.size == 0
+
+    def __len__(self) -> int:
+        return int(self.count)
+
+    def update(self, values: Any) -> "TDigest":
+        """Agregar valores (escalar o array); se ignoran NaN e infinitos."""
+        arr = _finite(values)
+        if arr.size:
+            self._add(arr, np.ones(arr.size))
+        return self
+
+    def _add(self, means: np.ndarray, weights: np.ndarray):
+        self.min = min(self.min, float(means.min()))
+        self.max = max(self.max, float(means.max()))
+        self.count += float(weights.sum())
+        self._buffer_means.append(means)
+        self._buffer_weights.append(weights)
+        self._buffered += means.size
+        if self._buffered >= self.buffer_size:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Fusionar otro digest (p. ej. otro intervalo o dispositivo)."""
+        if other.count == 0:
+            return self
+        for means, weights in other._centroids_and_buffer():
+            if means.size:
+                self._add(means, weights)
+        if not other.is_exact:
+            self._compress()  # El buffer contiene centroides: ya no es exacto
+        return self
+
+    def _centroids_and_buffer(self):
+        yield self.means, self.weights
+        yield from zip(self._buffer_means, self._buffer_weights)
+
+    def _raw_values(self) -> np.ndarray:
+        return np.concatenate(self._buffer_means) if self._buffer_means else np.empty(0)
+
+    def _compress(self):
+        """Compactar buffer + centroides en centroides de tamaño acotado por k1."""
+        if not self._buffer_means:
+            return
+        means = np.concatenate([self.means, *self._buffer_means])
+        weights = np.concatenate([self.weights, *self._buffer_weights])
+        self._buffer_means, self._buffer_weights, self._buffered = [], [], 0
+
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_mid = (np.cumsum(weights) - weights / 2.0) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * q_mid - 1, -1.0, 1.0))
+        group = np.floor(k)
+
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: Quantiles) -> Union[float, np.ndarray]:
+        """
+        Cuantil(es) ``q`` en [0, 1]. Exacto (interpolación lineal como
+        ``np.quantile``) antes de la primera compactación.
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else math.nan
+        if self.is_exact:
+            result = np.quantile(self._raw_values(), q)
+        else:
+            self._compress()
+            centers = np.cumsum(self.weights) - self.weights / 2.0
+            result = np.interp(np.asarray(q, dtype=np.float64) * self.count,
+                               np.r_[0.0, centers, self.count],
+                               np.r_[self.min, self.means, self.max])
+        return float(result) if np.ndim(result) == 0 else result
+
+    def cdf(self, x: float) -> float:
+        """Fracción de valores <= ``x``."""
+        if self.count == 0:
+            return math.nan
+        if self.is_exact:
+            return float(np.mean(self._raw_values() <= x))
+        self._compress()
+        centers = np.cumsum(self.weights) - self.weights / 2.0
+        rank = np.interp(x, np.r_[self.min, self.means, self.max], np.r_[0.0, centers, self.count])
+        return float(rank / self.count)
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._compress()
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TDigest":
+        digest = cls(compression=data.get("compression", 200.0))
+        means = np.asarray(data.get("means", []), dtype=np.float64)
+        if means.size:
+            digest.means = means
+            digest.weights = np.asarray(data["weights"], dtype=np.float64)
+            digest.count = float(digest.weights.sum())
+            digest.min, digest.max = float(data["min"]), float(data["max"])
+        return digest
+
+
+class HyperLogLog:
+    """
+    Conteo aproximado de valores distintos (error típico ~1.04 / sqrt(2**precision)).
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision debe estar entre 4 y 16")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: Any) -> "HyperLogLog":
+        """Agregar valores (números, cadenas o un array de ellos)."""
+        arr = np.asarray(values).ravel()
+        if arr.size == 0:
+            return self
+        hashes = pd.util.hash_array(arr)
+        tail_bits = 64 - self.precision
+        index = (hashes >> np.uint64(tail_bits)).astype(np.intp)
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        # frexp da el bit_length exacto (tail < 2**52 cabe en un float64)
+        _, bit_length = np.frexp(tail.astype(np.float64))
+        rank = (tail_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("No se pueden fusionar HyperLogLog de distinta precisión")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Corrección de rango pequeño
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"precision": self.precision, "registers": self.registers.tobytes().hex()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        hll = cls(precision=data["precision"])
+        hll.registers = np.frombuffer(bytes.fromhex(data["registers"]), dtype=np.uint8).copy()
+        return hll
+
+
+@dataclass
+class SeriesSketch:
+    """Resumen incremental y fusionable de una serie de lecturas."""
+    digest: TDigest = field(default_factory=TDigest)
+    distinct: HyperLogLog = field(default_factory=HyperLogLog)
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    @classmethod
+    def from_values(cls, values: Any) -> "SeriesSketch":
+        return cls().update(values)
+
+    def update(self, values: Any) -> "SeriesSketch":
+        """Agregar lecturas; se ignoran NaN e infinitos."""
+        arr = _finite(values)
+        if arr.size == 0:
+            return self
+        self.digest.update(arr)
+        self.distinct.update(arr)
+        batch_mean = float(arr.mean())
+        self._combine(arr.size, batch_mean, float(((arr - batch_mean) ** 2).sum()))
+        return self
+
+    def _combine(self, n: int, mean: float, m2: float):
+        """Combinar momentos (Chan et al.)."""
+        total = self.count + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+
+    def merge(self, other: "SeriesSketch") -> "SeriesSketch":
+        """Fusionar otro sketch (otro intervalo de tiempo u otro dispositivo)."""
+        if other.count == 0:
+            return self
+        self.digest.merge(other.digest)
+        self.distinct.merge(other.distinct)
+        self._combine(other.count, other.mean, other.m2)
+        return self
+
+    @property
+    def min(self) -> float:
+        return self.digest.min if self.count else math.nan
+
+    @property
+    def max(self) -> float:
+        return self.digest.max if self.count else math.nan
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def std(self, ddof: int = 0) -> float:
+        """Desviación estándar (``ddof=1`` para la muestral)."""
+        if self.count <= ddof:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / (self.count - ddof))
+
+    def quantile(self, q: Quantiles) -> Union[float, np.ndarray]:
+        return self.digest.quantile(q)
+
+    def iqr_bounds(self, k: float = 1.5) -> Tuple[float, float]:
+        """Límites de outliers de Tukey: (Q1 - k·IQR, Q3 + k·IQR)."""
+        q1, q3 = self.digest.quantile([0.25, 0.75])
+        iqr = q3 - q1
+        return float(q1 - k * iqr), float(q3 + k * iqr)
+
+    def outlier_fraction(self, k: float = 1.5) -> float:
+        """Fracción estimada de lecturas fuera de ``iqr_bounds(k)``."""
+        if self.count == 0:
+            return 0.0
+        lower, upper = self.iqr_bounds(k)
+        below = self.digest.cdf(np.nextafter(lower, -math.inf))
+        return max(0.0, below + 1.0 - self.digest.cdf(upper))
+
+    def summary(self) -> Dict[str, Any]:
+        """Estadísticas listas para reportes."""
+        if self.count == 0:
+            return {"count": 0}
+        p25, p50, p75, p95 = self.quantile([0.25, 0.5, 0.75, 0.95])
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std(),
+            "min": self.min,
+            "max": self.max,
+            "p25": float(p25),
+            "median": float(p50),
+            "p75": float(p75),
+            "p95": float(p95),
+            "distinct": self.distinct.count(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "digest": self.digest.to_dict(),
+            "distinct": self.distinct.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SeriesSketch":
+        return cls(digest=TDigest.from_dict(data["digest"]),
+                   distinct=HyperLogLog.from_dict(data["distinct"]),
+                   count=int(data["count"]), mean=float(data["mean"]), m2=float(data["m2"]))
+
+
+class SketchAccumulator:
+    """
+    Sketches por clave alimentados lectura a lectura.
+
+    Los valores se acumulan por clave y se incorporan en bloques de
+    ``chunk_size``, evitando el costo de actualizar el sketch por cada valor.
+    """
+
+    def __init__(self, chunk_size: int = 4096):
+        self.chunk_size = chunk_size
+        self._sketches: Dict[Any, SeriesSketch] = {}
+        self._pending: Dict[Any, List[float]] = {}
+
+    def add(self, key: Any, value: float):
+        pending = self._pending.setdefault(key, [])
+        pending.append(value)
+        if len(pending) >= self.chunk_size:
+            self._flush(key)
+
+    def _flush(self, key: Any):
+        sketch = self._sketches.setdefault(key, SeriesSketch())
+        sketch.update(self._pending.pop(key, []))
+
+    def get(self, key: Any) -> SeriesSketch:
+        """Sketch de ``key`` con los valores pendientes ya incorporados."""
+        self._flush(key)
+        return self._sketches[key]
+
+    def result(self) -> Dict[Any, SeriesSketch]:
+        for key in list(self._pending):
+            self._flush(key)
+        return self._sketches
+
+
+SketchKey = Tuple[str, str, datetime]
+
+
+class SketchStore:
+    """
+    Caché de ``SeriesSketch`` por (device_id, sensor_type, inicio de intervalo).
+
+    Args:
+        bucket: Ancho de cada intervalo
+        max_buckets: Intervalos retenidos (se descartan los más antiguos);
+            acota la memoria independientemente del volumen de lecturas
+    """
+
+    def __init__(self, bucket: timedelta = timedelta(hours=1), max_buckets: int = 50_000):
+        self.bucket = bucket
+        self.max_buckets = max_buckets
+        self._sketches: Dict[SketchKey, SeriesSketch] = {}
+        self._spans: Dict[Tuple[str, str], Tuple[pd.Timestamp, pd.Timestamp]] = {}  # primera y última lectura
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sketches)
+
+    def clear(self):
+        with self._lock:
+            self._sketches.clear()
+            self._spans.clear()
+
+    def update(self, readings: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> int:
+        """
+        Incorporar lecturas (``device_id``, ``sensor_type``, ``value``,
+        ``timestamp``) a los sketches de sus intervalos.
+
+        Por serie solo se incorporan lecturas fuera del rango ya visto
+        (posteriores a la última o anteriores a la primera), de modo que
+        volver a pasar una ventana solapada no duplica conteos y la historia
+        descargada más tarde sí se suma.
+
+        Returns:
+            Número de lecturas válidas incorporadas
+        """
+        df = readings if isinstance(readings, pd.DataFrame) else pd.DataFrame(list(readings))
+        required = {"device_id", "sensor_type", "value", "timestamp"}
+        if df.empty or not required.issubset(df.columns):
+            return 0
+
+        frame = pd.DataFrame({
+            "device_id": df["device_id"].astype(str),
+            "sensor_type": df["sensor_type"].astype(str),
+            "value": pd.to_numeric(df["value"], errors="coerce"),
+            "timestamp": wall_clock(df["timestamp"]),
+        }).dropna(subset=["value", "timestamp"])
+        frame["bucket"] = frame["timestamp"].dt.floor(self.bucket)
+
+        added = 0
+        with self._lock:
+            for (device_id, sensor_type), series in frame.groupby(["device_id", "sensor_type"], sort=False):
+                span = self._spans.get((device_id, sensor_type))
+                if span is not None:
+                    series = series[(series["timestamp"] < span[0]) | (series["timestamp"] > span[1])]
+                if series.empty:
+                    continue
+                first, last = series["timestamp"].min(), series["timestamp"].max()
+                if span is not None:
+                    first, last = min(first, span[0]), max(last, span[1])
+                self._spans[(device_id, sensor_type)] = (first, last)
+                added += len(series)
+                for bucket, group in series.groupby("bucket", sort=False):
+                    self._add(device_id, sensor_type, bucket.to_pydatetime(), group["value"].to_numpy())
+            self._evict()
+        return added
+
+    def _add(self, device_id: str, sensor_type: str, bucket: datetime, values: np.ndarray):
+        key = (device_id, sensor_type, bucket)
+        sketch = self._sketches.get(key)
+        if sketch is None:
+            sketch = self._sketches[key] = SeriesSketch()
+        sketch.update(values)
+
+    def _evict(self):
+        if len(self._sketches) <= self.max_buckets:
+            return
+        for key in sorted(self._sketches, key=lambda k: k[2])[:len(self._sketches) - self.max_buckets]:
+            del self._sketches[key]
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              device_id: Optional[str] = None, sensor_type: Optional[str] = None) -> SeriesSketch:
+        """
+        Fusionar los sketches de los intervalos en [start, end) que coincidan
+        con los filtros. Los sketches en caché no se modifican.
+        """
+        result = SeriesSketch()
+        with self._lock:
+            for (device, sensor, bucket), sketch in self._sketches.items():
+                if device_id is not None and device != device_id:
+                    continue
+                if sensor_type is not None and sensor != sensor_type:
+                    continue
+                if start is not None and bucket + self.bucket <= start:
+                    continue
+                if end is not None and bucket >= end:
+                    continue
+                result.merge(sketch)
+        return result
+
+    def series(self) -> List[Tuple[str, str]]:
+        """Series (device_id, sensor_type) con sketches en caché."""
+        return sorted({(device, sensor) for device, sensor, _ in self._sketches})
+
+
+# Instancia global compartida por los módulos de análisis
+sketch_store = SketchStore()
@@ -0,0 +1,208 @@
+"""
+Exportación en Streaming de Lecturas IoT
+========================================
+
+Escribe filas por bloques directamente desde la fuente de lecturas, sin
+construir listas de diccionarios ni DataFrames completos:
+
+- CSV: generador de bloques de bytes (``iter_csv_chunks``)
+- XLSX: openpyxl en modo ``write_only`` (memoria constante por hoja)
+- Parquet: ``pyarrow`` por lotes con compresión (formato columnar compacto)
+
+``spool_chunks`` convierte cualquier generador de bytes en un archivo
+temporal que pasa a disco al superar un umbral, apto para
+``st.download_button``.
+"""
+
+import csv
+import io
+import logging
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Imports opcionales
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logger.warning("⚠️ pyarrow no disponible - exportación Parquet deshabilitada")
+
+# Fila de lectura normalizada: (timestamp, dispositivo, sensor, valor)
+ReadingRow = Tuple[Any, Any, Any, Any]
+
+READING_COLUMNS = ['timestamp', 'device', 'sensor', 'value']
+DEFAULT_CHUNK_ROWS = 5_000
+DEFAULT_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def iter_series_rows(all_data: Dict[str, Any]) -> Iterator[ReadingRow]:
+    """
+    Recorrer las series de un reporte (``{key: {device, sensor, data: [{t, v}]}}``)
+    como filas, sin copiarlas.
+    """
+    for info in all_data.values():
+        device = info.get('device', '')
+        sensor = info.get('sensor', '')
+        for point in info.get('data') or []:
+            yield point.get('t', ''), device, sensor, point.get('v', '')
+
+
+def iter_record_rows(records: Iterable[Dict[str, Any]]) -> Iterator[ReadingRow]:
+    """
+    Recorrer lecturas crudas de la API (``device_id``/``sensor_type``/``value``)
+    o puntos combinados (``device``/``sensor``/``v``) como filas.
+    """
+    for record in records:
+        yield (
+            record.get('timestamp', record.get('t', '')),
+            record.get('device_id', record.get('device', '')),
+            record.get('sensor_type', record.get('sensor', '')),
+            record.get('value', record.get('v', '')),
+        )
+
+
+def iter_csv_chunks(rows: Iterable[Sequence[Any]],
+                    header: Optional[Sequence[str]] = None,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                    encoding: str = 'utf-8') -> Iterator[bytes]:
+    """
+    Generar el CSV en bloques de ``chunk_rows`` filas.
+
+    Args:
+        rows: Filas a escribir (cualquier iterable, se consume una vez)
+        header: Encabezado opcional
+        chunk_rows: Filas por bloque
+        encoding: Codificación de salida
+
+    Yields:
+        Bloques de bytes listos para escribir o descargar
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(header)
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode(encoding)
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode(encoding)
+
+
+def spool_chunks(chunks: Iterable[bytes], max_memory: int = DEFAULT_SPOOL_BYTES):
+    """
+    Volcar bloques de bytes a un archivo temporal (memoria hasta ``max_memory``,
+    luego disco) y devolverlo rebobinado.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory, mode='w+b')
+    for chunk in chunks:
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def write_xlsx_streaming(sheets: Iterable[Tuple[str, Sequence[str], Iterable[Sequence[Any]]]],
+                         output=None):
+    """
+    Escribir un libro XLSX en modo ``write_only`` de openpyxl.
+
+    Cada hoja se serializa fila a fila a un archivo temporal, por lo que la
+    memoria no crece con la cantidad de filas.
+
+    Args:
+        sheets: Iterable de ``(nombre, encabezado, filas)``
+        output: Archivo binario destino (por defecto un SpooledTemporaryFile)
+
+    Returns:
+        El archivo destino rebobinado
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for name, header, rows in sheets:
+        sheet = workbook.create_sheet(title=str(name)[:31])  # Límite de Excel
+        sheet.append(list(header))
+        for row in rows:
+            sheet.append(list(row))
+
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=DEFAULT_SPOOL_BYTES, mode='w+b')
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def _parquet_schema():
+    return pa.schema([
+        ('timestamp', pa.timestamp('ms', tz='UTC')),
+        ('device', pa.dictionary(pa.int32(), pa.string())),
+        ('sensor', pa.dictionary(pa.int32(), pa.string())),
+        ('value', pa.float64()),
+    ])
+
+
+def _parquet_batch(batch: List[ReadingRow], schema) -> "pa.RecordBatch":
+    import pandas as pd
+
+    timestamps = pd.to_datetime([row[0] for row in batch], utc=True, errors='coerce', format='ISO8601')
+    values = pd.to_numeric(pd.Series([row[3] for row in batch], dtype=object), errors='coerce')
+    arrays = [
+        pa.array(timestamps.as_unit('ms'), type=schema.field('timestamp').type),
+        pa.array([str(row[1]) for row in batch]).dictionary_encode(),
+        pa.array([str(row[2]) for row in batch]).dictionary_encode(),
+        pa.array(values.to_numpy(dtype='float64'), type=pa.float64(), from_pandas=True),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet_streaming(rows: Iterable[ReadingRow], output=None,
+                            compression: str = 'zstd',
+                            batch_rows: int = 50_000):
+    """
+    Escribir lecturas a Parquet por lotes (timestamp UTC, dispositivo y
+    sensor codificados como diccionario, valor float64).
+
+    Args:
+        rows: Filas ``(timestamp, dispositivo, sensor, valor)``
+        output: Archivo binario o ruta destino (por defecto SpooledTemporaryFile)
+        compression: Códec de Parquet (``zstd``, ``snappy``, ``gzip``...)
+        batch_rows: Filas por lote / row group
+
+    Returns:
+        El archivo destino rebobinado (o la ruta si se pasó una)
+
+    Raises:
+        ImportError: Si pyarrow no está instalado
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow es requerido para exportar Parquet")
+
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=DEFAULT_SPOOL_BYTES, mode='w+b')
+
+    schema = _parquet_schema()
+    with pq.ParquetWriter(output, schema, compression=compression) as writer:
+        batch: List[ReadingRow] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                writer.write_batch(_parquet_batch(batch, schema))
+                batch = []
+        if batch:
+            writer.write_batch(_parquet_batch(batch, schema))
+
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
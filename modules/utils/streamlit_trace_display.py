@@ -0,0 +1,126 @@
+"""
+Panel de Streamlit para diagnóstico de rendimiento
+==================================================
+
+Muestra las trazas recientes del pipeline (ver ``modules.utils.tracing``):
+tiempo por nodo/motor, percentiles p50/p95, contadores de registros, bytes,
+tokens y caché, y el camino caliente de la última consulta. También muestra
+el costo de importación de los plugins diferidos (``plugin_registry``).
+"""
+
+import streamlit as st
+from typing import Optional
+import logging
+
+from modules.utils.tracing import Tracer, get_tracer, hot_path, summarize_spans
+
+logger = logging.getLogger(__name__)
+
+# Columnas de contadores que se muestran si existen en el resumen
+_COUNTER_COLUMNS = ["records", "bytes_fetched", "llm_tokens", "cache_hits", "cache_misses"]
+
+
+def display_trace_diagnostics(key_prefix: str = "trace", trace_tracer: Optional[Tracer] = None, limit: int = 50):
+    """
+    Mostrar el panel de diagnóstico de rendimiento.
+
+    Args:
+        key_prefix: Prefijo para las claves de Streamlit
+        trace_tracer: Trazador a consultar (por defecto el global)
+        limit: Cantidad máxima de trazas recientes a agregar
+    """
+    try:
+        active_tracer = trace_tracer or get_tracer()
+
+        if not active_tracer.enabled:
+            st.info("ℹ️ Trazado desactivado (IOT_TRACING_ENABLED=0)")
+            return
+
+        traces = active_tracer.recent_traces(limit)
+        if not traces:
+            st.info("ℹ️ Aún no hay trazas registradas. Realice una consulta en el chat.")
+            return
+
+        latest = traces[0]
+        root = next((s for s in latest if s.get("parent_span_id") is None), latest[-1])
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("🧭 Trazas Recientes", len(traces))
+        with col2:
+            st.metric("⏱️ Última Consulta", f"{root['duration_ms']:.0f} ms")
+        with col3:
+            st.metric("🔢 Spans en Última Traza", len(latest))
+
+        # Resumen por span (camino caliente primero)
+        st.markdown("**Tiempo por etapa (todas las trazas recientes):**")
+        rows = []
+        for entry in summarize_spans(traces):
+            row = {
+                "Etapa": entry["name"],
+                "Llamadas": entry["count"],
+                "Total (ms)": entry["total_ms"],
+                "p50 (ms)": entry["p50_ms"],
+                "p95 (ms)": entry["p95_ms"],
+                "Máx (ms)": entry["max_ms"],
+                "Errores": entry["errors"],
+            }
+            for counter in _COUNTER_COLUMNS:
+                if counter in entry:
+                    row[counter] = entry[counter]
+            rows.append(row)
+        st.dataframe(rows, use_container_width=True, key=f"{key_prefix}_summary")
+
+        # Camino caliente de la última consulta
+        st.markdown("**🔥 Camino caliente de la última consulta:**")
+        path = hot_path(latest)
+        st.code("\n".join(
+            f"{'  ' * depth}└─ {span['name']}: {span['duration_ms']:.1f} ms"
+            for depth, span in enumerate(path)
+        ))
+
+        st.caption(f"Archivo de trazas (OTLP/JSON): {active_tracer.trace_file}")
+
+        if st.button("🧹 Limpiar trazas", key=f"{key_prefix}_clear"):
+            active_tracer.clear()
+            st.rerun()
+
+    except Exception as e:
+        logger.error(f"Error mostrando diagnóstico de trazas: {e}")
+        st.error(f"❌ Error mostrando diagnóstico: {str(e)}")
+
+
+def display_import_report(key_prefix: str = "imports"):
+    """
+    Mostrar el costo de importación de los plugins diferidos.
+
+    Args:
+        key_prefix: Prefijo para las claves de Streamlit
+    """
+    try:
+        from modules.utils.plugin_registry import get_plugin_registry
+
+        report = get_plugin_registry().import_report()
+
+        st.markdown("**🔌 Carga de plugins (motores, renderizadores, exportadores):**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("📦 Cargados", f"{report['loaded']}/{report['registered']}")
+        with col2:
+            st.metric("⏱️ Tiempo de Importación", f"{report['total_seconds']:.2f} s")
+        with col3:
+            st.metric("💤 Pendientes", len(report["pending"]))
+
+        if report["plugins"]:
+            rows = [{
+                "Plugin": p["name"],
+                "Estado": "✅" if p["status"] == "loaded" else "❌",
+                "Segundos": p["seconds"],
+                "Hilo": p["thread"],
+                "Cargado": p["loaded_at"],
+            } for p in report["plugins"]]
+            st.dataframe(rows, use_container_width=True, key=f"{key_prefix}_plugins")
+
+    except Exception as e:
+        logger.error(f"Error mostrando reporte de importación: {e}")
+        st.error(f"❌ Error mostrando reporte de importación: {str(e)}")
@@ -0,0 +1,266 @@
+"""
+Perfiles Temporales por Serie
+=============================
+
+Agregados hora del día x día de la semana (7 x 24 = 168 celdas) para cada
+serie (device_id, sensor_type), con conteo, suma, suma de cuadrados, mínimo
+y máximo por celda:
+
+- ``TemporalProfile``: perfil de una serie (o la fusión de varias); de las
+  sumas se obtienen medias y desviaciones por celda, por hora o por grupo
+  de días sin volver a leer las lecturas.
+- ``ProfileStore``: caché de perfiles que se actualiza de forma incremental
+  (por serie se incorporan solo las lecturas fuera de los rangos ya vistos).
+
+Los heatmaps temporales y la detección de patrones diarios/semanales se
+responden desde estos perfiles en vez de reagrupar semanas de lecturas.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from modules.utils.timestamps import wall_clock
+
+logger = logging.getLogger(__name__)
+
+DAYS = 7
+HOURS = 24
+DAY_LABELS = ('Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom')
+WEEKDAYS = (0, 1, 2, 3, 4)
+WEEKEND = (5, 6)
+
+SeriesKey = Tuple[str, str]
+
+
+class TemporalProfile:
+    """
+    Agregados por (día de la semana, hora) de una serie.
+
+    Las matrices tienen forma ``(7, 24)``: fila = día (0 = lunes), columna =
+    hora local del dispositivo.
+    """
+
+    def __init__(self):
+        self.count = np.zeros((DAYS, HOURS), dtype=np.int64)
+        self.sum = np.zeros((DAYS, HOURS))
+        self.sumsq = np.zeros((DAYS, HOURS))
+        self.min = np.full((DAYS, HOURS), np.inf)
+        self.max = np.full((DAYS, HOURS), -np.inf)
+        self.first_seen: Optional[pd.Timestamp] = None
+        self.last_seen: Optional[pd.Timestamp] = None
+
+    @property
+    def total(self) -> int:
+        return int(self.count.sum())
+
+    @property
+    def days_covered(self) -> int:
+        """Días de la semana con al menos una lectura"""
+        return int((self.count.sum(axis=1) > 0).sum())
+
+    @property
+    def span_days(self) -> int:
+        """Días calendario entre la primera y la última lectura incorporadas"""
+        if self.first_seen is None:
+            return 0
+        return (self.last_seen.normalize() - self.first_seen.normalize()).days + 1
+
+    def update(self, timestamps: pd.Series, values: np.ndarray):
+        """Incorporar lecturas (timestamps en hora local del dispositivo, sin offset)"""
+        if len(values) == 0:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        cells = (timestamps.dt.dayofweek.to_numpy(), timestamps.dt.hour.to_numpy())
+        np.add.at(self.count, cells, 1)
+        np.add.at(self.sum, cells, values)
+        np.add.at(self.sumsq, cells, values * values)
+        np.minimum.at(self.min, cells, values)
+        np.maximum.at(self.max, cells, values)
+        self._extend(timestamps.min(), timestamps.max())
+
+    def merge(self, other: 'TemporalProfile') -> 'TemporalProfile':
+        self.count += other.count
+        self.sum += other.sum
+        self.sumsq += other.sumsq
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        if other.first_seen is not None:
+            self._extend(other.first_seen, other.last_seen)
+        return self
+
+    def _extend(self, first: pd.Timestamp, last: pd.Timestamp):
+        self.first_seen = first if self.first_seen is None else min(self.first_seen, first)
+        self.last_seen = last if self.last_seen is None else max(self.last_seen, last)
+
+    @staticmethod
+    def _moments(count, total, sumsq) -> Tuple[np.ndarray, np.ndarray]:
+        """Media y desviación muestral (NaN donde no hay lecturas suficientes)"""
+        count = np.asarray(count, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, total / count, np.nan)
+            variance = np.where(count > 1, (sumsq - count * mean * mean) / (count - 1), np.nan)
+        return mean, np.sqrt(np.clip(variance, 0, None))
+
+    def mean(self) -> np.ndarray:
+        return self._moments(self.count, self.sum, self.sumsq)[0]
+
+    def std(self) -> np.ndarray:
+        return self._moments(self.count, self.sum, self.sumsq)[1]
+
+    def heatmap(self) -> pd.DataFrame:
+        """Media por celda: índice = hora, columnas = día de la semana"""
+        return pd.DataFrame(self.mean().T, index=pd.RangeIndex(HOURS, name='hour'), columns=list(DAY_LABELS))
+
+    def hourly(self) -> pd.DataFrame:
+        """
+        Estadísticas por hora del día, agrupando todos los días (ponderadas
+        por cantidad de lecturas). Las horas sin lecturas quedan en NaN.
+        """
+        count = self.count.sum(axis=0)
+        mean, std = self._moments(count, self.sum.sum(axis=0), self.sumsq.sum(axis=0))
+        empty = count == 0
+        return pd.DataFrame({
+            'count': count,
+            'mean': mean,
+            'std': std,
+            'min': np.where(empty, np.nan, self.min.min(axis=0)),
+            'max': np.where(empty, np.nan, self.max.max(axis=0)),
+        }, index=pd.RangeIndex(HOURS, name='hour'))
+
+    def pooled(self, days: Sequence[int] = tuple(range(DAYS))) -> Tuple[int, float, float]:
+        """(conteo, media, desviación) de todas las lecturas de los días indicados"""
+        rows = list(days)
+        count = int(self.count[rows].sum())
+        mean, std = self._moments(count, self.sum[rows].sum(), self.sumsq[rows].sum())
+        return count, float(mean), float(std)
+
+
+class ProfileStore:
+    """
+    Caché de ``TemporalProfile`` por serie (device_id, sensor_type).
+
+    Los agregados ocupan 168 celdas por serie sin importar cuántas semanas
+    de lecturas se hayan incorporado; para que la ingesta sea idempotente se
+    guardan además, por serie, los rangos de tiempo ya incorporados. Cada
+    lote cubre el rango entre su primera y su última lectura (las ventanas
+    que se solapan se funden en un solo rango), así que el estado crece con
+    las ventanas disjuntas y no con las lecturas.
+    """
+
+    def __init__(self):
+        self._profiles: Dict[SeriesKey, TemporalProfile] = {}
+        self._coverage: Dict[SeriesKey, np.ndarray] = {}   # rangos [inicio, fin] (ns) ordenados y disjuntos
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+            self._coverage.clear()
+
+    def update(self, readings: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> int:
+        """
+        Incorporar lecturas (``device_id``, ``sensor_type``, ``value``,
+        ``timestamp``) a los perfiles de sus series.
+
+        Por serie se descartan las lecturas dentro de los rangos ya
+        incorporados, de modo que volver a pasar una ventana solapada no
+        duplica conteos y la historia que llega después (anterior a la
+        primera lectura vista) sí se suma.
+
+        Returns:
+            Número de lecturas válidas incorporadas
+        """
+        df = readings if isinstance(readings, pd.DataFrame) else pd.DataFrame(list(readings))
+        required = {"device_id", "sensor_type", "value", "timestamp"}
+        if df.empty or not required.issubset(df.columns):
+            return 0
+
+        frame = pd.DataFrame({
+            "device_id": df["device_id"].astype(str),
+            "sensor_type": df["sensor_type"].astype(str),
+            "value": pd.to_numeric(df["value"], errors="coerce"),
+            "timestamp": wall_clock(df["timestamp"]),
+        }).dropna(subset=["value", "timestamp"])
+        frame = frame.drop_duplicates(["device_id", "sensor_type", "timestamp"])
+
+        added = 0
+        with self._lock:
+            for key, series in frame.groupby(["device_id", "sensor_type"], sort=False):
+                stamps = series["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+                coverage = self._coverage.get(key)
+                self._coverage[key] = _add_range(coverage, int(stamps.min()), int(stamps.max()))
+                if coverage is not None:
+                    series = series[~_covered(coverage, stamps)]
+                if series.empty:
+                    continue
+                profile = self._profiles.get(key)
+                if profile is None:
+                    profile = self._profiles[key] = TemporalProfile()
+                profile.update(series["timestamp"], series["value"].to_numpy())
+                added += len(series)
+        return added
+
+    def profile(self, sensor_type: Optional[str] = None, device_id: Optional[str] = None,
+                series: Optional[Iterable[SeriesKey]] = None) -> TemporalProfile:
+        """
+        Fusionar los perfiles de las series que coincidan con los filtros
+        (``series`` restringe a esas claves (device_id, sensor_type)).
+        Los perfiles en caché no se modifican.
+        """
+        result = TemporalProfile()
+        allowed = None if series is None else {(str(device), str(sensor)) for device, sensor in series}
+        with self._lock:
+            for (device, sensor), profile in self._profiles.items():
+                if allowed is not None and (device, sensor) not in allowed:
+                    continue
+                if device_id is not None and device != device_id:
+                    continue
+                if sensor_type is not None and sensor != sensor_type:
+                    continue
+                result.merge(profile)
+        return result
+
+    @staticmethod
+    def series_in(df: pd.DataFrame) -> List[SeriesKey]:
+        """Series (device_id, sensor_type) presentes en un frame de lecturas"""
+        if df.empty or not {"device_id", "sensor_type"}.issubset(df.columns):
+            return []
+        return list(df[["device_id", "sensor_type"]].astype(str).drop_duplicates().itertuples(index=False, name=None))
+
+    def series(self) -> List[SeriesKey]:
+        """Series (device_id, sensor_type) con perfil en caché."""
+        return sorted(self._profiles)
+
+
+def _covered(ranges: np.ndarray, stamps: np.ndarray) -> np.ndarray:
+    """Máscara de los timestamps que caen dentro de algún rango"""
+    position = np.searchsorted(ranges[:, 0], stamps, side='right') - 1
+    inside = position >= 0
+    inside[inside] = stamps[inside] <= ranges[position[inside], 1]
+    return inside
+
+
+def _add_range(ranges: Optional[np.ndarray], start: int, end: int) -> np.ndarray:
+    """Agregar [start, end] a los rangos, fundiendo los que se solapan"""
+    if ranges is None:
+        return np.array([[start, end]], dtype=np.int64)
+    merged = np.vstack([ranges, [[start, end]]])
+    merged = merged[np.argsort(merged[:, 0], kind='stable')]
+    result = [merged[0].copy()]
+    for low, high in merged[1:]:
+        if low <= result[-1][1]:
+            result[-1][1] = max(result[-1][1], high)
+        else:
+            result.append(np.array([low, high]))
+    return np.array(result, dtype=np.int64)
+
+
+# Instancia global compartida por los motores de visualización e insights
+profile_store = ProfileStore()
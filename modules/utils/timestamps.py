@@ -0,0 +1,36 @@
+"""
+Normalización de Timestamps de Lecturas
+=======================================
+
+La API entrega timestamps ISO con el offset del dispositivo
+(``2025-10-21T11:30:00-03:00``); la base guarda la hora local sin offset.
+Estas funciones convierten una columna de timestamps a esas dos vistas:
+
+- ``wall_clock``: hora local del dispositivo, naive (se descarta el offset)
+- ``instant``: instante UTC, solo para los timestamps que traen offset
+"""
+
+import pandas as pd
+
+_OFFSET_PATTERN = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+
+def wall_clock(timestamps: pd.Series) -> pd.Series:
+    """Timestamps -> hora local del dispositivo sin offset (igual que la columna ``TIMESTAMP`` de la base)"""
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        return timestamps.dt.tz_localize(None)
+    if pd.api.types.is_datetime64_dtype(timestamps):
+        return timestamps
+    text = timestamps.astype(str).str.replace(_OFFSET_PATTERN, "", regex=True)
+    return pd.to_datetime(text, errors="coerce", format="ISO8601")
+
+
+def instant(timestamps: pd.Series) -> pd.Series:
+    """Instante UTC de los timestamps que traen offset (NaT en los que no)"""
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        return timestamps.dt.tz_convert("UTC")
+    if pd.api.types.is_datetime64_dtype(timestamps):
+        return pd.Series(pd.NaT, index=timestamps.index, dtype="datetime64[ns, UTC]")
+    text = timestamps.astype(str)
+    utc = pd.to_datetime(text, errors="coerce", utc=True, format="ISO8601")
+    return utc.where(text.str.contains(_OFFSET_PATTERN, regex=True))
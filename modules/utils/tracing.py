@@ -0,0 +1,358 @@
+"""
+Trazado (Tracing) de Rendimiento del Pipeline IoT
+=================================================
+
+Spans ligeros para medir dónde se va el tiempo de cada consulta: nodos del
+grafo LangGraph, llamadas a motores de inteligencia, peticiones a la API
+Jetson y llamadas al LLM.
+
+Cada span registra:
+- Duración con reloj monotónico (``time.perf_counter_ns``)
+- Contadores: registros, bytes descargados, tokens LLM, aciertos de caché
+- Atributos libres y estado (ok / error)
+
+Los spans terminados se escriben como JSON Lines a un archivo rotativo
+local, una línea por span con el mensaje ``ExportTraceServiceRequest`` de
+OTLP/JSON (``resourceSpans`` → ``scopeSpans`` → ``spans``), y se guardan en
+un buffer en memoria que consume el panel de diagnóstico de Streamlit.
+
+Variables de entorno:
+- ``IOT_TRACING_ENABLED``: ``0`` desactiva el trazado (default ``1``)
+- ``IOT_TRACE_FILE``: ruta del archivo (default ``<proyecto>/logs/traces.jsonl``,
+  independiente del directorio de trabajo)
+- ``IOT_TRACE_TO_FILE``: ``0`` no escribe el archivo por defecto, solo el
+  buffer en memoria (default ``1``; la suite de tests lo fija en ``0``). Una
+  ruta explícita se escribe igual.
+- ``IOT_TRACE_MAX_BYTES`` / ``IOT_TRACE_BACKUPS``: rotación del archivo
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import secrets
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Contadores estándar que suma el panel de diagnóstico
+COUNTER_RECORDS = "records"
+COUNTER_BYTES = "bytes_fetched"
+COUNTER_LLM_TOKENS = "llm_tokens"
+COUNTER_CACHE_HITS = "cache_hits"
+COUNTER_CACHE_MISSES = "cache_misses"
+
+DEFAULT_TRACE_FILE = Path(__file__).resolve().parents[2] / "logs" / "traces.jsonl"
+SCOPE_NAME = "modules.utils.tracing"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("iot_current_span", default=None)
+
+
+@dataclass
+class Span:
+    """Unidad de trabajo medida dentro de una traza"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_unix_nano: int
+    start_perf_ns: int
+    end_perf_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    counters: Dict[str, float] = field(default_factory=dict)
+    status: str = "ok"
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_perf_ns if self.end_perf_ns is not None else time.perf_counter_ns()
+        return (end - self.start_perf_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def increment(self, counter: str, amount: float = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_unix_nano": self.start_unix_nano,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": dict(self.attributes),
+            "counters": dict(self.counters),
+            "status": self.status,
+            "error": self.error,
+        }
+
+    def to_otlp(self, service_name: str) -> Dict[str, Any]:
+        """``ExportTraceServiceRequest`` OTLP/JSON con este span (una línea del archivo)."""
+        end_unix_nano = self.start_unix_nano + int(self.duration_ms * 1_000_000)
+        attributes = [_otlp_attribute(k, v) for k, v in self.attributes.items()]
+        attributes += [_otlp_attribute(f"iot.{k}", v) for k, v in self.counters.items()]
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_unix_nano),
+            "endTimeUnixNano": str(end_unix_nano),
+            "attributes": attributes,
+            "status": {"code": 2, "message": self.error or ""} if self.status == "error" else {"code": 1},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": [span]}],
+        }]}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+class Tracer:
+    """
+    Trazador de procesos con propagación vía ``contextvars``.
+
+    Funciona igual en código síncrono y asíncrono: las tareas de asyncio
+    heredan el span activo del contexto que las creó.
+    """
+
+    def __init__(self,
+                 service_name: str = "iot-agent",
+                 trace_file: Optional[str] = None,
+                 max_bytes: Optional[int] = None,
+                 backup_count: Optional[int] = None,
+                 enabled: Optional[bool] = None,
+                 buffer_size: int = 200):
+        self.service_name = service_name
+        self.enabled = enabled if enabled is not None else os.getenv("IOT_TRACING_ENABLED", "1") != "0"
+        configured = trace_file or os.getenv("IOT_TRACE_FILE")
+        self.trace_file = Path(configured).resolve() if configured else DEFAULT_TRACE_FILE
+        self.max_bytes = max_bytes or int(os.getenv("IOT_TRACE_MAX_BYTES", str(5 * 1024 * 1024)))
+        self.backup_count = backup_count if backup_count is not None else int(os.getenv("IOT_TRACE_BACKUPS", "3"))
+
+        self._lock = threading.Lock()
+        self._open_traces: Dict[str, List[Span]] = {}
+        self._finished: Deque[List[Dict[str, Any]]] = deque(maxlen=buffer_size)
+        self._file_logger: Optional[logging.Logger] = None
+        self._file_disabled = not configured and os.getenv("IOT_TRACE_TO_FILE", "1") == "0"
+
+    # ------------------------------------------------------------------
+    # API de spans
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Abrir un span hijo del span activo (o raíz si no hay ninguno)."""
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id if parent else None,
+            start_unix_nano=time.time_ns(),
+            start_perf_ns=time.perf_counter_ns(),
+            attributes=attributes,
+        )
+        with self._lock:
+            self._open_traces.setdefault(span.trace_id, []).append(span)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_perf_ns = time.perf_counter_ns()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def traced(self, name: Optional[str] = None, **attributes) -> Callable:
+        """Decorador que envuelve una función (sync o async) en un span."""
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__qualname__
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, **attributes):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, **attributes):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def increment(self, counter: str, amount: float = 1):
+        """Sumar a un contador del span activo; no-op si no hay span."""
+        span = _current_span.get()
+        if span is not None:
+            span.increment(counter, amount)
+
+    def set_attribute(self, key: str, value: Any):
+        span = _current_span.get()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    # ------------------------------------------------------------------
+    # Exportación
+    # ------------------------------------------------------------------
+
+    def _finish(self, span: Span):
+        self._export(span)
+        if span.parent_span_id is not None:
+            return
+        with self._lock:
+            spans = self._open_traces.pop(span.trace_id, [span])
+        self._finished.append([s.to_dict() for s in spans])
+
+    def _get_file_logger(self) -> Optional[logging.Logger]:
+        if self._file_logger is not None or self._file_disabled:
+            return self._file_logger
+        try:
+            self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                self.trace_file, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            file_logger = logging.getLogger(f"iot_trace.{id(self)}")
+            file_logger.handlers = [handler]
+            file_logger.setLevel(logging.INFO)
+            file_logger.propagate = False
+            self._file_logger = file_logger
+        except OSError as e:
+            # Sistemas de archivos de sólo lectura (Streamlit Cloud): quedarse con el buffer
+            logger.warning(f"⚠️ Archivo de trazas no disponible ({self.trace_file}): {e}")
+            self._file_disabled = True
+        return self._file_logger
+
+    def _export(self, span: Span):
+        file_logger = self._get_file_logger()
+        if file_logger is None:
+            return
+        try:
+            file_logger.info(json.dumps(span.to_otlp(self.service_name), ensure_ascii=False, default=str))
+        except Exception as e:
+            logger.debug(f"No se pudo exportar span {span.name}: {e}")
+
+    # ------------------------------------------------------------------
+    # Consulta para diagnóstico
+    # ------------------------------------------------------------------
+
+    def recent_traces(self, limit: int = 20) -> List[List[Dict[str, Any]]]:
+        """Últimas trazas completas (más reciente primero)."""
+        with self._lock:
+            traces = list(self._finished)
+        return list(reversed(traces))[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._finished.clear()
+            self._open_traces.clear()
+
+
+def summarize_spans(traces: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Agregar spans por nombre: conteo, p50/p95/max de duración y contadores.
+
+    Returns:
+        Lista ordenada por tiempo total descendente (el camino caliente primero)
+    """
+    grouped: Dict[str, Dict[str, Any]] = {}
+    for trace in traces:
+        for span in trace:
+            entry = grouped.setdefault(span["name"], {"durations": [], "counters": {}, "errors": 0})
+            entry["durations"].append(span["duration_ms"])
+            entry["errors"] += 1 if span.get("status") == "error" else 0
+            for counter, value in span.get("counters", {}).items():
+                entry["counters"][counter] = entry["counters"].get(counter, 0) + value
+
+    summary = []
+    for name, entry in grouped.items():
+        durations = sorted(entry["durations"])
+        p95_index = min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))
+        summary.append({
+            "name": name,
+            "count": len(durations),
+            "total_ms": round(sum(durations), 3),
+            "p50_ms": round(statistics.median(durations), 3),
+            "p95_ms": round(durations[p95_index], 3),
+            "max_ms": round(durations[-1], 3),
+            "errors": entry["errors"],
+            **{counter: value for counter, value in entry["counters"].items()},
+        })
+    summary.sort(key=lambda item: item["total_ms"], reverse=True)
+    return summary
+
+
+def hot_path(trace: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Cadena raíz → hijo más lento → ... de una traza."""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in trace:
+        children.setdefault(span.get("parent_span_id"), []).append(span)
+
+    path = []
+    current = max(children.get(None, []), key=lambda s: s["duration_ms"], default=None)
+    while current is not None:
+        path.append(current)
+        current = max(children.get(current["span_id"], []), key=lambda s: s["duration_ms"], default=None)
+    return path
+
+
+def load_trace_file(path: str) -> List[Dict[str, Any]]:
+    """Leer un archivo de trazas OTLP/JSON Lines a una lista de spans."""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    spans.extend(scope_spans.get("spans", []))
+    return spans
+
+
+# Instancia global (igual que usage_tracker)
+tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Obtener el trazador global del proceso."""
+    return tracer
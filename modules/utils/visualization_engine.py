@@ -29,6 +29,8 @@ import tempfile
 import warnings
 warnings.filterwarnings('ignore')
 
+from modules.utils.chart_renderer import ChartRenderer, ChartSpec, chart_renderer
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
@@ -47,8 +49,21 @@ class IoTVisualizationEngine:
     Solo genera gráficos cuando es explícitamente solicitado o necesario.
     """
     
-    def __init__(self):
-        """Inicializar el motor de visualización"""
+    def __init__(self, image_format: str = 'png', display_width_px: int = 1100,
+                 display_height_px: int = 650, renderer: Optional[ChartRenderer] = None):
+        """
+        Inicializar el motor de visualización.
+
+        Args:
+            image_format: 'png' (por defecto, compatible con data:image/png) o 'webp'
+            display_width_px: Ancho destino de los gráficos (define DPI y marcadores)
+            display_height_px: Alto destino de los gráficos
+            renderer: Servicio de renderizado (por defecto el compartido)
+        """
+        self.image_format = image_format
+        self.display_width_px = display_width_px
+        self.display_height_px = display_height_px
+        self.renderer = renderer or chart_renderer
         self.supported_chart_types = [
             'time_series', 'statistics', 'comparison', 'prediction', 
             'distribution', 'correlation', 'anomaly_detection'
@@ -149,6 +164,15 @@ class IoTVisualizationEngine:
         logger.info("🚫 No se requieren gráficos")
         return False
     
+    def _chart_spec(self, kind: str, title: str, **kwargs) -> ChartSpec:
+        return ChartSpec(kind=kind, title=title, width_px=self.display_width_px,
+                         height_px=self.display_height_px, image_format=self.image_format, **kwargs)
+    
+    def _render(self, spec: ChartSpec, data: List[Dict]) -> Optional[str]:
+        """Renderizar vía el servicio compartido y devolver el base64 de la imagen"""
+        image = self.renderer.render(spec, data)
+        return image.to_base64() if image else None
+    
     def generate_time_series_chart(self, data: List[Dict], title: str = "Serie Temporal") -> Optional[str]:
         """
         Generar gráfico de serie temporal para datos IoT.
@@ -164,45 +188,9 @@ class IoTVisualizationEngine:
             if not data:
                 return None
             
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
-            
-            fig, ax = plt.subplots(figsize=(14, 8))
-            
-            # Agrupar por dispositivo y tipo de sensor
-            for device_id in df['device_id'].unique():
-                device_data = df[df['device_id'] == device_id]
-                
-                for sensor_type in device_data['sensor_type'].unique():
-                    sensor_data = device_data[device_data['sensor_type'] == sensor_type]
-                    
-                    if len(sensor_data) > 0:
-                        label = f"{device_id} - {sensor_type}"
-                        ax.plot(sensor_data['timestamp'], sensor_data['value'], 
-                               marker='o', markersize=4, linewidth=2, label=label, alpha=0.8)
-            
-            ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
-            ax.set_xlabel('Tiempo', fontsize=12)
-            ax.set_ylabel('Valor del Sensor', fontsize=12)
-            ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-            ax.grid(True, alpha=0.3)
-            
-            # Formato de fechas en eje X
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-            ax.xaxis.set_major_locator(mdates.MinuteLocator(interval=30))
-            plt.xticks(rotation=45)
-            
-            plt.tight_layout()
-            
-            # Convertir a base64 para mostrar directamente en Streamlit
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-            
-            logger.info(f"✅ Gráfico de serie temporal generado (base64)")
+            chart_base64 = self._render(self._chart_spec('time_series', title), data)
+            if chart_base64:
+                logger.info(f"✅ Gráfico de serie temporal generado (base64)")
             return chart_base64
             
         except Exception as e:
@@ -217,59 +205,9 @@ class IoTVisualizationEngine:
             if not data:
                 return None
             
-            df = pd.DataFrame(data)
-            
-            # Calcular estadísticas por sensor y dispositivo
-            stats = df.groupby(['device_id', 'sensor_type'])['value'].agg([
-                'count', 'mean', 'std', 'min', 'max'
-            ]).reset_index()
-            
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
-            
-            # Gráfico 1: Promedio por sensor
-            sensor_groups = stats.groupby('sensor_type')['mean'].mean().sort_values(ascending=False)
-            ax1.bar(range(len(sensor_groups)), sensor_groups.values, color='skyblue', alpha=0.8)
-            ax1.set_title('Valor Promedio por Tipo de Sensor', fontweight='bold')
-            ax1.set_xticks(range(len(sensor_groups)))
-            ax1.set_xticklabels(sensor_groups.index, rotation=45)
-            ax1.set_ylabel('Valor Promedio')
-            
-            # Gráfico 2: Cantidad de registros por dispositivo
-            device_counts = df['device_id'].value_counts()
-            ax2.pie(device_counts.values, labels=device_counts.index, autopct='%1.1f%%', 
-                   colors=['lightcoral', 'lightblue', 'lightgreen', 'lightyellow'])
-            ax2.set_title('Distribución de Registros por Dispositivo', fontweight='bold')
-            
-            # Gráfico 3: Rango de valores (min-max) por sensor
-            x_pos = range(len(stats))
-            ax3.errorbar(x_pos, stats['mean'], 
-                        yerr=[stats['mean'] - stats['min'], stats['max'] - stats['mean']], 
-                        fmt='o', capsize=5, capthick=2, alpha=0.8)
-            ax3.set_title('Rango de Valores por Sensor', fontweight='bold')
-            ax3.set_xticks(x_pos)
-            ax3.set_xticklabels([f"{row['device_id']}\n{row['sensor_type']}" 
-                               for _, row in stats.iterrows()], rotation=45)
-            ax3.set_ylabel('Valor')
-            
-            # Gráfico 4: Desviación estándar
-            ax4.bar(x_pos, stats['std'], color='orange', alpha=0.7)
-            ax4.set_title('Desviación Estándar por Sensor', fontweight='bold')
-            ax4.set_xticks(x_pos)
-            ax4.set_xticklabels([f"{row['device_id']}\n{row['sensor_type']}" 
-                               for _, row in stats.iterrows()], rotation=45)
-            ax4.set_ylabel('Desviación Estándar')
-            
-            plt.suptitle(title, fontsize=16, fontweight='bold', y=0.98)
-            plt.tight_layout()
-            
-            # Convertir a base64 para mostrar directamente en Streamlit
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-            
-            logger.info(f"✅ Gráfico de estadísticas generado (base64)")
+            chart_base64 = self._render(self._chart_spec('statistics', title), data)
+            if chart_base64:
+                logger.info(f"✅ Gráfico de estadísticas generado (base64)")
             return chart_base64
             
         except Exception as e:
@@ -290,92 +228,9 @@ class IoTVisualizationEngine:
             if not data or len(data) < 10:
                 return None
             
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
-            
-            fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-            axes = axes.flatten()
-            
-            plot_count = 0
-            max_plots = 4
-            
-            for device_id in df['device_id'].unique():
-                if plot_count >= max_plots:
-                    break
-                    
-                device_data = df[df['device_id'] == device_id]
-                
-                for sensor_type in device_data['sensor_type'].unique():
-                    if plot_count >= max_plots:
-                        break
-                    
-                    sensor_data = device_data[device_data['sensor_type'] == sensor_type]
-                    
-                    if len(sensor_data) < 5:
-                        continue
-                    
-                    # Preparar datos para predicción
-                    sensor_data = sensor_data.copy()
-                    sensor_data['time_numeric'] = (sensor_data['timestamp'] - sensor_data['timestamp'].min()).dt.total_seconds() / 3600
-                    
-                    X = sensor_data['time_numeric'].values.reshape(-1, 1)
-                    y = sensor_data['value'].values
-                    
-                    # Crear modelo polinomial simple
-                    poly_features = PolynomialFeatures(degree=2)
-                    X_poly = poly_features.fit_transform(X)
-                    
-                    model = LinearRegression()
-                    model.fit(X_poly, y)
-                    
-                    # Generar predicción
-                    last_time = sensor_data['time_numeric'].max()
-                    future_times = np.linspace(last_time, last_time + hours_ahead, 50)
-                    future_X_poly = poly_features.transform(future_times.reshape(-1, 1))
-                    future_predictions = model.predict(future_X_poly)
-                    
-                    # Crear timestamps futuros
-                    future_timestamps = [sensor_data['timestamp'].max() + timedelta(hours=h) 
-                                       for h in (future_times - last_time)]
-                    
-                    ax = axes[plot_count]
-                    
-                    # Plotear datos históricos
-                    ax.plot(sensor_data['timestamp'], sensor_data['value'], 
-                           'o-', label='Datos Históricos', linewidth=2, markersize=4)
-                    
-                    # Plotear predicción
-                    ax.plot(future_timestamps, future_predictions, 
-                           '--', label=f'Predicción {hours_ahead}h', linewidth=2, alpha=0.8, color='red')
-                    
-                    ax.set_title(f'{device_id} - {sensor_type}', fontweight='bold')
-                    ax.set_xlabel('Tiempo')
-                    ax.set_ylabel('Valor')
-                    ax.legend()
-                    ax.grid(True, alpha=0.3)
-                    
-                    # Formato de fechas
-                    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-                    plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-                    
-                    plot_count += 1
-            
-            # Ocultar subplots no utilizados
-            for i in range(plot_count, max_plots):
-                axes[i].set_visible(False)
-            
-            plt.suptitle(title, fontsize=16, fontweight='bold', y=0.98)
-            plt.tight_layout()
-            
-            # Convertir a base64 para mostrar directamente en Streamlit
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-            buffer.seek(0)
-            chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-            
-            logger.info(f"📊 Gráfico de predicción generado (base64)")
+            chart_base64 = self._render(self._chart_spec('prediction', title, hours_ahead=hours_ahead), data)
+            if chart_base64:
+                logger.info(f"📊 Gráfico de predicción generado (base64)")
             return chart_base64
             
         except Exception as e:
@@ -403,29 +258,21 @@ class IoTVisualizationEngine:
             if not data:
                 return results
             
-            # 1. Gráfico de serie temporal
-            time_series_chart = self.generate_time_series_chart(
-                data, f"Serie Temporal - Últimas {analysis_hours} Horas"
-            )
-            if time_series_chart:
-                results['charts']['time_series'] = time_series_chart
-            
-            # 2. Gráfico de estadísticas
-            stats_chart = self.generate_statistics_chart(
-                data, f"Estadísticas Descriptivas - {analysis_hours}h"
-            )
-            if stats_chart:
-                results['charts']['statistics'] = stats_chart
-            
-            # 3. Gráfico de predicción
-            prediction_chart = self.generate_prediction_chart(
-                data, hours_ahead=24, title="Predicción para las Próximas 24 Horas"
-            )
-            if prediction_chart:
-                results['charts']['prediction'] = prediction_chart
-            
-            # 4. Calcular estadísticas numéricas
             df = pd.DataFrame(data)
+
+            # 1-3. Serie temporal, estadísticas y predicción (renderizadas en paralelo)
+            specs = [
+                self._chart_spec('time_series', f"Serie Temporal - Últimas {analysis_hours} Horas"),
+                self._chart_spec('statistics', f"Estadísticas Descriptivas - {analysis_hours}h"),
+            ]
+            if SKLEARN_AVAILABLE and len(df) >= 10:
+                specs.append(self._chart_spec('prediction', "Predicción para las Próximas 24 Horas", hours_ahead=24))
+            images = self.renderer.render_many([(spec, df) for spec in specs])
+            for spec, image in zip(specs, images):
+                if image:
+                    results['charts'][spec.kind] = image.to_base64()
+
+            # 4. Calcular estadísticas numéricas
             
             # Estadísticas por sensor
             sensor_stats = {}
@@ -137,71 +137,47 @@ def show_professional_banner():
     
     st.markdown("---")
 
+@st.cache_resource
+def _create_services():
+    """Agente y conector únicos por proceso (no se recrean en cada turno)"""
+    from modules.agents.cloud_iot_agent import CloudIoTAgent
+    from modules.tools.jetson_api_connector import JetsonAPIConnector
+    
+    return CloudIoTAgent(), JetsonAPIConnector(base_url=JETSON_API_URL)
+
+@st.cache_resource
+def _create_report_generator():
+    """Generador de reportes único por proceso"""
+    from modules.intelligence.advanced_report_generator import AdvancedReportGenerator
+    
+    return AdvancedReportGenerator(jetson_api_url=JETSON_API_URL)
+
+@st.cache_resource
+def _create_smart_analyzer():
+    """SmartAnalyzer único por proceso: su caché incremental sobrevive entre renders"""
+    from modules.intelligence.smart_analyzer import SmartAnalyzer
+    
+    return SmartAnalyzer()
+
 def initialize_services():
     """Inicializar servicios del sistema"""
     try:
-        from modules.agents.cloud_iot_agent import CloudIoTAgent
-        from modules.tools.jetson_api_connector import JetsonAPIConnector
-        
-        cloud_agent = CloudIoTAgent()
-        jetson_connector = JetsonAPIConnector(base_url=JETSON_API_URL)
-        
-        return cloud_agent, jetson_connector
+        # Un fallo no queda en caché: se reintenta en el siguiente turno
+        return _create_services()
     except Exception as e:
         return None, None
 
 def get_device_status_for_system():
-    """Obtener estado de dispositivos SOLO para la pestaña Sistema - CON DATOS REALES"""
+    """Obtener estado de dispositivos para la pestaña Sistema desde el índice de últimos valores"""
     try:
-        from modules.tools.direct_jetson_connector import DirectJetsonConnector
-        connector = DirectJetsonConnector(JETSON_API_URL)
+        from modules.utils.latest_index import latest_index
         
-        # Obtener DATOS REALES del endpoint /data
-        data_result = connector.get_all_data_simple()
+        # Arranque en frío: solo metadatos de /devices, sin descargar lecturas
+        if not latest_index.devices():
+            from modules.tools.direct_jetson_connector import DirectJetsonConnector
+            DirectJetsonConnector(JETSON_API_URL).get_devices_direct()
         
-        if data_result.get('status') == 'success':
-            all_records = data_result.get('sensor_data', [])
-            devices_from_api = data_result.get('devices', [])
-            
-            # Análisis de datos reales por dispositivo
-            device_analysis = {}
-            sensor_types = set()
-            
-            for record in all_records:
-                device_id = record.get('device_id', 'unknown')
-                sensor_type = record.get('sensor_type', 'unknown')
-                
-                if device_id not in device_analysis:
-                    device_analysis[device_id] = {
-                        'records': [],
-                        'sensor_types': set(),
-                        'latest_timestamp': ''
-                    }
-                
-                device_analysis[device_id]['records'].append(record)
-                device_analysis[device_id]['sensor_types'].add(sensor_type)
-                sensor_types.add(sensor_type)
-                
-                # Actualizar timestamp más reciente
-                timestamp = record.get('timestamp', record.get('created_at', ''))
-                if timestamp > device_analysis[device_id]['latest_timestamp']:
-                    device_analysis[device_id]['latest_timestamp'] = timestamp
-            
-            # Crear status de dispositivos con datos reales
-            device_status = {}
-            for device_id, data in device_analysis.items():
-                records_count = len(data['records'])
-                sensors_count = len(data['sensor_types'])
-                
-                device_status[device_id] = {
-                    'status': '🟢 Activo' if records_count > 0 else '🔴 Inactivo',
-                    'records_count': records_count,
-                    'sensors_count': sensors_count,
-                    'last_seen': data['latest_timestamp'] or 'Sin timestamp',
-                    'active': records_count > 0
-                }
-            
-            return device_status, len(all_records)
+        return latest_index.device_status(), latest_index.total_records
         
     except Exception as e:
         st.error(f"Error obteniendo estado: {e}")
@@ -312,11 +288,10 @@ def display_reports_interface():
         with st.spinner("📊 Generando reporte inteligente con IA..."):
             try:
                 # Usar el sistema de reportes inteligente avanzado
-                from modules.intelligence.advanced_report_generator import AdvancedReportGenerator
                 from modules.tools.direct_jetson_connector import DirectJetsonConnector
                 
-                # Inicializar generador de reportes inteligente
-                report_generator = AdvancedReportGenerator(jetson_api_url=JETSON_API_URL)
+                # Generador de reportes inteligente compartido entre reportes
+                report_generator = _create_report_generator()
                 connector = DirectJetsonConnector(JETSON_API_URL)
                 
                 # Obtener datos con el método corregido
@@ -429,16 +404,18 @@ def display_system_status():
         with health_col1:
             # Usar análisis inteligente para determinar salud del sistema
             try:
-                from modules.intelligence.smart_analyzer import SmartAnalyzer
-                analyzer = SmartAnalyzer()
-                analysis_data = analyzer.analyze_iot_data(
-                    device_status, 
-                    list(device_status.keys()), 
-                    sum(d['sensors_count'] for d in device_status.values())
-                )
+                from modules.utils.latest_index import latest_index
+                readings = [
+                    {'device_id': device_id, 'sensor_type': sensor_type, **reading}
+                    for device_id, sensors in latest_index.latest().items()
+                    for sensor_type, reading in sensors.items()
+                ]
+                analysis_data = _create_smart_analyzer().analyze_comprehensive(readings)
+                if analysis_data.get('status') == 'no_data':
+                    raise ValueError(analysis_data.get('reason'))
                 # Obtener puntuación de salud del análisis inteligente
                 health_pct = analysis_data.get('health_score', 85.0)
-                confidence = analysis_data.get('confidence_score', 100.0)
+                confidence = analysis_data.get('confidence_level', 1.0) * 100
                 st.metric("🏥 Salud del Sistema", f"{health_pct:.0f}%", f"Confianza: {confidence:.0f}%")
             except Exception as e:
                 # Fallback al cálculo simple
@@ -448,7 +425,7 @@ def display_system_status():
                 st.metric("📱 Salud Dispositivos", f"{health_pct:.0f}%", f"{active_devices}/{total_devices}")
         
         with health_col2:
-            st.metric("📊 Datos Recientes", total_records, "Últimos 30 min")
+            st.metric("📊 Lecturas Recibidas", total_records, "Desde el arranque")
         
         with health_col3:
             total_sensors = sum(d['sensors_count'] for d in device_status.values())
@@ -471,6 +448,16 @@ def display_system_status():
                     st.write(f"Sensores: {status_info['sensors_count']}")
                 with col_time:
                     st.write(f"Registros: {status_info['records_count']}")
+                    st.caption(f"Último: {status_info['last_seen']}")
+    
+    # Diagnóstico de rendimiento (trazas por nodo/motor)
+    with st.expander("🔬 Diagnóstico de Rendimiento", expanded=False):
+        try:
+            from modules.utils.streamlit_trace_display import display_trace_diagnostics, display_import_report
+            display_trace_diagnostics(key_prefix="system_trace")
+            display_import_report(key_prefix="system_imports")
+        except Exception as e:
+            st.warning(f"⚠️ Diagnóstico no disponible: {e}")
     
     # Información técnica
     st.subheader("🔧 Información Técnica")
@@ -603,41 +590,25 @@ def create_simple_chart(data):
     """Crear gráfico simple y robusto"""
     try:
         import matplotlib.pyplot as plt
-        import pandas as pd
-        
-        df = pd.DataFrame(data)
-        
-        if df.empty or not all(col in df.columns for col in ['timestamp', 'device_id', 'sensor_type', 'value']):
-            return None
+        from modules.utils.plot_data import prepare_series
         
-        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-        df['value'] = pd.to_numeric(df['value'], errors='coerce')
-        df = df.dropna(subset=['timestamp', 'value'])
+        # Una sola pasada: series contiguas por dispositivo y sensor, ordenadas por tiempo
+        series = prepare_series(data)
         
-        if df.empty:
+        if not len(series):
             return None
         
         fig, ax = plt.subplots(figsize=(12, 6))
         
         colors = ['red', 'blue', 'green', 'orange', 'purple', 'brown']
-        color_idx = 0
         
-        for device_id in df['device_id'].unique():
-            device_data = df[df['device_id'] == device_id]
+        for color_idx, ((device_id, sensor_type), sensor_data) in enumerate(series):
+            label = f"{device_id}-{sensor_type}"
             
-            for sensor_type in device_data['sensor_type'].unique():
-                sensor_data = device_data[device_data['sensor_type'] == sensor_type]
-                
-                if len(sensor_data) > 0:
-                    sensor_data = sensor_data.sort_values('timestamp')
-                    label = f"{device_id}-{sensor_type}"
-                    
-                    ax.plot(sensor_data['timestamp'], sensor_data['value'], 
-                           marker='o', label=label, 
-                           color=colors[color_idx % len(colors)],
-                           linewidth=2, markersize=4)
-                    
-                    color_idx += 1
+            ax.plot(sensor_data['timestamp'], sensor_data['value'], 
+                   marker='o', label=label, 
+                   color=colors[color_idx % len(colors)],
+                   linewidth=2, markersize=4)
         
         ax.set_title("📈 Evolución Temporal de Sensores IoT", fontsize=14, fontweight='bold')
         ax.set_xlabel("Tiempo")
@@ -668,6 +639,14 @@ def show_sidebar():
         # Solo métricas básicas (sin estado de dispositivos complejo)
         st.metric("📊 Sistema", "Operativo", "🟢")
         
+        # Dispositivos activos según el índice de últimos valores (sin consultar la API)
+        from modules.utils.latest_index import latest_index
+        device_status = latest_index.device_status()
+        if device_status:
+            active_devices = sum(1 for d in device_status.values() if d['active'])
+            st.metric("📡 Dispositivos", f"{active_devices}/{len(device_status)}",
+                      f"{latest_index.total_records} lecturas")
+        
         # Capacidades
         with st.expander("📊 Capacidades", expanded=False):
             st.markdown(f"""
@@ -995,7 +974,31 @@ def generate_intelligent_report(report_generator, report_type, all_data, devices
                 
                 for insight in report_result.insights:
                     st.write(f"💡 {insight}")
-            
+
+            # Exportación de datos crudos en streaming (memoria constante)
+            if filtered_data:
+                from modules.utils.streaming_export import (
+                    PYARROW_AVAILABLE, READING_COLUMNS, iter_csv_chunks, iter_record_rows,
+                    spool_chunks, write_parquet_streaming
+                )
+                export_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                export_col1, export_col2 = st.columns(2)
+                with export_col1:
+                    st.download_button(
+                        label="⬇️ Descargar Datos (CSV)",
+                        data=spool_chunks(iter_csv_chunks(iter_record_rows(filtered_data), READING_COLUMNS)),
+                        file_name=f"Datos_IoT_{export_stamp}.csv",
+                        mime="text/csv"
+                    )
+                with export_col2:
+                    if PYARROW_AVAILABLE:
+                        st.download_button(
+                            label="⬇️ Descargar Datos (Parquet)",
+                            data=write_parquet_streaming(iter_record_rows(filtered_data)),
+                            file_name=f"Datos_IoT_{export_stamp}.parquet",
+                            mime="application/vnd.apache.parquet"
+                        )
+
             # Botón de descarga PDF MEJORADO con gráficas
             if format_type == "PDF" or st.button("📄 Descargar Reporte con Gráficas"):
                 with st.spinner("🔄 Generando PDF inteligente con visualizaciones..."):
@@ -1331,6 +1334,13 @@ def main():
     
     # Sidebar simplificado
     show_sidebar()
+    
+    # Precargar motores pesados en segundo plano (después del primer render)
+    try:
+        from modules.utils.plugin_registry import plugin_registry
+        plugin_registry.warm_up()
+    except Exception:
+        pass
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
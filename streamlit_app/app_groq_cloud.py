@@ -52,14 +52,11 @@ def load_project_modules():
         from modules.tools.jetson_api_connector import JetsonAPIConnector
         from modules.utils.usage_tracker import usage_tracker
         
-        # Imports para reportes (con manejo de errores)
-        try:
-            from modules.agents.reporting import ReportGenerator
-            report_generator_available = True
-        except Exception as e:
-            st.warning(f"⚠️ Sistema de reportes no disponible: {str(e)}")
-            ReportGenerator = None
-            report_generator_available = False
+        # Reportes como plugin diferido (reportlab/kaleido/openpyxl se importan al generar)
+        from modules.utils.plugin_registry import plugin_registry, LazyPluginMap
+        report_generator_available = plugin_registry.is_available('report_exporter')
+        if not report_generator_available:
+            st.warning("⚠️ Sistema de reportes no disponible")
         
         # Imports para UI de uso (con fallback robusto)
         try:
@@ -83,7 +80,8 @@ def load_project_modules():
         return {
             'CloudIoTAgent': CloudIoTAgent,
             'JetsonAPIConnector': JetsonAPIConnector, 
-            'ReportGenerator': ReportGenerator,
+            'plugin_registry': plugin_registry,
+            'LazyPluginMap': LazyPluginMap,
             'usage_tracker': usage_tracker,
             'display_usage_metrics': display_usage_metrics,
             'display_usage_alert': display_usage_alert,
@@ -116,17 +114,16 @@ def initialize_services():
         # Crear agente IoT completo
         cloud_agent = modules['CloudIoTAgent']()
         
-        # Crear generador de reportes (si está disponible)
-        if modules.get('report_generator_available', False) and modules['ReportGenerator']:
-            try:
-                report_generator = modules['ReportGenerator'](jetson_connector=jetson_connector)
-            except Exception as e:
-                st.warning(f"⚠️ Error inicializando reportes: {str(e)}")
-                report_generator = None
+        # Generador de reportes diferido: se instancia al generar el primer reporte
+        if modules.get('report_generator_available', False):
+            report_plugins = modules['LazyPluginMap'](
+                modules['plugin_registry'],
+                {'report_exporter': {'jetson_connector': jetson_connector}}
+            )
         else:
-            report_generator = None
+            report_plugins = None
         
-        return cloud_agent, jetson_connector, report_generator
+        return cloud_agent, jetson_connector, report_plugins
         
     except Exception as e:
         st.error(f"❌ Error inicializando servicios: {str(e)}")
@@ -506,10 +503,10 @@ def display_reports_interface():
     st.title("📊 Generador de Reportes IoT")
     
     # Cargar servicios
-    cloud_agent, jetson_connector, report_generator = initialize_services()
+    cloud_agent, jetson_connector, report_plugins = initialize_services()
     modules = load_project_modules()
     
-    if not report_generator or not modules:
+    if not report_plugins or not modules:
         st.error("❌ Servicios de reportes no disponibles")
         return
     
@@ -560,6 +557,11 @@ def display_reports_interface():
                     
                     hours = hours_map.get(date_range, 24)
                     
+                    report_generator = report_plugins.get('report_exporter')
+                    if report_generator is None:
+                        st.error("❌ Error inicializando el generador de reportes")
+                        return
+                    
                     # Generar reporte usando el generador
                     report_result = report_generator.generate_comprehensive_report(
                         device_ids=selected_devices,
@@ -881,6 +883,11 @@ def main():
     
     # Sidebar
     display_sidebar()
+    
+    # Precargar motores y exportadores en segundo plano (después del primer render)
+    cloud_agent = initialize_services()[0]
+    if cloud_agent:
+        cloud_agent.warm_up()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,345 @@
+"""
+Suite de Benchmarks de Rendimiento
+==================================
+
+Mide tiempo de pared y memoria pico de los caminos críticos del sistema
+(recolector, analizadores y reportes) sobre datasets sintéticos de 1k a 1M
+lecturas generados por el servidor sustituto de la API Jetson.
+
+Los resultados se comparan contra líneas base guardadas en
+``tests/benchmark_baselines.json``; una regresión mayor al umbral hace fallar
+la ejecución.
+
+Uso::
+
+    python tests/benchmark_suite.py --sizes 1000,10000
+    python tests/benchmark_suite.py --sizes 1000,1000000 --repeat 5 --update-baselines
+    IOT_BENCH_SIZES=1000,100000 pytest tests/test_performance_benchmarks.py -m benchmark
+"""
+
+import asyncio
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.tools.jetson_standin_server import (
+    JetsonStandInServer,
+    StandInConfig,
+    SyntheticJetsonDataset,
+)
+
+logger = logging.getLogger(__name__)
+
+BASELINES_FILE = Path(__file__).parent / "benchmark_baselines.json"
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_THRESHOLD = 0.25        # 25% más lento / más memoria = regresión
+MIN_WALL_SLACK_S = 0.05         # Ruido absoluto tolerado en tiempos muy cortos
+MIN_MEMORY_SLACK_MB = 2.0
+# Escenarios dominados por E/S (render y escritura del PDF): más ruido entre corridas
+SCENARIO_THRESHOLDS = {"pdf_report": 0.50}
+ANCHOR = datetime(2025, 10, 21, 14, 30, tzinfo=timezone.utc)
+
+
+@dataclass
+class BenchmarkResult:
+    """Resultado de un escenario para un tamaño de dataset"""
+    scenario: str
+    size: int
+    wall_s: float
+    peak_mb: float
+    records_processed: int
+    timestamp: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.scenario}@{self.size}"
+
+
+def sizes_from_env(default: Optional[List[int]] = None) -> List[int]:
+    """Leer tamaños de ``IOT_BENCH_SIZES`` (ej. ``1000,100000``)."""
+    raw = os.getenv("IOT_BENCH_SIZES")
+    if not raw:
+        return list(default or DEFAULT_SIZES)
+    return [int(float(part)) for part in raw.split(",") if part.strip()]
+
+
+def build_dataset(size: int, devices: int = 2) -> List[Dict[str, Any]]:
+    """Dataset sintético determinista con ``size`` lecturas."""
+    config = StandInConfig(devices=devices, anchor=ANCHOR, history_hours=24.0 * 3650)
+    dataset = SyntheticJetsonDataset(config)
+    device_ids = [d["device_id"] for d in dataset.devices]
+    return dataset.device_records(device_ids, hours=None, limit=size)
+
+
+def _series_from_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Agrupar registros en el formato ``all_data`` que consume ReportGenerator."""
+    all_data: Dict[str, Any] = {}
+    for record in records:
+        key = f"{record['device_id']}_{record['sensor_type']}"
+        entry = all_data.get(key)
+        if entry is None:
+            entry = all_data[key] = {
+                "device": record["device_id"],
+                "sensor": record["sensor_type"],
+                "logical_sensor": record["sensor_type"],
+                "data": [],
+                "chart_type": "line",
+            }
+        entry["data"].append({"t": record["timestamp"], "v": record["value"]})
+    return all_data
+
+
+# ----------------------------------------------------------------------
+# Escenarios
+# ----------------------------------------------------------------------
+
+def bench_smart_analyzer(records: List[Dict[str, Any]]) -> int:
+    from modules.intelligence.smart_analyzer import SmartAnalyzer
+
+    result = SmartAnalyzer().analyze_comprehensive(records)
+    return result.get("total_data_points", len(records))
+
+
+def bench_alert_system(records: List[Dict[str, Any]]) -> int:
+    from modules.intelligence.intelligent_alert_system import IntelligentAlertSystem
+
+    system = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9", state_db=":memory:")
+    result = asyncio.run(system.process_real_time_data(records))
+    return result.get("processing_summary", {}).get("data_points_processed", len(records))
+
+
+def bench_predictive_engine(records: List[Dict[str, Any]]) -> int:
+    from modules.intelligence.predictive_analysis_engine import PredictiveAnalysisEngine
+
+    engine = PredictiveAnalysisEngine(jetson_api_url="http://127.0.0.1:9")
+    result = asyncio.run(engine.generate_comprehensive_predictions(records))
+    return result.get("data_points_analyzed", len(records))
+
+
+def bench_pdf_report(records: List[Dict[str, Any]]) -> int:
+    from modules.agents.reporting import ReportGenerator
+
+    all_data = _series_from_records(records)
+    devices = sorted({info["device"] for info in all_data.values()})
+    metrics = {
+        "total_registros": len(records),
+        "dispositivos": devices,
+        "sensores": sorted({info["sensor"] for info in all_data.values()}),
+        "periodo": "benchmark",
+        "timestamp": ANCHOR.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    spec = {"format": "pdf", "devices": devices, "sensors": metrics["sensores"]}
+    pdf_bytes = ReportGenerator().generate_pdf_multi_device(spec, "Benchmark", metrics, all_data)
+    if not pdf_bytes:
+        raise RuntimeError("generate_pdf_multi_device no produjo bytes")
+    return len(records)
+
+
+class StubLLM:
+    """LLM de reemplazo: respuesta inmediata y determinista."""
+
+    def generate_response(self, prompt: str, model: Optional[str] = None) -> str:
+        return f"Respuesta de benchmark ({len(prompt)} caracteres de contexto)"
+
+    def test_connection(self) -> Dict[str, Any]:
+        return {"success": True, "model": "stub"}
+
+
+def bench_agent_query(records: List[Dict[str, Any]]) -> int:
+    """
+    Consulta completa por el grafo de CloudIoTAgent contra el stand-in.
+
+    El stand-in sirve tantas lecturas como el dataset; el recolector aplica su
+    propio tope de página, por lo que ``records_processed`` refleja lo que el
+    agente realmente procesó.
+    """
+    import tempfile
+    from modules.agents.cloud_iot_agent import CloudIoTAgent
+    from modules.utils.usage_tracker import usage_tracker
+
+    config = StandInConfig(devices=2, anchor=ANCHOR, page_cap=len(records), history_hours=24.0 * 3650)
+    with tempfile.TemporaryDirectory() as tmp, JetsonStandInServer(config) as server:
+        original_file = usage_tracker.data_file
+        usage_tracker.data_file = Path(tmp) / "usage_data.json"
+        try:
+            agent = CloudIoTAgent(jetson_api_url=server.base_url)
+            asyncio.run(agent.initialize())
+            agent.groq_integration = StubLLM()
+            result = asyncio.run(agent.process_query("¿Cuál es la temperatura actual de los sensores?"))
+        finally:
+            usage_tracker.data_file = original_file
+
+    if not result.get("success"):
+        raise RuntimeError(result.get("error", "process_query falló"))
+    return result.get("data_summary", {}).get("total_records", 0)
+
+
+SCENARIOS: Dict[str, Callable[[List[Dict[str, Any]]], int]] = {
+    "smart_analyzer": bench_smart_analyzer,
+    "alert_system": bench_alert_system,
+    "predictive_engine": bench_predictive_engine,
+    "pdf_report": bench_pdf_report,
+    "agent_query": bench_agent_query,
+}
+
+
+# ----------------------------------------------------------------------
+# Medición y comparación
+# ----------------------------------------------------------------------
+
+_WARMED_UP = set()
+
+
+def measure(scenario: str, records: List[Dict[str, Any]], repeat: int = 1) -> BenchmarkResult:
+    """
+    Ejecutar un escenario: mediana del tiempo de ``repeat`` pasadas sin
+    trazado y una pasada adicional con tracemalloc para la memoria pico.
+
+    La primera medición de cada escenario va precedida de una corrida de
+    calentamiento sobre un subconjunto pequeño.
+    """
+    func = SCENARIOS[scenario]
+
+    # Calentamiento: excluir imports y cachés de primera llamada de la medición
+    if scenario not in _WARMED_UP:
+        func(records[:200])
+        _WARMED_UP.add(scenario)
+
+    timings = []
+    processed = 0
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        start = time.perf_counter()
+        processed = func(records)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(records)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        scenario=scenario,
+        size=len(records),
+        wall_s=round(statistics.median(timings), 4),
+        peak_mb=round(peak / 1024 / 1024, 3),
+        records_processed=int(processed or 0),
+        timestamp=datetime.now().isoformat(),
+    )
+
+
+def load_baselines(path: Path = BASELINES_FILE) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("baselines", {})
+
+
+def save_baselines(results: List[BenchmarkResult], path: Path = BASELINES_FILE):
+    """Fusionar resultados nuevos en el archivo de líneas base."""
+    baselines = load_baselines(path)
+    for result in results:
+        baselines[result.key] = asdict(result)
+    payload = {
+        "updated": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "baselines": dict(sorted(baselines.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+
+
+def find_regressions(results: List[BenchmarkResult],
+                     baselines: Dict[str, Dict[str, Any]],
+                     threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Listar regresiones de tiempo o memoria por sobre el umbral relativo
+    (el mayor entre ``threshold`` y el propio del escenario).
+    """
+    regressions = []
+    for result in results:
+        baseline = baselines.get(result.key)
+        if not baseline:
+            continue
+        threshold_for = max(threshold, SCENARIO_THRESHOLDS.get(result.scenario, 0.0))
+
+        wall_limit = max(baseline["wall_s"] * (1 + threshold_for), baseline["wall_s"] + MIN_WALL_SLACK_S)
+        if result.wall_s > wall_limit:
+            regressions.append(
+                f"{result.key}: tiempo {result.wall_s:.3f}s > {wall_limit:.3f}s "
+                f"(base {baseline['wall_s']:.3f}s)"
+            )
+
+        memory_limit = max(baseline["peak_mb"] * (1 + threshold_for), baseline["peak_mb"] + MIN_MEMORY_SLACK_MB)
+        if result.peak_mb > memory_limit:
+            regressions.append(
+                f"{result.key}: memoria {result.peak_mb:.1f}MB > {memory_limit:.1f}MB "
+                f"(base {baseline['peak_mb']:.1f}MB)"
+            )
+    return regressions
+
+
+def run_suite(sizes: List[int], scenarios: Optional[List[str]] = None, repeat: int = 1) -> List[BenchmarkResult]:
+    results = []
+    for size in sizes:
+        records = build_dataset(size)
+        for scenario in scenarios or list(SCENARIOS):
+            result = measure(scenario, records, repeat=repeat)
+            print(f"⏱️ {result.key:<28} {result.wall_s:>9.3f}s  {result.peak_mb:>9.1f}MB  "
+                  f"({result.records_processed} registros)")
+            results.append(result)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks de rendimiento del agente IoT")
+    parser.add_argument("--sizes", default=None, help="Tamaños separados por coma (default: IOT_BENCH_SIZES o 1k..1M)")
+    parser.add_argument("--scenarios", default=None, help=f"Subconjunto de: {','.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas por escenario (se toma la mediana)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Los módulos del proyecto configuran logging al importarse; silenciar todo
+    logging.disable(logging.WARNING)
+    sizes = [int(float(s)) for s in args.sizes.split(",")] if args.sizes else sizes_from_env()
+    scenarios = args.scenarios.split(",") if args.scenarios else None
+
+    results = run_suite(sizes, scenarios, repeat=args.repeat)
+
+    if args.update_baselines:
+        save_baselines(results)
+        print(f"💾 Líneas base actualizadas en {BASELINES_FILE}")
+        return 0
+
+    regressions = find_regressions(results, load_baselines(), args.threshold)
+    if regressions:
+        print("❌ REGRESIONES DE RENDIMIENTO:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+
+    print("✅ Sin regresiones de rendimiento")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
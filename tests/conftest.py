@@ -7,6 +7,7 @@ Configuración común y fixtures compartidas para todos los tests.
 
 import pytest
 import asyncio
+import os
 import sys
 from pathlib import Path
 from unittest.mock import Mock, AsyncMock, patch
@@ -26,7 +27,7 @@ def event_loop():
     loop.close()
 
 @pytest.fixture(autouse=True)
-def setup_test_environment(monkeypatch):
+def setup_test_environment(monkeypatch, tmp_path):
     """
     Configuración automática del entorno de pruebas.
     Se ejecuta antes de cada test.
@@ -39,6 +40,8 @@ def setup_test_environment(monkeypatch):
     monkeypatch.setenv("DB_PASSWORD", "test_password")
     monkeypatch.setenv("OPENAI_API_KEY", "test_api_key")
     monkeypatch.setenv("LOG_LEVEL", "ERROR")  # Silenciar logs en tests
+    # Estado de alertas aislado por test, fuera del data/ del proyecto
+    monkeypatch.setenv("ALERT_STATE_DB", str(tmp_path / "alert_state.db"))
 
 @pytest.fixture
 def db_connector():
@@ -192,6 +195,41 @@ def sample_sensor_data():
     
     return data
 
+@pytest.fixture
+def make_readings():
+    """
+    Fábrica de lecturas sintéticas de una serie con timestamps regulares.
+
+    Argumentos de la fábrica:
+        periods, start, freq: grilla temporal (como ``pd.date_range``)
+        device_id, sensor_type: serie
+        values: escalar, array o función de los timestamps (por defecto 0, 1, 2...)
+        offset: sufijo de zona horaria de los timestamps ISO, como los entrega
+            la API (None = columna datetime en vez de texto)
+        frame: devolver un DataFrame en vez de la lista de registros
+        **columns: columnas adicionales (p. ej. ``unit="lux"``)
+    """
+    import numpy as np
+    import pandas as pd
+
+    def factory(periods=60, start="2025-10-21", freq="1min", device_id="esp32_wifi_001", sensor_type="ldr",
+                values=None, offset="-03:00", frame=False, **columns):
+        timestamps = pd.date_range(start, periods=periods, freq=freq)
+        if values is None:
+            values = np.arange(periods, dtype=float)
+        elif callable(values):
+            values = values(timestamps)
+        df = pd.DataFrame({
+            "device_id": device_id,
+            "sensor_type": sensor_type,
+            "value": np.broadcast_to(np.asarray(values, dtype=float), (periods,)),
+            "timestamp": timestamps if offset is None else [ts.isoformat() + offset for ts in timestamps],
+            **columns,
+        })
+        return df if frame else df.to_dict("records")
+
+    return factory
+
 @pytest.fixture
 def sample_system_events():
     """
@@ -279,10 +317,23 @@ def sample_alert_data():
     ]
 
 # Configuración de pytest
+def pytest_addoption(parser):
+    """
+    Opciones de línea de comandos propias de la suite.
+    """
+    parser.addoption(
+        "--benchmark", action="store_true", default=False,
+        help="ejecutar los benchmarks contra líneas base (también con IOT_BENCH_SIZES)"
+    )
+
 def pytest_configure(config):
     """
     Configuración adicional de pytest.
     """
+    # Las trazas de los tests quedan en memoria, no en logs/traces.jsonl del proyecto
+    # (antes de importar los módulos: el trazador global lee la variable al crearse)
+    os.environ.setdefault("IOT_TRACE_TO_FILE", "0")
+
     # Agregar marcadores personalizados
     config.addinivalue_line(
         "markers", "slow: marks tests as slow (deselect with '-m \"not slow\"')"
@@ -296,12 +347,21 @@ def pytest_configure(config):
     config.addinivalue_line(
         "markers", "agent: marks tests related to agent functionality"
     )
+    config.addinivalue_line(
+        "markers", "benchmark: timing benchmarks, opt-in with --benchmark or IOT_BENCH_SIZES"
+    )
 
 def pytest_collection_modifyitems(config, items):
     """
     Modificar items de la colección de tests.
     """
+    # Los benchmarks dependen de la máquina: solo corren si se piden
+    run_benchmarks = config.getoption("--benchmark") or bool(os.getenv("IOT_BENCH_SIZES"))
+    skip_benchmark = pytest.mark.skip(reason="benchmark: usar --benchmark o IOT_BENCH_SIZES")
+
     # Agregar marcador 'unit' por defecto a todos los tests
     for item in items:
+        if not run_benchmarks and item.get_closest_marker("benchmark"):
+            item.add_marker(skip_benchmark)
         if not any(mark.name in ['integration', 'slow'] for mark in item.iter_markers()):
             item.add_marker(pytest.mark.unit)
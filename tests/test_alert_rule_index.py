@@ -0,0 +1,121 @@
+"""
+Tests para el índice de reglas de alerta
+========================================
+
+Verifica la resolución (dispositivo, sensor) -> reglas, que la partición
+del lote coincida con el filtrado regla por regla, y la recarga en caliente
+del archivo de reglas en IntelligentAlertSystem.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.intelligence.alert_rule_index import AlertRuleIndex
+from modules.intelligence.intelligent_alert_system import IntelligentAlertSystem, alert_rule_from_config
+
+
+def _site_rule(rule_id="temp_sala", high=28.0, **overrides):
+    entry = {"rule_id": rule_id, "name": "Temperatura sala", "category": "environmental", "severity": "CRITICAL",
+             "condition": "value > threshold_high OR value < threshold_low",
+             "threshold_values": {"threshold_high": high, "threshold_low": 15.0},
+             "sensor_types": ["temperature_1"], "devices": ["arduino_eth_001"]}
+    entry.update(overrides)
+    return entry
+
+
+def _batch(minutes=3):
+    now = datetime.now()
+    rows = [{"device_id": device, "sensor_type": sensor, "value": value,
+             "timestamp": now - timedelta(minutes=i)}
+            for i in range(minutes)
+            for device, sensor, value in [("arduino_eth_001", "t1", 45.0), ("arduino_eth_001", "temperature_1", 30.0),
+                                          ("esp32_wifi_001", "temperature_1", 30.0), ("esp32_wifi_001", "ldr", 500.0)]]
+    return pd.DataFrame(rows)
+
+
+def _write_rules(path, entries):
+    path.write_text(json.dumps({"rules": entries}), encoding="utf-8")
+    # Forzar un mtime distinto aunque el sistema de archivos tenga resolución gruesa
+    stamp = path.stat().st_mtime + 1
+    os.utime(path, (stamp, stamp))
+
+
+class TestAlertRuleIndex:
+    """Tests del índice."""
+
+    def test_rules_for_series_in_definition_order(self):
+        system = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9")
+        rules = dict(system.alert_rules)
+        rules["temp_sala"] = alert_rule_from_config(_site_rule())
+        rules["esp32_only"] = alert_rule_from_config(_site_rule("esp32_only", sensor_types=[], devices=["esp32_wifi_001"]))
+        index = AlertRuleIndex(rules)
+
+        wildcard = ("sensor_anomaly", "connectivity_degraded", "failure_prediction", "maintenance_due")
+        assert index.rules_for("arduino_eth_001", "t1") == ("temp_critical",) + wildcard
+        assert index.rules_for("arduino_eth_001", "temperature_1") == wildcard + ("temp_sala",)
+        assert index.rules_for("esp32_wifi_001", "temperature_1") == wildcard + ("esp32_only",)
+
+    def test_partition_matches_per_rule_filtering(self):
+        system = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9")
+        system.alert_rules["temp_sala"] = alert_rule_from_config(_site_rule())
+        system.alert_rules["sensor_anomaly"].enabled = False
+        system.rule_index.ensure_current(system.alert_rules)
+        df = _batch()
+
+        partition = system.rule_index.partition(df)
+
+        assert "sensor_anomaly" not in partition
+        for rule_id, rule in system.alert_rules.items():
+            if not rule.enabled:
+                continue
+            expected = system._filter_data_for_rule(df, rule)
+            assert df.index[partition[rule_id]].tolist() == expected.index.tolist()
+
+
+class TestRulesHotReload:
+    """Tests de la recarga del archivo de reglas."""
+
+    def test_site_rule_from_file_and_reload(self, tmp_path):
+        rules_file = tmp_path / "alert_rules.json"
+        _write_rules(rules_file, [_site_rule()])
+        system = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9", rules_file=str(rules_file))
+
+        alerts = asyncio.run(system._evaluate_alert_rules(_batch()))
+        # Tres lecturas fuera de rango en la misma serie: una alerta, las demás dentro del cooldown
+        assert sum(alert.rule_id == "temp_sala" for alert in alerts) == 1
+
+        # Subir el umbral y desactivar la regla por defecto de temperatura
+        _write_rules(rules_file, [_site_rule(high=35.0),
+                                  {**_site_rule("temp_critical"), "enabled": False}])
+        alerts = asyncio.run(system._evaluate_alert_rules(_batch()))
+
+        assert system.alert_rules["temp_sala"].threshold_values["threshold_high"] == 35.0
+        assert not system.alert_rules["temp_critical"].enabled
+        assert not any(alert.rule_id in ("temp_sala", "temp_critical") for alert in alerts)
+
+    def test_invalid_file_keeps_current_rules(self, tmp_path):
+        rules_file = tmp_path / "alert_rules.json"
+        _write_rules(rules_file, [_site_rule(), {"rule_id": "incompleta"}])
+        system = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9", rules_file=str(rules_file))
+        assert "temp_sala" in system.alert_rules and "incompleta" not in system.alert_rules
+
+        rules_file.write_text("{no es json", encoding="utf-8")
+        os.utime(rules_file, (rules_file.stat().st_mtime + 2,) * 2)
+
+        assert system.reload_rules() is False
+        assert "temp_sala" in system.alert_rules
+        assert system.reload_rules() is False  # no se reintenta hasta que el archivo vuelva a cambiar
+
+    def test_invalid_entry_rejected(self):
+        with pytest.raises(ValueError):
+            alert_rule_from_config(_site_rule(severity="URGENTE"))
@@ -0,0 +1,146 @@
+"""
+Tests para el almacén de estado de alertas
+==========================================
+
+Verifica las búsquedas indexadas (similares, por serie y estado), la
+retención acotada, la persistencia entre reinicios y el ciclo de vida de
+alertas en IntelligentAlertSystem (supresión, actualización y resolución).
+"""
+
+import asyncio
+import sys
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.intelligence.alert_state_store import AlertRecord, AlertStateStore, to_epoch
+
+T0 = datetime(2025, 10, 21, 10, 0)
+
+
+def _record(alert_id, minutes=0, rule_id="temp_critical", device_id="arduino_eth_001", sensor_type="t1",
+            status="active", last_updated=None):
+    return AlertRecord(alert_id=alert_id, rule_id=rule_id, device_id=device_id, sensor_type=sensor_type,
+                       severity=3, category="environmental", status=status, current_value=45.0,
+                       triggered_at=to_epoch(T0 + timedelta(minutes=minutes)),
+                       last_updated=(last_updated or datetime.now()).timestamp(),
+                       payload={"alert_id": alert_id, "title": "Temperatura Crítica"})
+
+
+class TestAlertStateStore:
+    """Tests del almacén."""
+
+    def test_find_similar_within_window(self):
+        store = AlertStateStore()
+        for minute in (0, 20, 45, 90):
+            store.add(_record(f"a{minute}", minute))
+        store.add(_record("otro", 20, sensor_type="t2"))
+
+        similar = store.find_similar("temp_critical", "arduino_eth_001", "t1", T0 + timedelta(minutes=30),
+                                     timedelta(minutes=15))
+
+        assert [record.alert_id for record in similar] == ["a20", "a45"]
+        assert store.find_similar("temp_critical", "esp32_wifi_001", "t1", T0, timedelta(hours=1)) == []
+
+    def test_query_and_counts_by_index(self):
+        store = AlertStateStore()
+        store.add(_record("a", 0))
+        store.add(_record("b", 5, sensor_type="t2"))
+        store.add(_record("c", 10, device_id="esp32_wifi_001", sensor_type="ldr", rule_id="sensor_anomaly"))
+
+        assert store.add(_record("a", 0)) is False
+        store.update("b", status="resolved")
+
+        assert [r.alert_id for r in store.query(device_id="arduino_eth_001")] == ["a"]
+        assert [r.alert_id for r in store.query(rule_id="sensor_anomaly")] == ["c"]
+        assert store.count_by("device_id") == {"arduino_eth_001": 1, "esp32_wifi_001": 1}
+        assert (store.count(), store.count(["resolved"])) == (3, 1)
+
+    def test_bounded_retention(self):
+        store = AlertStateStore(retention=timedelta(days=1), max_alerts=3)
+        store.add(_record("viejo", 0, last_updated=datetime.now() - timedelta(days=2)))
+        for minute in range(4):
+            store.add(_record(f"a{minute}", minute))
+
+        store.prune()
+
+        assert len(store) == 3 and "viejo" not in store and "a0" not in store
+        assert store.find_similar("temp_critical", "arduino_eth_001", "t1", T0, timedelta(seconds=30)) == []
+
+    def test_persists_across_restarts(self, tmp_path):
+        db_path = str(tmp_path / "alert_state.db")
+        store = AlertStateStore(db_path)
+        store.add(_record("a", 0))
+        store.update("a", status="acknowledged", current_value=41.0)
+        store.close()
+
+        restored = AlertStateStore(db_path)
+
+        record = restored.get("a")
+        assert (record.status, record.current_value) == ("acknowledged", 41.0)
+        assert record.to_dict()["title"] == "Temperatura Crítica"
+        assert [r.alert_id for r in restored.find_similar("temp_critical", "arduino_eth_001", "t1", T0,
+                                                          timedelta(minutes=1))] == ["a"]
+
+
+class TestAlertLifecycle:
+    """Tests del ciclo de vida en IntelligentAlertSystem."""
+
+    @staticmethod
+    def _readings(values, start):
+        return [{"device_id": "arduino_eth_001", "sensor_type": "t1", "value": value,
+                 "timestamp": (start + timedelta(minutes=i)).isoformat()} for i, value in enumerate(values)]
+
+    def test_suppress_update_resolve_and_restore(self):
+        from modules.intelligence.intelligent_alert_system import IntelligentAlertSystem
+
+        # Sin state_db explícito: ALERT_STATE_DB (archivo en tmp_path, ver conftest)
+        start = datetime.now() - timedelta(minutes=4)
+        system = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9")
+
+        first = asyncio.run(system.process_real_time_data(self._readings([45.0, 46.0, 47.0], start)))
+        critical = [alert for alert in first["new_alerts"] if alert["title"].startswith("Temperatura")]
+        assert len(critical) == 1
+        assert len(first["suppressed_alerts"]) >= 2
+        assert first["alert_summary"]["by_device"]["arduino_eth_001"] >= 1
+
+        # Tras un reinicio, la misma serie sigue en cooldown y la lectura normal resuelve la alerta
+        restarted = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9")
+        second = asyncio.run(restarted.process_real_time_data(
+            self._readings([48.0, 25.0], start + timedelta(minutes=3))))
+
+        assert not any(alert["title"].startswith("Temperatura") for alert in second["new_alerts"])
+        resolved = [alert for alert in second["resolved_alerts"] if alert["alert_id"] == critical[0]["alert_id"]]
+        assert resolved and resolved[0]["status"] == "resolved" and resolved[0]["current_value"] == 25.0
+
+    def test_default_state_db_is_a_data_file(self, monkeypatch, tmp_path):
+        from modules.intelligence import intelligent_alert_system as module
+
+        monkeypatch.delenv("ALERT_STATE_DB")
+        monkeypatch.setattr(module, "DEFAULT_ALERT_STATE_DB", tmp_path / "data" / "alert_state.db")
+
+        system = module.IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9")
+
+        assert system.alert_store.db_path == str(tmp_path / "data" / "alert_state.db")
+        assert (tmp_path / "data" / "alert_state.db").exists()
+
+    def test_alert_state_bounded_by_store(self):
+        from modules.intelligence.intelligent_alert_system import IntelligentAlertSystem
+
+        system = IntelligentAlertSystem(jetson_api_url="http://127.0.0.1:9")
+        system.alert_store = AlertStateStore(max_alerts=2)
+        start = datetime.now() - timedelta(minutes=4)
+
+        for index in range(4):
+            readings = [dict(reading, device_id=f"arduino_eth_00{index}")
+                        for reading in self._readings([45.0, 46.0, 47.0], start + timedelta(seconds=index))]
+            asyncio.run(system.process_real_time_data(readings))
+        result = asyncio.run(system.process_real_time_data(self._readings([25.0], start + timedelta(minutes=3))))
+
+        # Las alertas viven solo en el almacén: la poda acota todo el estado
+        assert len(system.alert_store) == 2
+        assert result["alert_summary"]["total_alerts"] == 2
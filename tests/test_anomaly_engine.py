@@ -0,0 +1,138 @@
+"""
+Tests para el motor unificado de anomalías
+==========================================
+
+Verifica la puntuación agrupada y móvil sobre frames multi-serie, la
+configuración por familia de sensor y que los llamadores deleguen en el motor.
+"""
+
+import asyncio
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.intelligence.anomaly_engine import (
+    AnomalyEngine,
+    AnomalyWindowConfig,
+    anomaly_engine,
+    sensor_family,
+)
+
+
+def _frame(devices=3, n=300, spike_at=150, shuffle=False):
+    rng = np.random.default_rng(11)
+    timestamps = pd.date_range("2025-10-21", periods=n, freq="min")
+    frames = []
+    for d in range(devices):
+        for sensor, base, noise, spike in (("t1", 24.0, 0.5, 15.0), ("ldr", 500.0, 10.0, 400.0)):
+            values = base + rng.normal(0, noise, n)
+            values[spike_at] += spike
+            frames.append(pd.DataFrame({"device_id": f"esp32_{d}", "sensor_type": sensor,
+                                        "value": values, "timestamp": timestamps}))
+    df = pd.concat(frames, ignore_index=True)
+    return df.sample(frac=1, random_state=0) if shuffle else df
+
+
+class TestAnomalyEngine:
+    """Tests del motor vectorizado."""
+
+    def test_spikes_flagged_in_every_series(self):
+        scored = anomaly_engine.score(_frame())
+        spikes = scored[scored["timestamp"] == pd.Timestamp("2025-10-21") + pd.Timedelta(minutes=150)]
+
+        assert spikes["robust_z_anomaly"].all()
+        assert spikes["jump_anomaly"].all()
+        assert (spikes["severity"] == "critical").all()
+        assert scored["robust_z_anomaly"].sum() <= len(spikes) * 2  # pocos falsos positivos
+
+    def test_order_independent_and_index_preserved(self):
+        ordered = anomaly_engine.score(_frame())
+        shuffled = anomaly_engine.score(_frame(shuffle=True))
+
+        assert list(shuffled.index) == list(_frame(shuffle=True).index)
+        pd.testing.assert_series_equal(shuffled["robust_z"].sort_index(), ordered["robust_z"])
+
+    def test_rolling_window_adapts_to_level_shift(self):
+        values = np.r_[np.full(200, 20.0), np.full(200, 30.0)] + np.random.default_rng(1).normal(0, 0.2, 400)
+        df = pd.DataFrame({"device_id": "esp32", "sensor_type": "t1", "value": values,
+                           "timestamp": pd.date_range("2025-10-21", periods=400, freq="min")})
+
+        rolling = anomaly_engine.score(df, detectors=("robust_z",))
+        whole = anomaly_engine.score(df, detectors=("robust_z",), window=None)
+
+        assert rolling["robust_z_anomaly"].iloc[300:].sum() == 0  # la ventana ya se adaptó
+        assert rolling["robust_z_anomaly"].iloc[200]
+        assert whole["baseline"].nunique() == 1
+
+    def test_zero_mad_falls_back_to_mean_deviation(self):
+        from modules.tools.analysis_tools import AnalysisTools
+
+        records = [{"device_id": "esp32", "sensor_type": "t1", "value": value,
+                    "timestamp": f"2025-10-21T10:{i:02d}:00"} for i, value in enumerate([20.0] * 10 + [50.0])]
+
+        scored = anomaly_engine.score(records, detectors=("robust_z",))
+        result = AnalysisTools().detect_anomalies(records)
+
+        assert scored["robust_z_anomaly"].tolist() == [False] * 10 + [True]
+        assert [a["value"] for a in result["anomalies"]] == [50.0]
+        # Serie constante: sin escala no hay anomalías
+        assert not anomaly_engine.score(records[:10])["is_anomaly"].any()
+
+    def test_config_per_family_and_ranges(self):
+        engine = AnomalyEngine({"luminosity": AnomalyWindowConfig(window=10, valid_range=(0, 100))})
+        df = pd.DataFrame({"sensor_type": ["ldr"] * 3 + ["ntc_entrada"] * 3,
+                           "value": [50, 150, 60, 20, 21, 70]})
+
+        scored = engine.score(df, detectors=("range",), valid_ranges={"ntc_entrada": (0, 60)})
+
+        assert scored["range_anomaly"].tolist() == [False, True, False, False, False, True]
+        assert engine.config_for("ldr").window == 10
+        assert sensor_family("ntc_salida") == "temperature"
+        assert sensor_family("humidity") == "humidity"
+
+    def test_detect_and_invalid_detector(self):
+        assert anomaly_engine.detect([]).empty
+        with pytest.raises(ValueError):
+            anomaly_engine.score(_frame(), detectors=("prophet",))
+
+
+class TestCallersDelegate:
+    """Tests de los llamadores."""
+
+    def test_analysis_tools(self):
+        from modules.tools.analysis_tools import AnalysisTools
+
+        records = _frame(devices=1).to_dict("records")
+        result = AnalysisTools().detect_anomalies(records, threshold_factor=4.0)
+
+        assert result["threshold_used"]["method"] == "robust_z"
+        assert {a["sensor_type"] for a in result["anomalies"]} == {"t1", "ldr"}
+        assert {"min", "max"} <= result["anomalies"][0]["expected_range"].keys()
+
+    def test_remote_nodes_ranges(self):
+        from modules.agents.remote_langgraph_nodes import RemoteLangGraphNodes
+
+        nodes = RemoteLangGraphNodes.__new__(RemoteLangGraphNodes)
+        data = [{"device_id": "esp32", "sensor_type": "ldr", "value": 150.0,
+                 "timestamp": "2025-10-21T10:00:00"}]
+
+        anomalies = asyncio.run(nodes._detect_anomalies(data))
+
+        assert anomalies[0]["expected_range"] == "0-100"
+        assert anomalies[0]["methods"] == ["Fuera de rango"]
+
+    def test_smart_analyzer_anomalies(self):
+        from modules.intelligence.smart_analyzer import SmartAnalyzer
+
+        df = _frame(devices=2)
+        anomalies = SmartAnalyzer(incremental=False)._detect_intelligent_anomalies(df)
+
+        spikes = [a for a in anomalies if a["timestamp"] == pd.Timestamp("2025-10-21 02:30")]
+        assert len(spikes) == 4
+        assert all("Z-Score robusto" in a["detection_method"] for a in spikes)
@@ -0,0 +1,130 @@
+"""
+Tests para el event loop persistente
+====================================
+
+Verifica que las corrutinas de distintos turnos corran en el mismo loop,
+que ``submit`` funcione desde varios hilos y que el agente cloud use el
+loop persistente en ``process_query_sync``.
+"""
+
+import asyncio
+import concurrent.futures
+import sys
+import threading
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.async_runtime import BackgroundEventLoop
+
+
+@pytest.fixture
+def runtime():
+    background = BackgroundEventLoop(name="test-loop")
+    yield background
+    background.stop()
+
+
+async def _current_loop():
+    return asyncio.get_running_loop()
+
+
+class TestBackgroundEventLoop:
+    """Tests del loop en segundo plano."""
+
+    def test_same_loop_across_calls(self, runtime):
+        first = runtime.run(_current_loop())
+        second = runtime.run(_current_loop())
+
+        assert first is second
+        assert runtime.is_running
+        assert runtime.submitted == 2
+
+    def test_loop_state_survives_between_turns(self, runtime):
+        async def make_lock():
+            return asyncio.Lock()  # Objeto ligado al loop
+
+        lock = runtime.run(make_lock())
+
+        async def use_lock():
+            async with lock:
+                return True
+
+        assert runtime.run(use_lock()) is True
+
+    def test_submit_from_many_threads(self, runtime):
+        async def double(value):
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda v: runtime.submit(double(v)).result(timeout=5), range(16)))
+
+        assert results == [v * 2 for v in range(16)]
+
+    def test_timeout_cancels_future(self, runtime):
+        with pytest.raises(concurrent.futures.TimeoutError):
+            runtime.run(asyncio.sleep(5), timeout=0.05)
+
+    def test_run_from_loop_thread_is_rejected(self, runtime):
+        async def nested():
+            return runtime.run(_current_loop())
+
+        with pytest.raises(RuntimeError):
+            runtime.run(nested())
+
+    def test_dropped_loop_is_released(self):
+        import gc
+        import weakref
+
+        ref = weakref.ref(BackgroundEventLoop(name="dropped"))
+        gc.collect()
+
+        assert ref() is None
+
+    def test_stop_and_restart(self, runtime):
+        runtime.run(_current_loop())
+        runtime.stop()
+
+        assert not runtime.is_running
+        assert runtime.run(_current_loop()).is_running()
+
+
+class TestCloudAgentRuntime:
+    """Tests de process_query_sync sobre el loop persistente."""
+
+    def test_process_query_sync_reuses_loop(self):
+        from modules.agents.cloud_iot_agent import CloudIoTAgent
+
+        agent = CloudIoTAgent()
+        loops, threads = [], []
+
+        async def fake_process_query(query, thread_id="cloud-session", analysis_hours=None):
+            loops.append(asyncio.get_running_loop())
+            threads.append(threading.current_thread().name)
+            return {"response": f"ok: {query}"}
+
+        agent.process_query = fake_process_query
+        try:
+            assert agent.process_query_sync("hola") == "ok: hola"
+            assert agent.process_query_sync("otra", analysis_hours=2).startswith("ok: otra")
+        finally:
+            agent.runtime.stop()
+
+        assert loops[0] is loops[1]
+        assert threads == ["cloud-iot-agent-loop"] * 2
+
+    def test_agents_share_one_loop_thread(self):
+        from modules.agents.cloud_iot_agent import CloudIoTAgent
+
+        try:
+            for _ in range(3):
+                CloudIoTAgent().runtime.run(_current_loop())
+            loop_threads = [t for t in threading.enumerate() if t.name == "cloud-iot-agent-loop"]
+        finally:
+            CloudIoTAgent().runtime.stop()
+
+        assert len(loop_threads) == 1
@@ -0,0 +1,224 @@
+"""
+Tests para la ingesta masiva con COPY
+=====================================
+
+Usa un pool falso de asyncpg para verificar el armado de lotes, el uso de
+staging + inserción (registro de dispositivos nuevos, recálculo de rollups
+en modo upsert), el back-pressure de la cola y el ajuste del tamaño de lote.
+"""
+
+import asyncio
+import os
+import sys
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+os.environ.setdefault("DB_PASSWORD", "test")
+
+from modules.database.bulk_ingest import (
+    CREATE_STAGING_SQL,
+    INGEST_COLUMNS,
+    MERGE_SQL,
+    REFRESH_ROLLUPS_SQL,
+    REGISTER_DEVICES_SQL,
+    STAGING_TABLE,
+    BulkIngestor,
+    ReadingBatch,
+)
+from modules.database.db_connector import DatabaseConnector
+
+
+class FakeConnection:
+    """Conexión que emula COPY a staging, el registro de dispositivos y el merge con deduplicación."""
+
+    def __init__(self, store, delay=0.0, fail_on_batch=None):
+        self.store = store
+        self.delay = delay
+        self.fail_on_batch = fail_on_batch
+        self.staging = []
+        self.statements = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+        self.staging = []  # ON COMMIT DELETE ROWS
+
+    async def execute(self, sql, *args):
+        self.statements.append((sql, *args) if args else sql)
+        if sql == REGISTER_DEVICES_SQL:
+            self.store.setdefault("_devices", set()).update(r[0] for r in self.staging)
+            return "INSERT 0 0"
+        if sql in MERGE_SQL.values():
+            assert {r[0] for r in self.staging} <= self.store.get("_devices", set())  # clave foránea
+            written = 0
+            for device, sensor, value, unit, ts in {(r[0], r[1], r[4]): r for r in self.staging}.values():
+                key = (device, sensor, ts)
+                if key not in self.store or (sql == MERGE_SQL["update"] and self.store[key] != value):
+                    self.store[key] = value
+                    written += 1
+            return f"INSERT 0 {written}"
+        return "CREATE TABLE"
+
+    async def fetch(self, sql, *args):
+        self.statements.append((sql, *args) if args else sql)
+        if "ensure_sensor_data_partition" in sql:
+            return [{"partition": f"sensor_data_{args[0]:%Y_%m}"}]
+        return []
+
+    async def copy_records_to_table(self, table, records, columns):
+        assert table == STAGING_TABLE and columns == INGEST_COLUMNS
+        self.store.setdefault("_batches", []).append(len(records))
+        if self.fail_on_batch is not None and len(self.store["_batches"]) == self.fail_on_batch:
+            raise RuntimeError("copy failed")
+        await asyncio.sleep(self.delay)
+        self.staging = list(records)
+
+
+class FakePool:
+    def __init__(self, **kwargs):
+        self.store = {}
+        self.kwargs = kwargs
+        self.connections = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        connection = FakeConnection(self.store, **self.kwargs)
+        self.connections.append(connection)
+        yield connection
+
+
+@pytest.fixture
+def readings(make_readings):
+    """Una lectura por segundo desde las 10:00 -03:00, con el segundo como valor"""
+    def factory(count, device="esp32_wifi_001"):
+        return make_readings(periods=count, start="2025-10-21 10:00", freq="1s", device_id=device, unit="lux")
+    return factory
+
+
+class TestReadingBatch:
+    """Tests de normalización de lecturas."""
+
+    def test_from_records_normalizes_and_skips_invalid(self, readings):
+        batch = ReadingBatch.from_records(readings(2) + [
+            {"device_id": "x", "sensor_type": "t1", "value": "n/a", "timestamp": "2025-10-21T10:00:00"},
+            {"device_id": "x", "sensor_type": "t1", "value": 1.0, "timestamp": None},
+        ])
+
+        assert len(batch) == 2
+        assert batch.rows[0] == ("esp32_wifi_001", "ldr", 0.0, "lux", datetime(2025, 10, 21, 10, 0, 0))
+
+
+class TestBulkIngestor:
+    """Tests de la ingesta por lotes."""
+
+    @pytest.mark.asyncio
+    async def test_batches_and_dedupe(self, readings):
+        pool = FakePool()
+        ingestor = BulkIngestor(pool, batch_size=1_000, workers=1, target_batch_seconds=None)
+
+        records = readings(2_500)
+        stats = await ingestor.ingest(records + records[:500])  # 500 duplicadas
+
+        assert pool.store["_batches"] == [1_000, 1_000, 1_000]
+        assert stats.rows_received == 3_000
+        assert stats.rows_written == 2_500
+        assert stats.duplicates == 500
+        statements = pool.connections[0].statements
+        assert statements[:3] == [CREATE_STAGING_SQL, REGISTER_DEVICES_SQL, MERGE_SQL["ignore"]]
+        assert pool.store["_devices"] == {"esp32_wifi_001"}
+
+    @pytest.mark.asyncio
+    async def test_update_mode_refreshes_rollups(self, readings):
+        pool = FakePool()
+        ingestor = BulkIngestor(pool, batch_size=1_000, workers=1, target_batch_seconds=None,
+                                on_conflict="update")
+        records = readings(10)
+        await ingestor.ingest(records)
+
+        changed = [dict(record, value=record["value"] + 1) for record in records[3:5]]
+        stats = await ingestor.ingest(changed)
+        await ingestor.ingest(changed)   # sin cambios: no se recalcula
+
+        refreshes = [s for c in pool.connections for s in c.statements if isinstance(s, tuple)]
+        assert stats.rows_written == 2
+        assert refreshes[-1] == (REFRESH_ROLLUPS_SQL, datetime(2025, 10, 21, 10, 0, 3), datetime(2025, 10, 21, 10, 0, 4))
+        assert len(refreshes) == 2
+
+    @pytest.mark.asyncio
+    async def test_async_source_of_batches(self, readings):
+        pool = FakePool()
+
+        async def source():
+            for device in ("esp32_wifi_001", "arduino_eth_001"):
+                yield ReadingBatch.from_records(readings(300, device))
+
+        stats = await BulkIngestor(pool, batch_size=250, workers=2).ingest(source())
+
+        assert stats.rows_written == 600
+        assert sum(pool.store["_batches"]) == 600
+
+    @pytest.mark.asyncio
+    async def test_back_pressure_bounds_queue(self, readings):
+        pool = FakePool(delay=0.01)
+        ingestor = BulkIngestor(pool, batch_size=100, max_pending_batches=2, workers=1,
+                                target_batch_seconds=None)
+
+        await ingestor.ingest(iter([readings(100)] * 20))
+
+        assert ingestor.max_queue_depth <= 2
+
+    @pytest.mark.asyncio
+    async def test_worker_error_propagates(self, readings):
+        pool = FakePool(fail_on_batch=2)
+        ingestor = BulkIngestor(pool, batch_size=100, max_pending_batches=1, workers=1)
+
+        with pytest.raises(RuntimeError, match="copy failed"):
+            await ingestor.ingest(iter([readings(100)] * 10))
+
+    def test_tune_moves_towards_target(self):
+        ingestor = BulkIngestor(FakePool(), batch_size=5_000, target_batch_seconds=0.5)
+
+        ingestor._tune(5_000, 0.1)  # Rápido: crece (acotado a x2)
+        assert ingestor.batch_size == 10_000
+        ingestor._tune(10_000, 2.0)  # Lento: decrece (acotado a /2)
+        assert ingestor.batch_size == 5_000
+
+    def test_invalid_conflict_mode(self):
+        with pytest.raises(ValueError):
+            BulkIngestor(FakePool(), on_conflict="merge")
+
+
+class TestConnectorBulkIngest:
+    """Tests del método del conector."""
+
+    @pytest.mark.asyncio
+    async def test_uses_connector_pool(self, readings):
+        connector = DatabaseConnector()
+        connector.pool = FakePool()
+
+        stats = await connector.bulk_ingest(readings(50))
+
+        statements = [sql for connection in connector.pool.connections for sql in connection.statements]
+        assert stats.rows_written == 50
+        assert MERGE_SQL["ignore"] in statements
+        # Antes de ingerir se aseguran las particiones del mes
+        assert sum("ensure_sensor_data_partition" in str(sql) for sql in statements) == 3
+
+    @pytest.mark.asyncio
+    async def test_feeds_latest_index(self, readings):
+        from modules.utils.latest_index import latest_index
+
+        latest_index.clear()
+        ingestor = BulkIngestor(FakePool(), batch_size=100, workers=1, target_batch_seconds=None)
+
+        await ingestor.ingest(readings(150) + readings(20, device="arduino_eth_001"))
+
+        assert latest_index.device_status()["esp32_wifi_001"]["records_count"] == 150
+        assert latest_index.latest("arduino_eth_001")["arduino_eth_001"]["ldr"]["value"] == 19.0
+        latest_index.clear()
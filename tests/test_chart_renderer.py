@@ -0,0 +1,169 @@
+"""
+Tests para el servicio de renderizado de gráficos
+=================================================
+
+Verifica el perfil adaptativo (DPI y marcadores), la caché por watermark
+y especificación, la salida WebP, el renderizado de varios gráficos (un
+gráfico con error no se guarda en caché), que el lienzo reutilizado vuelva
+a los márgenes por defecto y que IoTVisualizationEngine delegue en el servicio.
+"""
+
+import base64
+import sys
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils import chart_renderer as chart_renderer_module
+from modules.utils.chart_renderer import (
+    ChartRenderer, ChartSpec, WEBP_AVAILABLE, chart_renderer, render_chart, render_profile
+)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def frame(make_readings):
+    """Luminosidad y temperatura por minuto con la misma onda (columna datetime)"""
+    def factory(points=200):
+        wave = np.sin(np.arange(points) / 20)
+        return pd.concat([
+            make_readings(periods=points, values=500 + 100 * wave, offset=None, frame=True),
+            make_readings(periods=points, values=24 + wave, device_id="arduino_eth_001",
+                          sensor_type="temperature_1", offset=None, frame=True),
+        ], ignore_index=True)
+    return factory
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    chart_renderer.clear()
+    yield
+    chart_renderer.clear()
+
+
+class TestRenderProfile:
+    """Tests del perfil adaptativo."""
+
+    def test_dpi_follows_display_size(self):
+        small = render_profile(ChartSpec("time_series", width_px=600, height_px=400), 50)
+        large = render_profile(ChartSpec("time_series", width_px=2400, height_px=1400), 50)
+
+        assert small.dpi < large.dpi <= 200
+        assert small.figsize[0] * small.dpi == pytest.approx(600)
+
+    def test_markers_thin_out_with_density(self):
+        spec = ChartSpec("time_series")
+
+        assert render_profile(spec, 50).marker == "o"
+        assert render_profile(spec, 300).markevery > 1
+        dense = render_profile(spec, 20000)
+        assert dense.marker is None and dense.linewidth < render_profile(spec, 50).linewidth
+
+
+class TestChartRenderer:
+    """Tests del servicio."""
+
+    def test_cache_by_data_and_spec(self, frame):
+        renderer = ChartRenderer()
+        df = frame()
+        spec = ChartSpec("time_series", title="Serie")
+
+        first = renderer.render(spec, df)
+        again = renderer.render(spec, df.to_dict("records"))
+
+        assert first.data.startswith(PNG_SIGNATURE)
+        assert again is first
+        assert (renderer.cache_hits, renderer.cache_misses) == (1, 1)
+        assert renderer.render(ChartSpec("time_series", title="Otra"), df) is not first
+        assert renderer.render(spec, df.iloc[:-1]) is not first
+
+    @pytest.mark.skipif(not WEBP_AVAILABLE, reason="Pillow sin soporte WebP")
+    def test_webp_output(self, frame):
+        image = ChartRenderer().render(ChartSpec("statistics", image_format="webp"), frame())
+
+        assert image.mime_type == "image/webp"
+        assert image.data[8:12] == b"WEBP"
+        assert image.data_uri().startswith("data:image/webp;base64,")
+
+    def test_render_many_caches_each_chart(self, frame):
+        renderer = ChartRenderer()
+        df = frame()
+        specs = [ChartSpec("time_series"), ChartSpec("statistics"), ChartSpec("prediction")]
+
+        images = renderer.render_many([(spec, df) for spec in specs])
+
+        assert all(image.data.startswith(PNG_SIGNATURE) for image in images)
+        assert renderer.cache_misses == 3
+        assert renderer.render_many([(specs[1], df)])[0] is images[1]
+
+    def test_failed_chart_is_not_cached(self, monkeypatch, frame):
+        renderer = ChartRenderer()
+        df = frame()
+        specs = [ChartSpec("time_series"), ChartSpec("statistics")]
+
+        def failing_statistics(spec, data):
+            if spec.kind == "statistics":
+                raise ValueError("dato inválido")
+            return render_chart(spec, data)
+
+        monkeypatch.setattr(chart_renderer_module, "render_chart", failing_statistics)
+        images = renderer.render_many([(spec, df) for spec in specs])
+
+        assert images[0].data.startswith(PNG_SIGNATURE) and images[1] is None
+        assert len(renderer._cache) == 1
+        monkeypatch.setattr(chart_renderer_module, "render_chart", render_chart)
+        assert renderer.render_many([(spec, df) for spec in specs])[1] is not None
+
+    def test_reused_figure_resets_margins(self):
+        profile = render_profile(ChartSpec("time_series"), 50)
+        fig = chart_renderer_module._acquire_figure(profile)
+        fig.subplots_adjust(left=0.3, top=0.6)  # Como los deja tight_layout
+
+        reused = chart_renderer_module._acquire_figure(profile)
+
+        assert reused is fig
+        assert reused.subplotpars.left == matplotlib.rcParams["figure.subplot.left"]
+        assert reused.subplotpars.top == matplotlib.rcParams["figure.subplot.top"]
+
+    def test_serial_error_is_not_cached(self, monkeypatch, frame):
+        renderer = ChartRenderer()
+        spec, df = ChartSpec("time_series"), frame()
+
+        def failing(*args):
+            raise RuntimeError("fallo transitorio")
+
+        monkeypatch.setattr(chart_renderer_module, "render_chart", failing)
+        assert renderer.render(spec, df) is None
+        monkeypatch.setattr(chart_renderer_module, "render_chart", render_chart)
+        assert renderer.render(spec, df).data.startswith(PNG_SIGNATURE)
+        assert renderer.cache_misses == 2
+
+    def test_nothing_to_plot(self, frame):
+        renderer = ChartRenderer()
+        assert renderer.render(ChartSpec("time_series"), []) is None
+        with pytest.raises(ValueError):
+            renderer.render(ChartSpec("pie"), frame())
+
+
+class TestEngineDelegates:
+    """Tests de IoTVisualizationEngine sobre el servicio."""
+
+    def test_engine_returns_base64_png(self, frame):
+        from modules.utils.visualization_engine import IoTVisualizationEngine
+
+        engine = IoTVisualizationEngine(renderer=ChartRenderer())
+        records = frame().assign(timestamp=lambda df: df["timestamp"].astype(str)).to_dict("records")
+
+        chart = engine.generate_time_series_chart(records)
+        analysis = engine.generate_comprehensive_analysis(records)
+
+        assert base64.b64decode(chart).startswith(PNG_SIGNATURE)
+        assert set(analysis["charts"]) == {"time_series", "statistics", "prediction"}
+        assert analysis["statistics"]["esp32_wifi_001"]["ldr"]["count"] == 200
@@ -0,0 +1,198 @@
+"""
+Tests para los reportes HTML compactos
+======================================
+
+Verifica el payload binario compartido, que cada serie se guarde una sola
+vez, que plotly.js quede fijado (CDN por defecto, incrustado o archivo
+hermano), las etiquetas por punto y el tamaño total frente a ``fig.to_json``.
+"""
+
+import base64
+import json
+import re
+import sys
+import zlib
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.compact_html_report import (
+    PLOTLY_MODE_CDN,
+    PLOTLY_MODE_INLINE,
+    PLOTLY_MODE_SIBLING,
+    CompactHTMLReport,
+    plotly_asset_name,
+)
+from modules.agents.reporting import ReportGenerator
+
+
+def _series(points, start_value=20.0):
+    start = datetime(2025, 10, 21, 10, 0, 0)
+    timestamps = [(start + timedelta(seconds=10 * i)).isoformat() + "-03:00" for i in range(points)]
+    values = [round(start_value + (i % 50) * 0.1, 2) for i in range(points)]
+    return timestamps, values
+
+
+def _decode(report):
+    """Decodificar el payload como lo hace el navegador."""
+    manifest, payload = report.build_payload()
+    raw = base64.b64decode(payload)
+    if manifest["compressed"]:
+        raw = zlib.decompress(raw)
+    decoded = {}
+    for series_id, meta in manifest["series"].items():
+        deltas = np.frombuffer(raw, dtype="<f8", count=meta["n"], offset=meta["t"] * 8)
+        values = np.frombuffer(raw, dtype="<f4", count=meta["n"],
+                               offset=manifest["values_byte_offset"] + meta["v"] * 4)
+        decoded[series_id] = (np.cumsum(deltas), values)
+    return decoded
+
+
+def _multi_report_data(points):
+    all_data = {}
+    for device in ("esp32_wifi_001", "arduino_eth_001"):
+        for sensor, chart_type in (("t1", "line"), ("ldr", "bar"), ("avg", "pie")):
+            timestamps, values = _series(points)
+            all_data[f"{device}_{sensor}"] = {
+                "device": device, "sensor": sensor, "chart_type": chart_type,
+                "data": [{"t": t, "v": v} for t, v in zip(timestamps, values)],
+            }
+    return all_data
+
+
+METRICS = {"total_registros": 10, "dispositivos": ["esp32_wifi_001"], "sensores": ["t1"],
+           "periodo": "24h", "timestamp": "2025-10-21 10:00"}
+
+
+class TestCompactPayload:
+    """Tests del payload binario."""
+
+    def test_roundtrip_keeps_wall_clock_and_values(self):
+        report = CompactHTMLReport("Test")
+        timestamps, values = _series(100)
+        report.add_series("s0", timestamps, values)
+
+        times, decoded_values = _decode(report)["s0"]
+
+        first = datetime(1970, 1, 1) + timedelta(milliseconds=float(times[0]))
+        assert first == datetime(2025, 10, 21, 10, 0, 0)
+        assert np.allclose(np.diff(times), 10_000)
+        assert np.allclose(decoded_values, values, atol=1e-4)
+
+    def test_series_stored_once(self):
+        report = CompactHTMLReport("Test")
+        timestamps, values = _series(10)
+        report.add_series("s0", timestamps, values)
+        report.add_series("s0", timestamps, values)
+        report.add_figure("A", [{"series": "s0", "type": "line"}])
+        report.add_figure("B", [{"series": "s0", "type": "area"}])
+
+        manifest, _ = report.build_payload()
+
+        assert list(manifest["series"]) == ["s0"]
+        assert manifest["values_byte_offset"] == 10 * 8
+
+    def test_uncompressed_payload(self):
+        report = CompactHTMLReport("Test", compress=False)
+        report.add_series("s0", *_series(5))
+
+        manifest, payload = report.build_payload()
+
+        assert manifest["compressed"] is False
+        assert len(base64.b64decode(payload)) == 5 * 8 + 5 * 4
+
+
+class TestCompactRender:
+    """Tests del HTML generado."""
+
+    def test_pinned_cdn_mode(self):
+        html_text = CompactHTMLReport("Test", plotly_mode=PLOTLY_MODE_CDN).render()
+
+        assert f'<script src="https://cdn.plot.ly/{plotly_asset_name()}"' in html_text
+        assert len(html_text) < 20_000
+        assert "IntersectionObserver" in html_text
+
+    def test_default_inline_plotly_without_cdn(self):
+        import plotly
+
+        html_text = CompactHTMLReport("Test").render()
+
+        assert '<script src="https://cdn.plot.ly' not in html_text
+        assert f"plotly.js {plotly.__version__}" in html_text
+        assert ReportGenerator().html_plotly_mode == PLOTLY_MODE_INLINE
+
+    def test_sibling_bundle_writes_pinned_asset(self, tmp_path):
+        report = CompactHTMLReport("Test", plotly_mode=PLOTLY_MODE_SIBLING)
+
+        html_path = report.write_bundle(str(tmp_path))
+
+        assert (tmp_path / plotly_asset_name()).exists()
+        assert f'src="{plotly_asset_name()}"' in html_path.read_text(encoding="utf-8")
+
+    def test_templates_deduplicated(self):
+        import plotly.graph_objects as go
+
+        report = CompactHTMLReport("Test")
+        for sid in ("a", "b"):
+            report.add_series(sid, *_series(5))
+            fig = go.Figure(go.Scatter(x=[1], y=[1]))
+            fig.update_layout(template="plotly_white")
+            report.add_plotly_figure(sid, fig, {0: sid})
+
+        assert len(report._templates) == 1
+        assert report._figures[0]["traces"][0] == {"type": "scatter", "series": "a"}
+
+    def test_value_labels_become_text_template(self):
+        import plotly.graph_objects as go
+
+        report = CompactHTMLReport("Test")
+        timestamps, values = _series(5)
+        report.add_series("s0", timestamps, values)
+        labels = ["bajo", "medio", "alto", "medio", "bajo"]
+        fig = go.Figure([go.Bar(x=timestamps, y=values, text=[f"{v:.1f}" for v in values]),
+                         go.Bar(x=timestamps, y=values, text=labels)])
+        report.add_plotly_figure("Barras", fig, {0: "s0", 1: "s0"})
+
+        formatted, custom = report._figures[0]["traces"]
+        assert formatted["texttemplate"] == "%{y:.1f}" and "text" not in formatted
+        assert custom["text"] == labels
+
+
+class TestMultiReport:
+    """Tests de ReportGenerator.export_html_multi_report."""
+
+    def test_figures_reference_series(self):
+        html_text = ReportGenerator().export_html_multi_report(
+            {"title": "Reporte"}, "Resumen", METRICS, _multi_report_data(50)).decode("utf-8")
+
+        spec = json.loads(re.search(r'id="report-spec">(.*?)</script>', html_text, re.S).group(1))
+        series_traces = [t for f in spec["figures"] for t in f["traces"] if "series" in t]
+
+        assert len(spec["figures"]) == 6
+        assert len(series_traces) == 4  # Las tortas llevan sólo sus rangos agregados
+        assert all("x" not in t and "text" not in t for t in series_traces)
+        # Las barras conservan sus etiquetas por punto
+        bars = [t for t in series_traces if t["type"] == "bar"]
+        assert bars and all(t["texttemplate"] == "%{y:.0f}" for t in bars)  # luminosidad sin decimales
+
+    def test_data_much_smaller_than_plotly_json(self):
+        generator = ReportGenerator()
+        generator.html_plotly_mode = PLOTLY_MODE_CDN  # Solo los datos, sin plotly.js
+        all_data = _multi_report_data(1000)
+
+        compact_size = len(generator.export_html_multi_report(
+            {"title": "Reporte"}, "Resumen", METRICS, all_data))
+
+        legacy_size = 0
+        for info in all_data.values():
+            timestamps = [p["t"] for p in info["data"]]
+            values = [p["v"] for p in info["data"]]
+            legacy_size += len(generator.build_plotly_figure(
+                timestamps, values, info["chart_type"], info["sensor"], info["sensor"]).to_json())
+
+        assert compact_size * 10 < legacy_size
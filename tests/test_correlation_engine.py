@@ -0,0 +1,125 @@
+"""
+Tests para el motor compartido de correlaciones
+===============================================
+
+Verifica la alineación en una grilla común, la detección de desfases vía
+FFT, la caché por watermark y que los analizadores deleguen en el motor.
+"""
+
+import asyncio
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.intelligence.correlation_engine import CorrelationEngine, correlation_engine
+
+
+def _frame(n=600, lag_minutes=20, offset_seconds=7):
+    """Luminosidad y temperatura que la sigue con ``lag_minutes`` de retraso, con relojes desfasados"""
+    rng = np.random.default_rng(5)
+    light = pd.Series(rng.normal(0, 1, n + lag_minutes)).rolling(15, min_periods=1).mean().to_numpy()
+    timestamps = pd.date_range("2025-10-21", periods=n, freq="min")
+    ldr = 500 + 100 * light[lag_minutes:]
+    temperature = 24 + 2 * light[:n]  # temperatura(t) = luz(t - lag)
+    return pd.concat([
+        pd.DataFrame({"device_id": "esp32_wifi_001", "sensor_type": "ldr", "value": ldr,
+                      "timestamp": timestamps}),
+        pd.DataFrame({"device_id": "esp32_wifi_001", "sensor_type": "ntc_entrada", "value": temperature,
+                      "timestamp": timestamps + pd.Timedelta(seconds=offset_seconds)}),
+        pd.DataFrame({"device_id": "arduino_eth_001", "sensor_type": "t1", "value": -ldr / 50.0,
+                      "timestamp": timestamps + pd.Timedelta(seconds=2 * offset_seconds)}),
+    ], ignore_index=True)
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    correlation_engine.clear()
+    yield
+    correlation_engine.clear()
+
+
+class TestCorrelationEngine:
+    """Tests del motor."""
+
+    def test_offset_clocks_align_on_common_grid(self):
+        result = CorrelationEngine().analyze(_frame(lag_minutes=0))
+
+        assert result.freq == pd.Timedelta(minutes=1)
+        assert result.grid.shape == (600, 3)
+        assert result.matrix.loc[("esp32_wifi_001", "ldr"), ("esp32_wifi_001", "ntc_entrada")] > 0.99
+
+    def test_upper_triangle_pairs(self):
+        result = CorrelationEngine().analyze(_frame(), lags=False)
+
+        assert len(result.pairs) == 3
+        assert {"sensor1", "sensor2", "correlation", "overlap"} <= set(result.pairs.columns)
+        assert result.strongest(-1)["correlation"] == pytest.approx(-1.0)
+        strong = result.strong(0.5)
+        assert strong["correlation"].abs().is_monotonic_decreasing
+
+    def test_detects_lag(self):
+        result = CorrelationEngine().analyze(_frame(lag_minutes=20))
+        pair = result.pairs[(result.pairs["sensor1"] == ("esp32_wifi_001", "ldr"))
+                            & (result.pairs["sensor2"] == ("esp32_wifi_001", "ntc_entrada"))].iloc[0]
+
+        assert pair["lag_seconds"] == -1200  # la temperatura va detrás de la luminosidad
+        assert pair["lag_correlation"] > 0.9
+        assert abs(pair["correlation"]) < pair["lag_correlation"]
+
+    def test_cache_by_watermark(self):
+        engine = CorrelationEngine()
+        df = _frame()
+
+        first = engine.analyze(df)
+        second = engine.analyze(df.sample(frac=1, random_state=1))
+
+        assert first is second
+        assert (engine.cache_hits, engine.cache_misses) == (1, 1)
+        assert engine.analyze(df.iloc[:-1]) is not first
+
+    def test_swapped_series_miss_cache(self):
+        engine = CorrelationEngine()
+        df = _frame(lag_minutes=0, offset_seconds=0)
+        first = engine.analyze(df)
+
+        # Mismos valores y timestamps, pero la luminosidad pasa a otro dispositivo
+        swapped = df.copy()
+        ldr, t1 = swapped["sensor_type"] == "ldr", swapped["sensor_type"] == "t1"
+        swapped.loc[ldr, "device_id"], swapped.loc[t1, "device_id"] = "arduino_eth_001", "esp32_wifi_001"
+        second = engine.analyze(swapped)
+
+        assert second is not first
+        assert ("arduino_eth_001", "ldr") in second.series and ("arduino_eth_001", "ldr") not in first.series
+
+    def test_insufficient_series(self):
+        df = _frame()
+        assert correlation_engine.analyze(df[df["sensor_type"] == "ldr"]) is None
+        assert correlation_engine.analyze(pd.DataFrame()) is None
+
+
+class TestCallersDelegate:
+    """Tests de los analizadores que comparten el motor."""
+
+    def test_consumers_share_one_computation(self):
+        from modules.intelligence.advanced_visualization_engine import AdvancedVisualizationEngine
+        from modules.intelligence.automatic_insights_engine import AutomaticInsightsEngine
+        from modules.intelligence.smart_analyzer import SmartAnalyzer
+
+        df = _frame()
+        hits, misses = correlation_engine.cache_hits, correlation_engine.cache_misses
+        visual = asyncio.run(AdvancedVisualizationEngine("http://localhost:8000")._create_correlation_analysis(df))
+        insights = asyncio.run(AutomaticInsightsEngine("http://localhost:8000")._detect_complex_correlations(df))
+        smart = SmartAnalyzer(incremental=False)._analyze_sensor_correlations(df)
+
+        assert correlation_engine.cache_misses == misses + 1
+        assert correlation_engine.cache_hits == hits + 2
+        assert visual["strongest_negative"]["correlation"] == pytest.approx(-1.0)
+        assert any(lag["lag_seconds"] == -1200 for lag in visual["lagged_correlations"])
+        assert all("lag_seconds" in insight.evidence for insight in insights)
+        assert smart
@@ -0,0 +1,110 @@
+"""
+Tests para el nodo de verificación de datos
+===========================================
+
+Verifica el escáner de alucinaciones compilado en una sola pasada, su
+reconstrucción sólo cuando cambia el inventario y que la verificación use
+el inventario en vivo del estado sin consultar la base de datos.
+"""
+
+import re
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.agents.data_verification_node import (
+    FORBIDDEN_SENSOR_KEYWORDS,
+    DataVerificationNode,
+    HallucinationScanner,
+    get_hallucination_scanner,
+)
+
+
+def _reference_scan(text):
+    """Implementación original: un re.search por palabra clave."""
+    found = []
+    lower = text.lower()
+    for category, keywords in FORBIDDEN_SENSOR_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in lower and re.search(r'\b' + re.escape(keyword) + r'\b', lower):
+                found.append((category, keyword))
+    return found
+
+
+class TestHallucinationScanner:
+    """Tests del escáner compilado."""
+
+    @pytest.mark.parametrize("text", [
+        "La temperatura es 24°C y la humedad relativa 60%",
+        "Presión de 1013 hPa, sin movimiento detectado; ruido de 40 dB",
+        "El sensor LDR marca 512 y el NTC 23.4 V",
+        "Nivel de CO2 estable, dióxido de carbono bajo, pH neutro",
+        "Voltage y voltaje en rango; flow normal",
+        "Sin menciones prohibidas: temperatura y luminosidad",
+        "",
+    ])
+    def test_matches_reference_implementation(self, text):
+        scanner = HallucinationScanner()
+
+        result = [(h["category"], h["keyword"]) for h in scanner.scan(text)]
+
+        assert result == _reference_scan(text)
+
+    def test_word_boundaries(self):
+        scanner = HallucinationScanner()
+
+        # 'bar' dentro de 'barrera' y 'v' dentro de 'valor' no son menciones
+        assert scanner.scan("La barrera tiene un valor alto") == []
+
+    def test_inventory_excludes_real_categories(self):
+        scanner = HallucinationScanner(frozenset({"humidity", "temperature"}))
+
+        keywords = {h["keyword"] for h in scanner.scan("humedad 50% y presión 1000 hPa")}
+
+        assert "humedad" not in keywords
+        assert {"presión", "hpa"} <= keywords
+
+    def test_scanner_cached_per_inventory(self):
+        first = get_hallucination_scanner(frozenset({"ldr", "ntc"}))
+
+        assert get_hallucination_scanner(frozenset({"ntc", "ldr"})) is first
+        assert get_hallucination_scanner(frozenset({"ldr"})) is not first
+
+
+class TestDataVerificationNode:
+    """Tests del nodo usando el inventario en vivo."""
+
+    @pytest.fixture
+    def node(self):
+        verifier = DataVerificationNode()
+        verifier.refresh_valid_data_cache = AsyncMock()
+        return verifier
+
+    @pytest.mark.asyncio
+    async def test_uses_state_inventory_without_db(self, node):
+        state = {
+            "final_response": "La humedad es alta y la temperatura 25°C",
+            "raw_data": [
+                {"device_id": "esp32_wifi_001", "sensor_type": "temperature"},
+                {"device_id": "esp32_wifi_001", "sensor_type": "ldr"},
+            ],
+        }
+
+        result = await node.verify_response(state)
+
+        node.refresh_valid_data_cache.assert_not_awaited()
+        assert result["needs_correction"] is True
+        assert result["verification_metadata"]["hallucinations"][0]["keyword"] == "humedad"
+        assert node.valid_devices == {"esp32_wifi_001"}
+
+    def test_scanner_rebuilt_only_on_inventory_change(self, node):
+        assert node.update_inventory({"ldr", "ntc_entrada"}, {"arduino_eth_001"}) is True
+        scanner = node.scanner
+
+        assert node.update_inventory({"NTC_entrada", "ldr"}, {"arduino_eth_001"}) is False
+        assert node.scanner is scanner
@@ -0,0 +1,252 @@
+"""
+Tests para rollups y particiones de sensor_data
+===============================================
+
+Verifica que las estadísticas se resuelvan en una sola consulta sobre los
+rollups (con caída a datos crudos), la selección de resolución de las
+series agregadas, los agregados por intervalo en el servidor y la creación
+de particiones mensuales.
+"""
+
+import os
+import sys
+import pytest
+import asyncpg
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+os.environ.setdefault("DB_PASSWORD", "test")
+
+from modules.database.db_connector import (
+    DatabaseConnector,
+    SENSOR_STATS_RAW_QUERY,
+    SENSOR_STATS_ROLLUP_QUERY,
+    choose_bucket,
+)
+from modules.tools.database_tools import DatabaseTools, parse_time_window_hours
+
+
+class RecordingConnector(DatabaseConnector):
+    """Conector que registra las consultas en lugar de ir a PostgreSQL."""
+
+    def __init__(self, responses=None, missing_rollups=False):
+        super().__init__()
+        self.queries = []
+        self.responses = responses or {}
+        self.missing_rollups = missing_rollups
+
+    async def execute_query(self, query, *args):
+        self.queries.append((query, args))
+        if self.missing_rollups and "sensor_rollup" in query:
+            raise asyncpg.exceptions.UndefinedTableError("relation does not exist")
+        if "ensure_sensor_data_partition" in query:
+            return [{"partition": f"sensor_data_{args[0]:%Y_%m}"}]
+        return self.responses.get("rows", [])
+
+
+STATS_ROW = {
+    "total": 1500,
+    "first_ts": datetime(2025, 10, 1),
+    "last_ts": datetime(2025, 10, 21),
+    "devices": 2,
+    "by_device": '[{"device_id": "esp32_wifi_001", "count": 1000}, '
+                 '{"device_id": "arduino_eth_001", "count": 500}]',
+}
+
+
+class TestSensorStats:
+    """Tests de las estadísticas en una sola consulta."""
+
+    @pytest.mark.asyncio
+    async def test_single_query_on_rollups(self):
+        db = RecordingConnector({"rows": [STATS_ROW]})
+
+        stats = await db.get_sensor_stats()
+
+        assert [q for q, _ in db.queries] == [SENSOR_STATS_ROLLUP_QUERY]
+        assert stats["total_records"] == 1500
+        assert stats["devices_count"] == 2
+        assert stats["counts_by_device"][0] == {"device_id": "esp32_wifi_001", "count": 1000}
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_raw_table(self):
+        db = RecordingConnector({"rows": [STATS_ROW]}, missing_rollups=True)
+
+        stats = await db.get_sensor_stats()
+
+        assert db.queries[-1][0] == SENSOR_STATS_RAW_QUERY
+        assert "FROM sensor_data" in SENSOR_STATS_RAW_QUERY
+        assert stats["total_records"] == 1500
+
+    @pytest.mark.asyncio
+    async def test_tool_delegates(self):
+        tools = DatabaseTools()
+        tools.db = RecordingConnector({"rows": [STATS_ROW]})
+
+        stats = await tools.get_sensor_stats_tool()
+
+        assert len(tools.db.queries) == 1
+        assert stats["last_record_at"] == datetime(2025, 10, 21)
+
+
+class TestSensorRollups:
+    """Tests de las series agregadas."""
+
+    @pytest.mark.parametrize("hours,table", [(1, "sensor_rollup_1m"), (12, "sensor_rollup_1m"),
+                                             (24, "sensor_rollup_1h"), (24 * 30, "sensor_rollup_1h")])
+    @pytest.mark.asyncio
+    async def test_resolution_by_window(self, hours, table):
+        db = RecordingConnector()
+
+        await db.get_sensor_rollups(hours)
+
+        assert f"FROM {table}" in db.queries[0][0]
+
+    @pytest.mark.asyncio
+    async def test_filters_are_parameters(self):
+        db = RecordingConnector()
+
+        await db.get_sensor_rollups(48, device_id="esp32_wifi_001", sensor_type="ldr")
+
+        query, args = db.queries[0]
+        assert "device_id = $2" in query and "sensor_type = $3" in query
+        assert args[1:] == ("esp32_wifi_001", "ldr")
+
+    @pytest.mark.asyncio
+    async def test_invalid_resolution(self):
+        with pytest.raises(ValueError):
+            await RecordingConnector().get_sensor_rollups(1, resolution="5s")
+
+    @pytest.mark.asyncio
+    async def test_report_history_reads_rollups(self):
+        from modules.agents.langgraph_nodes import LangGraphNodes
+        from modules.agents.langgraph_state import QueryIntent, ToolType
+
+        nodes = LangGraphNodes()
+        nodes.db_tools.db = RecordingConnector({"rows": [
+            {"device_id": "esp32_wifi_001", "sensor_type": "ldr", "bucket": datetime(2025, 10, 21, 10),
+             "sample_count": 360, "avg_value": 512.0, "min_value": 400.0, "max_value": 700.0}]})
+
+        tools = nodes._determine_required_tools(QueryIntent.REPORTS, "informe de la última semana")
+        chart_tools = nodes._determine_required_tools(QueryIntent.SENSOR_DATA, "gráfico de luz")
+        result = await nodes._execute_tool(ToolType.GET_SENSOR_HISTORY,
+                                           {"user_query": "informe de la última semana"})
+
+        assert ToolType.GET_SENSOR_HISTORY in tools and ToolType.GET_SENSOR_HISTORY in chart_tools
+        assert "FROM sensor_rollup_1h" in nodes.db_tools.db.queries[0][0]
+        assert (result[0]["timestamp"], result[0]["value"]) == (datetime(2025, 10, 21, 10), 512.0)
+        assert nodes._extract_sensor_data_from_context({ToolType.GET_SENSOR_HISTORY: result}) == result
+
+
+BUCKET_ROW = {"device_id": "esp32_wifi_001", "sensor_type": "ldr",
+              "bucket_start": datetime(2025, 10, 21, 10), "sample_count": 360,
+              "avg_value": 512.0, "min_value": 400.0, "max_value": 700.0}
+
+
+class TestBucketedReadings:
+    """Tests de los agregados por intervalo."""
+
+    @pytest.mark.asyncio
+    async def test_raw_query_with_percentiles(self):
+        db = RecordingConnector({"rows": [dict(BUCKET_ROW, percentiles=[510.0, 650.0])]})
+
+        rows = await db.get_bucketed_readings(datetime(2025, 10, 21), bucket=timedelta(minutes=5),
+                                              device_id="esp32_wifi_001")
+
+        query, args = db.queries[0]
+        assert "date_bin($1::interval, timestamp" in query and "FROM sensor_data" in query
+        assert "device_id = $4" in query and "percentile_cont($5::float8[])" in query
+        assert args[0] == timedelta(minutes=5) and args[4] == [0.5, 0.95]
+        assert rows[0]["p50"] == 510.0 and rows[0]["p95"] == 650.0
+        assert rows[0]["value"] == 512.0 and rows[0]["timestamp"] == datetime(2025, 10, 21, 10)
+
+    @pytest.mark.parametrize("bucket,table", [(timedelta(hours=6), "sensor_rollup_1h"),
+                                              (timedelta(minutes=15), "sensor_rollup_1m")])
+    @pytest.mark.asyncio
+    async def test_rollups_without_percentiles(self, bucket, table):
+        db = RecordingConnector({"rows": [dict(BUCKET_ROW)]})
+
+        await db.get_bucketed_readings(datetime(2025, 10, 1), bucket=bucket, percentiles=())
+
+        assert f"FROM {table}" in db.queries[0][0]
+
+    @pytest.mark.asyncio
+    async def test_rollup_fallback_and_sub_minute_buckets(self):
+        db = RecordingConnector({"rows": []}, missing_rollups=True)
+
+        await db.get_bucketed_readings(datetime(2025, 10, 1), bucket=timedelta(hours=1), percentiles=())
+        await db.get_bucketed_readings(datetime(2025, 10, 1), bucket=timedelta(seconds=30), percentiles=())
+
+        assert [("sensor_rollup" in q) for q, _ in db.queries] == [True, False, False]
+
+    def test_choose_bucket_bounds_series_length(self):
+        assert choose_bucket(1) == timedelta(minutes=1)
+        assert choose_bucket(24) == timedelta(minutes=15)
+        assert choose_bucket(24 * 30) == timedelta(hours=6)
+        assert choose_bucket(24 * 365) == timedelta(days=1)
+
+    @pytest.mark.parametrize("text,hours", [("últimas 6 horas", 6), ("la última semana", 168),
+                                            ("hace 30 minutos", 0.5), ("tendencia", 24)])
+    def test_parse_time_window(self, text, hours):
+        assert parse_time_window_hours(text) == hours
+
+    @pytest.mark.asyncio
+    async def test_langgraph_tool_uses_buckets(self):
+        from modules.agents.langgraph_nodes import LangGraphNodes
+        from modules.agents.langgraph_state import QueryIntent, ToolType
+
+        nodes = LangGraphNodes()
+        nodes.db_tools.db = RecordingConnector({"rows": [dict(BUCKET_ROW, percentiles=[1.0, 2.0])]})
+
+        tools = nodes._determine_required_tools(QueryIntent.ANALYSIS, "tendencia última semana")
+        result = await nodes._execute_tool(ToolType.GET_SENSOR_BUCKETS,
+                                           {"user_query": "tendencia de la última semana"})
+
+        assert ToolType.GET_SENSOR_BUCKETS in tools and ToolType.GET_SENSOR_DATA not in tools
+        assert result[0]["value"] == 512.0
+        assert nodes.db_tools.db.queries[0][1][0] == timedelta(hours=6)  # 168h -> buckets de 6h
+        assert "FROM sensor_rollup_1h" in nodes.db_tools.db.queries[0][0]  # sin percentiles: rollups
+
+
+class TestPartitions:
+    """Tests de particiones mensuales."""
+
+    @pytest.mark.asyncio
+    async def test_ensure_current_and_next_months(self):
+        db = RecordingConnector()
+
+        created = await db.ensure_partitions(months_ahead=2)
+
+        months = [args[0] for _, args in db.queries]
+        assert months[0] == date.today().replace(day=1)
+        assert len(set(created)) == 3
+        assert all(m.day == 1 for m in months)
+
+    @pytest.mark.asyncio
+    async def test_connect_ensures_partitions_once_per_month(self, monkeypatch):
+        async def fake_pool(**kwargs):
+            return object()
+
+        monkeypatch.setattr(asyncpg, "create_pool", fake_pool)
+        db = RecordingConnector()
+
+        await db.connect()
+        await db._ensure_current_partitions()
+        assert len(db.queries) == 3
+
+        # Cambio de mes en un proceso de larga vida: se aseguran los siguientes
+        db._partitions_month = date(2000, 1, 1)
+        await db._ensure_current_partitions()
+        assert len(db.queries) == 6
+
+    def test_schema_declares_partitions_and_rollups(self):
+        schema = (root_dir / "database" / "schema.sql").read_text(encoding="utf-8")
+
+        assert "PARTITION BY RANGE (timestamp)" in schema
+        assert "REFERENCING NEW TABLE AS new_rows" in schema
+        for table in ("sensor_rollup_1m", "sensor_rollup_1h"):
+            assert f"CREATE TABLE IF NOT EXISTS {table}" in schema
@@ -0,0 +1,123 @@
+"""
+Tests para el motor de descomposición estacional
+================================================
+
+Verifica que extender la descomposición con lecturas nuevas dé los mismos
+componentes que calcularla de una vez, el uso de la caché por watermark, la
+reconstrucción al llegar historia anterior a la caché y
+que predicciones y descomposición visual compartan los mismos componentes.
+"""
+
+import asyncio
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.intelligence.decomposition_engine import DecompositionEngine
+
+
+def _daily_cycle(timestamps):
+    """Ciclo diario con pico a las 14:00, tendencia suave y ruido"""
+    hours = timestamps.hour + timestamps.minute / 60
+    noise = np.random.default_rng(7).normal(0, 0.2, len(timestamps))
+    return 20 + 3 * np.cos((hours - 14) / 24 * 2 * np.pi) + np.linspace(0, 1, len(timestamps)) + noise
+
+
+@pytest.fixture
+def readings(make_readings):
+    """Lecturas cada 10 min (columna datetime) con ciclo diario"""
+    def factory(days=4, device_id="arduino_eth_001", sensor_type="temperature_1"):
+        return make_readings(periods=days * 144, start="2025-10-06", freq="10min", values=_daily_cycle,
+                             device_id=device_id, sensor_type=sensor_type, offset=None, frame=True)
+    return factory
+
+
+class TestDecompositionEngine:
+    """Tests del motor."""
+
+    def test_incremental_matches_batch(self, readings):
+        df = readings()
+        batch = DecompositionEngine().decompose(df, "arduino_eth_001", "temperature_1")
+
+        engine = DecompositionEngine()
+        for end in range(40, len(df), 53):
+            engine.decompose(df.iloc[:end], "arduino_eth_001", "temperature_1")
+        incremental = engine.decompose(df, "arduino_eth_001", "temperature_1")
+
+        pd.testing.assert_series_equal(incremental.observed, batch.observed)
+        pd.testing.assert_series_equal(incremental.trend, batch.trend)
+        np.testing.assert_allclose(incremental.seasonal_profile, batch.seasonal_profile)
+
+    def test_components_and_scoring(self, readings):
+        df = readings()
+        decomposition = DecompositionEngine().decompose(df, "arduino_eth_001", "temperature_1")
+
+        profile = decomposition.seasonal_profile
+        assert int(np.argmax(profile)) in (13, 14) and int(np.argmin(profile)) in (1, 2)
+        assert profile.sum() == pytest.approx(0, abs=1e-9)
+        np.testing.assert_allclose((decomposition.trend + decomposition.seasonal + decomposition.residual).dropna(),
+                                   decomposition.observed[decomposition.trend.notna()])
+
+        at = decomposition.watermark
+        assert decomposition.residual_zscore(decomposition.expected_at(at), at) == 0
+        assert decomposition.residual_zscore(decomposition.expected_at(at) + 10, at) > 3
+
+    def test_cache_by_series_and_watermark(self, readings):
+        engine = DecompositionEngine()
+        df = pd.concat([readings(), readings(device_id="esp32_wifi_001")])
+
+        first = engine.decompose(df, "arduino_eth_001", "temperature_1")
+        trend = first.trend.copy()
+
+        assert engine.decompose(df, "arduino_eth_001", "temperature_1") is first
+        pd.testing.assert_series_equal(first.trend, trend)
+        assert len(first) == 4 * 24  # solo las lecturas de la serie pedida
+        assert engine.decompose(df.iloc[:20], "esp32_wifi_001", "temperature_1") is None  # menos de un ciclo
+        assert engine.get("esp32_wifi_001", "ldr") is None
+
+    def test_longer_window_after_short_one_rebuilds(self, readings):
+        df = readings(days=3)
+        engine = DecompositionEngine()
+
+        # Primero una ventana corta, luego 72h de la misma serie
+        assert engine.decompose(df.iloc[-12:], "arduino_eth_001", "temperature_1") is None
+        rebuilt = engine.decompose(df, "arduino_eth_001", "temperature_1")
+
+        batch = DecompositionEngine().decompose(df, "arduino_eth_001", "temperature_1")
+        assert rebuilt is not None and len(rebuilt) == 3 * 24
+        pd.testing.assert_series_equal(rebuilt.trend, batch.trend)
+        np.testing.assert_allclose(rebuilt.seasonal_profile, batch.seasonal_profile)
+
+
+class TestSharedComponents:
+    """Tests de los motores que consumen los componentes."""
+
+    def test_forecast_and_visual_share_components(self, readings):
+        from modules.intelligence.advanced_visualization_engine import AdvancedVisualizationEngine
+        from modules.intelligence.predictive_analysis_engine import (PredictionAlgorithm, PredictionHorizon,
+                                                                     PredictiveAnalysisEngine)
+
+        engine = DecompositionEngine()
+        predictive = PredictiveAnalysisEngine(jetson_api_url="http://127.0.0.1:9")
+        visual = AdvancedVisualizationEngine(jetson_api_url="http://127.0.0.1:9")
+        predictive.decomposition_engine = visual.decomposition_engine = engine
+        df = readings()
+
+        decomposition = engine.decompose(df, "arduino_eth_001", "temperature_1")
+        prediction = asyncio.run(predictive._apply_prediction_algorithm(
+            df, "arduino_eth_001", "temperature_1", PredictionAlgorithm.SEASONAL_DECOMPOSITION,
+            PredictionHorizon.MEDIUM_TERM, decomposition))
+        result = asyncio.run(visual._create_time_series_decomposition(df))
+
+        assert len(engine) == 1 and engine.get("arduino_eth_001", "temperature_1") is decomposition
+        expected = decomposition.expected_at(decomposition.watermark + pd.Timedelta(hours=6))
+        assert prediction.predicted_value == pytest.approx(expected)
+        assert prediction.seasonality_detected and prediction.anomaly_probability == 0
+        components = result["decompositions"]["arduino_eth_001_temperature_1"]["components"]
+        assert components == decomposition.strengths()
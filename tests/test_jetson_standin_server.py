@@ -0,0 +1,113 @@
+"""
+Tests para el servidor sustituto de la API Jetson
+=================================================
+
+Verifica formas de respuesta, determinismo, tope de página e inyección de
+fallas, además de la compatibilidad con JetsonAPIConnector.
+"""
+
+import pytest
+import requests
+import sys
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.tools.jetson_standin_server import (
+    JetsonStandInServer,
+    StandInConfig,
+    SyntheticJetsonDataset,
+)
+from modules.tools.jetson_api_connector import JetsonAPIConnector
+
+ANCHOR = datetime(2025, 10, 21, 14, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def server():
+    with JetsonStandInServer(StandInConfig(devices=3, anchor=ANCHOR)) as srv:
+        yield srv
+
+
+class TestSyntheticJetsonDataset:
+    """Tests del generador de series sintéticas."""
+
+    def test_deterministic_values(self):
+        first = SyntheticJetsonDataset(StandInConfig(anchor=ANCHOR, seed=7))
+        second = SyntheticJetsonDataset(StandInConfig(anchor=ANCHOR, seed=7))
+        ids = [d["device_id"] for d in first.devices]
+
+        assert first.device_records(ids, None, 50) == second.device_records(ids, None, 50)
+
+    def test_real_devices_first(self):
+        dataset = SyntheticJetsonDataset(StandInConfig(devices=4, sensors_per_device=2))
+
+        assert [d["device_id"] for d in dataset.devices[:2]] == ["esp32_wifi_001", "arduino_eth_001"]
+        assert all(len(d["sensors"]) == 2 for d in dataset.devices)
+
+    def test_window_bounds_records(self):
+        dataset = SyntheticJetsonDataset(StandInConfig(anchor=ANCHOR, interval_seconds=60))
+
+        records = dataset.device_records(["esp32_wifi_001"], hours=1, limit=10_000)
+
+        # 60 ticks en una hora x 3 sensores
+        assert len(records) == 180
+        assert records[0]["timestamp"] > records[-1]["timestamp"]
+
+    def test_offset_pages(self):
+        dataset = SyntheticJetsonDataset(StandInConfig(anchor=ANCHOR))
+
+        full = dataset.device_records(["esp32_wifi_001"], None, 10)
+
+        assert dataset.device_records(["esp32_wifi_001"], None, 4, offset=6) == full[6:]
+
+
+class TestJetsonStandInServer:
+    """Tests de los endpoints HTTP."""
+
+    def test_health_and_devices_shape(self, server):
+        health = requests.get(f"{server.base_url}/health", timeout=5).json()
+        devices = requests.get(f"{server.base_url}/devices", timeout=5).json()
+
+        assert health["status"] == "healthy"
+        assert health["devices_count"] == 3
+        assert devices["success"] is True
+        assert devices["count"] == 3
+        assert {"device_id", "status", "last_seen", "ip_address"} <= set(devices["data"][0])
+
+    def test_data_page_cap(self, server):
+        response = requests.get(f"{server.base_url}/data", params={"limit": 5000}, timeout=5).json()
+
+        assert response["success"] is True
+        assert response["count"] == 200
+        assert {"device_id", "sensor_type", "value", "timestamp"} <= set(response["data"][0])
+
+    def test_data_per_device(self, server):
+        response = requests.get(f"{server.base_url}/data/arduino_eth_001", params={"limit": 30}, timeout=5).json()
+
+        assert len(response["data"]) == 30
+        assert {r["device_id"] for r in response["data"]} == {"arduino_eth_001"}
+
+    def test_unknown_device_returns_404(self, server):
+        response = requests.get(f"{server.base_url}/data/nope", timeout=5)
+
+        assert response.status_code == 404
+
+    def test_error_injection(self):
+        config = StandInConfig(anchor=ANCHOR, error_rate=1.0, error_status=503)
+        with JetsonStandInServer(config) as srv:
+            response = requests.get(f"{srv.base_url}/data", timeout=5)
+
+        assert response.status_code == 503
+        assert srv.stats["errors"] == 1
+
+    def test_connector_against_standin(self, server):
+        connector = JetsonAPIConnector(server.base_url)
+
+        data = connector.get_sensor_data(device_id="esp32_wifi_001", sensor_type="ldr", limit=60)
+
+        assert len(data) == 20
+        assert server.stats["by_endpoint"]["/data/{device_id}"] == 1
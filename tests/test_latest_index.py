@@ -0,0 +1,158 @@
+"""
+Tests para el índice de últimos valores
+=======================================
+
+Verifica el último valor y conteo por serie, que las ventanas solapadas no
+dupliquen conteos, el estado por dispositivo (activo según la antigüedad de
+su última lectura), la frescura por dispositivo y la alimentación desde los
+conectores.
+"""
+
+import pytest
+import sys
+from pathlib import Path
+from datetime import datetime, timezone
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.latest_index import LatestValueIndex, latest_index
+
+ANCHOR = datetime(2025, 10, 21, 14, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def readings(make_readings):
+    """Lecturas por minuto desde las 10:00 -03:00, con el minuto como valor"""
+    def factory(minutes, start=0, device="esp32_wifi_001", sensor="ldr"):
+        return make_readings(periods=minutes, start=f"2025-10-21 10:{start:02d}", values=range(start, start + minutes),
+                             device_id=device, sensor_type=sensor, unit="lux")
+    return factory
+
+
+@pytest.fixture(autouse=True)
+def _clean_index():
+    latest_index.clear()
+    yield
+    latest_index.clear()
+
+
+class TestLatestValueIndex:
+    """Tests del índice."""
+
+    def test_latest_value_and_count(self, readings):
+        index = LatestValueIndex()
+        records = readings(30)[::-1]  # La API entrega los más recientes primero
+
+        assert index.update(records) == 30
+
+        latest = index.latest()["esp32_wifi_001"]["ldr"]
+        assert latest["value"] == 29.0
+        assert latest["timestamp"] == "2025-10-21T10:29:00-03:00"
+        assert latest["unit"] == "lux" and latest["count"] == 30
+
+    def test_overlapping_windows_are_not_double_counted(self, readings):
+        index = LatestValueIndex()
+        index.update(readings(30))
+
+        assert index.update(readings(30, start=20)) == 20
+        assert index.update(readings(10)) == 0
+        assert index.total_records == 50
+        assert index.latest()["esp32_wifi_001"]["ldr"]["value"] == 49.0
+
+    def test_device_status_merges_metadata(self, readings):
+        index = LatestValueIndex()
+        index.update(readings(5) + readings(3, sensor="ntc_entrada"))
+        index.register_devices([{"device_id": "arduino_eth_001", "status": "offline",
+                                 "last_seen": "2025-10-20T08:00:00"}])
+
+        status = index.device_status(now=datetime(2025, 10, 21, 13, 10, tzinfo=timezone.utc))
+
+        assert status["esp32_wifi_001"] == {"status": "🟢 Activo", "records_count": 8, "sensors_count": 2,
+                                            "last_seen": "2025-10-21T10:04:00-03:00", "active": True}
+        assert status["arduino_eth_001"]["active"] is False
+        assert status["arduino_eth_001"]["last_seen"] == "2025-10-20T08:00:00"
+
+    def test_device_without_recent_readings_is_inactive(self, readings):
+        index = LatestValueIndex()
+        index.update(readings(5))   # última lectura 13:04 UTC
+
+        assert index.device_status(now=datetime(2025, 10, 21, 13, 10, tzinfo=timezone.utc))[
+            "esp32_wifi_001"]["active"] is True
+        later = index.device_status(now=datetime(2025, 10, 21, 13, 30, tzinfo=timezone.utc))
+        assert later["esp32_wifi_001"]["active"] is False
+        assert later["esp32_wifi_001"]["status"] == "🔴 Inactivo"
+        assert index.device_status(active_minutes=60, now=datetime(2025, 10, 21, 13, 30, tzinfo=timezone.utc))[
+            "esp32_wifi_001"]["active"] is True
+
+    def test_ingest_rows_and_freshness(self):
+        index = LatestValueIndex()
+        assert not index.is_fresh(60)
+
+        index.update([("arduino_eth_001", "temperature_1", 24.5, "°C", datetime(2025, 10, 21, 10, 0))])
+
+        assert index.is_fresh(60)
+        assert index.latest("arduino_eth_001")["arduino_eth_001"]["temperature_1"]["value"] == 24.5
+        assert index.latest("esp32_wifi_001") == {}
+
+    def test_freshness_is_per_device(self, readings):
+        index = LatestValueIndex()
+        index.update(readings(5, device="arduino_eth_001"))
+
+        assert index.is_fresh(60, device_id="arduino_eth_001")
+        assert not index.is_fresh(60, device_id="esp32_wifi_001")
+
+        index.update(readings(5))
+        index._device_updated_at["arduino_eth_001"] -= 120
+        assert index.is_fresh(60, device_id="esp32_wifi_001")
+        assert not index.is_fresh(60)   # sin dispositivo: todos deben estar frescos
+
+
+class TestIngestionFeedsIndex:
+    """Tests de las vías de ingesta."""
+
+    def test_connector_feeds_and_serves_latest(self):
+        from modules.tools.jetson_api_connector import JetsonAPIConnector
+        from modules.tools.jetson_standin_server import JetsonStandInServer, StandInConfig
+
+        with JetsonStandInServer(StandInConfig(devices=2, anchor=ANCHOR)) as server:
+            connector = JetsonAPIConnector(server.base_url)
+            data = connector.get_sensor_data(limit=60)
+            summary = connector.get_sensor_summary()
+
+            calls = []
+            connector.get_sensor_data = lambda **kwargs: calls.append(kwargs) or []
+            latest = connector.get_latest_readings()
+
+        assert calls == []  # el índice está fresco: no se vuelve a descargar
+        assert latest_index.total_records == len(data)
+        assert set(latest) == {"esp32_wifi_001", "arduino_eth_001"}
+        assert summary["sensors"]["esp32_wifi_001"]["device_type"] == "arduino_ethernet"
+        assert summary["sensors"]["esp32_wifi_001"]["records_count"] > 0
+
+    def test_connector_refetches_device_not_in_last_ingest(self, readings):
+        from modules.tools.jetson_api_connector import JetsonAPIConnector
+
+        connector = JetsonAPIConnector("http://127.0.0.1:9")
+        calls = []
+        connector.get_sensor_data = lambda **kwargs: calls.append(kwargs) or latest_index.update(
+            readings(3, device=kwargs["device_id"]))
+
+        connector.get_latest_readings(device_id="arduino_eth_001")
+        connector.get_latest_readings(device_id="arduino_eth_001")
+        latest = connector.get_latest_readings(device_id="esp32_wifi_001")
+
+        assert [call["device_id"] for call in calls] == ["arduino_eth_001", "esp32_wifi_001"]
+        assert set(latest) == {"esp32_wifi_001"}
+
+    def test_agent_import_does_not_load_pandas(self):
+        import os
+        import subprocess
+
+        code = ("import sys; import modules.agents.cloud_iot_agent; "
+                "sys.exit(1 if 'pandas' in sys.modules else 0)")
+        env = {**os.environ, "DB_PASSWORD": os.environ.get("DB_PASSWORD", "x")}
+        result = subprocess.run([sys.executable, "-c", code], cwd=str(root_dir), env=env, capture_output=True)
+
+        assert result.returncode == 0, result.stderr.decode(errors="replace")[-2000:]
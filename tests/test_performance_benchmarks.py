@@ -0,0 +1,92 @@
+"""
+Tests de Rendimiento (Benchmarks)
+=================================
+
+Ejecuta la suite de ``benchmark_suite.py`` bajo pytest y falla cuando un
+escenario supera su línea base por más del umbral configurado.
+
+Los tiempos absolutos dependen de la máquina, así que los benchmarks no
+corren en la ejecución por defecto (sí los tests de la lógica de comparación).
+Se activan con ``--benchmark`` (dataset de 1k lecturas) o indicando tamaños::
+
+    pytest tests/test_performance_benchmarks.py --benchmark
+    IOT_BENCH_SIZES=1000,100000,1000000 pytest tests/test_performance_benchmarks.py -m benchmark
+
+Cada escenario se mide como la mediana de ``IOT_BENCH_REPEAT`` pasadas (3).
+"""
+
+import os
+import sys
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from benchmark_suite import (
+    SCENARIOS,
+    SCENARIO_THRESHOLDS,
+    BenchmarkResult,
+    build_dataset,
+    find_regressions,
+    load_baselines,
+    measure,
+    sizes_from_env,
+)
+
+BENCH_SIZES = sizes_from_env(default=[1_000])
+THRESHOLD = float(os.getenv("IOT_BENCH_THRESHOLD", "0.25"))
+REPEAT = int(os.getenv("IOT_BENCH_REPEAT", "3"))
+
+
+def _result(wall_s: float, peak_mb: float, scenario: str = "smart_analyzer") -> BenchmarkResult:
+    return BenchmarkResult(scenario, 1000, wall_s, peak_mb, 1000, "2025-10-21T00:00:00")
+
+
+class TestRegressionDetection:
+    """Tests de la lógica de comparación contra líneas base."""
+
+    def test_within_threshold(self):
+        baselines = {"smart_analyzer@1000": {"wall_s": 1.0, "peak_mb": 100.0}}
+
+        assert find_regressions([_result(1.2, 110.0)], baselines, 0.25) == []
+
+    def test_time_and_memory_regression(self):
+        baselines = {"smart_analyzer@1000": {"wall_s": 1.0, "peak_mb": 100.0}}
+
+        regressions = find_regressions([_result(2.0, 200.0)], baselines, 0.25)
+
+        assert len(regressions) == 2
+
+    def test_absolute_slack_on_tiny_timings(self):
+        baselines = {"smart_analyzer@1000": {"wall_s": 0.001, "peak_mb": 0.1}}
+
+        assert find_regressions([_result(0.02, 1.0)], baselines, 0.25) == []
+
+    def test_io_bound_scenarios_tolerate_more_noise(self):
+        baselines = {f"{name}@1000": {"wall_s": 1.0, "peak_mb": 100.0} for name in ("smart_analyzer", "pdf_report")}
+
+        assert SCENARIO_THRESHOLDS["pdf_report"] > 0.25
+        assert find_regressions([_result(1.4, 100.0, "pdf_report")], baselines, 0.25) == []
+        assert len(find_regressions([_result(1.4, 100.0)], baselines, 0.25)) == 1
+
+    def test_dataset_is_deterministic(self):
+        assert build_dataset(500) == build_dataset(500)
+        assert len(build_dataset(500)) == 500
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark
+@pytest.mark.parametrize("size", BENCH_SIZES)
+@pytest.mark.parametrize("scenario", list(SCENARIOS))
+def test_benchmark_against_baseline(scenario, size):
+    """Escenario completo contra su línea base (si existe)."""
+    records = build_dataset(size)
+
+    result = measure(scenario, records, repeat=REPEAT)
+
+    assert result.records_processed > 0
+    regressions = find_regressions([result], load_baselines(), THRESHOLD)
+    assert not regressions, "\n".join(regressions)
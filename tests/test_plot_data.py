@@ -0,0 +1,120 @@
+"""
+Tests para la preparación de datos de gráficos
+==============================================
+
+Verifica la división en series contiguas (orden de aparición, orden
+temporal con offsets mixtos, filas inválidas), las estadísticas agrupadas y que las tarjetas
+de ModernVisualizationEngine no modifiquen el DataFrame del llamador.
+"""
+
+import asyncio
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.plot_data import prepare_series, series_stats
+
+
+def _records():
+    """Lecturas como las entrega la API: más recientes primero y valores como texto"""
+    rows = []
+    for minute in range(9, -1, -1):
+        timestamp = f"2025-10-21T10:{minute:02d}:00-03:00"
+        rows.append({"device_id": "esp32_wifi_001", "sensor_type": "ldr", "value": str(100 + minute),
+                     "timestamp": timestamp})
+        rows.append({"device_id": "arduino_eth_001", "sensor_type": "temperature_1", "value": 24.0,
+                     "timestamp": timestamp})
+        rows.append({"device_id": "esp32_wifi_001", "sensor_type": "ntc_entrada", "value": 20.0 + minute % 2,
+                     "timestamp": timestamp})
+    rows.append({"device_id": "esp32_wifi_001", "sensor_type": "ldr", "value": "error", "timestamp": "2025-10-21T11:00:00"})
+    return rows
+
+
+class TestPrepareSeries:
+    """Tests de la división en series."""
+
+    def test_contiguous_series_in_appearance_order(self):
+        series = prepare_series(_records())
+
+        # Como el recorrido anidado por unique(): las series de un mismo dispositivo quedan juntas
+        assert series.keys == [("esp32_wifi_001", "ldr"), ("esp32_wifi_001", "ntc_entrada"),
+                               ("arduino_eth_001", "temperature_1")]
+        assert series.sizes.tolist() == [10, 10, 10]  # la lectura no numérica se descarta
+        for _, view in series:
+            assert view["timestamp"].is_monotonic_increasing
+
+    def test_mixed_offsets_across_dst_change(self):
+        # Chile atrasa la hora el 2025-04-06: 00:00-03:00 -> 23:00-04:00 del día anterior
+        rows = [{"device_id": "esp32_wifi_001", "sensor_type": "ldr", "value": value, "timestamp": timestamp}
+                for value, timestamp in ((3, "2025-04-05T23:30:00-04:00"), (1, "2025-04-05T23:30:00-03:00"),
+                                         (2, "2025-04-05T23:59:00-03:00"))]
+
+        frame = prepare_series(rows).frame
+
+        assert pd.api.types.is_datetime64_dtype(frame["timestamp"])
+        # Orden por instante real; el eje muestra la hora local del dispositivo
+        assert frame["value"].tolist() == [1, 2, 3]
+        assert frame["timestamp"].dt.strftime("%H:%M").tolist() == ["23:30", "23:59", "23:30"]
+
+    def test_does_not_mutate_caller_frame(self):
+        df = pd.DataFrame(_records())
+        before = df.copy()
+
+        prepare_series(df)
+
+        pd.testing.assert_frame_equal(df, before)
+
+    def test_missing_columns(self):
+        assert len(prepare_series([])) == 0
+        assert len(prepare_series([{"device_id": "x", "value": 1}])) == 0
+        assert series_stats(prepare_series([])).empty
+
+
+class TestSeriesStats:
+    """Tests de las estadísticas agrupadas."""
+
+    def test_matches_per_series_computation(self):
+        series = prepare_series(_records())
+        stats = series_stats(series)
+
+        for key, view in series:
+            values = view["value"]
+            row = stats.loc[key]
+            assert row["count"] == len(values)
+            assert row["mean"] == pytest.approx(values.mean())
+            assert row["std"] == pytest.approx(values.std())
+            assert (row["min"], row["max"]) == (values.min(), values.max())
+            half = len(values) // 2
+            expected = (values.iloc[half:].mean() - values.iloc[:half].mean()) / values.iloc[:half].mean() * 100
+            assert row["trend_pct"] == pytest.approx(expected)
+
+        assert stats.loc[("arduino_eth_001", "temperature_1"), "trend_pct"] == 0
+        assert stats.loc[("esp32_wifi_001", "ldr"), "trend_pct"] > 0  # ascendente en orden temporal
+
+    def test_single_reading_has_no_trend(self):
+        stats = series_stats(prepare_series(_records()[:1], by=("sensor_type",)))
+        assert np.isnan(stats.loc["ldr", "trend_pct"])
+
+
+class TestDashboardCards:
+    """Tests de las tarjetas de ModernVisualizationEngine."""
+
+    def test_cards_use_shared_stats_without_mutation(self, tmp_path, monkeypatch):
+        from modules.utils.modern_visualization_engine import ModernVisualizationEngine
+
+        monkeypatch.chdir(tmp_path)  # Altair escribe los datos de cada gráfico en el directorio actual
+        df = pd.DataFrame(_records())
+        before = df.copy()
+
+        cards = asyncio.run(ModernVisualizationEngine().create_sensor_dashboard_cards(df))
+
+        pd.testing.assert_frame_equal(df, before)
+        assert set(cards) == {"sensor_ldr", "sensor_ntc_entrada", "sensor_temperature_1"}
+        assert "Ascendente" in cards["sensor_ldr"]
+        assert "Estable" in cards["sensor_temperature_1"]
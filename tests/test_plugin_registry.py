@@ -0,0 +1,79 @@
+"""
+Tests para el registro de plugins con carga diferida
+====================================================
+
+Verifica que los plugins no se importan hasta su primer uso, el mapa
+diferido de instancias, la precarga en segundo plano y el reporte de
+importación.
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.plugin_registry import LazyPluginMap, PluginRegistry
+
+
+def _registry():
+    registry = PluginRegistry()
+    registry.register("counter", "collections", "Counter")
+    registry.register("ordered", "collections", "OrderedDict")
+    registry.register("broken", "modules.does_not_exist", "Nothing")
+    return registry
+
+
+class TestPluginRegistry:
+    """Tests del registro de plugins."""
+
+    def test_register_does_not_import(self):
+        registry = _registry()
+
+        assert registry.is_available("counter")
+        assert not registry.is_available("broken")
+        assert not registry.is_loaded("counter")
+        assert registry.import_report()["pending"] == ["counter", "ordered", "broken"]
+
+    def test_create_loads_once(self):
+        registry = _registry()
+
+        first = registry.create("counter", "aab")
+        registry.create("counter")
+
+        assert first["a"] == 2
+        assert registry.import_report()["loaded"] == 1
+        assert len(registry.import_report()["plugins"]) == 1
+
+    def test_warm_up_background_records_failures(self):
+        registry = _registry()
+
+        thread = registry.warm_up()
+        thread.join(timeout=10)
+
+        report = registry.import_report()
+        statuses = {p["name"]: p["status"] for p in report["plugins"]}
+        assert statuses == {"counter": "loaded", "ordered": "loaded", "broken": "failed"}
+        assert all(p["thread"] == "plugin-warmup" for p in report["plugins"])
+        assert registry.warm_up() is not None  # el plugin roto sigue pendiente
+
+
+class TestLazyPluginMap:
+    """Tests del mapa diferido de instancias."""
+
+    def test_instances_created_on_first_access(self):
+        registry = _registry()
+        systems = LazyPluginMap(registry, {"counter": {}, "broken": {}})
+
+        assert not registry.is_loaded("counter")
+        assert systems.get("counter") is systems["counter"]
+        assert registry.is_loaded("counter")
+
+    def test_failed_plugin_is_dropped(self):
+        systems = LazyPluginMap(_registry(), {"counter": {}, "broken": {}})
+
+        assert systems.get("broken") is None
+        assert "broken" not in systems
+        assert list(systems) == ["counter"]
+        assert len(systems) == 1
@@ -0,0 +1,157 @@
+"""
+Tests para el planificador de consultas
+=======================================
+
+Verifica que la consulta se traduzca en un plan de recolección (series,
+ventana, agregación y presupuesto de puntos) y que el agente recolecte
+según el plan antes de analizar, sin volver a filtrar por el texto.
+"""
+
+import asyncio
+import sys
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.query_planner import CHART_POINTS, FetchPlan, plan_query
+
+
+@pytest.fixture
+def records(make_readings):
+    """Una lectura por hora y serie durante 48 h (hasta 2025-10-10 12:00), con offset como la API"""
+    return [record for device in ("esp32_wifi_001", "arduino_eth_001") for sensor in ("ldr", "temperature_1")
+            for record in make_readings(periods=48, start="2025-10-08 13:00", freq="1h", values=1.0,
+                                        device_id=device, sensor_type=sensor)]
+
+
+class TestPlanQuery:
+    """Tests de la traducción consulta -> plan."""
+
+    def test_series_window_and_resolution(self):
+        plan = plan_query("Muéstrame un gráfico de la temperatura del esp32 en las últimas 2 semanas por hora")
+
+        assert plan.aggregation == "series" and plan.max_points == CHART_POINTS
+        assert plan.hours == 336 and plan.window_explicit
+        assert plan.resolution == timedelta(hours=1)
+        assert plan.sensor_types == ["temperature", "ntc"] and plan.device_ids == ["esp32"]
+
+    def test_summary_latest_and_defaults(self):
+        summary = plan_query("¿Cuál es el promedio de luz de arduino_eth_001 en los últimos 3 días?")
+        assert (summary.aggregation, summary.max_points, summary.hours) == ("summary", None, 72)
+        assert summary.device_ids == ["arduino_eth_001"] and summary.sensor_types == ["ldr", "light"]
+
+        latest = plan_query("¿Qué temperatura hay ahora?")
+        assert (latest.aggregation, latest.max_points, latest.hours) == ("latest", None, 1.0)
+
+        # "cada 15 minutos" es resolución, no ventana; la ventana la fija la interfaz
+        general = plan_query("Analiza los sensores cada 15 minutos", analysis_hours=12)
+        assert general.resolution == timedelta(minutes=15) and general.hours == 12
+        assert not general.sensor_types and not general.device_ids
+
+        today = plan_query("resumen de hoy", now=datetime(2025, 10, 10, 9, 30))
+        assert today.hours == pytest.approx(9.5) and today.window_explicit
+        assert not plan_query("hola").window_explicit
+
+    def test_round_trip_and_select(self, records):
+        plan = plan_query("temperatura del esp32 últimas 6 horas por hora")
+        assert FetchPlan.from_dict(plan.to_dict()) == plan
+        assert FetchPlan.from_dict(None) is None
+
+        selected = plan.select(records)
+        assert {(r["device_id"], r["sensor_type"]) for r in selected} == {("esp32_wifi_001", "temperature_1")}
+        assert len(selected) == 7   # 6 horas hacia atrás desde la lectura más reciente, inclusive
+
+
+class _FakeSeriesConnector:
+    def __init__(self, records, covered=True, rows=10):
+        self.records = records
+        self.calls = []
+        self.covered = covered
+        self.rows = rows
+
+    def get_series_for_window(self, hours, **kwargs):
+        self.calls.append((hours, kwargs))
+        return {"data": [r for r in self.records if r["sensor_type"] == "ldr"][:self.rows],
+                "plan": {"tier": "1h", "estimated_rows": 10, "covered": self.covered}}
+
+
+class _FakeDirectConnector:
+    def __init__(self, records):
+        self.records = records
+        self.calls = 0
+
+    def get_all_data_simple(self):
+        self.calls += 1
+        return {"status": "success", "sensor_data": self.records, "connection": {}, "devices": [], "stats": {}}
+
+
+class TestAgentCollection:
+    """Tests de los nodos del agente que consumen el plan."""
+
+    @pytest.fixture
+    def agent(self):
+        pytest.importorskip("langgraph")
+        from modules.agents.cloud_iot_agent import CloudIoTAgent
+        from modules.agents.langgraph_state import create_initial_state
+
+        agent = CloudIoTAgent(jetson_api_url="http://127.0.0.1:9")
+        agent.direct_api_agent = None
+        return agent, create_initial_state
+
+    def test_collector_fetches_planned_series(self, agent, records):
+        agent, create_initial_state = agent
+        agent.series_connector = _FakeSeriesConnector(records)
+
+        state = create_initial_state("gráfico de luz del esp32", analysis_hours=48)
+        state = asyncio.run(agent._query_analyzer_node(state))
+        state = asyncio.run(agent._remote_data_collector_node(state))
+
+        hours, kwargs = agent.series_connector.calls[0]
+        assert hours == 48 and kwargs["max_points"] == CHART_POINTS
+        assert kwargs["device_ids"] == ["esp32"] and kwargs["sensor_types"] == ["ldr", "light"]
+        assert state["data_collection_method"] == "planned" and len(state["raw_data"]) == 10
+        assert state["fetch_plan"]["tier"]["tier"] == "1h"
+
+    def test_fallback_data_is_trimmed_once(self, agent, records):
+        agent, create_initial_state = agent
+        agent.direct_connector = _FakeDirectConnector(records)
+
+        state = create_initial_state("temperatura del arduino últimas 6 horas")
+        state = asyncio.run(agent._query_analyzer_node(state))
+        state = asyncio.run(agent._remote_data_collector_node(state))
+
+        assert state["data_collection_method"] == "direct"
+        assert {(r["device_id"], r["sensor_type"]) for r in state["raw_data"]} == {("arduino_eth_001", "temperature_1")}
+        assert len(state["raw_data"]) == 7
+
+    def test_uncovered_plan_is_not_fetched_twice(self, agent, records):
+        agent, create_initial_state = agent
+        agent.series_connector = _FakeSeriesConnector(records, covered=False)
+        agent.direct_connector = _FakeDirectConnector(records)
+
+        state = create_initial_state("máximo de luz del esp32 en la última semana")
+        state = asyncio.run(agent._query_analyzer_node(state))
+        state = asyncio.run(agent._remote_data_collector_node(state))
+
+        hours, kwargs = agent.series_connector.calls[0]
+        assert hours == 168 and kwargs["max_points"] is None   # extremos a resolución cruda
+        # El conector de series ya consultó la API: se usan sus series parciales
+        assert agent.direct_connector.calls == 0
+        assert state["data_collection_method"] == "planned_partial" and len(state["raw_data"]) == 10
+
+    def test_unreachable_series_falls_through_to_direct(self, agent, records):
+        agent, create_initial_state = agent
+        agent.series_connector = _FakeSeriesConnector(records, rows=0)
+        agent.direct_connector = _FakeDirectConnector(records)
+
+        state = create_initial_state("máximo de luz del esp32 en la última semana")
+        state = asyncio.run(agent._query_analyzer_node(state))
+        state = asyncio.run(agent._remote_data_collector_node(state))
+
+        assert agent.direct_connector.calls == 1
+        assert state["data_collection_method"] == "direct" and len(state["raw_data"]) == 48
+
@@ -0,0 +1,179 @@
+"""
+Tests para el almacén local de lecturas por niveles
+===================================================
+
+Verifica la elección de nivel según ventana y presupuesto de puntos, que
+los rollups coincidan con agregar las lecturas crudas, la ingesta sin
+duplicados por (serie, timestamp) con historia descargada más tarde, la persistencia en archivo y que el conector
+solo consulte la API cuando el almacén no cubre la ventana o quedó viejo.
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.reading_tiers import TieredReadingStore, choose_tier
+
+
+@pytest.fixture
+def readings(make_readings):
+    """Lecturas regulares con offset de zona horaria, como las entrega la API"""
+    def factory(days=1.0, freq="1min", start="2025-10-01", **series):
+        return make_readings(periods=int(days * pd.Timedelta("1D") / pd.Timedelta(freq)), start=start, freq=freq,
+                             values=lambda ts: 500 + 100 * np.sin(np.arange(len(ts)) / 60), frame=True, **series)
+    return factory
+
+
+class TestChooseTier:
+    """Tests de la elección de nivel."""
+
+    def test_coarsest_tier_within_budget(self):
+        assert choose_tier(timedelta(hours=1), max_points=500).name == "raw"
+        assert choose_tier(timedelta(days=1), max_points=500).name == "1m"
+        assert choose_tier(timedelta(days=7), max_points=500).name == "15m"
+        assert choose_tier(timedelta(days=30), max_points=500).name == "1h"
+        assert choose_tier(timedelta(days=365), max_points=500).name == "1h"
+        assert choose_tier(timedelta(days=730), max_points=200).name == "1d"
+
+    def test_resolution_and_retention(self):
+        assert choose_tier(timedelta(days=7), resolution=timedelta(hours=2)).name == "1h"
+        # El crudo solo se retiene dos días: una semana a resolución fina cae en 1m
+        assert choose_tier(timedelta(days=7), resolution=timedelta(seconds=10)).name == "1m"
+        assert choose_tier(timedelta(days=30)).name == "15m"
+
+
+class TestTieredReadingStore:
+    """Tests del almacén."""
+
+    def test_rollups_match_raw_aggregation(self, readings):
+        store = TieredReadingStore()
+        df = readings(days=2)
+        assert store.ingest(df) == len(df)
+
+        plan = store.plan(hours=48, max_points=48)
+        rows = store.query(plan)
+
+        local = pd.to_datetime(df["timestamp"].str[:-6])
+        expected = df.groupby(local.dt.floor("1h"))["value"].agg(["count", "mean", "min", "max"])
+        assert plan.tier == "1h" and plan.covered
+        assert [row["sample_count"] for row in rows] == expected["count"].tolist()
+        np.testing.assert_allclose([row["avg_value"] for row in rows], expected["mean"])
+        np.testing.assert_allclose([row["min_value"] for row in rows], expected["min"])
+        assert rows[0]["timestamp"] == "2025-10-01T00:00:00" and rows[0]["value"] == rows[0]["avg_value"]
+
+    def test_ingest_skips_seen_readings(self, readings):
+        store = TieredReadingStore()
+        df = readings(days=1)
+        store.ingest(df.iloc[:600])
+
+        # Ventana solapada: solo cuentan las lecturas no vistas
+        assert store.ingest(df.iloc[300:]) == len(df) - 600
+        assert store.ingest(df) == 0
+
+        rows = store.query(store.plan(hours=24, max_points=1))
+        assert sum(row["sample_count"] for row in rows) == len(df)
+        assert store.latest == pd.Timestamp("2025-10-01 23:59:00")
+
+    def test_backfill_of_older_history(self, readings):
+        store = TieredReadingStore()
+        df = readings(days=30, freq="1h")
+        store.ingest(df.iloc[-3:])
+
+        # La ventana larga llega después de una corta: la historia se incorpora
+        assert store.ingest(df) == len(df) - 3
+        plan = store.plan(hours=30 * 24, max_points=500)
+        assert plan.covered and len(store.query(plan)) == len(df)
+
+        # Re-descargar todo no duplica, aunque el crudo ya no retenga lo viejo
+        assert store.ingest(df) == 0
+        assert sum(row["sample_count"] for row in store.query(plan)) == len(df)
+        assert store.latest == pd.Timestamp("2025-10-30 23:00:00")
+
+    def test_month_window_reads_bounded_rows(self, readings):
+        store = TieredReadingStore()
+        store.ingest(pd.concat([readings(days=30), readings(days=30, sensor_type="temperature_1")]))
+
+        plan = store.plan(hours=30 * 24, max_points=500, sensor_types=["ldr"])
+        rows = store.query(plan, sensor_types=["ldr"])
+
+        assert plan.tier == "1h" and plan.covered
+        assert len(rows) == 30 * 24 and plan.estimated_rows == 30 * 24 + 1
+        assert sum(row["sample_count"] for row in rows) == 30 * 24 * 60
+        assert not store.plan(hours=60 * 24, max_points=500).covered
+        # El crudo solo conserva los últimos dos días
+        assert store._count_raw([("esp32_wifi_001", "ldr")], pd.Timestamp("2025-10-01"),
+                                pd.Timestamp("2025-11-01")) == 2 * 24 * 60 + 1
+
+    def test_persists_to_file(self, tmp_path, readings):
+        db_path = str(tmp_path / "readings.db")
+        store = TieredReadingStore(db_path)
+        store.ingest(readings(days=1))
+        store.close()
+
+        reopened = TieredReadingStore(db_path)
+        assert len(reopened) == 1 and reopened.latest == pd.Timestamp("2025-10-01 23:59:00")
+        assert reopened.is_stale()
+        assert reopened.ingest(readings(days=1)) == 0
+
+
+class TestConnectorWindow:
+    """Tests del conector sobre el almacén."""
+
+    def test_fetches_only_when_needed(self, monkeypatch, readings):
+        from modules.tools.ultra_robust_connector import UltraRobustJetsonConnector
+
+        store = TieredReadingStore()
+        connector = UltraRobustJetsonConnector("http://127.0.0.1:9", reading_store=store)
+        calls = []
+
+        def fake_fetch(hours, max_records_per_device=20000):
+            calls.append(hours)
+            connector._last_fetch = (pd.Timestamp.now().timestamp(), hours)
+            return connector._store_records(readings(days=7).to_dict("records"))
+
+        monkeypatch.setattr(connector, "fetch_window", fake_fetch)
+
+        result = connector.get_series_for_window(7 * 24, max_points=500)
+        assert calls == [168] and result["plan"]["tier"] == "15m"
+        assert len(result["data"]) == 7 * 24 * 4
+
+        # Cubierto y fresco: sin llamadas a la API
+        connector.get_series_for_window(24, max_points=500)
+        assert calls == [168]
+
+        # Una ventana mayor que lo recién descargado no puede cubrirse sin pedirla
+        connector.get_series_for_window(30 * 24, max_points=500)
+        assert calls == [168, 720]
+        connector.get_series_for_window(30 * 24, max_points=500)
+        assert calls == [168, 720]
+
+        # Almacén viejo: solo se piden las horas transcurridas desde la ingesta
+        store._ingested_at -= 3600
+        connector.get_series_for_window(24, max_points=500)
+        assert calls[-1] == pytest.approx(1.25, abs=0.01)
+
+    def test_paged_fetch_covers_window_against_standin(self):
+        from datetime import datetime, timezone
+        from modules.tools.jetson_standin_server import JetsonStandInServer, StandInConfig
+        from modules.tools.ultra_robust_connector import UltraRobustJetsonConnector
+
+        config = StandInConfig(anchor=datetime(2025, 10, 21, 14, 30, tzinfo=timezone.utc), interval_seconds=60)
+        with JetsonStandInServer(config) as server:
+            connector = UltraRobustJetsonConnector(server.base_url, max_retries=1, timeout=5,
+                                                   reading_store=TieredReadingStore())
+            result = connector.get_series_for_window(24, max_points=500)
+            requests = server.stats["by_endpoint"]["/data/{device_id}"]
+            connector.get_series_for_window(12, max_points=500)
+            assert server.stats["by_endpoint"]["/data/{device_id}"] == requests
+
+        # 24h a 1 lectura/min x 3 sensores = 4320 registros por dispositivo, más de 200 por página
+        assert result["plan"]["covered"] and result["plan"]["tier"] == "1m"
+        assert requests == 2 * 22
+        assert len(connector.reading_store) == 2 * 3
@@ -191,5 +191,68 @@ def test_create_report_generator():
     assert hasattr(generator, 'generate_report')
 
 
+class TestReportDataPlanner:
+    """Tests de la recolección de datos por dispositivo"""
+    
+    def setup_method(self):
+        """Servidor sustituto de la Jetson con página amplia"""
+        from datetime import timezone
+        from modules.tools.jetson_standin_server import JetsonStandInServer, StandInConfig
+        from modules.tools.jetson_api_connector import JetsonAPIConnector
+        
+        config = StandInConfig(anchor=datetime(2025, 10, 21, 14, 30, tzinfo=timezone.utc), page_cap=5000)
+        self.server = JetsonStandInServer(config).start()
+        self.generator = ReportGenerator(jetson_connector=JetsonAPIConnector(self.server.base_url))
+        self.generator.page_size = config.page_cap
+    
+    def teardown_method(self):
+        self.server.stop()
+    
+    def test_one_request_per_device(self):
+        """Un reporte de 2 dispositivos hace 2 peticiones, no una por serie"""
+        spec = {"devices": ["esp32_wifi_001", "arduino_eth_001"], "sensors": ["temperature", "ldr"],
+                "time_range": {"description": "últimas 24 horas"}}
+        
+        series = self.generator._collect_report_series(spec, spec["devices"], spec["sensors"])
+        
+        assert self.server.stats["by_endpoint"]["/data/{device_id}"] == 2
+        assert set(series["esp32_wifi_001"]) == {"ntc_entrada", "ntc_salida", "ldr"}
+        assert set(series["arduino_eth_001"]) == {"temperature_1", "temperature_2", "temperature_avg"}
+        assert all(points for device in series.values() for points in device.values())
+    
+    def test_series_not_capped_at_200(self):
+        """Cada serie llega hasta max_data_points"""
+        spec = {"time_range": {"description": "últimas 48 horas"}}
+        
+        series = self.generator._collect_report_series(spec, ["esp32_wifi_001"], ["ldr"])
+        
+        points = series["esp32_wifi_001"]["ldr"]
+        assert len(points) == self.generator.max_data_points
+        assert set(points[0]) == {"t", "v"}
+    
+    def test_paginates_over_page_cap(self):
+        """Con el tope real de 200 registros por respuesta, la ventana se pagina con offset"""
+        from datetime import timezone
+        from modules.tools.jetson_standin_server import JetsonStandInServer, StandInConfig
+        from modules.tools.jetson_api_connector import JetsonAPIConnector
+        
+        config = StandInConfig(anchor=datetime(2025, 10, 21, 14, 30, tzinfo=timezone.utc))
+        with JetsonStandInServer(config) as server:
+            generator = ReportGenerator(jetson_connector=JetsonAPIConnector(server.base_url))
+            series = generator._collect_report_series({}, ["arduino_eth_001"], ["temperature"])
+            requests = server.stats["by_endpoint"]["/data/{device_id}"]
+        
+        points = series["arduino_eth_001"]["temperature_1"]
+        assert requests == 3 * generator.max_data_points // 200
+        assert len(points) == generator.max_data_points
+        assert len({point["t"] for point in points}) == len(points)
+    
+    def test_window_hours_from_spec(self):
+        """Ventana derivada de la descripción del rango temporal"""
+        assert self.generator._get_window_hours({"time_range": {"description": "últimas 72 horas"}}) == 72
+        assert self.generator._get_window_hours({"time_range": {"description": "última semana"}}) == 168
+        assert self.generator._get_window_hours({}) == 24
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
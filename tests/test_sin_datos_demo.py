@@ -27,7 +27,7 @@ async def test_sistema_sin_datos_demo():
         
         print('\n3️⃣ Probando obtención de datos reales (sin Jetson)...')
         # Intentar obtener datos reales - debería fallar apropiadamente
-        real_data = rg._get_real_sensor_data("arduino_eth_001", "t1")
+        real_data = rg._collect_report_series({}, ["arduino_eth_001"], ["temperature"])["arduino_eth_001"]
         
         if not real_data:
             print('   ✅ CORRECTO: No se generaron datos ficticios')
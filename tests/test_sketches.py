@@ -0,0 +1,248 @@
+"""
+Tests para los sketches estadísticos
+====================================
+
+Verifica la precisión de los cuantiles aproximados, la fusión entre
+intervalos/dispositivos, el conteo de distintos, la caché por intervalo y
+que las comparaciones de semana/mes respondan los outliers desde la caché.
+"""
+
+import sys
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.sketches import (
+    HyperLogLog,
+    SeriesSketch,
+    SketchAccumulator,
+    SketchStore,
+    TDigest,
+)
+
+QUANTILES = [0.01, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+@pytest.fixture
+def values():
+    return np.random.default_rng(7).lognormal(mean=3.0, sigma=0.5, size=200_000)
+
+
+class TestTDigest:
+    """Tests de cuantiles aproximados."""
+
+    def test_exact_before_compression(self):
+        data = [1, 2, 3, 4, 100]
+        digest = TDigest().update(data)
+
+        assert digest.is_exact
+        assert digest.quantile([0.25, 0.75]).tolist() == np.percentile(data, [25, 75]).tolist()
+        assert digest.cdf(3) == 0.6
+
+    def test_bounded_centroids_and_accuracy(self, values):
+        digest = TDigest(compression=200)
+        for chunk in np.array_split(values, 50):
+            digest.update(chunk)
+
+        assert not digest.is_exact
+        assert digest.means.size <= 110
+        expected = np.quantile(values, QUANTILES)
+        assert np.allclose(digest.quantile(QUANTILES), expected, rtol=0.01)
+        assert digest.min == values.min() and digest.max == values.max()
+
+    def test_ignores_non_finite(self):
+        digest = TDigest().update([1.0, np.nan, np.inf, 3.0])
+
+        assert len(digest) == 2
+        assert digest.quantile(0.5) == 2.0
+
+    def test_round_trip(self, values):
+        digest = TDigest().update(values)
+        restored = TDigest.from_dict(digest.to_dict())
+
+        assert restored.quantile(0.5) == pytest.approx(digest.quantile(0.5))
+        assert len(restored) == len(values)
+
+
+class TestHyperLogLog:
+    """Tests del conteo de distintos."""
+
+    def test_estimate_within_error(self):
+        hll = HyperLogLog(precision=12).update(np.arange(100_000, dtype=float))
+
+        assert hll.count() == pytest.approx(100_000, rel=0.05)
+
+    def test_small_cardinality_and_duplicates(self):
+        hll = HyperLogLog().update(["esp32_wifi_001", "arduino_eth_001"] * 1_000)
+
+        assert hll.count() == 2
+
+    def test_merge_is_union(self):
+        left = HyperLogLog().update(np.arange(0, 6_000))
+        right = HyperLogLog().update(np.arange(4_000, 10_000))
+
+        assert left.merge(right).count() == pytest.approx(10_000, rel=0.05)
+        with pytest.raises(ValueError):
+            left.merge(HyperLogLog(precision=10))
+
+
+class TestSeriesSketch:
+    """Tests del sketch por serie."""
+
+    def test_moments_match_numpy(self, values):
+        sketch = SeriesSketch.from_values(values)
+
+        assert sketch.count == len(values)
+        assert sketch.mean == pytest.approx(values.mean())
+        assert sketch.std() == pytest.approx(values.std())
+        assert sketch.std(ddof=1) == pytest.approx(values.std(ddof=1))
+
+    def test_merge_across_buckets_equals_whole(self, values):
+        merged = SeriesSketch()
+        for chunk in np.array_split(values, 24):
+            merged.merge(SeriesSketch.from_values(chunk))
+
+        assert merged.count == len(values)
+        assert merged.mean == pytest.approx(values.mean())
+        assert merged.std() == pytest.approx(values.std())
+        assert np.allclose(merged.quantile(QUANTILES), np.quantile(values, QUANTILES), rtol=0.01)
+
+    def test_iqr_bounds_and_outlier_fraction(self, values):
+        sketch = SeriesSketch.from_values(values)
+        q1, q3 = np.percentile(values, [25, 75])
+        lower, upper = sketch.iqr_bounds()
+        actual = np.mean((values < q1 - 1.5 * (q3 - q1)) | (values > q3 + 1.5 * (q3 - q1)))
+
+        assert lower == pytest.approx(q1 - 1.5 * (q3 - q1), rel=0.02)
+        assert upper == pytest.approx(q3 + 1.5 * (q3 - q1), rel=0.02)
+        assert sketch.outlier_fraction() == pytest.approx(actual, abs=0.005)
+
+    def test_summary_and_round_trip(self):
+        sketch = SeriesSketch.from_values([20.0, 21.0, 22.0, 23.0, 24.0])
+        summary = sketch.summary()
+        restored = SeriesSketch.from_dict(sketch.to_dict())
+
+        assert summary["median"] == 22.0 and summary["distinct"] == 5
+        assert restored.summary()["median"] == 22.0
+        assert SeriesSketch().summary() == {"count": 0}
+
+    def test_accumulator_flushes_in_chunks(self):
+        accumulator = SketchAccumulator(chunk_size=10)
+        for i in range(25):
+            accumulator.add(("esp32_wifi_001", "ldr"), float(i))
+
+        sketches = accumulator.result()
+
+        assert sketches[("esp32_wifi_001", "ldr")].count == 25
+        assert sketches[("esp32_wifi_001", "ldr")].median == 12.0
+
+
+def _minutes(make_readings, start, hours, **series):
+    """Una lectura por minuto durante ``hours`` horas, con valores 0..99 cíclicos"""
+    return make_readings(periods=hours * 60, start=start, values=lambda ts: np.arange(len(ts)) % 100, **series)
+
+
+class TestSketchStore:
+    """Tests de la caché por intervalo."""
+
+    def test_buckets_by_hour_and_queries_window(self, make_readings):
+        store = SketchStore()
+        start = datetime(2025, 10, 21, 0, 0)
+
+        assert store.update(_minutes(make_readings, start, 48)) == 48 * 60
+
+        assert len(store) == 48
+        day_two = store.query(start + timedelta(days=1), start + timedelta(days=2))
+        assert day_two.count == 24 * 60
+        assert store.query(device_id="arduino_eth_001").count == 0
+
+    def test_overlapping_windows_are_not_double_counted(self, make_readings):
+        store = SketchStore()
+        start = datetime(2025, 10, 21)
+
+        store.update(_minutes(make_readings, start, 2))
+        added = store.update(_minutes(make_readings, start + timedelta(hours=1), 2))
+
+        assert added == 60
+        assert store.query().count == 3 * 60
+
+    def test_backfilled_history_is_added(self, make_readings):
+        store = SketchStore()
+        start = datetime(2025, 10, 21)
+
+        store.update(_minutes(make_readings, start + timedelta(hours=2), 1))
+        # Ventana larga que llega después de una corta: solo se suma lo anterior
+        assert store.update(_minutes(make_readings, start, 3)) == 2 * 60
+        assert store.query().count == 3 * 60
+
+    def test_merges_devices_and_keeps_cache_intact(self, make_readings):
+        store = SketchStore()
+        start = datetime(2025, 10, 21)
+        store.update(_minutes(make_readings, start, 1, device_id="esp32_wifi_001"))
+        store.update(_minutes(make_readings, start, 1, device_id="arduino_eth_001"))
+
+        combined = store.query(sensor_type="ldr")
+
+        assert combined.count == 120
+        assert store.query(device_id="esp32_wifi_001").count == 60
+        assert store.series() == [("arduino_eth_001", "ldr"), ("esp32_wifi_001", "ldr")]
+
+    def test_eviction_bounds_memory(self, make_readings):
+        store = SketchStore(max_buckets=10)
+
+        store.update(_minutes(make_readings, datetime(2025, 10, 21), 24))
+
+        assert len(store) == 10
+        assert store.query().count == 10 * 60
+
+
+class TestCallers:
+    """Tests de los módulos que usan sketches."""
+
+    def test_temporal_outliers_from_arrays_and_sketches(self):
+        from modules.intelligence.temporal_comparison_engine import TemporalComparisonEngine
+
+        engine = TemporalComparisonEngine.__new__(TemporalComparisonEngine)
+        current = np.r_[np.full(20, 10.0) + np.arange(20) * 0.1, [50.0, 60.0]]
+        reference = np.arange(20, dtype=float)
+
+        from_arrays = engine._analyze_outlier_changes(current, reference)
+        from_sketches = engine._analyze_outlier_changes(SeriesSketch.from_values(current),
+                                                        SeriesSketch.from_values(reference))
+
+        assert from_arrays["current_outlier_count"] == 2
+        assert from_arrays["reference_outlier_count"] == 0
+        assert from_sketches["current_outlier_count"] == 2
+
+    def test_month_comparison_outliers_from_sketch_store(self, make_readings, monkeypatch):
+        import asyncio
+        from modules.intelligence.temporal_comparison_engine import ComparisonPeriod, TemporalComparisonEngine
+
+        engine = TemporalComparisonEngine(jetson_api_url="http://127.0.0.1:9")
+        engine.sketch_store = SketchStore()
+        hours = np.arange(60 * 24)
+        values = np.where(hours % 97 == 0, 80.0, 20.0 + np.sin(hours / 7))  # Un pico cada 97 h
+        records = make_readings(periods=len(hours), start="2025-08-20", freq="1h", sensor_type="t1", values=values)
+        queried = []
+        query = engine.sketch_store.query
+
+        def recording_query(*args, **kwargs):
+            queried.append(args)
+            return query(*args, **kwargs)
+
+        monkeypatch.setattr(engine.sketch_store, "query", recording_query)
+
+        result = asyncio.run(engine.perform_comprehensive_temporal_analysis(
+            records, [ComparisonPeriod.DAY_VS_DAY, ComparisonPeriod.MONTH_VS_MONTH],
+            include_seasonal=False, include_evolution=False))
+
+        comparisons = result["temporal_comparisons"]["esp32_wifi_001_t1"]
+        assert engine.sketch_store.series() == [("esp32_wifi_001", "t1")]
+        assert len(queried) == 2  # Solo el mes: el día se responde con los valores
+        month = comparisons["month_vs_month"]["outlier_changes"]
+        assert month["current_outlier_count"] == pytest.approx(720 // 97, abs=2)
@@ -0,0 +1,139 @@
+"""
+Tests para el modo incremental de SmartAnalyzer
+===============================================
+
+Verifica que solo se recalculen las series con datos nuevos, que los
+insights sistémicos se reutilicen mientras ninguna serie cambie y que el
+resultado coincida con el análisis completo.
+"""
+
+import sys
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.intelligence.smart_analyzer import SmartAnalyzer
+
+
+@pytest.fixture
+def readings(make_readings):
+    """Tres series por minuto hasta ahora (UTC), con ruido y un pico en el minuto 50"""
+    def factory(minutes=120):
+        start = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None) - timedelta(minutes=minutes)
+        rng = np.random.default_rng(3)
+        spike = np.where(np.arange(minutes) == 50, 30.0, 0.0)
+        data = []
+        for device, sensor, base in (("esp32_wifi_001", "temperature", 24.0),
+                                     ("esp32_wifi_001", "ldr", 500.0),
+                                     ("arduino_eth_001", "temperature", 22.0)):
+            data += make_readings(periods=minutes, start=start, values=base + rng.normal(0, 1, minutes) + spike,
+                                  device_id=device, sensor_type=sensor, offset="+00:00")
+        return data
+    return factory
+
+
+class TestIncrementalAnalysis:
+    """Tests de la caché por serie."""
+
+    def test_repeated_query_reuses_everything(self, readings):
+        analyzer = SmartAnalyzer()
+        data = readings()
+
+        first = analyzer.analyze_comprehensive(data, 24)
+        calls = []
+        analyzer._analyze_sensors_detailed = lambda df: calls.append(df) or []
+        second = analyzer.analyze_comprehensive(data, 24)
+
+        assert calls == []
+        assert analyzer.cache_stats == {'series_hits': 3, 'series_misses': 3,
+                                        'system_hits': 1, 'system_misses': 1}
+        assert len(second['sensor_insights']) == len(first['sensor_insights'])
+        assert len(second['anomalies']) == len(first['anomalies'])
+        assert second['predictions'].keys() == first['predictions'].keys()
+
+    def test_only_changed_series_recomputed(self, readings):
+        analyzer = SmartAnalyzer()
+        data = readings()
+        analyzer.analyze_comprehensive(data, 24)
+
+        new_reading = dict(data[-1], value=99.0,
+                           timestamp=(datetime.now(timezone.utc).replace(microsecond=0)
+                                     + timedelta(seconds=1)).isoformat())
+        seen = []
+        original = analyzer._analyze_sensors_detailed
+        analyzer._analyze_sensors_detailed = lambda df: seen.append(
+            sorted(set(zip(df['device_id'], df['sensor_type'])))) or original(df)
+
+        result = analyzer.analyze_comprehensive(data + [new_reading], 24)
+
+        assert seen == [[("arduino_eth_001", "temperature")]]
+        assert analyzer.cache_stats['series_misses'] == 4
+        assert analyzer.cache_stats['system_misses'] == 2
+        assert result['predictions']['arduino_eth_001_temperature']['data_points_used'] == 121
+
+    def test_matches_full_analysis(self, readings):
+        data = readings()
+
+        incremental = SmartAnalyzer().analyze_comprehensive(data, 24)
+        full = SmartAnalyzer(incremental=False).analyze_comprehensive(data, 24)
+
+        assert [(i.device_id, i.sensor_type, i.title) for i in incremental['sensor_insights']] == \
+               [(i.device_id, i.sensor_type, i.title) for i in full['sensor_insights']]
+        assert len(incremental['anomalies']) == len(full['anomalies'])
+        assert incremental['health_score'] == full['health_score']
+
+    def test_cache_is_bounded(self, readings):
+        analyzer = SmartAnalyzer(max_cached_series=2)
+        data = readings()
+
+        # Más series que capacidad: el análisis sigue completo
+        result = analyzer.analyze_comprehensive(data, 24)
+        full = SmartAnalyzer(incremental=False).analyze_comprehensive(data, 24)
+
+        assert result.get('status') != 'no_data'
+        assert len(result['sensor_insights']) == len(full['sensor_insights'])
+        assert result['predictions'].keys() == full['predictions'].keys()
+        assert len(analyzer._series_cache) == 2
+        analyzer.clear_cache()
+        assert not analyzer._series_cache and analyzer._system_cache is None
+
+    def test_eviction_is_least_recently_used(self, readings):
+        analyzer = SmartAnalyzer(max_cached_series=2)
+        data = readings()
+        by_series = lambda device, sensor: [r for r in data if (r["device_id"], r["sensor_type"]) == (device, sensor)]
+        ldr = by_series("esp32_wifi_001", "ldr")
+        esp_temp = by_series("esp32_wifi_001", "temperature")
+        arduino = by_series("arduino_eth_001", "temperature")
+
+        analyzer.analyze_comprehensive(ldr, 24)
+        analyzer.analyze_comprehensive(esp_temp, 24)
+        analyzer.analyze_comprehensive(ldr, 24)        # acierto: pasa a ser la más reciente
+        analyzer.analyze_comprehensive(arduino, 24)
+
+        assert analyzer.cache_stats['series_hits'] == 1
+        assert [key[:2] for key in analyzer._series_cache] == [("esp32_wifi_001", "ldr"),
+                                                               ("arduino_eth_001", "temperature")]
+
+
+class TestAgentAnalysis:
+    """Tests del análisis estadístico del agente."""
+
+    def test_agent_reuses_its_analyzer_between_turns(self, readings):
+        from modules.agents.cloud_iot_agent import CloudIoTAgent
+
+        agent = CloudIoTAgent.__new__(CloudIoTAgent)
+        agent.intelligence_systems = {'smart_analyzer': SmartAnalyzer()}
+        data = readings()
+
+        first = agent._smart_statistical_analysis(data, 24)
+        second = agent._smart_statistical_analysis(data, 24)
+
+        assert first["analysis_type"] == "smart" and first["anomaly_count"] > 0
+        assert first["insights"] and {"title", "description", "severity"} <= first["insights"][0].keys()
+        assert second["insights"] == first["insights"]
+        assert agent.intelligence_systems['smart_analyzer'].cache_stats['series_hits'] == 3
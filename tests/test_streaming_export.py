@@ -0,0 +1,121 @@
+"""
+Tests para la exportación en streaming
+======================================
+
+Verifica CSV por bloques, XLSX write_only, Parquet por lotes y que la
+memoria no crezca con el tamaño de la exportación.
+"""
+
+import csv
+import io
+import sys
+import tracemalloc
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.streaming_export import (
+    PYARROW_AVAILABLE,
+    READING_COLUMNS,
+    iter_csv_chunks,
+    iter_record_rows,
+    iter_series_rows,
+    spool_chunks,
+    write_parquet_streaming,
+    write_xlsx_streaming,
+)
+from modules.agents.reporting import ReportGenerator
+
+
+def _rows(count):
+    for i in range(count):
+        yield f"2025-10-21T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}-03:00", "esp32_wifi_001", "ldr", float(i)
+
+
+ALL_DATA = {
+    "esp32_wifi_001_ldr": {"device": "esp32_wifi_001", "sensor": "ldr",
+                           "data": [{"t": "2025-10-21T10:00:00-03:00", "v": 500.0},
+                                    {"t": "2025-10-21T10:00:10-03:00", "v": 520.0}]},
+    "arduino_eth_001_t1": {"device": "arduino_eth_001", "sensor": "t1",
+                           "data": [{"t": "2025-10-21T10:00:00-03:00", "v": 22.5}]},
+}
+
+
+class TestCsvStreaming:
+    """Tests del generador CSV."""
+
+    def test_chunks_join_to_full_csv(self):
+        chunks = list(iter_csv_chunks(_rows(25), READING_COLUMNS, chunk_rows=10))
+
+        parsed = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+
+        assert len(chunks) == 3
+        assert parsed[0] == READING_COLUMNS
+        assert len(parsed) == 26
+
+    def test_record_rows_accept_api_and_combined_shapes(self):
+        rows = list(iter_record_rows([
+            {"timestamp": "a", "device_id": "d1", "sensor_type": "ldr", "value": 1},
+            {"t": "b", "device": "d2", "sensor": "t1", "v": 2},
+        ]))
+
+        assert rows == [("a", "d1", "ldr", 1), ("b", "d2", "t1", 2)]
+
+    def test_spool_spills_to_disk_with_flat_memory(self):
+        tracemalloc.start()
+        spooled = spool_chunks(iter_csv_chunks(_rows(100_000), READING_COLUMNS), max_memory=1024 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert spooled._rolled  # pasó a disco
+        assert peak < 3 * 1024 * 1024
+        assert spooled.readline().decode().strip() == ",".join(READING_COLUMNS)
+
+
+class TestXlsxStreaming:
+    """Tests del libro XLSX en modo write_only."""
+
+    def test_multi_device_workbook(self):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(io.BytesIO(ReportGenerator().export_xlsx_from_combined_data(ALL_DATA)))
+
+        assert workbook.sheetnames == ["Resumen", "esp32_wifi_001_ldr", "arduino_eth_001_t1"]
+        summary = list(workbook["Resumen"].values)
+        assert summary[1] == ("esp32_wifi_001", "ldr", 2, 510.0, 500.0, 520.0)
+
+    def test_sheet_names_truncated(self):
+        from openpyxl import load_workbook
+
+        output = write_xlsx_streaming([("x" * 40, ["a"], [(1,), (2,)])])
+
+        assert load_workbook(output).sheetnames == ["x" * 31]
+
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow no instalado")
+class TestParquetStreaming:
+    """Tests de la exportación Parquet."""
+
+    def test_roundtrip_types_and_batches(self):
+        import pyarrow.parquet as pq
+
+        output = write_parquet_streaming(_rows(2_500), batch_rows=1_000)
+        parquet_file = pq.ParquetFile(output)
+        table = parquet_file.read()
+
+        assert parquet_file.metadata.num_row_groups == 3
+        assert table.num_rows == 2_500
+        assert str(table.schema.field("timestamp").type) == "timestamp[ms, tz=UTC]"
+        assert table.column("value").to_pylist()[-1] == 2_499.0
+
+    def test_report_generator_parquet_format(self):
+        import pyarrow.parquet as pq
+
+        data = ReportGenerator().export_parquet_from_combined_data(ALL_DATA)
+        table = pq.read_table(io.BytesIO(data))
+
+        assert table.num_rows == len(list(iter_series_rows(ALL_DATA)))
+        assert set(table.column("device").to_pylist()) == {"esp32_wifi_001", "arduino_eth_001"}
@@ -0,0 +1,156 @@
+"""
+Tests para los perfiles temporales
+==================================
+
+Verifica que los agregados hora x día de la semana coincidan con agrupar
+las lecturas crudas, la actualización incremental sin duplicar conteos (con
+la cobertura por serie guardada como rangos) y que el heatmap temporal y los
+insights ambientales se respondan desde los perfiles.
+"""
+
+import asyncio
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.temporal_profiles import DAY_LABELS, ProfileStore, TemporalProfile
+
+
+@pytest.fixture
+def readings(make_readings):
+    """Lecturas cada 30 min con ciclo diario (pico a las 14:00) y offset opcional en fin de semana"""
+    def factory(days=14, weekend_offset=0.0, start="2025-10-06"):
+        def daily_cycle(timestamps):
+            hours = timestamps.hour + timestamps.minute / 60
+            weekend = np.where(timestamps.dayofweek >= 5, weekend_offset, 0)
+            return 20 + 5 * np.cos((hours - 14) / 24 * 2 * np.pi) + weekend
+
+        return make_readings(periods=days * 48, start=start, freq="30min", values=daily_cycle,
+                             device_id="arduino_eth_001", sensor_type="temperature_1", frame=True)
+    return factory
+
+
+class TestProfileStore:
+    """Tests del almacén de perfiles."""
+
+    def test_cells_match_raw_grouping(self, readings):
+        df = readings(days=9)
+        store = ProfileStore()
+
+        assert store.update(df) == len(df)
+
+        profile = store.profile(sensor_type="temperature_1")
+        local = pd.to_datetime(df["timestamp"].str[:-6])
+        grouped = df.groupby([local.dt.dayofweek, local.dt.hour])["value"].agg(["count", "mean", "std", "min", "max"])
+        for (day, hour), row in grouped.iterrows():
+            assert profile.count[day, hour] == row["count"]
+            assert profile.mean()[day, hour] == pytest.approx(row["mean"])
+            assert profile.std()[day, hour] == pytest.approx(row["std"])
+            assert (profile.min[day, hour], profile.max[day, hour]) == (row["min"], row["max"])
+
+        hourly = profile.hourly()
+        expected = df.groupby(local.dt.hour)["value"].agg(["mean", "std"])
+        np.testing.assert_allclose(hourly["mean"], expected["mean"])
+        np.testing.assert_allclose(hourly["std"], expected["std"])
+        assert profile.span_days == 9 and profile.days_covered == 7
+
+    def test_incremental_updates_skip_seen_readings(self, readings):
+        df = readings(days=4)
+        store = ProfileStore()
+        store.update(df.iloc[:100])
+
+        # Ventana solapada: solo cuentan las lecturas no vistas
+        assert store.update(df.iloc[50:]) == len(df) - 100
+        assert store.update(df) == 0
+
+        full = ProfileStore()
+        full.update(df)
+        np.testing.assert_array_equal(store.profile().count, full.profile().count)
+        np.testing.assert_allclose(store.profile().sum, full.profile().sum)
+
+    def test_backfill_after_short_window(self, readings):
+        df = readings(days=7)
+        store = ProfileStore()
+        store.update(df.iloc[-1:])
+
+        # La ventana larga llega después de la última lectura: la historia se suma
+        assert store.update(df) == len(df) - 1
+        assert store.update(pd.concat([df, df.iloc[:10]])) == 0
+        assert store.profile().total == len(df)
+
+    def test_coverage_kept_as_ranges(self, readings):
+        df = readings(days=7)
+        store = ProfileStore()
+        for start in range(0, len(df) - 100, 50):
+            store.update(df.iloc[start:start + 100])
+
+        # Ventanas solapadas: un solo rango por serie, no un timestamp por lectura
+        assert all(len(ranges) == 1 for ranges in store._coverage.values())
+        counted = store.profile().total
+        assert store.update(df) == len(df) - counted
+
+        gaps = ProfileStore()
+        gaps.update(df.iloc[:10])
+        gaps.update(df.iloc[-10:])
+        assert all(len(ranges) == 2 for ranges in gaps._coverage.values())
+        # Lo que cae entre dos ventanas disjuntas sigue sin verse
+        assert gaps.update(df) == len(df) - 20
+
+    def test_profile_merges_matching_series(self, readings):
+        store = ProfileStore()
+        store.update(readings(days=2))
+        store.update(readings(days=2).assign(device_id="esp32_wifi_001"))
+
+        assert store.profile(sensor_type="temperature_1").total == 2 * store.profile(device_id="esp32_wifi_001").total
+        assert store.profile(sensor_type="ldr").total == 0
+        assert store.profile(series=[("esp32_wifi_001", "temperature_1")]).total == 2 * 48
+        assert TemporalProfile().hourly()["mean"].isna().all()
+
+
+class TestProfileConsumers:
+    """Tests de los motores que leen los perfiles."""
+
+    def test_temporal_heatmap_from_profiles(self, readings):
+        from modules.intelligence.advanced_visualization_engine import AdvancedVisualizationEngine
+
+        engine = AdvancedVisualizationEngine(jetson_api_url="http://127.0.0.1:9")
+        engine.profile_store = ProfileStore()
+        df = readings(weekend_offset=4.0)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+
+        result = asyncio.run(engine._create_temporal_heatmap(df))
+
+        heatmap = result["heatmaps_by_sensor"]["temperature_1"]
+        assert heatmap["peak_hours"]["peak_hour"] == 14
+        assert heatmap["peak_hours"]["valley_hour"] == 2
+        assert any("fin de semana" in pattern for pattern in heatmap["patterns_detected"])
+        assert result["summary"]["time_span_days"] == 14
+        assert list(DAY_LABELS) == list(engine.profile_store.profile().heatmap().columns)
+
+        # Otro dispositivo ya visto no se mezcla con los datos de la consulta
+        other = readings(days=14).assign(device_id="esp32_wifi_001")
+        other["value"] = np.where(pd.to_datetime(other["timestamp"].str[:-6]).dt.hour == 2, 90.0, 20.0)
+        engine.profile_store.update(other)
+        again = asyncio.run(engine._create_temporal_heatmap(df))
+        assert again["heatmaps_by_sensor"]["temperature_1"]["peak_hours"] == heatmap["peak_hours"]
+        assert engine.profile_store.profile(sensor_type="temperature_1").hourly()["mean"].idxmax() == 2
+
+    def test_environmental_patterns_from_profiles(self, readings):
+        from modules.intelligence.automatic_insights_engine import AutomaticInsightsEngine
+
+        engine = AutomaticInsightsEngine(jetson_api_url="http://127.0.0.1:9")
+        engine.profile_store = ProfileStore()
+        df = readings(days=3)
+        before = df.copy()
+
+        insights = asyncio.run(engine._analyze_environmental_factors(df))
+
+        pd.testing.assert_frame_equal(df, before)
+        thermal = [insight for insight in insights if insight.evidence.get("pattern_type") == "thermal_cycle"]
+        assert thermal and thermal[0].evidence["peak_hour"] == 14
@@ -0,0 +1,204 @@
+"""
+Tests para el trazado de rendimiento
+====================================
+
+Verifica anidamiento de spans, contadores, propagación en asyncio,
+exportación OTLP/JSON con rotación, la ruta por defecto del archivo, los
+contadores de caché de los motores y los resúmenes del panel.
+"""
+
+import asyncio
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from modules.utils.tracing import (
+    COUNTER_BYTES,
+    COUNTER_CACHE_HITS,
+    COUNTER_CACHE_MISSES,
+    COUNTER_RECORDS,
+    DEFAULT_TRACE_FILE,
+    Tracer,
+    hot_path,
+    load_trace_file,
+    summarize_spans,
+)
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    return tmp_path / "traces.jsonl"
+
+
+@pytest.fixture
+def test_tracer(trace_file):
+    return Tracer(service_name="test", trace_file=str(trace_file), enabled=True)
+
+
+class TestTracer:
+    """Tests del trazador."""
+
+    def test_nested_spans_share_trace(self, test_tracer):
+        with test_tracer.span("root") as root:
+            with test_tracer.span("child", node="x") as child:
+                test_tracer.increment(COUNTER_RECORDS, 10)
+
+        trace = test_tracer.recent_traces()[0]
+        by_name = {s["name"]: s for s in trace}
+
+        assert child.trace_id == root.trace_id
+        assert by_name["child"]["parent_span_id"] == root.span_id
+        assert by_name["child"]["counters"] == {COUNTER_RECORDS: 10}
+        assert by_name["child"]["attributes"] == {"node": "x"}
+
+    def test_error_status(self, test_tracer):
+        with pytest.raises(ValueError):
+            with test_tracer.span("fails"):
+                raise ValueError("boom")
+
+        span = test_tracer.recent_traces()[0][0]
+
+        assert span["status"] == "error"
+        assert "boom" in span["error"]
+
+    def test_async_propagation(self, test_tracer):
+        @test_tracer.traced("fetch")
+        async def fetch(n):
+            await asyncio.sleep(0)
+            test_tracer.increment(COUNTER_BYTES, n)
+            return n
+
+        async def run():
+            with test_tracer.span("query"):
+                return await asyncio.gather(fetch(1), fetch(2))
+
+        assert asyncio.run(run()) == [1, 2]
+
+        trace = test_tracer.recent_traces()[0]
+        fetches = [s for s in trace if s["name"] == "fetch"]
+        root = next(s for s in trace if s["name"] == "query")
+
+        assert len(fetches) == 2
+        assert all(s["parent_span_id"] == root["span_id"] for s in fetches)
+
+    def test_disabled_tracer_is_noop(self, trace_file):
+        disabled = Tracer(trace_file=str(trace_file), enabled=False)
+
+        with disabled.span("nothing") as span:
+            disabled.increment(COUNTER_RECORDS, 5)
+
+        assert span is None
+        assert disabled.recent_traces() == []
+        assert not trace_file.exists()
+
+    def test_otlp_file_export_and_rotation(self, tmp_path):
+        path = tmp_path / "rotating.jsonl"
+        rotating = Tracer(trace_file=str(path), max_bytes=2000, backup_count=2, enabled=True)
+
+        for i in range(50):
+            with rotating.span("tick", i=i):
+                rotating.increment(COUNTER_RECORDS)
+
+        spans = load_trace_file(str(path))
+
+        assert spans[0]["name"] == "tick"
+        assert {"traceId", "spanId", "startTimeUnixNano", "endTimeUnixNano"} <= set(spans[0])
+        assert (tmp_path / "rotating.jsonl.1").exists()
+        assert not (tmp_path / "rotating.jsonl.3").exists()
+
+    def test_otlp_line_is_export_request(self, test_tracer, trace_file):
+        with test_tracer.span("root"):
+            with test_tracer.span("child"):
+                pass
+
+        request = json.loads(trace_file.read_text(encoding="utf-8").splitlines()[-1])
+        resource_spans = request["resourceSpans"][0]
+
+        assert resource_spans["resource"]["attributes"] == [
+            {"key": "service.name", "value": {"stringValue": "test"}}]
+        span = resource_spans["scopeSpans"][0]["spans"][0]
+        assert span["name"] == "root" and span["kind"] == 1
+        assert [s["name"] for s in load_trace_file(str(trace_file))] == ["child", "root"]
+
+    def test_default_file_is_absolute_and_skipped_when_disabled(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("IOT_TRACE_FILE", raising=False)
+        monkeypatch.setenv("IOT_TRACE_TO_FILE", "0")
+        default = Tracer(enabled=True)
+
+        with default.span("tick"):
+            pass
+
+        assert default.trace_file == DEFAULT_TRACE_FILE and DEFAULT_TRACE_FILE.is_absolute()
+        assert DEFAULT_TRACE_FILE.parent == root_dir.resolve() / "logs"
+        assert default._get_file_logger() is None
+        assert len(default.recent_traces()) == 1
+
+        # Sin la variable el archivo por defecto se escribe; una ruta explícita siempre
+        monkeypatch.setenv("IOT_TRACE_TO_FILE", "1")
+        assert not Tracer(enabled=True)._file_disabled
+        monkeypatch.setenv("IOT_TRACE_TO_FILE", "0")
+        assert not Tracer(trace_file=str(tmp_path / "traces.jsonl"), enabled=True)._file_disabled
+
+
+class TestCacheCounters:
+    """Los motores reportan sus aciertos de caché al span activo (de cualquier trazador)."""
+
+    def test_chart_renderer_reports_hits(self, test_tracer):
+        import pandas as pd
+        from modules.utils import chart_renderer as module
+
+        renderer = module.ChartRenderer()
+        df = pd.DataFrame({"device_id": "esp32_wifi_001", "sensor_type": "ldr", "value": [1.0, 2.0, 3.0],
+                           "timestamp": pd.date_range("2025-10-21", periods=3, freq="min")})
+
+        with test_tracer.span("render"):
+            renderer.render(module.ChartSpec("time_series"), df)
+            renderer.render(module.ChartSpec("time_series"), df)
+
+        counters = test_tracer.recent_traces()[0][0]["counters"]
+        assert counters == {COUNTER_CACHE_MISSES: 1, COUNTER_CACHE_HITS: 1}
+
+    def test_smart_analyzer_reports_series_hits(self, test_tracer):
+        from datetime import datetime, timedelta, timezone
+        from modules.intelligence import smart_analyzer as module
+
+        end = datetime.now(timezone.utc)
+        data = [{"device_id": "esp32_wifi_001", "sensor_type": "ldr", "value": float(i % 7),
+                 "timestamp": (end - timedelta(minutes=i)).isoformat()} for i in range(30)]
+        analyzer = module.SmartAnalyzer()
+
+        with test_tracer.span("analyze"):
+            analyzer.analyze_comprehensive(data, 24)
+            analyzer.analyze_comprehensive(data, 24)
+
+        # 1ª llamada: serie, insights sistémicos y correlaciones fallan; 2ª: serie y sistémicos aciertan
+        counters = test_tracer.recent_traces()[0][0]["counters"]
+        assert counters == {COUNTER_CACHE_MISSES: 3, COUNTER_CACHE_HITS: 2}
+
+
+class TestSummaries:
+    """Tests de agregación para el panel de diagnóstico."""
+
+    def _trace(self):
+        return [
+            {"name": "root", "span_id": "a", "parent_span_id": None, "duration_ms": 100.0, "counters": {}},
+            {"name": "fast", "span_id": "b", "parent_span_id": "a", "duration_ms": 10.0, "counters": {"records": 5}},
+            {"name": "slow", "span_id": "c", "parent_span_id": "a", "duration_ms": 80.0, "counters": {}},
+            {"name": "leaf", "span_id": "d", "parent_span_id": "c", "duration_ms": 70.0, "counters": {}},
+        ]
+
+    def test_summarize_sorted_by_total(self):
+        summary = summarize_spans([self._trace(), self._trace()])
+
+        assert summary[0]["name"] == "root"
+        assert summary[0]["count"] == 2
+        fast = next(s for s in summary if s["name"] == "fast")
+        assert fast["records"] == 10
+
+    def test_hot_path(self):
+        assert [s["name"] for s in hot_path(self._trace())] == ["root", "slow", "leaf"]